@@ -1,6 +1,9 @@
 """
 Main FastAPI application
 """
+import asyncio
+import os
+
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -19,8 +22,8 @@ from core.auth import (
 
 # Import module routers
 from modules.bag.api import router as bag_router
-from modules.brain.api import router as brain_router
-from modules.circle.api import router as circle_router
+from modules.brain.api import router as brain_router, brain, graph_analytics_scheduler
+from modules.circle.api import router as circle_router, reminder_scheduler
 from modules.vessel.api import router as vessel_router
 
 @asynccontextmanager
@@ -31,8 +34,26 @@ async def lifespan(app: FastAPI):
     print("🚀 Levy API starting up...")
     print("   - Database initialized")
     print("   - Modules loaded: bag, brain, circle, vessel")
+    if os.getenv("BRAIN_WARMUP", "1") == "1":
+        try:
+            timings = await asyncio.to_thread(brain.warm_up)
+            print(f"   - Embedding model warmed up ({timings['load_ms']:.0f} ms load, "
+                  f"{timings['encode_ms']:.0f} ms first encode)")
+        except Exception as e:
+            print(f"   - Embedding warm-up failed: {e}")
+    graph_task = asyncio.create_task(
+        graph_analytics_scheduler(int(os.getenv("BRAIN_GRAPH_REFRESH_SECONDS", "300")))
+    )
+    print("   - Graph analytics scheduler started")
+    reminder_task = asyncio.create_task(
+        reminder_scheduler(int(os.getenv("CIRCLE_REMINDER_TICK_SECONDS", "60")))
+    )
+    print("   - Reminder scheduler started")
     yield
     # Shutdown
+    graph_task.cancel()
+    reminder_task.cancel()
+    await brain.clipper.aclose()
     print("👋 Levy API shutting down...")
 
 app = FastAPI(
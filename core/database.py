@@ -53,17 +53,22 @@ def log_audit(
     entity_type: str,
     entity_id: str,
     metadata: Dict = None,
-    ip_address: str = None
+    ip_address: str = None,
+    conn: sqlite3.Connection = None
 ):
-    """Log an audit entry"""
-    with get_db() as conn:
-        conn.execute(
-            """INSERT INTO audit_log 
-               (user_id, module, action, entity_type, entity_id, metadata, ip_address)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (user_id, module, action, entity_type, entity_id, 
-             json.dumps(metadata) if metadata else None, ip_address)
-        )
+    """Log an audit entry (inside conn's transaction if given, else in its own)"""
+    if conn is None:
+        with get_db() as conn:
+            return log_audit(user_id, module, action, entity_type, entity_id,
+                             metadata, ip_address, conn=conn)
+    
+    conn.execute(
+        """INSERT INTO audit_log 
+           (user_id, module, action, entity_type, entity_id, metadata, ip_address)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (user_id, module, action, entity_type, entity_id, 
+         json.dumps(metadata) if metadata else None, ip_address)
+    )
 
 class MultiTenantQuery:
     """Helper for multi-tenant queries"""
@@ -0,0 +1,26 @@
+-- Migration: Incremental Anki card sync
+-- Date: 2026-10-19
+
+-- Last edit time of each entry (ALTER TABLE cannot use a CURRENT_TIMESTAMP default)
+ALTER TABLE knowledge_entries ADD COLUMN updated_at DATETIME;
+UPDATE knowledge_entries SET updated_at = COALESCE(timestamp, CURRENT_TIMESTAMP);
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_srs_updated ON knowledge_entries(is_srs_eligible, updated_at);
+
+-- Bump updated_at (millisecond precision) on edits to card-relevant fields
+CREATE TRIGGER IF NOT EXISTS knowledge_touch_update
+AFTER UPDATE OF title, content, domain, tags, is_srs_eligible ON knowledge_entries BEGIN
+    UPDATE knowledge_entries SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+-- Per-user watermark for incremental Anki card sync
+CREATE TABLE IF NOT EXISTS anki_sync_state (
+    owner TEXT PRIMARY KEY CHECK (owner IN ('faza', 'gaby', 'shared')),
+    last_synced_at DATETIME,
+    notes_added INTEGER DEFAULT 0,
+    notes_updated INTEGER DEFAULT 0
+);
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'anki_sync_state', 'add_anki_sync', '{"version": "1.0"}');
@@ -0,0 +1,175 @@
+-- Migration: Bulk biometrics ingestion (per-device upsert key, batched rollups)
+-- Date: 2026-10-19
+
+-- Rollups whose triggers are paused while a bulk write rebuilds them once
+-- per batch (only ever set inside that write's own transaction)
+CREATE TABLE IF NOT EXISTS rollup_suspended (
+    name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+-- biometrics_daily triggers skip rows written while the rollup is suspended
+DROP TRIGGER IF EXISTS biometrics_daily_insert;
+DROP TRIGGER IF EXISTS biometrics_daily_delete;
+DROP TRIGGER IF EXISTS biometrics_daily_update;
+
+CREATE TRIGGER biometrics_daily_insert
+AFTER INSERT ON biometrics
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspended WHERE name = 'biometrics_daily')
+BEGIN
+    INSERT INTO biometrics_daily (owner, day)
+    SELECT NEW.owner, date(NEW.date) WHERE NEW.owner IS NOT NULL AND NEW.date IS NOT NULL
+    ON CONFLICT(owner, day) DO NOTHING;
+    UPDATE biometrics_daily SET
+        readings = readings + 1,
+        sleep_score_sum = sleep_score_sum + IFNULL(NEW.sleep_score, 0),
+        sleep_score_n = sleep_score_n + (NEW.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum + IFNULL(NEW.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n + (NEW.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum + IFNULL(NEW.hrv, 0),
+        hrv_n = hrv_n + (NEW.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum + IFNULL(NEW.resting_hr, 0),
+        resting_hr_n = resting_hr_n + (NEW.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum + IFNULL(NEW.recovery_score, 0),
+        recovery_score_n = recovery_score_n + (NEW.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum + IFNULL(NEW.weight_kg, 0),
+        weight_kg_n = weight_kg_n + (NEW.weight_kg IS NOT NULL)
+    WHERE owner = NEW.owner AND day = date(NEW.date);
+END;
+
+CREATE TRIGGER biometrics_daily_delete
+AFTER DELETE ON biometrics
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspended WHERE name = 'biometrics_daily')
+BEGIN
+    UPDATE biometrics_daily SET
+        readings = readings - 1,
+        sleep_score_sum = sleep_score_sum - IFNULL(OLD.sleep_score, 0),
+        sleep_score_n = sleep_score_n - (OLD.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum - IFNULL(OLD.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n - (OLD.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum - IFNULL(OLD.hrv, 0),
+        hrv_n = hrv_n - (OLD.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum - IFNULL(OLD.resting_hr, 0),
+        resting_hr_n = resting_hr_n - (OLD.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum - IFNULL(OLD.recovery_score, 0),
+        recovery_score_n = recovery_score_n - (OLD.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum - IFNULL(OLD.weight_kg, 0),
+        weight_kg_n = weight_kg_n - (OLD.weight_kg IS NOT NULL)
+    WHERE owner = OLD.owner AND day = date(OLD.date);
+    DELETE FROM biometrics_daily WHERE owner = OLD.owner AND day = date(OLD.date) AND readings <= 0;
+END;
+
+CREATE TRIGGER biometrics_daily_update
+AFTER UPDATE OF owner, date, sleep_score, sleep_hours, hrv, resting_hr, recovery_score, weight_kg ON biometrics
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspended WHERE name = 'biometrics_daily')
+BEGIN
+    UPDATE biometrics_daily SET
+        readings = readings - 1,
+        sleep_score_sum = sleep_score_sum - IFNULL(OLD.sleep_score, 0),
+        sleep_score_n = sleep_score_n - (OLD.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum - IFNULL(OLD.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n - (OLD.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum - IFNULL(OLD.hrv, 0),
+        hrv_n = hrv_n - (OLD.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum - IFNULL(OLD.resting_hr, 0),
+        resting_hr_n = resting_hr_n - (OLD.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum - IFNULL(OLD.recovery_score, 0),
+        recovery_score_n = recovery_score_n - (OLD.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum - IFNULL(OLD.weight_kg, 0),
+        weight_kg_n = weight_kg_n - (OLD.weight_kg IS NOT NULL)
+    WHERE owner = OLD.owner AND day = date(OLD.date);
+    DELETE FROM biometrics_daily WHERE owner = OLD.owner AND day = date(OLD.date) AND readings <= 0;
+    INSERT INTO biometrics_daily (owner, day)
+    SELECT NEW.owner, date(NEW.date) WHERE NEW.owner IS NOT NULL AND NEW.date IS NOT NULL
+    ON CONFLICT(owner, day) DO NOTHING;
+    UPDATE biometrics_daily SET
+        readings = readings + 1,
+        sleep_score_sum = sleep_score_sum + IFNULL(NEW.sleep_score, 0),
+        sleep_score_n = sleep_score_n + (NEW.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum + IFNULL(NEW.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n + (NEW.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum + IFNULL(NEW.hrv, 0),
+        hrv_n = hrv_n + (NEW.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum + IFNULL(NEW.resting_hr, 0),
+        resting_hr_n = resting_hr_n + (NEW.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum + IFNULL(NEW.recovery_score, 0),
+        recovery_score_n = recovery_score_n + (NEW.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum + IFNULL(NEW.weight_kg, 0),
+        weight_kg_n = weight_kg_n + (NEW.weight_kg IS NOT NULL)
+    WHERE owner = NEW.owner AND day = date(NEW.date);
+END;
+
+-- Merge readings sharing an owner, day and device into the latest one before
+-- adding the key: blank fields take the newest earlier value (as an import
+-- upsert would), then the older rows go (the update and delete triggers keep
+-- biometrics_daily in step). Merged counts are logged with the migration.
+DROP TABLE IF EXISTS temp.biometrics_merged;
+CREATE TEMP TABLE biometrics_merged AS
+SELECT owner, date, device_source, MAX(rowid) AS keep_rowid, COUNT(*) AS readings
+FROM biometrics
+WHERE device_source IS NOT NULL
+GROUP BY owner, date, device_source
+HAVING COUNT(*) > 1;
+
+UPDATE biometrics SET
+    sleep_score = COALESCE(sleep_score, (
+        SELECT o.sleep_score FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.sleep_score IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    sleep_hours = COALESCE(sleep_hours, (
+        SELECT o.sleep_hours FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.sleep_hours IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    deep_sleep_pct = COALESCE(deep_sleep_pct, (
+        SELECT o.deep_sleep_pct FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.deep_sleep_pct IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    hrv = COALESCE(hrv, (
+        SELECT o.hrv FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.hrv IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    resting_hr = COALESCE(resting_hr, (
+        SELECT o.resting_hr FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.resting_hr IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    recovery_score = COALESCE(recovery_score, (
+        SELECT o.recovery_score FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.recovery_score IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    weight_kg = COALESCE(weight_kg, (
+        SELECT o.weight_kg FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.weight_kg IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1)),
+    body_fat_pct = COALESCE(body_fat_pct, (
+        SELECT o.body_fat_pct FROM biometrics o
+        WHERE o.owner = biometrics.owner AND o.date = biometrics.date
+          AND o.device_source = biometrics.device_source AND o.body_fat_pct IS NOT NULL
+        ORDER BY o.rowid DESC LIMIT 1))
+WHERE rowid IN (SELECT keep_rowid FROM biometrics_merged);
+
+DELETE FROM biometrics
+WHERE rowid IN (
+    SELECT b.rowid FROM biometrics b
+    JOIN biometrics_merged m
+      ON m.owner = b.owner AND m.date = b.date AND m.device_source = b.device_source
+    WHERE b.rowid <> m.keep_rowid
+);
+
+-- One reading per owner, day and device: bulk imports upsert on this
+CREATE UNIQUE INDEX IF NOT EXISTS idx_biometrics_owner_date_source
+    ON biometrics(owner, date, device_source) WHERE device_source IS NOT NULL;
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+SELECT 'system', 'migration', 'biometrics', 'add_biometrics_bulk_ingest',
+       json_object('version', '1.0', 'merged_groups', COUNT(*),
+                   'merged_readings', COALESCE(SUM(readings - 1), 0))
+FROM biometrics_merged;
+
+DROP TABLE temp.biometrics_merged;
@@ -0,0 +1,57 @@
+-- Migration: Blueprint logs keyed on (owner, date) instead of a globally unique date
+-- Date: 2026-10-19
+-- Runs in one transaction. Recreates the health_correlations view, so it
+-- doesn't depend on add_health_correlations having run first.
+
+-- SQLite can't drop a column constraint in place: rebuild the table, in one
+-- transaction so a failure leaves blueprint_logs as it was
+BEGIN;
+
+DROP TABLE IF EXISTS blueprint_logs_new;
+CREATE TABLE blueprint_logs_new (
+    id TEXT PRIMARY KEY,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    owner TEXT CHECK (owner IN ('faza', 'gaby', 'shared')),
+    date DATE,
+    supplements_taken BOOLEAN,
+    super_veggie_eaten BOOLEAN,
+    nutty_pudding_eaten BOOLEAN,
+    exercise_done BOOLEAN,
+    supplement_list JSON,
+    meals_logged JSON,
+    water_intake_ml INTEGER,
+    compliance_score INTEGER CHECK (compliance_score BETWEEN 0 AND 100),
+    UNIQUE (owner, date)  -- one log per owner per day; upserts and heatmap scans use it
+);
+
+INSERT INTO blueprint_logs_new
+    (id, timestamp, owner, date, supplements_taken, super_veggie_eaten, nutty_pudding_eaten,
+     exercise_done, supplement_list, meals_logged, water_intake_ml, compliance_score)
+SELECT id, timestamp, owner, date, supplements_taken, super_veggie_eaten, nutty_pudding_eaten,
+       exercise_done, supplement_list, meals_logged, water_intake_ml, compliance_score
+FROM blueprint_logs;
+
+-- The rename re-checks every view; a database without add_health_correlations
+-- still has a health_correlations view that reads a missing column, so it is
+-- dropped here and recreated (in its current form) below
+DROP VIEW IF EXISTS health_correlations;
+DROP TABLE blueprint_logs;
+ALTER TABLE blueprint_logs_new RENAME TO blueprint_logs;
+
+-- Health correlation view (health logs with the same-day biometrics of the same owner)
+CREATE VIEW health_correlations AS
+SELECT 
+    h.*,
+    b.sleep_score as prev_night_sleep,
+    b.hrv as morning_hrv
+FROM health_logs h
+LEFT JOIN biometrics b ON b.owner = h.owner AND DATE(h.timestamp) = DATE(b.date);
+
+CREATE INDEX IF NOT EXISTS idx_blueprint_owner ON blueprint_logs(owner);
+CREATE INDEX IF NOT EXISTS idx_blueprint_date ON blueprint_logs(date);
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'blueprint_logs', 'add_blueprint_owner_date_key', '{"version": "1.0"}');
+
+COMMIT;
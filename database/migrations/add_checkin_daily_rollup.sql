@@ -0,0 +1,88 @@
+-- Migration: Daily check-in rollup for The Circle trends
+-- Date: 2026-10-19
+
+-- Per-day check-in sums and counts for trend queries (see modules/circle/trends.py)
+CREATE TABLE IF NOT EXISTS relationship_checkin_daily (
+    day DATE PRIMARY KEY,
+    checkins INTEGER NOT NULL DEFAULT 0,
+    faza_mood_sum INTEGER NOT NULL DEFAULT 0,
+    faza_mood_n INTEGER NOT NULL DEFAULT 0,
+    gaby_mood_sum INTEGER NOT NULL DEFAULT 0,
+    gaby_mood_n INTEGER NOT NULL DEFAULT 0,
+    relationship_vibe_sum INTEGER NOT NULL DEFAULT 0,
+    relationship_vibe_n INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS relationship_checkin_daily_insert
+AFTER INSERT ON relationship_checkins
+BEGIN
+    INSERT INTO relationship_checkin_daily (day) SELECT date(NEW.timestamp) WHERE NEW.timestamp IS NOT NULL
+    ON CONFLICT(day) DO NOTHING;
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins + 1,
+        faza_mood_sum = faza_mood_sum + IFNULL(NEW.faza_mood, 0),
+        faza_mood_n = faza_mood_n + (NEW.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum + IFNULL(NEW.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n + (NEW.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum + IFNULL(NEW.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n + (NEW.relationship_vibe IS NOT NULL)
+    WHERE day = date(NEW.timestamp);
+END;
+
+CREATE TRIGGER IF NOT EXISTS relationship_checkin_daily_delete
+AFTER DELETE ON relationship_checkins
+BEGIN
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins - 1,
+        faza_mood_sum = faza_mood_sum - IFNULL(OLD.faza_mood, 0),
+        faza_mood_n = faza_mood_n - (OLD.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum - IFNULL(OLD.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n - (OLD.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum - IFNULL(OLD.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n - (OLD.relationship_vibe IS NOT NULL)
+    WHERE day = date(OLD.timestamp);
+    DELETE FROM relationship_checkin_daily WHERE day = date(OLD.timestamp) AND checkins <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS relationship_checkin_daily_update
+AFTER UPDATE OF timestamp, faza_mood, gaby_mood, relationship_vibe ON relationship_checkins
+BEGIN
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins - 1,
+        faza_mood_sum = faza_mood_sum - IFNULL(OLD.faza_mood, 0),
+        faza_mood_n = faza_mood_n - (OLD.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum - IFNULL(OLD.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n - (OLD.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum - IFNULL(OLD.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n - (OLD.relationship_vibe IS NOT NULL)
+    WHERE day = date(OLD.timestamp);
+    DELETE FROM relationship_checkin_daily WHERE day = date(OLD.timestamp) AND checkins <= 0;
+    INSERT INTO relationship_checkin_daily (day) SELECT date(NEW.timestamp) WHERE NEW.timestamp IS NOT NULL
+    ON CONFLICT(day) DO NOTHING;
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins + 1,
+        faza_mood_sum = faza_mood_sum + IFNULL(NEW.faza_mood, 0),
+        faza_mood_n = faza_mood_n + (NEW.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum + IFNULL(NEW.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n + (NEW.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum + IFNULL(NEW.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n + (NEW.relationship_vibe IS NOT NULL)
+    WHERE day = date(NEW.timestamp);
+END;
+
+-- Backfill from existing check-ins (safe to re-run: rebuilt from source)
+DELETE FROM relationship_checkin_daily;
+INSERT INTO relationship_checkin_daily
+    (day, checkins, faza_mood_sum, faza_mood_n, gaby_mood_sum, gaby_mood_n,
+     relationship_vibe_sum, relationship_vibe_n)
+SELECT date(timestamp), COUNT(*),
+       IFNULL(SUM(faza_mood), 0), COUNT(faza_mood),
+       IFNULL(SUM(gaby_mood), 0), COUNT(gaby_mood),
+       IFNULL(SUM(relationship_vibe), 0), COUNT(relationship_vibe)
+FROM relationship_checkins
+WHERE timestamp IS NOT NULL
+GROUP BY date(timestamp);
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'relationship_checkin_daily', 'add_checkin_daily_rollup', '{"version": "1.0"}');
@@ -0,0 +1,12 @@
+-- Migration: Indexes for the Circle reminders engine
+-- Date: 2026-10-19
+
+-- Overdue pings per owner
+CREATE INDEX IF NOT EXISTS idx_contacts_owner_ping ON contacts(owner, next_scheduled_ping);
+
+-- Upcoming birthdays: month-day range scan instead of parsing every birthday
+CREATE INDEX IF NOT EXISTS idx_contacts_owner_birthday_md ON contacts(owner, strftime('%m-%d', birthday));
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'contacts', 'add_circle_reminder_indexes', '{"version": "1.0"}');
@@ -0,0 +1,16 @@
+-- Migration: Chunked knowledge embeddings
+-- Date: 2026-10-19
+--
+-- Entries are now embedded as overlapping chunks (one Qdrant point per chunk,
+-- parent_id = entry id). Existing whole-entry vectors are still searchable;
+-- POST /api/v1/brain/sync/embeddings re-embeds them as chunks.
+
+-- Number of chunk vectors stored for the entry
+ALTER TABLE knowledge_entries ADD COLUMN embedding_chunks INTEGER DEFAULT 0;
+
+-- Existing embeddings were a single vector
+UPDATE knowledge_entries SET embedding_chunks = 1 WHERE embedding_synced = 1;
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'knowledge_entries', 'add_embedding_chunks', '{"version": "1.0"}');
@@ -0,0 +1,21 @@
+-- Migration: Health correlations for every owner
+-- Date: 2026-10-19
+
+-- Range scans for the correlation engine (owner + time window)
+CREATE INDEX IF NOT EXISTS idx_health_owner_timestamp ON health_logs(owner, timestamp);
+CREATE INDEX IF NOT EXISTS idx_biometrics_owner_date ON biometrics(owner, date);
+
+-- The view was limited to owner 'gaby', joined biometrics across owners and
+-- read a sleep_quality column biometrics doesn't have
+DROP VIEW IF EXISTS health_correlations;
+CREATE VIEW health_correlations AS
+SELECT 
+    h.*,
+    b.sleep_score as prev_night_sleep,
+    b.hrv as morning_hrv
+FROM health_logs h
+LEFT JOIN biometrics b ON b.owner = h.owner AND DATE(h.timestamp) = DATE(b.date);
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'health_logs', 'add_health_correlations', '{"version": "1.0"}');
@@ -0,0 +1,29 @@
+-- Migration: Near-duplicate detection for knowledge entries
+-- Date: 2026-10-19
+
+-- MinHash signature per entry
+CREATE TABLE IF NOT EXISTS knowledge_signatures (
+    entry_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+-- LSH buckets: entries sharing a band hash are duplicate candidates
+CREATE TABLE IF NOT EXISTS knowledge_lsh (
+    band_key INTEGER NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (band_key, entry_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_lsh_entry ON knowledge_lsh(entry_id);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_dedup_delete AFTER DELETE ON knowledge_entries BEGIN
+    DELETE FROM knowledge_signatures WHERE entry_id = old.id;
+    DELETE FROM knowledge_lsh WHERE entry_id = old.id;
+END;
+
+-- Existing entries get signatures on the first GET /api/v1/brain/duplicates
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'knowledge_signatures', 'add_knowledge_dedup', '{"version": "1.0"}');
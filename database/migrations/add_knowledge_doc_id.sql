@@ -0,0 +1,135 @@
+-- Migration: Stable integer key (doc_id) for the knowledge_fts index
+-- Date: 2026-10-19
+-- Apply after, in this order: add_knowledge_fts (via add_knowledge_fts.py),
+-- add_knowledge_graph, add_embedding_chunks, add_anki_sync and
+-- add_knowledge_dedup (it copies their columns and recreates their triggers).
+-- The health_correlations view is recreated, so add_health_correlations
+-- needn't have run first.
+--
+-- knowledge_fts was keyed on the implicit rowid of knowledge_entries, which
+-- VACUUM may renumber for a table without an INTEGER PRIMARY KEY, silently
+-- detaching the index. The table is rebuilt with doc_id INTEGER PRIMARY KEY
+-- (a rowid alias, kept by VACUUM), current rowids become doc_ids and the
+-- index is rebuilt on them. Safe to re-run.
+
+BEGIN;
+
+CREATE TABLE knowledge_entries_new (
+    doc_id INTEGER PRIMARY KEY,  -- rowid alias keying knowledge_fts (kept by VACUUM)
+    id TEXT NOT NULL UNIQUE,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    owner TEXT CHECK (owner IN ('faza', 'gaby', 'shared')),
+    created_by TEXT,
+    title TEXT,
+    content TEXT,
+    content_type TEXT CHECK (content_type IN ('note', 'voice_transcript', 'web_clip', 'code', 'pdf_extract')),
+    source_url TEXT,
+    source_file TEXT,
+    domain TEXT CHECK (domain IN ('tech', 'dnd', 'masters', 'life', 'finance', 'health')),
+    project TEXT,
+    tags JSON,
+    is_srs_eligible BOOLEAN DEFAULT 0,
+    srs_card_id TEXT,
+    qdrant_id TEXT,
+    embedding_synced BOOLEAN DEFAULT 0,
+    embedding_chunks INTEGER DEFAULT 0,
+    updated_at DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+INSERT INTO knowledge_entries_new
+    (doc_id, id, timestamp, owner, created_by, title, content, content_type, source_url,
+     source_file, domain, project, tags, is_srs_eligible, srs_card_id, qdrant_id,
+     embedding_synced, embedding_chunks, updated_at)
+SELECT rowid, id, timestamp, owner, created_by, title, content, content_type, source_url,
+       source_file, domain, project, tags, is_srs_eligible, srs_card_id, qdrant_id,
+       embedding_synced, embedding_chunks, updated_at
+FROM knowledge_entries
+ORDER BY rowid;
+
+-- The rename re-checks every view; a database without add_health_correlations
+-- still has a health_correlations view that reads a missing column, so it is
+-- dropped here and recreated (in its current form) below
+DROP VIEW IF EXISTS health_correlations;
+
+-- Drops the old table's indexes and triggers with it
+DROP TABLE knowledge_entries;
+ALTER TABLE knowledge_entries_new RENAME TO knowledge_entries;
+
+-- Health correlation view (health logs with the same-day biometrics of the same owner)
+CREATE VIEW health_correlations AS
+SELECT 
+    h.*,
+    b.sleep_score as prev_night_sleep,
+    b.hrv as morning_hrv
+FROM health_logs h
+LEFT JOIN biometrics b ON b.owner = h.owner AND DATE(h.timestamp) = DATE(b.date);
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_owner ON knowledge_entries(owner);
+CREATE INDEX IF NOT EXISTS idx_knowledge_domain ON knowledge_entries(domain);
+CREATE INDEX IF NOT EXISTS idx_knowledge_project ON knowledge_entries(project);
+CREATE INDEX IF NOT EXISTS idx_knowledge_qdrant ON knowledge_entries(qdrant_id);
+CREATE INDEX IF NOT EXISTS idx_knowledge_srs_updated ON knowledge_entries(is_srs_eligible, updated_at);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_touch_update
+AFTER UPDATE OF title, content, domain, tags, is_srs_eligible ON knowledge_entries BEGIN
+    UPDATE knowledge_entries SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+-- Re-key the full-text index on doc_id
+DROP TABLE IF EXISTS knowledge_fts;
+CREATE VIRTUAL TABLE knowledge_fts USING fts5(
+    title,
+    content,
+    tags,
+    content='knowledge_entries',
+    content_rowid='doc_id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3 4 5 6'  -- type-ahead prefixes read one doclist instead of merging every completion
+);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_fts_insert AFTER INSERT ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(rowid, title, content, tags)
+    VALUES (new.doc_id, new.title, new.content, new.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_fts_delete AFTER DELETE ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, title, content, tags)
+    VALUES ('delete', old.doc_id, old.title, old.content, old.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_fts_update AFTER UPDATE OF title, content, tags ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, title, content, tags)
+    VALUES ('delete', old.doc_id, old.title, old.content, old.tags);
+    INSERT INTO knowledge_fts(rowid, title, content, tags)
+    VALUES (new.doc_id, new.title, new.content, new.tags);
+END;
+
+INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild');
+
+-- Tag index, graph and dedup maintenance triggers
+CREATE TRIGGER IF NOT EXISTS knowledge_tags_insert AFTER INSERT ON knowledge_entries BEGIN
+    INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+    SELECT value, new.id FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_tags_update AFTER UPDATE OF tags ON knowledge_entries BEGIN
+    DELETE FROM knowledge_tags WHERE entry_id = old.id;
+    INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+    SELECT value, new.id FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_graph_delete AFTER DELETE ON knowledge_entries BEGIN
+    DELETE FROM knowledge_tags WHERE entry_id = old.id;
+    DELETE FROM knowledge_edges WHERE src_id = old.id OR dst_id = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_dedup_delete AFTER DELETE ON knowledge_entries BEGIN
+    DELETE FROM knowledge_signatures WHERE entry_id = old.id;
+    DELETE FROM knowledge_lsh WHERE entry_id = old.id;
+END;
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'knowledge_entries', 'add_knowledge_doc_id', '{"version": "1.0"}');
+
+COMMIT;
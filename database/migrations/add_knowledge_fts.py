@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Migration: Create the knowledge_fts full-text index and backfill existing rows.
+
+The DDL lives in add_knowledge_fts.sql. Existing knowledge entries are copied
+into the index in rowid batches, one transaction per batch, so the database
+is never locked for the whole backfill. Rows inserted while the backfill runs
+are indexed by the triggers, so only rows up to the starting max(rowid) are
+copied.
+
+Also safe to re-run after VACUUM (which may renumber rowids).
+
+Usage:
+    python database/migrations/add_knowledge_fts.py [--db PATH] [--batch-size N]
+"""
+import sys
+import time
+import sqlite3
+import argparse
+from pathlib import Path
+
+# Add workspace to path
+workspace = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(workspace))
+
+from core.database import DB_PATH
+
+MIGRATION_SQL = Path(__file__).parent / "add_knowledge_fts.sql"
+
+
+def backfill_knowledge_fts(conn: sqlite3.Connection, batch_size: int = 500) -> int:
+    """Copy knowledge_entries into knowledge_fts in rowid order, one commit per batch"""
+    max_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM knowledge_entries").fetchone()[0]
+
+    last_rowid = 0
+    indexed = 0
+    while last_rowid < max_rowid:
+        rows = conn.execute(
+            """SELECT rowid, title, content, tags FROM knowledge_entries
+               WHERE rowid > ? AND rowid <= ?
+               ORDER BY rowid LIMIT ?""",
+            (last_rowid, max_rowid, batch_size)
+        ).fetchall()
+
+        if not rows:
+            break
+
+        conn.executemany(
+            "INSERT INTO knowledge_fts(rowid, title, content, tags) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+
+        last_rowid = rows[-1][0]
+        indexed += len(rows)
+        print(f"   - indexed {indexed} entries (rowid <= {last_rowid})")
+
+    return indexed
+
+
+def migrate(db_path: Path, batch_size: int = 500) -> int:
+    """Apply the DDL, backfill the index and record the migration"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(MIGRATION_SQL.read_text())
+
+        start = time.perf_counter()
+        indexed = backfill_knowledge_fts(conn, batch_size)
+        elapsed = time.perf_counter() - start
+
+        conn.execute("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('optimize')")
+        conn.execute(
+            """INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+               VALUES ('system', 'migration', 'knowledge_fts', 'add_knowledge_fts', ?)""",
+            (f'{{"version": "1.0", "indexed": {indexed}}}',)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"✅ knowledge_fts built: {indexed} entries in {elapsed:.2f}s")
+    return indexed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the knowledge_fts full-text index")
+    parser.add_argument('--db', default=str(DB_PATH), help="Path to levy.db")
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows per transaction")
+    args = parser.parse_args()
+
+    migrate(Path(args.db), args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+-- Migration: Full-text index for knowledge entries (FTS5, BM25)
+-- Date: 2026-10-19
+-- Rows are backfilled in batches by add_knowledge_fts.py (run that instead of this file)
+
+-- Drop any earlier definition so the prefix indexes are (re)built
+DROP TRIGGER IF EXISTS knowledge_fts_insert;
+DROP TRIGGER IF EXISTS knowledge_fts_delete;
+DROP TRIGGER IF EXISTS knowledge_fts_update;
+DROP TABLE IF EXISTS knowledge_fts;
+
+-- External-content index over knowledge_entries(title, content, tags)
+CREATE VIRTUAL TABLE knowledge_fts USING fts5(
+    title,
+    content,
+    tags,
+    content='knowledge_entries',
+    content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Keep the index in sync with knowledge_entries
+CREATE TRIGGER knowledge_fts_insert AFTER INSERT ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(rowid, title, content, tags)
+    VALUES (new.rowid, new.title, new.content, new.tags);
+END;
+
+CREATE TRIGGER knowledge_fts_delete AFTER DELETE ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, title, content, tags)
+    VALUES ('delete', old.rowid, old.title, old.content, old.tags);
+END;
+
+CREATE TRIGGER knowledge_fts_update AFTER UPDATE OF title, content, tags ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, title, content, tags)
+    VALUES ('delete', old.rowid, old.title, old.content, old.tags);
+    INSERT INTO knowledge_fts(rowid, title, content, tags)
+    VALUES (new.rowid, new.title, new.content, new.tags);
+END;
@@ -0,0 +1,50 @@
+-- Migration: Persistent knowledge graph (knowledge_tags, knowledge_edges)
+-- Date: 2026-10-19
+-- After running, build edges for existing entries with POST /api/v1/brain/sync/graph
+
+-- Inverted tag index (tag -> entries)
+CREATE TABLE IF NOT EXISTS knowledge_tags (
+    tag TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (tag, entry_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_tags_entry ON knowledge_tags(entry_id);
+
+-- Graph edges, stored in both directions
+CREATE TABLE IF NOT EXISTS knowledge_edges (
+    src_id TEXT NOT NULL,
+    dst_id TEXT NOT NULL,
+    edge_type TEXT DEFAULT 'metadata',
+    weight REAL NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (src_id, dst_id, edge_type)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_edges_dst ON knowledge_edges(dst_id);
+
+-- Keep knowledge_tags / knowledge_edges in sync with knowledge_entries
+CREATE TRIGGER IF NOT EXISTS knowledge_tags_insert AFTER INSERT ON knowledge_entries BEGIN
+    INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+    SELECT value, new.id FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_tags_update AFTER UPDATE OF tags ON knowledge_entries BEGIN
+    DELETE FROM knowledge_tags WHERE entry_id = old.id;
+    INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+    SELECT value, new.id FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_graph_delete AFTER DELETE ON knowledge_entries BEGIN
+    DELETE FROM knowledge_tags WHERE entry_id = old.id;
+    DELETE FROM knowledge_edges WHERE src_id = old.id OR dst_id = old.id;
+END;
+
+-- Backfill the tag index from existing entries
+INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+SELECT j.value, k.id
+FROM knowledge_entries k, json_each(CASE WHEN json_valid(k.tags) THEN k.tags ELSE '[]' END) j;
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'knowledge_edges', 'add_knowledge_graph', '{"version": "1.0"}');
@@ -0,0 +1,23 @@
+-- Migration: Materialised reminder queue for The Circle
+-- Date: 2026-10-19
+
+-- One row per (kind, ref_id): contact pings, birthdays and health alerts
+CREATE TABLE IF NOT EXISTS reminder_queue (
+    owner TEXT CHECK (owner IN ('faza', 'gaby', 'shared')),
+    kind TEXT NOT NULL CHECK (kind IN ('contact_ping', 'birthday', 'health_alert')),
+    ref_id TEXT NOT NULL,
+    due_at DATETIME NOT NULL,
+    expires_at DATETIME,
+    payload JSON,
+    fired_at DATETIME,
+    PRIMARY KEY (kind, ref_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_reminder_queue_owner_due ON reminder_queue(owner, kind, due_at);
+CREATE INDEX IF NOT EXISTS idx_reminder_queue_pending ON reminder_queue(due_at) WHERE fired_at IS NULL;
+
+-- Existing contacts are queued by the reminder scheduler when the API starts
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'reminder_queue', 'add_reminder_queue', '{"version": "1.0"}');
@@ -0,0 +1,84 @@
+-- Migration: Normalised sobriety relapses and per-habit cost per day
+-- Date: 2026-10-19
+
+-- Safe to re-run: the tracker table is rebuilt with cost_per_day instead of
+-- ALTER TABLE ... ADD COLUMN (which fails once the column exists), and
+-- relapse_log is emptied once its entries have moved. The health_correlations
+-- view is recreated, so add_health_correlations needn't have run first.
+
+-- Dropping the old tracker table must not cascade to sobriety_relapses
+PRAGMA foreign_keys = OFF;
+
+BEGIN;
+
+DROP TABLE IF EXISTS sobriety_tracker_new;
+CREATE TABLE sobriety_tracker_new (
+    id TEXT PRIMARY KEY,
+    owner TEXT CHECK (owner IN ('faza', 'gaby')),
+    habit_type TEXT CHECK (habit_type IN ('alcohol', 'nicotine', 'caffeine', 'social_media', 'gaming', 'other')),
+    start_date DATE,
+    last_relapse DATE,
+    current_streak_days INTEGER DEFAULT 0,  -- legacy: streaks and savings are computed on read
+    longest_streak_days INTEGER DEFAULT 0,
+    relapse_log JSON,  -- legacy: relapses live in sobriety_relapses
+    why_i_started TEXT,
+    savings_calculated DECIMAL(10,2) DEFAULT 0,
+    cost_per_day DECIMAL(10,2)  -- what the habit cost per day, for savings
+);
+
+-- cost_per_day is kept on a re-run: inside the subquery it names the old
+-- table's column when there is one, else the NULL placeholder of d
+INSERT INTO sobriety_tracker_new
+    (id, owner, habit_type, start_date, last_relapse, current_streak_days,
+     longest_streak_days, relapse_log, why_i_started, savings_calculated, cost_per_day)
+SELECT d.id, d.owner, d.habit_type, d.start_date, d.last_relapse, d.current_streak_days,
+       d.longest_streak_days, d.relapse_log, d.why_i_started, d.savings_calculated,
+       (SELECT cost_per_day FROM sobriety_tracker t WHERE t.id = d.id)
+FROM (SELECT *, NULL AS cost_per_day FROM sobriety_tracker) d;
+
+-- The rename re-checks every view; a database without add_health_correlations
+-- still has a health_correlations view that reads a missing column, so it is
+-- dropped here and recreated (in its current form) below
+DROP VIEW IF EXISTS health_correlations;
+DROP TABLE sobriety_tracker;
+ALTER TABLE sobriety_tracker_new RENAME TO sobriety_tracker;
+
+-- Health correlation view (health logs with the same-day biometrics of the same owner)
+CREATE VIEW health_correlations AS
+SELECT 
+    h.*,
+    b.sleep_score as prev_night_sleep,
+    b.hrv as morning_hrv
+FROM health_logs h
+LEFT JOIN biometrics b ON b.owner = h.owner AND DATE(h.timestamp) = DATE(b.date);
+
+-- One row per relapse; streaks and savings are computed from these on read
+CREATE TABLE IF NOT EXISTS sobriety_relapses (
+    id TEXT PRIMARY KEY,
+    tracker_id TEXT NOT NULL REFERENCES sobriety_tracker(id) ON DELETE CASCADE,
+    relapse_date DATE NOT NULL,
+    reason TEXT,
+    triggers JSON,
+    cost DECIMAL(10,2) DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sobriety_relapses_tracker_date ON sobriety_relapses(tracker_id, relapse_date);
+
+-- Move the JSON relapse_log entries into the table
+INSERT INTO sobriety_relapses (id, tracker_id, relapse_date, reason, triggers, cost)
+SELECT 'rel_' || lower(hex(randomblob(4))), t.id,
+       json_extract(r.value, '$.date'),
+       json_extract(r.value, '$.reason'),
+       json(IFNULL(json_extract(r.value, '$.triggers'), '[]')),
+       IFNULL(json_extract(r.value, '$.cost'), 0)
+FROM sobriety_tracker t, json_each(t.relapse_log) r
+WHERE json_valid(t.relapse_log) AND json_extract(r.value, '$.date') IS NOT NULL;
+
+UPDATE sobriety_tracker SET relapse_log = NULL;
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'sobriety_relapses', 'add_sobriety_relapses', '{"version": "1.0"}');
+
+COMMIT;
@@ -0,0 +1,235 @@
+-- Migration: Daily/weekly rollups for Vessel biometrics and workouts
+-- Date: 2026-10-19
+
+-- Per-owner daily biometric sums and counts, kept by triggers on biometrics
+CREATE TABLE IF NOT EXISTS biometrics_daily (
+    owner TEXT NOT NULL,
+    day DATE NOT NULL,
+    readings INTEGER NOT NULL DEFAULT 0,
+    sleep_score_sum REAL NOT NULL DEFAULT 0,
+    sleep_score_n INTEGER NOT NULL DEFAULT 0,
+    sleep_hours_sum REAL NOT NULL DEFAULT 0,
+    sleep_hours_n INTEGER NOT NULL DEFAULT 0,
+    hrv_sum REAL NOT NULL DEFAULT 0,
+    hrv_n INTEGER NOT NULL DEFAULT 0,
+    resting_hr_sum REAL NOT NULL DEFAULT 0,
+    resting_hr_n INTEGER NOT NULL DEFAULT 0,
+    recovery_score_sum REAL NOT NULL DEFAULT 0,
+    recovery_score_n INTEGER NOT NULL DEFAULT 0,
+    weight_kg_sum REAL NOT NULL DEFAULT 0,
+    weight_kg_n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner, day)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS biometrics_daily_insert
+AFTER INSERT ON biometrics
+BEGIN
+    INSERT INTO biometrics_daily (owner, day)
+    SELECT NEW.owner, date(NEW.date) WHERE NEW.owner IS NOT NULL AND NEW.date IS NOT NULL
+    ON CONFLICT(owner, day) DO NOTHING;
+    UPDATE biometrics_daily SET
+        readings = readings + 1,
+        sleep_score_sum = sleep_score_sum + IFNULL(NEW.sleep_score, 0),
+        sleep_score_n = sleep_score_n + (NEW.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum + IFNULL(NEW.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n + (NEW.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum + IFNULL(NEW.hrv, 0),
+        hrv_n = hrv_n + (NEW.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum + IFNULL(NEW.resting_hr, 0),
+        resting_hr_n = resting_hr_n + (NEW.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum + IFNULL(NEW.recovery_score, 0),
+        recovery_score_n = recovery_score_n + (NEW.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum + IFNULL(NEW.weight_kg, 0),
+        weight_kg_n = weight_kg_n + (NEW.weight_kg IS NOT NULL)
+    WHERE owner = NEW.owner AND day = date(NEW.date);
+END;
+
+CREATE TRIGGER IF NOT EXISTS biometrics_daily_delete
+AFTER DELETE ON biometrics
+BEGIN
+    UPDATE biometrics_daily SET
+        readings = readings - 1,
+        sleep_score_sum = sleep_score_sum - IFNULL(OLD.sleep_score, 0),
+        sleep_score_n = sleep_score_n - (OLD.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum - IFNULL(OLD.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n - (OLD.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum - IFNULL(OLD.hrv, 0),
+        hrv_n = hrv_n - (OLD.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum - IFNULL(OLD.resting_hr, 0),
+        resting_hr_n = resting_hr_n - (OLD.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum - IFNULL(OLD.recovery_score, 0),
+        recovery_score_n = recovery_score_n - (OLD.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum - IFNULL(OLD.weight_kg, 0),
+        weight_kg_n = weight_kg_n - (OLD.weight_kg IS NOT NULL)
+    WHERE owner = OLD.owner AND day = date(OLD.date);
+    DELETE FROM biometrics_daily WHERE owner = OLD.owner AND day = date(OLD.date) AND readings <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS biometrics_daily_update
+AFTER UPDATE OF owner, date, sleep_score, sleep_hours, hrv, resting_hr, recovery_score, weight_kg ON biometrics
+BEGIN
+    UPDATE biometrics_daily SET
+        readings = readings - 1,
+        sleep_score_sum = sleep_score_sum - IFNULL(OLD.sleep_score, 0),
+        sleep_score_n = sleep_score_n - (OLD.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum - IFNULL(OLD.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n - (OLD.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum - IFNULL(OLD.hrv, 0),
+        hrv_n = hrv_n - (OLD.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum - IFNULL(OLD.resting_hr, 0),
+        resting_hr_n = resting_hr_n - (OLD.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum - IFNULL(OLD.recovery_score, 0),
+        recovery_score_n = recovery_score_n - (OLD.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum - IFNULL(OLD.weight_kg, 0),
+        weight_kg_n = weight_kg_n - (OLD.weight_kg IS NOT NULL)
+    WHERE owner = OLD.owner AND day = date(OLD.date);
+    DELETE FROM biometrics_daily WHERE owner = OLD.owner AND day = date(OLD.date) AND readings <= 0;
+    INSERT INTO biometrics_daily (owner, day)
+    SELECT NEW.owner, date(NEW.date) WHERE NEW.owner IS NOT NULL AND NEW.date IS NOT NULL
+    ON CONFLICT(owner, day) DO NOTHING;
+    UPDATE biometrics_daily SET
+        readings = readings + 1,
+        sleep_score_sum = sleep_score_sum + IFNULL(NEW.sleep_score, 0),
+        sleep_score_n = sleep_score_n + (NEW.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum + IFNULL(NEW.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n + (NEW.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum + IFNULL(NEW.hrv, 0),
+        hrv_n = hrv_n + (NEW.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum + IFNULL(NEW.resting_hr, 0),
+        resting_hr_n = resting_hr_n + (NEW.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum + IFNULL(NEW.recovery_score, 0),
+        recovery_score_n = recovery_score_n + (NEW.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum + IFNULL(NEW.weight_kg, 0),
+        weight_kg_n = weight_kg_n + (NEW.weight_kg IS NOT NULL)
+    WHERE owner = NEW.owner AND day = date(NEW.date);
+END;
+
+-- Per-owner daily workout totals by type, kept by triggers on workouts
+CREATE TABLE IF NOT EXISTS workouts_daily (
+    owner TEXT NOT NULL,
+    day DATE NOT NULL,
+    workout_type TEXT NOT NULL,
+    workouts INTEGER NOT NULL DEFAULT 0,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    volume_kg INTEGER NOT NULL DEFAULT 0,
+    rpe_sum REAL NOT NULL DEFAULT 0,
+    rpe_n INTEGER NOT NULL DEFAULT 0,
+    prs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner, day, workout_type)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS workouts_daily_insert
+AFTER INSERT ON workouts
+BEGIN
+    INSERT INTO workouts_daily (owner, day, workout_type)
+    SELECT NEW.owner, date(NEW.timestamp), IFNULL(NEW.workout_type, '')
+    WHERE NEW.owner IS NOT NULL AND NEW.timestamp IS NOT NULL
+    ON CONFLICT(owner, day, workout_type) DO NOTHING;
+    UPDATE workouts_daily SET
+        workouts = workouts + 1,
+        minutes = minutes + IFNULL(NEW.duration_minutes, 0),
+        volume_kg = volume_kg + IFNULL(NEW.total_volume_kg, 0),
+        rpe_sum = rpe_sum + IFNULL(NEW.avg_rpe, 0),
+        rpe_n = rpe_n + (NEW.avg_rpe IS NOT NULL),
+        prs = prs + CASE WHEN json_valid(NEW.prs_achieved) THEN json_array_length(NEW.prs_achieved) ELSE 0 END
+    WHERE owner = NEW.owner AND day = date(NEW.timestamp) AND workout_type = IFNULL(NEW.workout_type, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS workouts_daily_delete
+AFTER DELETE ON workouts
+BEGIN
+    UPDATE workouts_daily SET
+        workouts = workouts - 1,
+        minutes = minutes - IFNULL(OLD.duration_minutes, 0),
+        volume_kg = volume_kg - IFNULL(OLD.total_volume_kg, 0),
+        rpe_sum = rpe_sum - IFNULL(OLD.avg_rpe, 0),
+        rpe_n = rpe_n - (OLD.avg_rpe IS NOT NULL),
+        prs = prs - CASE WHEN json_valid(OLD.prs_achieved) THEN json_array_length(OLD.prs_achieved) ELSE 0 END
+    WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '');
+    DELETE FROM workouts_daily WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '') AND workouts <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS workouts_daily_update
+AFTER UPDATE OF owner, timestamp, workout_type, duration_minutes, total_volume_kg, avg_rpe, prs_achieved ON workouts
+BEGIN
+    UPDATE workouts_daily SET
+        workouts = workouts - 1,
+        minutes = minutes - IFNULL(OLD.duration_minutes, 0),
+        volume_kg = volume_kg - IFNULL(OLD.total_volume_kg, 0),
+        rpe_sum = rpe_sum - IFNULL(OLD.avg_rpe, 0),
+        rpe_n = rpe_n - (OLD.avg_rpe IS NOT NULL),
+        prs = prs - CASE WHEN json_valid(OLD.prs_achieved) THEN json_array_length(OLD.prs_achieved) ELSE 0 END
+    WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '');
+    DELETE FROM workouts_daily WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '') AND workouts <= 0;
+    INSERT INTO workouts_daily (owner, day, workout_type)
+    SELECT NEW.owner, date(NEW.timestamp), IFNULL(NEW.workout_type, '')
+    WHERE NEW.owner IS NOT NULL AND NEW.timestamp IS NOT NULL
+    ON CONFLICT(owner, day, workout_type) DO NOTHING;
+    UPDATE workouts_daily SET
+        workouts = workouts + 1,
+        minutes = minutes + IFNULL(NEW.duration_minutes, 0),
+        volume_kg = volume_kg + IFNULL(NEW.total_volume_kg, 0),
+        rpe_sum = rpe_sum + IFNULL(NEW.avg_rpe, 0),
+        rpe_n = rpe_n + (NEW.avg_rpe IS NOT NULL),
+        prs = prs + CASE WHEN json_valid(NEW.prs_achieved) THEN json_array_length(NEW.prs_achieved) ELSE 0 END
+    WHERE owner = NEW.owner AND day = date(NEW.timestamp) AND workout_type = IFNULL(NEW.workout_type, '');
+END;
+
+-- Weekly (Monday-start) rollups over the daily tables
+CREATE VIEW IF NOT EXISTS biometrics_weekly AS
+SELECT
+    owner,
+    date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days') AS week,
+    COUNT(*) AS days,
+    SUM(readings) AS readings,
+    SUM(sleep_score_sum) AS sleep_score_sum, SUM(sleep_score_n) AS sleep_score_n,
+    SUM(sleep_hours_sum) AS sleep_hours_sum, SUM(sleep_hours_n) AS sleep_hours_n,
+    SUM(hrv_sum) AS hrv_sum, SUM(hrv_n) AS hrv_n,
+    SUM(resting_hr_sum) AS resting_hr_sum, SUM(resting_hr_n) AS resting_hr_n,
+    SUM(recovery_score_sum) AS recovery_score_sum, SUM(recovery_score_n) AS recovery_score_n,
+    SUM(weight_kg_sum) AS weight_kg_sum, SUM(weight_kg_n) AS weight_kg_n
+FROM biometrics_daily
+GROUP BY owner, week;
+
+CREATE VIEW IF NOT EXISTS workouts_weekly AS
+SELECT
+    owner,
+    date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days') AS week,
+    COUNT(DISTINCT day) AS active_days,
+    SUM(workouts) AS workouts,
+    SUM(minutes) AS minutes,
+    SUM(volume_kg) AS volume_kg,
+    SUM(rpe_sum) AS rpe_sum,
+    SUM(rpe_n) AS rpe_n,
+    SUM(prs) AS prs
+FROM workouts_daily
+GROUP BY owner, week;
+
+-- Backfill from existing rows (safe to re-run: rebuilt from source)
+DELETE FROM biometrics_daily;
+INSERT INTO biometrics_daily
+    (owner, day, readings, sleep_score_sum, sleep_score_n, sleep_hours_sum, sleep_hours_n, hrv_sum, hrv_n, resting_hr_sum, resting_hr_n, recovery_score_sum, recovery_score_n, weight_kg_sum, weight_kg_n)
+SELECT owner, date(date), COUNT(*),
+       IFNULL(SUM(sleep_score), 0), COUNT(sleep_score),
+       IFNULL(SUM(sleep_hours), 0), COUNT(sleep_hours),
+       IFNULL(SUM(hrv), 0), COUNT(hrv),
+       IFNULL(SUM(resting_hr), 0), COUNT(resting_hr),
+       IFNULL(SUM(recovery_score), 0), COUNT(recovery_score),
+       IFNULL(SUM(weight_kg), 0), COUNT(weight_kg)
+FROM biometrics
+WHERE owner IS NOT NULL AND date IS NOT NULL
+GROUP BY owner, date(date);
+
+DELETE FROM workouts_daily;
+INSERT INTO workouts_daily (owner, day, workout_type, workouts, minutes, volume_kg, rpe_sum, rpe_n, prs)
+SELECT owner, date(timestamp), IFNULL(workout_type, ''), COUNT(*),
+       IFNULL(SUM(duration_minutes), 0), IFNULL(SUM(total_volume_kg), 0),
+       IFNULL(SUM(avg_rpe), 0), COUNT(avg_rpe),
+       SUM(CASE WHEN json_valid(prs_achieved) THEN json_array_length(prs_achieved) ELSE 0 END)
+FROM workouts
+WHERE owner IS NOT NULL AND timestamp IS NOT NULL
+GROUP BY owner, date(timestamp), IFNULL(workout_type, '');
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'biometrics_daily', 'add_vessel_rollups', '{"version": "1.0"}');
@@ -0,0 +1,16 @@
+-- Migration: Web clip cache for conditional re-fetch
+-- Date: 2026-10-19
+
+-- Last extraction per clipped URL plus its ETag / Last-Modified validators
+CREATE TABLE IF NOT EXISTS web_clip_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    title TEXT,
+    content TEXT,
+    fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Log migration completion
+INSERT INTO audit_log (module, action, entity_type, entity_id, metadata)
+VALUES ('system', 'migration', 'web_clip_cache', 'add_web_clip_cache', '{"version": "1.0"}');
@@ -88,7 +88,8 @@ CREATE TABLE IF NOT EXISTS subscriptions (
 -- ==================== MODULE 2: THE BRAIN ====================
 
 CREATE TABLE IF NOT EXISTS knowledge_entries (
-    id TEXT PRIMARY KEY,
+    doc_id INTEGER PRIMARY KEY,  -- rowid alias keying knowledge_fts (kept by VACUUM)
+    id TEXT NOT NULL UNIQUE,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
     owner TEXT CHECK (owner IN ('faza', 'gaby', 'shared')),
     created_by TEXT,
@@ -103,13 +104,127 @@ CREATE TABLE IF NOT EXISTS knowledge_entries (
     is_srs_eligible BOOLEAN DEFAULT 0,
     srs_card_id TEXT,
     qdrant_id TEXT,
-    embedding_synced BOOLEAN DEFAULT 0
+    embedding_synced BOOLEAN DEFAULT 0,
+    embedding_chunks INTEGER DEFAULT 0,
+    updated_at DATETIME DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
 );
 
 CREATE INDEX IF NOT EXISTS idx_knowledge_owner ON knowledge_entries(owner);
 CREATE INDEX IF NOT EXISTS idx_knowledge_domain ON knowledge_entries(domain);
 CREATE INDEX IF NOT EXISTS idx_knowledge_project ON knowledge_entries(project);
 CREATE INDEX IF NOT EXISTS idx_knowledge_qdrant ON knowledge_entries(qdrant_id);
+CREATE INDEX IF NOT EXISTS idx_knowledge_srs_updated ON knowledge_entries(is_srs_eligible, updated_at);
+
+-- Bump updated_at (millisecond precision) on edits to card-relevant fields (incremental Anki sync)
+CREATE TRIGGER IF NOT EXISTS knowledge_touch_update
+AFTER UPDATE OF title, content, domain, tags, is_srs_eligible ON knowledge_entries BEGIN
+    UPDATE knowledge_entries SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = new.id;
+END;
+
+-- Full-text index (BM25) over knowledge entries, external content = knowledge_entries
+-- Existing databases: run database/migrations/add_knowledge_fts.py to build/backfill it,
+-- then database/migrations/add_knowledge_doc_id.sql to key it on doc_id
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(
+    title,
+    content,
+    tags,
+    content='knowledge_entries',
+    content_rowid='doc_id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3 4 5 6'  -- type-ahead prefixes read one doclist instead of merging every completion
+);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_fts_insert AFTER INSERT ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(rowid, title, content, tags)
+    VALUES (new.doc_id, new.title, new.content, new.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_fts_delete AFTER DELETE ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, title, content, tags)
+    VALUES ('delete', old.doc_id, old.title, old.content, old.tags);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_fts_update AFTER UPDATE OF title, content, tags ON knowledge_entries BEGIN
+    INSERT INTO knowledge_fts(knowledge_fts, rowid, title, content, tags)
+    VALUES ('delete', old.doc_id, old.title, old.content, old.tags);
+    INSERT INTO knowledge_fts(rowid, title, content, tags)
+    VALUES (new.doc_id, new.title, new.content, new.tags);
+END;
+-- Inverted tag index (tag -> entries), derived from knowledge_entries.tags
+CREATE TABLE IF NOT EXISTS knowledge_tags (
+    tag TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (tag, entry_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_tags_entry ON knowledge_tags(entry_id);
+
+-- Knowledge graph edges, stored in both directions for O(degree) lookups
+CREATE TABLE IF NOT EXISTS knowledge_edges (
+    src_id TEXT NOT NULL,
+    dst_id TEXT NOT NULL,
+    edge_type TEXT DEFAULT 'metadata',
+    weight REAL NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (src_id, dst_id, edge_type)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_edges_dst ON knowledge_edges(dst_id);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_tags_insert AFTER INSERT ON knowledge_entries BEGIN
+    INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+    SELECT value, new.id FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_tags_update AFTER UPDATE OF tags ON knowledge_entries BEGIN
+    DELETE FROM knowledge_tags WHERE entry_id = old.id;
+    INSERT OR IGNORE INTO knowledge_tags(tag, entry_id)
+    SELECT value, new.id FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags ELSE '[]' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS knowledge_graph_delete AFTER DELETE ON knowledge_entries BEGIN
+    DELETE FROM knowledge_tags WHERE entry_id = old.id;
+    DELETE FROM knowledge_edges WHERE src_id = old.id OR dst_id = old.id;
+END;
+
+-- MinHash signature per entry (near-duplicate detection)
+CREATE TABLE IF NOT EXISTS knowledge_signatures (
+    entry_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+-- LSH buckets: one row per (band hash, entry); entries sharing a bucket are candidates
+CREATE TABLE IF NOT EXISTS knowledge_lsh (
+    band_key INTEGER NOT NULL,
+    entry_id TEXT NOT NULL,
+    PRIMARY KEY (band_key, entry_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_knowledge_lsh_entry ON knowledge_lsh(entry_id);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_dedup_delete AFTER DELETE ON knowledge_entries BEGIN
+    DELETE FROM knowledge_signatures WHERE entry_id = old.id;
+    DELETE FROM knowledge_lsh WHERE entry_id = old.id;
+END;
+
+-- Per-user watermark for incremental Anki card sync
+CREATE TABLE IF NOT EXISTS anki_sync_state (
+    owner TEXT PRIMARY KEY CHECK (owner IN ('faza', 'gaby', 'shared')),
+    last_synced_at DATETIME,
+    notes_added INTEGER DEFAULT 0,
+    notes_updated INTEGER DEFAULT 0
+);
+
+-- Last extraction per clipped URL plus HTTP validators for conditional re-fetch
+CREATE TABLE IF NOT EXISTS web_clip_cache (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    title TEXT,
+    content TEXT,
+    fetched_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
 
 CREATE TABLE IF NOT EXISTS worktrees (
     id TEXT PRIMARY KEY,
@@ -144,6 +259,7 @@ CREATE TABLE IF NOT EXISTS health_logs (
 CREATE INDEX IF NOT EXISTS idx_health_owner ON health_logs(owner);
 CREATE INDEX IF NOT EXISTS idx_health_symptom ON health_logs(symptom_type);
 CREATE INDEX IF NOT EXISTS idx_health_timestamp ON health_logs(timestamp);
+CREATE INDEX IF NOT EXISTS idx_health_owner_timestamp ON health_logs(owner, timestamp);
 
 CREATE TABLE IF NOT EXISTS contacts (
     id TEXT PRIMARY KEY,
@@ -162,6 +278,25 @@ CREATE TABLE IF NOT EXISTS contacts (
     notes TEXT
 );
 
+-- Reminders: overdue pings per owner, and birthdays by month-day (expression index)
+CREATE INDEX IF NOT EXISTS idx_contacts_owner_ping ON contacts(owner, next_scheduled_ping);
+CREATE INDEX IF NOT EXISTS idx_contacts_owner_birthday_md ON contacts(owner, strftime('%m-%d', birthday));
+
+-- Materialised reminders, one per (kind, ref_id); see modules/circle/reminders.py
+CREATE TABLE IF NOT EXISTS reminder_queue (
+    owner TEXT CHECK (owner IN ('faza', 'gaby', 'shared')),
+    kind TEXT NOT NULL CHECK (kind IN ('contact_ping', 'birthday', 'health_alert')),
+    ref_id TEXT NOT NULL,
+    due_at DATETIME NOT NULL,
+    expires_at DATETIME,
+    payload JSON,
+    fired_at DATETIME,
+    PRIMARY KEY (kind, ref_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_reminder_queue_owner_due ON reminder_queue(owner, kind, due_at);
+CREATE INDEX IF NOT EXISTS idx_reminder_queue_pending ON reminder_queue(due_at) WHERE fired_at IS NULL;
+
 CREATE TABLE IF NOT EXISTS relationship_checkins (
     id TEXT PRIMARY KEY,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -176,13 +311,82 @@ CREATE TABLE IF NOT EXISTS relationship_checkins (
     ai_insights TEXT
 );
 
+-- Per-day check-in sums and counts for trend queries (see modules/circle/trends.py)
+CREATE TABLE IF NOT EXISTS relationship_checkin_daily (
+    day DATE PRIMARY KEY,
+    checkins INTEGER NOT NULL DEFAULT 0,
+    faza_mood_sum INTEGER NOT NULL DEFAULT 0,
+    faza_mood_n INTEGER NOT NULL DEFAULT 0,
+    gaby_mood_sum INTEGER NOT NULL DEFAULT 0,
+    gaby_mood_n INTEGER NOT NULL DEFAULT 0,
+    relationship_vibe_sum INTEGER NOT NULL DEFAULT 0,
+    relationship_vibe_n INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS relationship_checkin_daily_insert
+AFTER INSERT ON relationship_checkins
+BEGIN
+    INSERT INTO relationship_checkin_daily (day) SELECT date(NEW.timestamp) WHERE NEW.timestamp IS NOT NULL
+    ON CONFLICT(day) DO NOTHING;
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins + 1,
+        faza_mood_sum = faza_mood_sum + IFNULL(NEW.faza_mood, 0),
+        faza_mood_n = faza_mood_n + (NEW.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum + IFNULL(NEW.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n + (NEW.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum + IFNULL(NEW.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n + (NEW.relationship_vibe IS NOT NULL)
+    WHERE day = date(NEW.timestamp);
+END;
+
+CREATE TRIGGER IF NOT EXISTS relationship_checkin_daily_delete
+AFTER DELETE ON relationship_checkins
+BEGIN
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins - 1,
+        faza_mood_sum = faza_mood_sum - IFNULL(OLD.faza_mood, 0),
+        faza_mood_n = faza_mood_n - (OLD.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum - IFNULL(OLD.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n - (OLD.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum - IFNULL(OLD.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n - (OLD.relationship_vibe IS NOT NULL)
+    WHERE day = date(OLD.timestamp);
+    DELETE FROM relationship_checkin_daily WHERE day = date(OLD.timestamp) AND checkins <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS relationship_checkin_daily_update
+AFTER UPDATE OF timestamp, faza_mood, gaby_mood, relationship_vibe ON relationship_checkins
+BEGIN
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins - 1,
+        faza_mood_sum = faza_mood_sum - IFNULL(OLD.faza_mood, 0),
+        faza_mood_n = faza_mood_n - (OLD.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum - IFNULL(OLD.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n - (OLD.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum - IFNULL(OLD.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n - (OLD.relationship_vibe IS NOT NULL)
+    WHERE day = date(OLD.timestamp);
+    DELETE FROM relationship_checkin_daily WHERE day = date(OLD.timestamp) AND checkins <= 0;
+    INSERT INTO relationship_checkin_daily (day) SELECT date(NEW.timestamp) WHERE NEW.timestamp IS NOT NULL
+    ON CONFLICT(day) DO NOTHING;
+    UPDATE relationship_checkin_daily SET
+        checkins = checkins + 1,
+        faza_mood_sum = faza_mood_sum + IFNULL(NEW.faza_mood, 0),
+        faza_mood_n = faza_mood_n + (NEW.faza_mood IS NOT NULL),
+        gaby_mood_sum = gaby_mood_sum + IFNULL(NEW.gaby_mood, 0),
+        gaby_mood_n = gaby_mood_n + (NEW.gaby_mood IS NOT NULL),
+        relationship_vibe_sum = relationship_vibe_sum + IFNULL(NEW.relationship_vibe, 0),
+        relationship_vibe_n = relationship_vibe_n + (NEW.relationship_vibe IS NOT NULL)
+    WHERE day = date(NEW.timestamp);
+END;
+
 -- ==================== MODULE 4: THE VESSEL ====================
 
 CREATE TABLE IF NOT EXISTS blueprint_logs (
     id TEXT PRIMARY KEY,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
     owner TEXT CHECK (owner IN ('faza', 'gaby', 'shared')),
-    date DATE UNIQUE,
+    date DATE,
     supplements_taken BOOLEAN,
     super_veggie_eaten BOOLEAN,
     nutty_pudding_eaten BOOLEAN,
@@ -190,7 +394,8 @@ CREATE TABLE IF NOT EXISTS blueprint_logs (
     supplement_list JSON,
     meals_logged JSON,
     water_intake_ml INTEGER,
-    compliance_score INTEGER CHECK (compliance_score BETWEEN 0 AND 100)
+    compliance_score INTEGER CHECK (compliance_score BETWEEN 0 AND 100),
+    UNIQUE (owner, date)  -- one log per owner per day; upserts and heatmap scans use it
 );
 
 CREATE INDEX IF NOT EXISTS idx_blueprint_owner ON blueprint_logs(owner);
@@ -230,6 +435,223 @@ CREATE TABLE IF NOT EXISTS biometrics (
 
 CREATE INDEX IF NOT EXISTS idx_biometrics_owner ON biometrics(owner);
 CREATE INDEX IF NOT EXISTS idx_biometrics_date ON biometrics(date);
+CREATE INDEX IF NOT EXISTS idx_biometrics_owner_date ON biometrics(owner, date);
+-- One reading per owner, day and device: bulk imports upsert on this
+CREATE UNIQUE INDEX IF NOT EXISTS idx_biometrics_owner_date_source
+    ON biometrics(owner, date, device_source) WHERE device_source IS NOT NULL;
+
+-- Rollups whose triggers are paused while a bulk write rebuilds them once
+-- per batch (only ever set inside that write's own transaction)
+CREATE TABLE IF NOT EXISTS rollup_suspended (
+    name TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+-- Per-owner daily biometric sums and counts, kept by triggers on biometrics
+CREATE TABLE IF NOT EXISTS biometrics_daily (
+    owner TEXT NOT NULL,
+    day DATE NOT NULL,
+    readings INTEGER NOT NULL DEFAULT 0,
+    sleep_score_sum REAL NOT NULL DEFAULT 0,
+    sleep_score_n INTEGER NOT NULL DEFAULT 0,
+    sleep_hours_sum REAL NOT NULL DEFAULT 0,
+    sleep_hours_n INTEGER NOT NULL DEFAULT 0,
+    hrv_sum REAL NOT NULL DEFAULT 0,
+    hrv_n INTEGER NOT NULL DEFAULT 0,
+    resting_hr_sum REAL NOT NULL DEFAULT 0,
+    resting_hr_n INTEGER NOT NULL DEFAULT 0,
+    recovery_score_sum REAL NOT NULL DEFAULT 0,
+    recovery_score_n INTEGER NOT NULL DEFAULT 0,
+    weight_kg_sum REAL NOT NULL DEFAULT 0,
+    weight_kg_n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner, day)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS biometrics_daily_insert
+AFTER INSERT ON biometrics
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspended WHERE name = 'biometrics_daily')
+BEGIN
+    INSERT INTO biometrics_daily (owner, day)
+    SELECT NEW.owner, date(NEW.date) WHERE NEW.owner IS NOT NULL AND NEW.date IS NOT NULL
+    ON CONFLICT(owner, day) DO NOTHING;
+    UPDATE biometrics_daily SET
+        readings = readings + 1,
+        sleep_score_sum = sleep_score_sum + IFNULL(NEW.sleep_score, 0),
+        sleep_score_n = sleep_score_n + (NEW.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum + IFNULL(NEW.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n + (NEW.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum + IFNULL(NEW.hrv, 0),
+        hrv_n = hrv_n + (NEW.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum + IFNULL(NEW.resting_hr, 0),
+        resting_hr_n = resting_hr_n + (NEW.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum + IFNULL(NEW.recovery_score, 0),
+        recovery_score_n = recovery_score_n + (NEW.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum + IFNULL(NEW.weight_kg, 0),
+        weight_kg_n = weight_kg_n + (NEW.weight_kg IS NOT NULL)
+    WHERE owner = NEW.owner AND day = date(NEW.date);
+END;
+
+CREATE TRIGGER IF NOT EXISTS biometrics_daily_delete
+AFTER DELETE ON biometrics
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspended WHERE name = 'biometrics_daily')
+BEGIN
+    UPDATE biometrics_daily SET
+        readings = readings - 1,
+        sleep_score_sum = sleep_score_sum - IFNULL(OLD.sleep_score, 0),
+        sleep_score_n = sleep_score_n - (OLD.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum - IFNULL(OLD.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n - (OLD.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum - IFNULL(OLD.hrv, 0),
+        hrv_n = hrv_n - (OLD.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum - IFNULL(OLD.resting_hr, 0),
+        resting_hr_n = resting_hr_n - (OLD.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum - IFNULL(OLD.recovery_score, 0),
+        recovery_score_n = recovery_score_n - (OLD.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum - IFNULL(OLD.weight_kg, 0),
+        weight_kg_n = weight_kg_n - (OLD.weight_kg IS NOT NULL)
+    WHERE owner = OLD.owner AND day = date(OLD.date);
+    DELETE FROM biometrics_daily WHERE owner = OLD.owner AND day = date(OLD.date) AND readings <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS biometrics_daily_update
+AFTER UPDATE OF owner, date, sleep_score, sleep_hours, hrv, resting_hr, recovery_score, weight_kg ON biometrics
+WHEN NOT EXISTS (SELECT 1 FROM rollup_suspended WHERE name = 'biometrics_daily')
+BEGIN
+    UPDATE biometrics_daily SET
+        readings = readings - 1,
+        sleep_score_sum = sleep_score_sum - IFNULL(OLD.sleep_score, 0),
+        sleep_score_n = sleep_score_n - (OLD.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum - IFNULL(OLD.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n - (OLD.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum - IFNULL(OLD.hrv, 0),
+        hrv_n = hrv_n - (OLD.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum - IFNULL(OLD.resting_hr, 0),
+        resting_hr_n = resting_hr_n - (OLD.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum - IFNULL(OLD.recovery_score, 0),
+        recovery_score_n = recovery_score_n - (OLD.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum - IFNULL(OLD.weight_kg, 0),
+        weight_kg_n = weight_kg_n - (OLD.weight_kg IS NOT NULL)
+    WHERE owner = OLD.owner AND day = date(OLD.date);
+    DELETE FROM biometrics_daily WHERE owner = OLD.owner AND day = date(OLD.date) AND readings <= 0;
+    INSERT INTO biometrics_daily (owner, day)
+    SELECT NEW.owner, date(NEW.date) WHERE NEW.owner IS NOT NULL AND NEW.date IS NOT NULL
+    ON CONFLICT(owner, day) DO NOTHING;
+    UPDATE biometrics_daily SET
+        readings = readings + 1,
+        sleep_score_sum = sleep_score_sum + IFNULL(NEW.sleep_score, 0),
+        sleep_score_n = sleep_score_n + (NEW.sleep_score IS NOT NULL),
+        sleep_hours_sum = sleep_hours_sum + IFNULL(NEW.sleep_hours, 0),
+        sleep_hours_n = sleep_hours_n + (NEW.sleep_hours IS NOT NULL),
+        hrv_sum = hrv_sum + IFNULL(NEW.hrv, 0),
+        hrv_n = hrv_n + (NEW.hrv IS NOT NULL),
+        resting_hr_sum = resting_hr_sum + IFNULL(NEW.resting_hr, 0),
+        resting_hr_n = resting_hr_n + (NEW.resting_hr IS NOT NULL),
+        recovery_score_sum = recovery_score_sum + IFNULL(NEW.recovery_score, 0),
+        recovery_score_n = recovery_score_n + (NEW.recovery_score IS NOT NULL),
+        weight_kg_sum = weight_kg_sum + IFNULL(NEW.weight_kg, 0),
+        weight_kg_n = weight_kg_n + (NEW.weight_kg IS NOT NULL)
+    WHERE owner = NEW.owner AND day = date(NEW.date);
+END;
+
+-- Per-owner daily workout totals by type, kept by triggers on workouts
+CREATE TABLE IF NOT EXISTS workouts_daily (
+    owner TEXT NOT NULL,
+    day DATE NOT NULL,
+    workout_type TEXT NOT NULL,
+    workouts INTEGER NOT NULL DEFAULT 0,
+    minutes INTEGER NOT NULL DEFAULT 0,
+    volume_kg INTEGER NOT NULL DEFAULT 0,
+    rpe_sum REAL NOT NULL DEFAULT 0,
+    rpe_n INTEGER NOT NULL DEFAULT 0,
+    prs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner, day, workout_type)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS workouts_daily_insert
+AFTER INSERT ON workouts
+BEGIN
+    INSERT INTO workouts_daily (owner, day, workout_type)
+    SELECT NEW.owner, date(NEW.timestamp), IFNULL(NEW.workout_type, '')
+    WHERE NEW.owner IS NOT NULL AND NEW.timestamp IS NOT NULL
+    ON CONFLICT(owner, day, workout_type) DO NOTHING;
+    UPDATE workouts_daily SET
+        workouts = workouts + 1,
+        minutes = minutes + IFNULL(NEW.duration_minutes, 0),
+        volume_kg = volume_kg + IFNULL(NEW.total_volume_kg, 0),
+        rpe_sum = rpe_sum + IFNULL(NEW.avg_rpe, 0),
+        rpe_n = rpe_n + (NEW.avg_rpe IS NOT NULL),
+        prs = prs + CASE WHEN json_valid(NEW.prs_achieved) THEN json_array_length(NEW.prs_achieved) ELSE 0 END
+    WHERE owner = NEW.owner AND day = date(NEW.timestamp) AND workout_type = IFNULL(NEW.workout_type, '');
+END;
+
+CREATE TRIGGER IF NOT EXISTS workouts_daily_delete
+AFTER DELETE ON workouts
+BEGIN
+    UPDATE workouts_daily SET
+        workouts = workouts - 1,
+        minutes = minutes - IFNULL(OLD.duration_minutes, 0),
+        volume_kg = volume_kg - IFNULL(OLD.total_volume_kg, 0),
+        rpe_sum = rpe_sum - IFNULL(OLD.avg_rpe, 0),
+        rpe_n = rpe_n - (OLD.avg_rpe IS NOT NULL),
+        prs = prs - CASE WHEN json_valid(OLD.prs_achieved) THEN json_array_length(OLD.prs_achieved) ELSE 0 END
+    WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '');
+    DELETE FROM workouts_daily WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '') AND workouts <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS workouts_daily_update
+AFTER UPDATE OF owner, timestamp, workout_type, duration_minutes, total_volume_kg, avg_rpe, prs_achieved ON workouts
+BEGIN
+    UPDATE workouts_daily SET
+        workouts = workouts - 1,
+        minutes = minutes - IFNULL(OLD.duration_minutes, 0),
+        volume_kg = volume_kg - IFNULL(OLD.total_volume_kg, 0),
+        rpe_sum = rpe_sum - IFNULL(OLD.avg_rpe, 0),
+        rpe_n = rpe_n - (OLD.avg_rpe IS NOT NULL),
+        prs = prs - CASE WHEN json_valid(OLD.prs_achieved) THEN json_array_length(OLD.prs_achieved) ELSE 0 END
+    WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '');
+    DELETE FROM workouts_daily WHERE owner = OLD.owner AND day = date(OLD.timestamp) AND workout_type = IFNULL(OLD.workout_type, '') AND workouts <= 0;
+    INSERT INTO workouts_daily (owner, day, workout_type)
+    SELECT NEW.owner, date(NEW.timestamp), IFNULL(NEW.workout_type, '')
+    WHERE NEW.owner IS NOT NULL AND NEW.timestamp IS NOT NULL
+    ON CONFLICT(owner, day, workout_type) DO NOTHING;
+    UPDATE workouts_daily SET
+        workouts = workouts + 1,
+        minutes = minutes + IFNULL(NEW.duration_minutes, 0),
+        volume_kg = volume_kg + IFNULL(NEW.total_volume_kg, 0),
+        rpe_sum = rpe_sum + IFNULL(NEW.avg_rpe, 0),
+        rpe_n = rpe_n + (NEW.avg_rpe IS NOT NULL),
+        prs = prs + CASE WHEN json_valid(NEW.prs_achieved) THEN json_array_length(NEW.prs_achieved) ELSE 0 END
+    WHERE owner = NEW.owner AND day = date(NEW.timestamp) AND workout_type = IFNULL(NEW.workout_type, '');
+END;
+
+-- Weekly (Monday-start) rollups over the daily tables
+CREATE VIEW IF NOT EXISTS biometrics_weekly AS
+SELECT
+    owner,
+    date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days') AS week,
+    COUNT(*) AS days,
+    SUM(readings) AS readings,
+    SUM(sleep_score_sum) AS sleep_score_sum, SUM(sleep_score_n) AS sleep_score_n,
+    SUM(sleep_hours_sum) AS sleep_hours_sum, SUM(sleep_hours_n) AS sleep_hours_n,
+    SUM(hrv_sum) AS hrv_sum, SUM(hrv_n) AS hrv_n,
+    SUM(resting_hr_sum) AS resting_hr_sum, SUM(resting_hr_n) AS resting_hr_n,
+    SUM(recovery_score_sum) AS recovery_score_sum, SUM(recovery_score_n) AS recovery_score_n,
+    SUM(weight_kg_sum) AS weight_kg_sum, SUM(weight_kg_n) AS weight_kg_n
+FROM biometrics_daily
+GROUP BY owner, week;
+
+CREATE VIEW IF NOT EXISTS workouts_weekly AS
+SELECT
+    owner,
+    date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days') AS week,
+    COUNT(DISTINCT day) AS active_days,
+    SUM(workouts) AS workouts,
+    SUM(minutes) AS minutes,
+    SUM(volume_kg) AS volume_kg,
+    SUM(rpe_sum) AS rpe_sum,
+    SUM(rpe_n) AS rpe_n,
+    SUM(prs) AS prs
+FROM workouts_daily
+GROUP BY owner, week;
 
 CREATE TABLE IF NOT EXISTS sobriety_tracker (
     id TEXT PRIMARY KEY,
@@ -237,13 +659,27 @@ CREATE TABLE IF NOT EXISTS sobriety_tracker (
     habit_type TEXT CHECK (habit_type IN ('alcohol', 'nicotine', 'caffeine', 'social_media', 'gaming', 'other')),
     start_date DATE,
     last_relapse DATE,
-    current_streak_days INTEGER DEFAULT 0,
+    current_streak_days INTEGER DEFAULT 0,  -- legacy: streaks and savings are computed on read
     longest_streak_days INTEGER DEFAULT 0,
-    relapse_log JSON,
+    relapse_log JSON,  -- legacy: relapses live in sobriety_relapses
     why_i_started TEXT,
-    savings_calculated DECIMAL(10,2) DEFAULT 0
+    savings_calculated DECIMAL(10,2) DEFAULT 0,
+    cost_per_day DECIMAL(10,2)  -- what the habit cost per day, for savings
+);
+
+-- One row per relapse; streaks and savings are computed from these on read
+CREATE TABLE IF NOT EXISTS sobriety_relapses (
+    id TEXT PRIMARY KEY,
+    tracker_id TEXT NOT NULL REFERENCES sobriety_tracker(id) ON DELETE CASCADE,
+    relapse_date DATE NOT NULL,
+    reason TEXT,
+    triggers JSON,
+    cost DECIMAL(10,2) DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
+CREATE INDEX IF NOT EXISTS idx_sobriety_relapses_tracker_date ON sobriety_relapses(tracker_id, relapse_date);
+
 -- ==================== VIEWS ====================
 
 -- Shared expenses view
@@ -255,15 +691,14 @@ SELECT
 FROM transactions t
 WHERE t.owner = 'shared' OR t.split_type != 'solo';
 
--- Health correlation view
+-- Health correlation view (health logs with the same-day biometrics of the same owner)
 CREATE VIEW IF NOT EXISTS health_correlations AS
 SELECT 
     h.*,
-    b.sleep_quality as prev_night_sleep,
+    b.sleep_score as prev_night_sleep,
     b.hrv as morning_hrv
 FROM health_logs h
-LEFT JOIN biometrics b ON DATE(h.timestamp) = DATE(b.date)
-WHERE h.owner = 'gaby';  -- Gaby Protocol focus
+LEFT JOIN biometrics b ON b.owner = h.owner AND DATE(h.timestamp) = DATE(b.date);
 
 -- Monthly spending summary
 CREATE VIEW IF NOT EXISTS monthly_spending AS
@@ -0,0 +1,153 @@
+"""
+AnkiConnect client for The Brain
+
+One pooled HTTP session per client; bulk work goes through AnkiConnect's
+`multi` action so a batch of notes costs one round-trip instead of one
+request per card.
+"""
+import logging
+import re
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+ANKI_CONNECT_VERSION = 6
+
+# Notes per addNotes action, and actions per multi request
+ANKI_BATCH_SIZE = 100
+
+ANKI_TIMEOUT = 10
+
+
+class AnkiConnectError(Exception):
+    """AnkiConnect returned an error for a request"""
+
+
+def extract_card_content(content: str) -> Tuple[str, str]:
+    """Front/back for a card: a Q:/A: pair, else first paragraph / the rest"""
+    # Look for Q: / A: pattern
+    qa_match = re.search(r'Q:\s*(.+?)\s*\n\s*A:\s*(.+)', content, re.DOTALL)
+
+    if qa_match:
+        front = qa_match.group(1).strip()
+        back = qa_match.group(2).strip()
+    else:
+        # Fallback: first paragraph = front, rest = back
+        paragraphs = content.split('\n\n')
+        front = paragraphs[0].strip()[:200]  # Limit length
+        back = '\n\n'.join(paragraphs[1:]).strip()
+
+    return front, back
+
+
+def build_note(entry: Dict) -> Dict:
+    """AnkiConnect note for a knowledge entry (Basic model, Nexus::<domain> deck)"""
+    front, back = extract_card_content(entry.get('content') or '')
+    return {
+        'deckName': f"Nexus::{entry.get('domain') or 'General'}",
+        'modelName': 'Basic',
+        'fields': {'Front': front, 'Back': back},
+        'tags': list(entry.get('tags') or []) + ['nexus', 'auto']
+    }
+
+
+def update_actions(entries: List[Dict], infos: List[Dict]) -> Tuple[List[Dict], List[List[str]]]:
+    """
+    Actions bringing existing notes in line with their edited entries
+
+    infos are the notesInfo results for the entries' notes, in order ({} for
+    a note deleted in Anki). Each note gets its fields set; deck moves and
+    tag additions/removals are grouped so notes needing the same change
+    share one action. Returns the actions and the entry ids each affects.
+    """
+    actions, affected = [], []
+    groups: Dict[Tuple[str, str], Tuple[List[int], List[str]]] = {}
+
+    for entry, info in zip(entries, infos):
+        note = build_note(entry)
+        note_id = int(entry['srs_card_id'])
+        actions.append({'action': 'updateNoteFields',
+                        'params': {'note': {'id': note_id, 'fields': note['fields']}}})
+        affected.append([entry['id']])
+        if not info:
+            continue
+
+        current, wanted = set(info.get('tags') or []), set(note['tags'])
+        changes = [('changeDeck', note['deckName'], info.get('cards') or []),
+                   ('addTags', ' '.join(sorted(wanted - current)), [note_id]),
+                   ('removeTags', ' '.join(sorted(current - wanted)), [note_id])]
+        for action, value, ids in changes:
+            if value and ids:
+                targets, entry_ids = groups.setdefault((action, value), ([], []))
+                targets.extend(ids)
+                entry_ids.append(entry['id'])
+
+    for (action, value), (targets, entry_ids) in groups.items():
+        if action == 'changeDeck':
+            params = {'cards': targets, 'deck': value}
+        else:
+            params = {'notes': targets, 'tags': value}
+        actions.append({'action': action, 'params': params})
+        affected.append(entry_ids)
+
+    return actions, affected
+
+
+class AnkiConnect:
+    """Minimal AnkiConnect client over a keep-alive session"""
+
+    def __init__(self, url: str, timeout: float = ANKI_TIMEOUT, pool_size: int = 4):
+        self.url = url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session: Optional['requests.Session'] = None
+        self.requests_made = 0
+
+    @property
+    def session(self) -> 'requests.Session':
+        """Pooled session (created on first request)"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._session = requests.Session()
+            self._session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size))
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def invoke(self, action: str, timeout: float = None, **params) -> Any:
+        """Run one action; raises AnkiConnectError on an AnkiConnect error"""
+        payload = {'action': action, 'version': ANKI_CONNECT_VERSION}
+        if params:
+            payload['params'] = params
+
+        response = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+        self.requests_made += 1
+        result = response.json()
+
+        if result.get('error'):
+            raise AnkiConnectError(result['error'])
+        return result['result']
+
+    def multi(self, actions: List[Dict], batch_size: int = ANKI_BATCH_SIZE) -> List[Dict]:
+        """
+        Run many actions, batch_size per `multi` request
+
+        Returns one {'result', 'error'} dict per action, in order, so a
+        failing action doesn't fail its neighbours.
+        """
+        responses = []
+        for start in range(0, len(actions), batch_size):
+            batch = [{**action, 'version': ANKI_CONNECT_VERSION} for action in actions[start:start + batch_size]]
+            for item in self.invoke('multi', actions=batch):
+                # Older AnkiConnect versions return bare results
+                responses.append(item if isinstance(item, dict) and 'error' in item
+                                 else {'result': item, 'error': None})
+        return responses
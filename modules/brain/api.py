@@ -2,10 +2,15 @@
 API routes for The Brain module (Knowledge Management)
 FastAPI endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
+import asyncio
+import logging
+
+from fastapi import APIRouter, HTTPException, Query, Depends, File, UploadFile
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
 from datetime import datetime
 
+from .backup import to_ndjson
 from .service import BrainModule
 from core.auth import get_current_user_cloudflare
 
@@ -13,6 +18,7 @@ from core.auth import get_current_user_cloudflare
 router = APIRouter(prefix="/api/v1/brain", tags=["brain"])
 brain = BrainModule()
 get_current_user = get_current_user_cloudflare
+logger = logging.getLogger(__name__)
 
 
 # ========== KNOWLEDGE ENTRY ENDPOINTS ==========
@@ -63,6 +69,24 @@ async def get_entry(entry_id: str, user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/entries/{entry_id}/related")
+async def get_related_entries(
+    entry_id: str,
+    limit: int = Query(10, ge=1, le=50),
+    user: dict = Depends(get_current_user)
+):
+    """Related entries ranked by edge weights and embedding similarity"""
+    try:
+        related = brain.get_related(entry_id, user_id=user['user_id'], limit=limit)
+        if related is None:
+            raise HTTPException(status_code=404, detail="Entry not found")
+        return {'entry_id': entry_id, 'related': related, 'count': len(related)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.put("/entries/{entry_id}")
 async def update_entry(entry_id: str, update_data: dict, user: dict = Depends(get_current_user)):
     """Update a knowledge entry"""
@@ -117,7 +141,78 @@ async def create_web_clip(url_data: dict, user: dict = Depends(get_current_user)
         if not url:
             raise HTTPException(status_code=400, detail="URL is required")
 
-        result = brain.create_web_clip(url, user_id=user['user_id'], metadata=url_data)
+        result = await brain.create_web_clip(url, user_id=user['user_id'], metadata=url_data)
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/clip/batch")
+async def create_web_clips(batch_data: dict, user: dict = Depends(get_current_user)):
+    """
+    Clip many web pages concurrently
+
+    Body: {"urls": [url or {url, title, tags, ...}], "owner", "domain", "project", "tags", "on_duplicate"}
+    Top-level fields are defaults for every URL; on_duplicate='skip' doesn't
+    save pages that near-duplicate an existing entry.
+    """
+    try:
+        urls = batch_data.get('urls') or []
+        if not urls:
+            raise HTTPException(status_code=400, detail="urls is required")
+        if len(urls) > 100:
+            raise HTTPException(status_code=400, detail="At most 100 URLs per batch")
+
+        defaults = {k: v for k, v in batch_data.items() if k in ('owner', 'domain', 'project', 'tags', 'on_duplicate')}
+        clips = [{**defaults, **(item if isinstance(item, dict) else {'url': item})} for item in urls]
+        if any(not clip.get('url') for clip in clips):
+            raise HTTPException(status_code=400, detail="Every item needs a URL")
+
+        results = await brain.create_web_clips(clips, user_id=user['user_id'])
+
+        return {
+            'results': results,
+            'created': sum(1 for r in results if r.get('status') == 'created'),
+            'duplicates': sum(1 for r in results if r.get('duplicates')),
+            'failed': sum(1 for r in results if 'error' in r),
+            'cached': sum(1 for r in results if r.get('cached'))
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ========== DUPLICATES ==========
+
+@router.get("/duplicates")
+async def list_duplicates(
+    threshold: float = Query(0.8, ge=0.5, le=1.0),
+    user: dict = Depends(get_current_user)
+):
+    """Groups of near-duplicate entries (MinHash + LSH), oldest entry suggested as keep"""
+    try:
+        return await asyncio.to_thread(brain.get_duplicates, user['user_id'], threshold)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/duplicates/merge")
+async def merge_duplicates(merge_data: dict, user: dict = Depends(get_current_user)):
+    """
+    Merge duplicates into one entry
+
+    Body: {"keep": entry_id, "merge": [entry_id, ...]}
+    """
+    try:
+        if not merge_data.get('keep') or not merge_data.get('merge'):
+            raise HTTPException(status_code=400, detail="keep and merge are required")
+
+        result = brain.merge_entries(merge_data['keep'], merge_data['merge'], user_id=user['user_id'])
         if 'error' in result:
             raise HTTPException(status_code=400, detail=result['error'])
         return result
@@ -167,19 +262,47 @@ async def search_entries(
     domain: Optional[str] = None,
     project: Optional[str] = None,
     semantic: bool = False,
+    hybrid: bool = False,
+    prefix: bool = False,
+    highlight: bool = True,
     limit: int = Query(50, le=200),
     user: dict = Depends(get_current_user)
 ):
-    """Search knowledge entries"""
+    """Search knowledge entries (BM25 keyword, or hybrid BM25 + vector with RRF)"""
     try:
         filters = {
             'domain': domain,
             'project': project,
             'semantic': semantic,
+            'hybrid': hybrid,
+            'prefix': prefix,
+            'highlight': highlight,
             'limit': limit
         }
-        results = brain.search_entries(q, user_id=user['user_id'], filters=filters)
-        return {'results': results, 'count': len(results), 'query': q}
+        result = brain.search(q, user_id=user['user_id'], filters=filters)
+        return {**result, 'query': q}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/suggest")
+async def suggest(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    user: dict = Depends(get_current_user)
+):
+    """Search-as-you-type suggestions (titles, tags, projects) for a prefix"""
+    try:
+        return brain.suggest(q, user_id=user['user_id'], limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/search/cache")
+async def search_cache_stats(user: dict = Depends(get_current_user)):
+    """Search result cache hit rate, invalidations and size"""
+    try:
+        return brain.get_search_cache_stats()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -226,30 +349,166 @@ async def sync_anki(user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/sync/anki/cards")
+async def sync_anki_cards(batch_size: int = Query(100, ge=1, le=500), user: dict = Depends(get_current_user)):
+    """Create/update Anki cards for SRS-eligible entries changed since the last run"""
+    try:
+        result = await asyncio.to_thread(brain.sync_anki_cards, user['user_id'], batch_size)
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/sync/embeddings")
-async def sync_embeddings(user: dict = Depends(get_current_user)):
-    """Re-generate embeddings for all entries"""
+async def sync_embeddings(batch_size: int = Query(64, ge=1, le=512), user: dict = Depends(get_current_user)):
+    """Re-generate chunked embeddings for all entries"""
     try:
         # Get all entries for user
         entries = brain.get_entries(user_id=user['user_id'], include_shared=True, limit=1000)
+        entry_ids = [entry['id'] for entry in entries]
 
-        # Generate embeddings for each entry
+        # Encode in batches of entries; one failed batch doesn't stop the rest
         success_count = 0
         failed_count = 0
+        chunk_count = 0
+        encode_ms = 0.0
 
-        for entry in entries:
+        for i in range(0, len(entry_ids), batch_size):
+            batch = entry_ids[i:i + batch_size]
             try:
-                brain.generate_embedding(entry['id'])
-                success_count += 1
+                result = brain.generate_embeddings(batch)
+                success_count += result['entries']
+                chunk_count += result['chunks']
+                encode_ms += result['encode_ms']
             except Exception as e:
-                logger.error(f"Error generating embedding for {entry['id']}: {e}")
-                failed_count += 1
+                logger.error(f"Error generating embeddings for batch {i // batch_size}: {e}")
+                failed_count += len(batch)
 
         return {
             'status': 'completed',
             'success_count': success_count,
             'failed_count': failed_count,
-            'total': len(entries)
+            'total': len(entries),
+            'chunks': chunk_count,
+            'encode_ms': round(encode_ms, 3),
+            'ms_per_entry': round(encode_ms / success_count, 3) if success_count else 0.0
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/sync/graph")
+async def sync_graph(user: dict = Depends(get_current_user)):
+    """Rebuild knowledge graph edges for all entries"""
+    try:
+        return brain.rebuild_knowledge_graph(user_id=user['user_id'])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ========== EXPORT / IMPORT ENDPOINTS ==========
+
+@router.get("/export")
+async def export_entries(embeddings: bool = True, user: dict = Depends(get_current_user)):
+    """Stream all visible entries (and their vectors) as NDJSON"""
+    try:
+        filename = f"brain-{user['user_id']}-{datetime.now().strftime('%Y%m%d')}.ndjson"
+        return StreamingResponse(
+            to_ndjson(brain.export_entries(user_id=user['user_id'], include_embeddings=embeddings)),
+            media_type='application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/import")
+async def import_entries(
+    file: UploadFile = File(...),
+    on_conflict: str = Query('skip', pattern='^(skip|replace)$'),
+    embeddings: bool = True,
+    user: dict = Depends(get_current_user)
+):
+    """Restore entries from an NDJSON export (vectors are reused, not re-encoded)"""
+    try:
+        result = await asyncio.to_thread(
+            brain.import_entries, file.file, user['user_id'],
+            on_conflict=on_conflict, include_embeddings=embeddings
+        )
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ========== GRAPH ANALYTICS ENDPOINTS ==========
+
+@router.get("/graph/stats")
+async def graph_stats(user: dict = Depends(get_current_user)):
+    """Knowledge graph size, community/component counts and cache freshness"""
+    try:
+        return brain.get_graph_stats(user_id=user['user_id'])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/graph/pagerank")
+async def graph_pagerank(limit: int = Query(20, le=200), user: dict = Depends(get_current_user)):
+    """Most central entries by PageRank"""
+    try:
+        entries = brain.get_graph_pagerank(user_id=user['user_id'], limit=limit)
+        return {'entries': entries, 'count': len(entries)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/graph/communities")
+async def graph_communities(limit: int = Query(20, le=200), user: dict = Depends(get_current_user)):
+    """Topic clusters (Louvain communities), largest first"""
+    try:
+        communities = brain.get_graph_groups(user_id=user['user_id'], kind='communities', limit=limit)
+        return {'communities': communities, 'count': len(communities)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/graph/components")
+async def graph_components(limit: int = Query(20, le=200), user: dict = Depends(get_current_user)):
+    """Connected components, largest first"""
+    try:
+        components = brain.get_graph_groups(user_id=user['user_id'], kind='components', limit=limit)
+        return {'components': components, 'count': len(components)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/graph/rebuild")
+async def graph_rebuild(embeddings: bool = True, user: dict = Depends(get_current_user)):
+    """Rebuild metadata (and optionally embedding) edges, then recompute analytics"""
+    try:
+        result = {'metadata': brain.rebuild_knowledge_graph(user_id=user['user_id'])}
+        if embeddings:
+            result['embedding'] = brain.rebuild_embedding_edges(user_id=user['user_id'])
+        result['stats'] = brain.get_graph_stats(user_id=user['user_id'])
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def graph_analytics_scheduler(interval_seconds: int = 300):
+    """Background task: recompute analytics for owners whose graph changed"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            refreshed = await asyncio.to_thread(brain.refresh_stale_graphs)
+            if refreshed:
+                logger.info(f"Refreshed graph analytics for {', '.join(refreshed)}")
+        except Exception as e:
+            logger.error(f"Graph analytics refresh failed: {e}")
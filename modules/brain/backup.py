@@ -0,0 +1,121 @@
+"""
+Knowledge base export/import (NDJSON) for The Brain
+
+One JSON object per line: a header, then one record per entry carrying its
+row and, optionally, its stored chunk vectors. Vectors are float32 bytes in
+base64 (about a third the size of JSON floats and no float parsing), so an
+import restores them as-is instead of re-encoding content.
+
+Both directions stream: export pages through knowledge_entries by id
+(keyset pagination) and import works in fixed-size batches, so memory
+stays flat regardless of how many entries are moved.
+"""
+import base64
+import json
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+EXPORT_FORMAT = 'nexus-brain-ndjson'
+EXPORT_VERSION = 1
+
+# Entries per keyset page (export) and per insert/upsert batch (import)
+EXPORT_PAGE_SIZE = 500
+IMPORT_BATCH_SIZE = 500
+
+# Computed locally on import rather than trusted from the file
+DERIVED_COLUMNS = ('qdrant_id', 'embedding_synced', 'embedding_chunks')
+
+# Database-local keys, neither exported nor imported
+LOCAL_COLUMNS = ('doc_id',)
+
+
+def encode_vector(vector: List[float]) -> str:
+    """float32 little-endian bytes, base64"""
+    return base64.b64encode(array('f', vector).tobytes()).decode('ascii')
+
+
+def decode_vector(data: str) -> List[float]:
+    """Inverse of encode_vector"""
+    vector = array('f')
+    vector.frombytes(base64.b64decode(data))
+    return vector.tolist()
+
+
+def header(owner: str, embeddings: bool) -> Dict:
+    """First line of an export"""
+    return {
+        'type': 'header',
+        'format': EXPORT_FORMAT,
+        'version': EXPORT_VERSION,
+        'owner': owner,
+        'embeddings': embeddings,
+        'exported_at': datetime.now().isoformat()
+    }
+
+
+def to_ndjson(records: Iterable[Dict]) -> Iterator[str]:
+    """Serialise records lazily, one line each"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def read_ndjson(lines: Iterable[Union[str, bytes]], errors: Optional[List[Dict]] = None) -> Iterator[Dict]:
+    """
+    Parse NDJSON lazily, validating the header
+
+    Raises ValueError for a missing header or an unknown format/version.
+    A malformed line (invalid JSON, or an entry record without an entry id)
+    also raises, unless an errors list is given: then it is appended there
+    as {'record': line number, 'error': ...} and skipped.
+    """
+    seen_header = False
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("not a JSON object")
+        except ValueError as e:
+            error = f"Line {number}: invalid JSON ({e})"
+            if errors is None:
+                raise ValueError(error)
+            errors.append({'record': number, 'error': error})
+            continue
+
+        if record.get('type') == 'header':
+            if record.get('format') != EXPORT_FORMAT or record.get('version', 0) > EXPORT_VERSION:
+                raise ValueError(f"Unsupported export format {record.get('format')} "
+                                 f"v{record.get('version')}")
+            seen_header = True
+            continue
+
+        if not seen_header:
+            raise ValueError("Missing export header")
+        if record.get('type') == 'entry' and not (isinstance(record.get('entry'), dict)
+                                                  and record['entry'].get('id')):
+            error = f"Line {number}: entry record without an entry id"
+            if errors is None:
+                raise ValueError(error)
+            errors.append({'record': number, 'error': error})
+            continue
+        yield record
+
+
+def entry_record(row: Dict, chunks: Optional[List[Dict]] = None) -> Dict:
+    """Export record for one knowledge_entries row (tags decoded, vectors encoded)"""
+    entry = {k: v for k, v in dict(row).items() if k not in LOCAL_COLUMNS}
+    if isinstance(entry.get('tags'), str):
+        entry['tags'] = json.loads(entry['tags'])
+    record = {'type': 'entry', 'entry': entry}
+    if chunks is not None:
+        record['chunks'] = [
+            {'index': chunk['index'], 'vector': encode_vector(chunk['vector'])}
+            for chunk in sorted(chunks, key=lambda c: c['index'])
+        ]
+    return record
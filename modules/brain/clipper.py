@@ -0,0 +1,222 @@
+"""
+Web clipping pipeline for The Brain
+
+Pages are fetched with one pooled async HTTP client (httpx) per event loop,
+with a cap on concurrent requests per host. Each client is closed when its
+loop shuts down. Responses are cached in web_clip_cache with their
+ETag/Last-Modified validators, so re-clipping a URL sends a conditional
+request and a 304 reuses the stored extraction; cache reads and writes run
+in a worker thread so SQLite never blocks the loop.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from core.database import get_db
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+CLIP_TIMEOUT = 10.0
+
+# Pool size across all hosts, and concurrent requests allowed per host
+MAX_CONNECTIONS = 20
+PER_HOST_LIMIT = 4
+
+# 'lxml' is several times faster than the pure-Python 'html.parser'
+HTML_PARSER = os.getenv('CLIP_HTML_PARSER', 'lxml')
+
+CONTENT_SELECTORS = ['article', 'main', '[role="main"]', '.content', '.article']
+TEXT_TAGS = ['p', 'h1', 'h2', 'h3', 'h4', 'li']
+
+
+def extract_content(html: str, url: str, parser: str = HTML_PARSER) -> Optional[Dict]:
+    """
+    Title and readable text of an HTML page
+
+    Looks for a common article/content container and falls back to <body>.
+    Falls back to html.parser if the requested parser isn't installed.
+    Returns None if no text was found.
+    """
+    from bs4 import BeautifulSoup, FeatureNotFound
+
+    try:
+        soup = BeautifulSoup(html, parser)
+    except FeatureNotFound:
+        soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract title
+    title_tag = soup.find('title')
+    title = title_tag.get_text(strip=True) if title_tag else url
+
+    # Try common article/content containers
+    container = None
+    for selector in CONTENT_SELECTORS:
+        container = soup.select_one(selector)
+        if container:
+            break
+
+    if not container:
+        # Fallback to body
+        container = soup.find('body')
+
+    lines = []
+    if container:
+        # Extract text from paragraphs, headings, and lists
+        for tag in container.find_all(TEXT_TAGS):
+            text = tag.get_text(strip=True)
+            if text:
+                lines.append(text)
+
+    content = '\n'.join(lines)
+    if not content:
+        return None
+
+    return {'title': title or url, 'content': content}
+
+
+class WebClipper:
+    """Concurrent page fetcher with connection pooling and conditional re-fetch"""
+
+    def __init__(self, timeout: float = CLIP_TIMEOUT, max_connections: int = MAX_CONNECTIONS,
+                 per_host: int = PER_HOST_LIMIT, parser: str = HTML_PARSER):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.parser = parser
+
+        # Client and per-host semaphores of each running event loop
+        self._scopes: Dict[asyncio.AbstractEventLoop, Dict] = {}
+
+    async def _get_client(self) -> 'httpx.AsyncClient':
+        """Pooled client for the running event loop, created on first use there"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        scope = self._scopes.get(loop)
+        if scope is None:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={'User-Agent': USER_AGENT},
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+            scope = self._scopes[loop] = {
+                'client': client,
+                'host_limits': {},
+                'lifetime': self._client_lifetime(client)
+            }
+            await scope['lifetime'].__anext__()
+        return scope['client']
+
+    async def _client_lifetime(self, client: 'httpx.AsyncClient') -> AsyncIterator[None]:
+        """
+        Suspended for as long as the loop runs
+
+        Event loops finalise unfinished async generators when they shut down
+        (asyncio.run, uvicorn), so the client is closed on its own loop
+        rather than leaking its connections when a later loop replaces it.
+        """
+        try:
+            yield
+        finally:
+            self._scopes.pop(asyncio.get_running_loop(), None)
+            await client.aclose()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        """Semaphore capping concurrent requests to the URL's host (running loop)"""
+        host_limits = self._scopes[asyncio.get_running_loop()]['host_limits']
+        host = urlsplit(url).netloc.lower()
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(self.per_host)
+        return host_limits[host]
+
+    async def aclose(self):
+        """Close the running loop's pooled connections"""
+        scope = self._scopes.get(asyncio.get_running_loop())
+        if scope is not None:
+            await scope['lifetime'].aclose()
+
+    async def fetch(self, url: str) -> Dict:
+        """
+        Fetch and extract one page
+
+        Returns url, title, content, cached (True when the server answered
+        304 and the stored extraction was reused) or url and error.
+        """
+        client = await self._get_client()
+        cached = await asyncio.to_thread(self._cached, url)
+
+        headers = {}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            async with self._host_limit(url):
+                response = await client.get(url, headers=headers)
+
+            if response.status_code == 304 and cached:
+                await asyncio.to_thread(self._touch, url)
+                return {'url': url, 'title': cached['title'], 'content': cached['content'], 'cached': True}
+
+            response.raise_for_status()
+
+            # Parsing is CPU-bound; keep it off the event loop
+            extracted = await asyncio.to_thread(extract_content, response.text, url, self.parser)
+            if not extracted:
+                return {'url': url, 'error': 'No readable content'}
+
+            await asyncio.to_thread(self._store, url, response.headers.get('etag'),
+                                    response.headers.get('last-modified'), extracted)
+            logger.info(f"Extracted content from {url}: {len(extracted['content'])} chars")
+
+            return {'url': url, **extracted, 'cached': False}
+
+        except Exception as e:
+            logger.error(f"Error extracting web content from {url}: {e}")
+            return {'url': url, 'error': str(e) or type(e).__name__}
+
+    async def fetch_many(self, urls: List[str]) -> List[Dict]:
+        """Fetch pages concurrently (per-host limits apply); results in input order"""
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+    # ========== CACHE ==========
+
+    def _cached(self, url: str) -> Optional[Dict]:
+        with get_db() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, title, content FROM web_clip_cache WHERE url = ?",
+                (url,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _store(self, url: str, etag: Optional[str], last_modified: Optional[str], extracted: Dict):
+        with get_db() as conn:
+            conn.execute(
+                """INSERT INTO web_clip_cache (url, etag, last_modified, title, content, fetched_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET
+                       etag = excluded.etag,
+                       last_modified = excluded.last_modified,
+                       title = excluded.title,
+                       content = excluded.content,
+                       fetched_at = excluded.fetched_at""",
+                (url, etag, last_modified, extracted['title'], extracted['content'],
+                 datetime.now().isoformat())
+            )
+
+    def _touch(self, url: str):
+        with get_db() as conn:
+            conn.execute(
+                "UPDATE web_clip_cache SET fetched_at = ? WHERE url = ?",
+                (datetime.now().isoformat(), url)
+            )
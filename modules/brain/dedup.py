@@ -0,0 +1,115 @@
+"""
+Near-duplicate detection for The Brain
+
+Entries are reduced to MinHash signatures over word shingles: the share of
+signature slots two entries agree on estimates the Jaccard similarity of
+their shingle sets. Signatures are cut into LSH bands and each band hashed
+to a bucket key (persisted in knowledge_lsh), so finding an entry's
+duplicates only compares it with entries sharing a bucket.
+"""
+import hashlib
+import random
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Signature length and LSH layout: 16 bands x 4 rows. A pair at Jaccard 0.8
+# shares a bucket with p ~ 0.9998, at 0.5 with p ~ 0.64, at 0.3 with p ~ 0.12.
+NUM_PERM = 64
+LSH_BANDS = 16
+SHINGLE_WORDS = 3
+
+# Estimated Jaccard similarity at which two entries count as duplicates
+DUPLICATE_THRESHOLD = 0.8
+
+_PRIME = (1 << 31) - 1
+_rng = random.Random(20261019)
+_HASH_A = [_rng.randrange(1, _PRIME) for _ in range(NUM_PERM)]
+_HASH_B = [_rng.randrange(0, _PRIME) for _ in range(NUM_PERM)]
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def entry_text(entry: Dict) -> str:
+    """Text an entry is compared on: its content, or the title if empty"""
+    return entry.get('content') or entry.get('title') or ''
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> Set[str]:
+    """Overlapping size-word windows of the lowercased text"""
+    words = _WORD_RE.findall((text or '').lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _shingle_hash(shingle: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def minhash(text: str) -> Optional[List[int]]:
+    """
+    MinHash signature (NUM_PERM ints) of the text's shingles
+
+    Each slot is min((a * h + b) mod p) over the shingle hashes h, for one
+    random (a, b) per slot, computed for all slots at once with NumPy.
+    Returns None for text without words.
+    """
+    import numpy as np
+
+    grams = shingles(text)
+    if not grams:
+        return None
+
+    hashes = np.fromiter((_shingle_hash(g) for g in grams), dtype=np.uint64, count=len(grams)) % _PRIME
+    a = np.asarray(_HASH_A, dtype=np.uint64)[:, None]
+    b = np.asarray(_HASH_B, dtype=np.uint64)[:, None]
+    return ((a * hashes[None, :] + b) % _PRIME).min(axis=1).tolist()
+
+
+def band_keys(signature: List[int], bands: int = LSH_BANDS) -> List[int]:
+    """One signed 64-bit bucket key per band (band number included in the hash)"""
+    rows = len(signature) // bands
+    keys = []
+    for band in range(bands):
+        data = array('I', [band] + signature[band * rows:(band + 1) * rows]).tobytes()
+        keys.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little', signed=True))
+    return keys
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity: share of agreeing signature slots"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def pack_signature(signature: List[int]) -> bytes:
+    return array('I', signature).tobytes()
+
+
+def unpack_signature(data: bytes) -> List[int]:
+    signature = array('I')
+    signature.frombytes(data)
+    return signature.tolist()
+
+
+def group_pairs(pairs: Iterable[Tuple[str, str]]) -> List[Set[str]]:
+    """Connected groups of ids from duplicate pairs (union-find)"""
+    parent: Dict[str, str] = {}
+
+    def find(x: str) -> str:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    groups: Dict[str, Set[str]] = {}
+    for x in parent:
+        groups.setdefault(find(x), set()).add(x)
+    return list(groups.values())
@@ -0,0 +1,182 @@
+"""
+Chunked embeddings for The Brain
+
+all-MiniLM-L6-v2 truncates input at 256 word pieces, so a long web clip
+embedded as one string is represented only by its opening paragraph.
+Content is split into overlapping word windows instead; every window is
+stored in Qdrant as its own point with the entry id as parent_id, and
+chunk hits are collapsed back to entries at query time.
+
+The encoder backend is pluggable (EMBEDDING_BACKEND):
+    torch       sentence-transformers on PyTorch, fp32 (default)
+    torch-int8  PyTorch with dynamically quantized int8 Linear layers
+    onnx        ONNX Runtime (needs optimum[onnxruntime])
+    onnx-int8   ONNX Runtime with the hub's int8-quantized export
+EMBEDDING_THREADS caps intra-op CPU threads for either runtime.
+"""
+import logging
+import math
+import os
+import re
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+EMBEDDING_BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+# Quantized export shipped in the model's hub repo (override for AVX-512/ARM builds)
+ONNX_INT8_FILE = os.getenv('EMBEDDING_ONNX_INT8_FILE', 'onnx/model_qint8_avx2.onnx')
+
+WARMUP_SENTENCES = [
+    'Warm-up sentence for the embedding model.',
+    'Loads weights and initialises kernels before the first request.',
+]
+
+# ~128 words stays well under the model's 256 word-piece limit
+CHUNK_WORDS = 128
+CHUNK_OVERLAP = 32
+
+# Sentences per encode() call
+EMBED_BATCH_SIZE = 64
+
+# Chunk hits fetched per requested entry, so entries with several matching
+# chunks don't crowd others out of the top-k
+CHUNK_OVERFETCH = 4
+
+EMBEDDING_DIM = 384
+
+# Keyword payload indexes on chunk points (parent lookups/deletes, owner filter)
+PAYLOAD_INDEXES = ('parent_id', 'owner')
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def chunk_text(text: str, title: str = None, size: int = CHUNK_WORDS,
+               overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into overlapping windows of `size` words
+
+    The title is prepended to every chunk so each passage keeps the
+    entry's context. Short texts give a single chunk; empty text gives
+    a title-only chunk (or none without a title).
+    """
+    if overlap >= size:
+        raise ValueError("overlap must be smaller than chunk size")
+
+    words = _WORD_RE.findall(text or '')
+    prefix = f"{title}\n\n" if title else ''
+
+    if not words:
+        return [title] if title else []
+
+    chunks = []
+    step = size - overlap
+    for start in range(0, len(words), step):
+        chunks.append(prefix + ' '.join(words[start:start + size]))
+        if start + size >= len(words):
+            break
+    return chunks
+
+
+def chunk_point_id(entry_id: str, chunk_index: int) -> str:
+    """Deterministic Qdrant point id (UUID) for an entry's chunk"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"nexus-knowledge/{entry_id}/{chunk_index}"))
+
+
+def aggregate_chunk_hits(hits: Iterable, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Collapse scored chunk hits into one result per parent entry
+
+    An entry scores as its best chunk (max-pooling); chunk_hits counts how
+    many of its chunks matched. Hits without a parent_id (whole-entry points
+    from before chunking) count as their own parent.
+    """
+    entries: Dict[str, Dict] = {}
+    for hit in hits:
+        payload = hit.payload or {}
+        parent_id = payload.get('parent_id', str(hit.id))
+        best = entries.get(parent_id)
+        if best is None:
+            entries[parent_id] = {
+                'id': parent_id,
+                'score': hit.score,
+                'chunk_index': payload.get('chunk_index', 0),
+                'chunk_hits': 1
+            }
+            continue
+        best['chunk_hits'] += 1
+        if hit.score > best['score']:
+            best['score'] = hit.score
+            best['chunk_index'] = payload.get('chunk_index', 0)
+
+    ranked = sorted(entries.values(), key=lambda e: e['score'], reverse=True)
+    return ranked[:limit] if limit else ranked
+
+
+def mean_vector(vectors: Sequence[Sequence[float]]) -> List[float]:
+    """L2-normalised centroid of chunk vectors (the entry-level vector)"""
+    if not vectors:
+        return [0.0] * EMBEDDING_DIM
+    dim = len(vectors[0])
+    centroid = [sum(v[i] for v in vectors) / len(vectors) for i in range(dim)]
+    norm = math.sqrt(sum(x * x for x in centroid)) or 1.0
+    return [x / norm for x in centroid]
+
+
+def recall_at_k(ranked_ids: Sequence[Sequence[str]], relevant_ids: Sequence[str], k: int = 10) -> float:
+    """Fraction of queries whose relevant entry appears in the top k"""
+    if not relevant_ids:
+        return 0.0
+    found = sum(1 for ranked, relevant in zip(ranked_ids, relevant_ids) if relevant in ranked[:k])
+    return found / len(relevant_ids)
+
+
+def load_encoder(backend: str = None, threads: int = None, model_name: str = EMBEDDING_MODEL):
+    """
+    Build a SentenceTransformer for the chosen backend
+
+    backend and threads default to EMBEDDING_BACKEND / EMBEDDING_THREADS.
+    Every backend returns an object with the same encode() signature.
+    """
+    backend = backend or os.getenv('EMBEDDING_BACKEND', 'torch')
+    threads = threads or int(os.getenv('EMBEDDING_THREADS', '0')) or None
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}' (expected one of {EMBEDDING_BACKENDS})")
+
+    from sentence_transformers import SentenceTransformer
+
+    start = time.perf_counter()
+
+    if backend.startswith('onnx'):
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        if threads:
+            session_options.intra_op_num_threads = threads
+        model_kwargs = {'session_options': session_options}
+        if backend == 'onnx-int8':
+            model_kwargs['file_name'] = ONNX_INT8_FILE
+        model = SentenceTransformer(model_name, backend='onnx', model_kwargs=model_kwargs)
+    else:
+        import torch
+
+        if threads:
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(model_name)
+        if backend == 'torch-int8':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    logger.info(f"Loaded {model_name} ({backend}, threads={threads or 'default'}) "
+                f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return model
+
+
+def warm_up(model, sentences: Sequence[str] = WARMUP_SENTENCES) -> float:
+    """Run a throwaway encode so the first real request pays no lazy-init cost; returns ms"""
+    start = time.perf_counter()
+    model.encode(list(sentences), batch_size=len(sentences))
+    return (time.perf_counter() - start) * 1000
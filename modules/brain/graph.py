@@ -0,0 +1,284 @@
+"""
+Knowledge graph construction for The Brain
+
+Metadata similarity between entries:
+    0.3 * same domain + 0.4 * tag Jaccard + 0.3 * same project
+
+A domain match alone scores exactly 0.3, which never clears EDGE_THRESHOLD,
+so an edge requires a shared tag or a shared project. Candidate pairs are
+generated from inverted indexes on those features instead of scoring all
+O(n²) pairs; with scipy available the tag Jaccard of every candidate pair
+is computed in one sparse (entry x tag) matrix product.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+# networkx, numpy and scipy are imported where used, so importing this
+# module (and the API) doesn't pay for them
+if TYPE_CHECKING:
+    import networkx as nx
+    import numpy as np
+    from scipy import sparse
+
+# Optional: vectorised scoring (scipy ships with sentence-transformers)
+SCIPY_AVAILABLE = find_spec('scipy') is not None and find_spec('numpy') is not None
+
+
+DOMAIN_WEIGHT = 0.3
+TAG_WEIGHT = 0.4
+PROJECT_WEIGHT = 0.3
+
+# Minimum similarity for an edge
+EDGE_THRESHOLD = 0.3
+
+# Embedding (k-nearest-neighbour) edges: neighbours per entry and minimum cosine score
+KNN_NEIGHBORS = 5
+KNN_MIN_SCORE = 0.75
+
+# Fixed seed so community ids are stable between refreshes
+COMMUNITY_SEED = 42
+
+# Related-entry ranking: graph proximity blended with embedding similarity;
+# each hop past the first multiplies path strength by RELATED_HOP_DECAY
+RELATED_GRAPH_WEIGHT = 0.6
+RELATED_EMBEDDING_WEIGHT = 0.4
+RELATED_HOP_DECAY = 0.5
+
+Edge = Tuple[str, str, float]
+
+
+def entry_similarity(entry1: Dict, entry2: Dict) -> float:
+    """Metadata similarity between two entries (0-1)"""
+    score = 0.0
+
+    # Domain match (30%)
+    if entry1.get('domain') and entry2.get('domain'):
+        if entry1['domain'] == entry2['domain']:
+            score += DOMAIN_WEIGHT
+
+    # Tag overlap (40%)
+    tags1 = set(entry1.get('tags') or [])
+    tags2 = set(entry2.get('tags') or [])
+    if tags1 and tags2:
+        overlap = len(tags1 & tags2)
+        total = len(tags1 | tags2)
+        if total > 0:
+            score += TAG_WEIGHT * (overlap / total)
+
+    # Project match (30%)
+    if entry1.get('project') and entry2.get('project'):
+        if entry1['project'] == entry2['project']:
+            score += PROJECT_WEIGHT
+
+    return score
+
+
+def related_score(graph_weight: float, embedding_similarity: float) -> float:
+    """Ranking score of a related entry (0-1)"""
+    return RELATED_GRAPH_WEIGHT * graph_weight + RELATED_EMBEDDING_WEIGHT * max(embedding_similarity, 0.0)
+
+
+def can_link(owner1: str, owner2: str) -> bool:
+    """Private entries only link within one owner; shared entries link to all"""
+    return owner1 == owner2 or owner1 == 'shared' or owner2 == 'shared'
+
+
+class InvertedIndex:
+    """Feature -> entry id sets for tags, domains and projects"""
+
+    def __init__(self, entries: Iterable[Dict] = ()):
+        self.tags: Dict[str, Set[str]] = defaultdict(set)
+        self.domains: Dict[str, Set[str]] = defaultdict(set)
+        self.projects: Dict[str, Set[str]] = defaultdict(set)
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: Dict):
+        """Index an entry's tags, domain and project"""
+        for tag in entry.get('tags') or []:
+            self.tags[tag].add(entry['id'])
+        if entry.get('domain'):
+            self.domains[entry['domain']].add(entry['id'])
+        if entry.get('project'):
+            self.projects[entry['project']].add(entry['id'])
+
+    def remove(self, entry: Dict):
+        """Drop an entry from every posting list it appears in"""
+        for tag in entry.get('tags') or []:
+            self.tags.get(tag, set()).discard(entry['id'])
+        if entry.get('domain'):
+            self.domains.get(entry['domain'], set()).discard(entry['id'])
+        if entry.get('project'):
+            self.projects.get(entry['project'], set()).discard(entry['id'])
+
+    def candidates(self, entry: Dict) -> Set[str]:
+        """Entries sharing at least one tag or the project (domain-only pairs cannot link)"""
+        found: Set[str] = set()
+        for tag in entry.get('tags') or []:
+            found |= self.tags.get(tag, set())
+        if entry.get('project'):
+            found |= self.projects.get(entry['project'], set())
+        found.discard(entry['id'])
+        return found
+
+
+def compute_edges(entries: List[Dict], threshold: float = EDGE_THRESHOLD,
+                  vectorized: Optional[bool] = None) -> List[Edge]:
+    """
+    All metadata edges among entries, one (src, dst, weight) per unordered pair
+
+    Entries need id, owner, domain, project and a decoded tags list.
+    Uses the sparse-matrix path when scipy is installed unless vectorized=False.
+    """
+    if vectorized is None:
+        vectorized = SCIPY_AVAILABLE
+    if vectorized and entries:
+        return _compute_edges_sparse(entries, threshold)
+    return _compute_edges_indexed(entries, threshold)
+
+
+def _compute_edges_indexed(entries: List[Dict], threshold: float) -> List[Edge]:
+    """Score only candidate pairs from the inverted index"""
+    index = InvertedIndex(entries)
+    by_id = {entry['id']: entry for entry in entries}
+    position = {entry['id']: i for i, entry in enumerate(entries)}
+
+    edges = []
+    for i, entry in enumerate(entries):
+        for candidate_id in index.candidates(entry):
+            # Each unordered pair once
+            if position[candidate_id] <= i:
+                continue
+            candidate = by_id[candidate_id]
+            if not can_link(entry['owner'], candidate['owner']):
+                continue
+            weight = entry_similarity(entry, candidate)
+            if weight > threshold:
+                edges.append((entry['id'], candidate_id, weight))
+
+    return edges
+
+
+def _codes(values: List[Optional[str]]) -> 'np.ndarray':
+    """Integer-encode categorical values; None/empty -> -1"""
+    import numpy as np
+
+    lookup: Dict[str, int] = {}
+    return np.array([lookup.setdefault(v, len(lookup)) if v else -1 for v in values],
+                    dtype=np.int64)
+
+
+def _one_hot(codes: 'np.ndarray') -> 'sparse.csr_matrix':
+    """Sparse one-hot matrix (entries x categories), skipping -1"""
+    import numpy as np
+    from scipy import sparse
+
+    rows = np.nonzero(codes >= 0)[0]
+    width = int(codes.max()) + 1 if len(rows) else 1
+    data = np.ones(len(rows), dtype=np.int32)
+    return sparse.csr_matrix((data, (rows, codes[rows])), shape=(len(codes), width))
+
+
+def _compute_edges_sparse(entries: List[Dict], threshold: float) -> List[Edge]:
+    """
+    Vectorised scoring over an (entry x tag) sparse matrix
+
+    X @ X.T gives tag-overlap counts for every pair sharing a tag, and
+    P @ P.T marks pairs sharing a project. Their union is the candidate
+    set; Jaccard, domain and project terms are then computed for all
+    candidates at once.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    n = len(entries)
+
+    # Entry x tag incidence matrix (duplicate tags counted once)
+    tag_lookup: Dict[str, int] = {}
+    rows, cols = [], []
+    for i, entry in enumerate(entries):
+        for tag in set(entry.get('tags') or []):
+            rows.append(i)
+            cols.append(tag_lookup.setdefault(tag, len(tag_lookup)))
+    tags = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(n, max(len(tag_lookup), 1))
+    )
+    tag_counts = np.asarray(tags.sum(axis=1)).ravel()
+
+    projects = _codes([entry.get('project') for entry in entries])
+    domains = _codes([entry.get('domain') for entry in entries])
+    owners = _codes([entry.get('owner') for entry in entries])
+    shared_code = next((owners[i] for i, e in enumerate(entries) if e.get('owner') == 'shared'), -2)
+
+    overlap = (tags @ tags.T).tocsr()
+    project_pairs = _one_hot(projects)
+    candidates = sparse.triu(overlap + project_pairs @ project_pairs.T, k=1).tocoo()
+
+    i, j = candidates.row, candidates.col
+    if len(i) == 0:
+        return []
+
+    # Overlap counts at candidate positions (0 for project-only pairs)
+    inter = np.asarray(overlap[i, j]).ravel().astype(np.float64)
+    union = tag_counts[i] + tag_counts[j] - inter
+    has_tags = (tag_counts[i] > 0) & (tag_counts[j] > 0) & (union > 0)
+    jaccard = np.divide(inter, union, out=np.zeros_like(inter), where=has_tags)
+
+    # Same accumulation order as entry_similarity() so scores match exactly
+    score = np.zeros(len(i))
+    score += DOMAIN_WEIGHT * ((domains[i] >= 0) & (domains[i] == domains[j]))
+    score += np.where(has_tags, TAG_WEIGHT * jaccard, 0.0)
+    score += PROJECT_WEIGHT * ((projects[i] >= 0) & (projects[i] == projects[j]))
+
+    linkable = (owners[i] == owners[j]) | (owners[i] == shared_code) | (owners[j] == shared_code)
+    keep = np.nonzero((score > threshold) & linkable)[0]
+
+    ids = [entry['id'] for entry in entries]
+    return [(ids[i[k]], ids[j[k]], float(score[k])) for k in keep]
+
+
+def analyze_graph(graph: 'nx.Graph', previous_pagerank: Dict[str, float] = None) -> Dict:
+    """
+    PageRank, communities and connected components for one owner's graph
+
+    previous_pagerank warm-starts the power iteration, so a refresh after a
+    few edits converges in a handful of iterations.
+    """
+    import networkx as nx
+
+    start = time.perf_counter()
+    graph = graph.to_undirected() if graph.is_directed() else graph
+
+    pagerank: Dict[str, float] = {}
+    communities: List[List[str]] = []
+    components: List[List[str]] = []
+
+    if graph.number_of_nodes():
+        nstart = None
+        if previous_pagerank:
+            default = 1.0 / graph.number_of_nodes()
+            nstart = {node: previous_pagerank.get(node, default) for node in graph}
+        pagerank = nx.pagerank(graph, weight='weight', nstart=nstart)
+
+        communities = [
+            sorted(community) for community in
+            nx.community.louvain_communities(graph, weight='weight', seed=COMMUNITY_SEED)
+        ]
+        communities.sort(key=len, reverse=True)
+
+        components = [sorted(component) for component in nx.connected_components(graph)]
+        components.sort(key=len, reverse=True)
+
+    return {
+        'nodes': graph.number_of_nodes(),
+        'edges': graph.number_of_edges(),
+        'pagerank': pagerank,
+        'communities': communities,
+        'components': components,
+        'computed_at': datetime.now().isoformat(),
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 3)
+    }
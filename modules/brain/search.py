@@ -0,0 +1,202 @@
+"""
+Hybrid retrieval helpers for The Brain
+BM25 keyword ranking (SQLite FTS5), vector recall (Qdrant), reciprocal-rank
+fusion and a write-aware result cache
+"""
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# Rank-damping constant from Cormack et al. (2009); 60 is the usual default
+RRF_K = 60
+
+# BM25 column weights for knowledge_fts(title, content, tags)
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Markers wrapped around matched terms in snippets/highlights
+HIGHLIGHT_OPEN = '<mark>'
+HIGHLIGHT_CLOSE = '</mark>'
+SNIPPET_TOKENS = 16
+
+# Matches ranked per keyword query: a term or prefix found in more entries
+# than this is ranked over its newest KEYWORD_CANDIDATES matches only, so a
+# near-universal term costs the same as a rare one
+KEYWORD_CANDIDATES = 2000
+
+# Result cache: seconds an entry lives, and entries kept per owner (LRU)
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_SIZE = 256
+
+_TOKEN_RE = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+
+def build_match_query(query: str, prefix: bool = False) -> Optional[str]:
+    """
+    Turn free user text into a safe FTS5 MATCH expression.
+
+    Every word is quoted so FTS5 operators (AND, NEAR, column filters, ...)
+    typed by the user are treated as plain terms. Terms are implicitly ANDed.
+    A trailing '*' on a word makes it a prefix term ("pyth*" matches python);
+    prefix=True does the same for the last word (search-as-you-type).
+
+    Returns None if the query has no searchable terms.
+    """
+    tokens = _TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+
+    terms = []
+    for i, (word, star) in enumerate(tokens):
+        is_prefix = bool(star) or (prefix and i == len(tokens) - 1)
+        terms.append(f'"{word}"*' if is_prefix else f'"{word}"')
+    return ' '.join(terms)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K,
+                           weights: Sequence[float] = None) -> List[Tuple[str, float]]:
+    """
+    Merge several ranked id lists with reciprocal-rank fusion.
+
+    score(d) = sum_i weight_i / (k + rank_i(d))
+
+    Only ranks are used, so BM25 and cosine scores never need to be
+    normalised against each other.
+
+    Returns (id, score) pairs, best first.
+    """
+    scores: Dict[str, float] = {}
+    for i, ranking in enumerate(rankings):
+        weight = weights[i] if weights else 1.0
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class StageTimer:
+    """Collect per-stage wall-clock timings (milliseconds) for a request"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block; repeated stages accumulate"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0.0) + elapsed, 3)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage timings plus the total since the timer was created"""
+        total = (time.perf_counter() - self._start) * 1000
+        return {**self.timings, 'total': round(total, 3)}
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query (cache key)"""
+    return ' '.join(query.lower().split())
+
+
+class SearchCache:
+    """
+    Per-owner LRU cache of search results with a TTL
+
+    Every owner has a generation counter; writes bump it (a write to a
+    'shared' entry bumps every owner's view). A cached result is served
+    only while the generations it was computed under are still current,
+    so a write is visible to the very next search.
+    """
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, max_entries: int = SEARCH_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, OrderedDict] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.stale = self.expired = self.evictions = 0
+
+    @staticmethod
+    def key(query: str, filters: Dict) -> str:
+        """Cache key for a normalised query plus its filters"""
+        return json.dumps([normalize_query(query), filters], sort_keys=True, default=str)
+
+    def _generation(self, owner: str) -> Tuple[int, int]:
+        """Generations an owner's results depend on (own entries, shared entries)"""
+        return self._generations.get(owner, 0), self._generations.get('shared', 0)
+
+    def get(self, owner: str, key: str) -> Optional[Any]:
+        """Cached result, or None on a miss, expiry or intervening write"""
+        with self._lock:
+            entries = self._entries.get(owner)
+            item = entries.get(key) if entries else None
+            if item is None:
+                self.misses += 1
+                return None
+
+            generation, expires_at, value = item
+            if generation != self._generation(owner) or expires_at < time.monotonic():
+                del entries[key]
+                if generation != self._generation(owner):
+                    self.stale += 1
+                else:
+                    self.expired += 1
+                self.misses += 1
+                return None
+
+            entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, owner: str, key: str, value: Any, generation: Tuple[int, int] = None):
+        """
+        Store a result
+
+        Pass the generation read before computing the result (see
+        generation()) so a write that landed mid-search isn't masked.
+        """
+        with self._lock:
+            entries = self._entries.setdefault(owner, OrderedDict())
+            entries[key] = (generation or self._generation(owner), time.monotonic() + self.ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def generation(self, owner: str) -> Tuple[int, int]:
+        with self._lock:
+            return self._generation(owner)
+
+    def invalidate(self, owner: str):
+        """Bump the owner's generation (every owner's, for 'shared')"""
+        with self._lock:
+            self._generations[owner] = self._generations.get(owner, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters, hit rate and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': sum(len(entries) for entries in self._entries.values()),
+                'owners': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'max_entries_per_owner': self.max_entries
+            }
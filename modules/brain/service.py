@@ -3,20 +3,51 @@ Module 2: The Brain (Knowledge Management)
 Knowledge capture, organization, Anki integration, vector embeddings
 """
 import json
-import re
 import asyncio
+import logging
 import os
+import sqlite3
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Any
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup as bs4
-import networkx as nx
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+
+# Heavy dependencies (qdrant_client, networkx, requests, bs4, the encoder) are
+# imported on first use so importing the API and building BrainModule stay cheap
+if TYPE_CHECKING:
+    import networkx as nx
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Filter
 
 from core.database import get_db, generate_uuid, log_audit
+from .backup import (
+    DERIVED_COLUMNS, EXPORT_PAGE_SIZE, IMPORT_BATCH_SIZE, LOCAL_COLUMNS,
+    decode_vector, entry_record, header, read_ndjson
+)
+from .anki import (
+    ANKI_BATCH_SIZE, AnkiConnect, AnkiConnectError, build_note, extract_card_content, update_actions
+)
+from .clipper import WebClipper
+from .dedup import (
+    DUPLICATE_THRESHOLD, band_keys, entry_text, group_pairs, minhash,
+    pack_signature, similarity, unpack_signature
+)
+from .suggest import SUGGEST_LIMIT, PrefixIndex
+from .embeddings import (
+    CHUNK_OVERFETCH, EMBED_BATCH_SIZE, EMBEDDING_DIM, PAYLOAD_INDEXES,
+    aggregate_chunk_hits, chunk_point_id, chunk_text, load_encoder, mean_vector, warm_up
+)
+from .graph import (
+    EDGE_THRESHOLD, KNN_MIN_SCORE, KNN_NEIGHBORS, RELATED_HOP_DECAY,
+    analyze_graph, can_link, compute_edges, entry_similarity, related_score
+)
+from .search import (
+    BM25_WEIGHTS, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, KEYWORD_CANDIDATES, SNIPPET_TOKENS,
+    SearchCache, StageTimer, build_match_query, reciprocal_rank_fusion
+)
+
+logger = logging.getLogger(__name__)
 
 
 class BrainModule:
@@ -28,37 +59,82 @@ class BrainModule:
     def __init__(self):
         self.db_path = Path(__file__).parent.parent.parent / "data" / "levy.db"
 
-        # Initialize Qdrant client
-        qdrant_host = os.getenv("QDRANT_HOST", "http://127.0.0.1:6333")
-        qdrant_api_key = os.getenv("QDRANT_API_KEY")
-        self.qdrant = QdrantClient(url=qdrant_host, api_key=qdrant_api_key)
+        # Qdrant client (connected lazily, see the qdrant property)
+        self.qdrant_url = os.getenv("QDRANT_HOST", "http://127.0.0.1:6333")
+        self.qdrant_api_key = os.getenv("QDRANT_API_KEY")
+        self._qdrant = None
         self.collection_name = os.getenv("QDRANT_KNOWLEDGE_COLLECTION", "nexus_knowledge")
 
         # Initialize sentence transformer model (lazy loading)
         self._embedding_model = None
 
+        # Web clipping (pooled async HTTP client, created on first fetch)
+        self.clipper = WebClipper()
+
         # Initialize AnkiConnect URL
         self.anki_url = os.getenv("ANKICONNECT_URL", "http://127.0.0.1:8765")
+        self.anki = AnkiConnect(self.anki_url)
+
+        # Per-owner knowledge graphs (loaded from knowledge_edges) and their analytics
+        self.knowledge_graph: Dict[str, 'nx.DiGraph'] = {}
+        self._graph_analytics: Dict[str, Dict] = {}
+        self._graph_dirty = set()
 
-        # Initialize knowledge graph
-        self.knowledge_graph = nx.DiGraph()
+        # Search results and related-entry neighbourhoods per owner,
+        # dropped on the next write they could miss
+        self.search_cache = SearchCache()
+        self.related_cache = SearchCache()
 
-        # Ensure Qdrant collection exists
-        self._ensure_collection_exists()
+        # Per-owner prefix indexes for suggestions (built on first use)
+        self._suggest_indexes: Dict[str, PrefixIndex] = {}
+        self._suggest_lock = threading.Lock()
+
+    @property
+    def qdrant(self) -> 'QdrantClient':
+        """Qdrant client, connected (and the collection ensured) on first use"""
+        if self._qdrant is None:
+            from qdrant_client import QdrantClient
+
+            self._qdrant = QdrantClient(url=self.qdrant_url, api_key=self.qdrant_api_key)
+            self._ensure_collection_exists()
+        return self._qdrant
+
+    @qdrant.setter
+    def qdrant(self, client: 'QdrantClient'):
+        self._qdrant = client
 
     @property
     def embedding_model(self):
-        """Lazy load sentence transformer model"""
+        """Lazy load the sentence encoder (backend from EMBEDDING_BACKEND)"""
         if self._embedding_model is None:
             logger.info("Loading sentence transformer model...")
-            self._embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self._embedding_model = load_encoder()
             logger.info("Sentence transformer model loaded")
         return self._embedding_model
 
+    def warm_up(self) -> Dict:
+        """Load the encoder and run one encode (called from the API lifespan)"""
+        start = time.perf_counter()
+        model = self.embedding_model
+        load_ms = (time.perf_counter() - start) * 1000
+        return {'load_ms': round(load_ms, 1), 'encode_ms': round(warm_up(model), 1)}
+
     # ========== KNOWLEDGE ENTRY CRUD ==========
 
     def create_entry(self, data: Dict, user_id: str) -> Dict:
-        """Create a new knowledge entry"""
+        """
+        Create a new knowledge entry
+
+        Near-duplicates of the new entry are returned under 'duplicates';
+        with data['on_duplicate'] == 'skip' the entry isn't created and the
+        closest existing one is returned instead.
+        """
+        owner = data.get('owner', user_id)
+        signature = minhash(entry_text(data))
+        duplicates = self._find_similar(signature, owner) if signature else []
+        if duplicates and data.get('on_duplicate') == 'skip':
+            return {'id': duplicates[0]['id'], 'status': 'duplicate', 'duplicates': duplicates}
+
         entry_id = f"knl_{generate_uuid()}"
 
         with get_db() as conn:
@@ -69,7 +145,7 @@ class BrainModule:
                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                 (
                     entry_id,
-                    data.get('owner', user_id),
+                    owner,
                     user_id,
                     data['title'],
                     data['content'],
@@ -87,10 +163,22 @@ class BrainModule:
         log_audit(user_id, 'brain', 'create', 'knowledge_entry', entry_id,
                  {'title': data['title'], 'domain': data.get('domain')})
 
+        self.search_cache.invalidate(owner)
+
+        self._index_suggestions([entry_id])
+        if signature:
+            self._store_signatures({entry_id: signature})
+
+        # Link into the knowledge graph (only this node's edges)
+        self._update_entry_edges(entry_id)
+
         # Auto-generate embedding (async)
         self._queue_embedding_generation(entry_id)
 
-        return {'id': entry_id, 'status': 'created'}
+        result = {'id': entry_id, 'status': 'created'}
+        if duplicates:
+            result['duplicates'] = duplicates
+        return result
 
     def get_entries(self, user_id: str, include_shared: bool = True,
                     domain: str = None, project: str = None,
@@ -150,7 +238,7 @@ class BrainModule:
                 entry['tags'] = json.loads(entry['tags'])
 
             # Get related entries (knowledge graph)
-            entry['related'] = self._get_related_entries(entry_id, user_id)
+            entry['related'] = self._cached_related(entry_id, user_id)
 
             return entry
 
@@ -174,10 +262,21 @@ class BrainModule:
         params.append(entry_id)
 
         with get_db() as conn:
-            conn.execute(
-                f"UPDATE knowledge_entries SET {', '.join(update_fields)} WHERE id = ?",
+            updated = conn.execute(
+                f"UPDATE knowledge_entries SET {', '.join(update_fields)} WHERE id = ? RETURNING owner",
                 params
-            )
+            ).fetchone()
+
+        if updated:
+            self.search_cache.invalidate(updated['owner'])
+            self.related_cache.invalidate(updated['owner'])
+            if any(field in data for field in ('title', 'project', 'tags')):
+                self._index_suggestions([entry_id])
+            if 'title' in data or 'content' in data:
+                self._index_signatures([entry_id])
+
+        if any(field in data for field in ('domain', 'project', 'tags')):
+            self._update_entry_edges(entry_id)
 
         log_audit(user_id, 'brain', 'update', 'knowledge_entry', entry_id, data)
 
@@ -205,6 +304,11 @@ class BrainModule:
 
         log_audit(user_id, 'brain', 'delete', 'knowledge_entry', entry_id, {})
 
+        # Edges are dropped by trigger; cached analytics and results are now stale
+        self._invalidate_graph(entry['owner'])
+        self.search_cache.invalidate(entry['owner'])
+        self._unindex_suggestion(entry_id, entry['owner'])
+
         # Delete from Qdrant (if embedding exists)
         self._delete_embedding(entry_id)
 
@@ -213,7 +317,9 @@ class BrainModule:
     # ========== EMBEDDINGS (Qdrant) ==========
 
     def _ensure_collection_exists(self):
-        """Ensure Qdrant collection exists"""
+        """Ensure the Qdrant collection and its payload indexes exist (idempotent)"""
+        from qdrant_client.models import Distance, PayloadSchemaType, VectorParams
+
         try:
             collections = self.qdrant.get_collections().collections
             collection_names = [c.name for c in collections]
@@ -222,8 +328,20 @@ class BrainModule:
                 logger.info(f"Creating Qdrant collection: {self.collection_name}")
                 self.qdrant.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=384, distance=Distance.COSINE)
+                    vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE)
                 )
+
+            # Chunks are looked up by parent and filtered by owner; checked on every
+            # startup so collections created before the indexes existed get them too
+            indexed = self.qdrant.get_collection(self.collection_name).payload_schema or {}
+            for field in PAYLOAD_INDEXES:
+                if field not in indexed:
+                    logger.info(f"Creating Qdrant payload index: {self.collection_name}.{field}")
+                    self.qdrant.create_payload_index(
+                        collection_name=self.collection_name,
+                        field_name=field,
+                        field_schema=PayloadSchemaType.KEYWORD
+                    )
         except Exception as e:
             logger.error(f"Error ensuring Qdrant collection exists: {e}")
 
@@ -237,26 +355,93 @@ class BrainModule:
             logger.error(f"Error generating embedding for {entry_id}: {e}")
 
     def generate_embedding(self, entry_id: str) -> Dict:
-        """Generate vector embedding for a knowledge entry"""
+        """Generate chunk embeddings for a knowledge entry"""
         entry = self.get_entry(entry_id, 'system')  # System user
 
         if not entry:
             return {'error': 'Entry not found'}
 
-        # Generate embedding with sentence-transformers
-        embedding = self._generate_embedding_vector(entry['content'])
+        result = self.generate_embeddings([entry_id])
+
+        return {
+            'entry_id': entry_id,
+            'qdrant_id': entry_id,
+            'chunks': result['chunks'],
+            'encode_ms': result['encode_ms'],
+            'status': 'embedded'
+        }
+
+    def generate_embeddings(self, entry_ids: List[str], batch_size: int = EMBED_BATCH_SIZE) -> Dict:
+        """
+        Chunk, encode and store embeddings for many entries
 
-        # Store in Qdrant
-        qdrant_id = self._store_embedding(entry_id, embedding, entry)
+        All chunks of all entries go through the model in batch_size
+        batches; each chunk becomes one Qdrant point with the entry as
+        parent_id. Returns chunk counts and encode timings per entry.
+        """
+        from qdrant_client.models import PointStruct
 
-        # Update database
+        placeholders = ','.join(['?' for _ in entry_ids])
         with get_db() as conn:
-            conn.execute(
-                "UPDATE knowledge_entries SET qdrant_id = ?, embedding_synced = 1 WHERE id = ?",
-                (qdrant_id, entry_id)
+            entries = [dict(row) for row in conn.execute(
+                f"SELECT * FROM knowledge_entries WHERE id IN ({placeholders})",
+                entry_ids
+            )]
+
+        chunk_texts, chunk_refs = [], []
+        for entry in entries:
+            for index, text in enumerate(chunk_text(entry['content'], title=entry['title'])):
+                chunk_texts.append(text)
+                chunk_refs.append((entry, index))
+
+        start = time.perf_counter()
+        vectors = self._encode_batch(chunk_texts, batch_size=batch_size)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        points = [
+            PointStruct(
+                id=chunk_point_id(entry['id'], index),
+                vector=vector,
+                payload=self._chunk_payload(entry, index)
             )
+            for (entry, index), vector in zip(chunk_refs, vectors)
+        ]
+
+        # Old chunks first: an edited entry may now have fewer of them
+        for entry in entries:
+            self._delete_embedding(entry['id'])
+        for i in range(0, len(points), batch_size):
+            self.qdrant.upsert(collection_name=self.collection_name, points=points[i:i + batch_size])
 
-        return {'entry_id': entry_id, 'qdrant_id': qdrant_id, 'status': 'embedded'}
+        chunk_counts = {}
+        for entry, _ in chunk_refs:
+            chunk_counts[entry['id']] = chunk_counts.get(entry['id'], 0) + 1
+
+        with get_db() as conn:
+            conn.executemany(
+                """UPDATE knowledge_entries
+                   SET qdrant_id = ?, embedding_synced = 1, embedding_chunks = ?
+                   WHERE id = ?""",
+                [(entry['id'], chunk_counts.get(entry['id'], 0), entry['id']) for entry in entries]
+            )
+        for owner in {entry['owner'] for entry in entries}:
+            self.search_cache.invalidate(owner)
+
+        # Link to nearest neighbours in embedding space
+        try:
+            self._update_embedding_edges([entry['id'] for entry in entries])
+        except Exception as e:
+            logger.error(f"Error updating embedding edges: {e}")
+
+        logger.info(f"Embedded {len(entries)} entries as {len(points)} chunks in {encode_ms:.1f} ms")
+
+        return {
+            'entries': len(entries),
+            'chunks': len(points),
+            'encode_ms': round(encode_ms, 3),
+            'chunks_per_entry': round(len(points) / len(entries), 3) if entries else 0.0,
+            'ms_per_entry': round(encode_ms / len(entries), 3) if entries else 0.0
+        }
 
     def _generate_embedding_vector(self, text: str) -> List[float]:
         """Generate embedding vector from text using sentence-transformers"""
@@ -267,40 +452,72 @@ class BrainModule:
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             # Return zero vector as fallback
-            return [0.0] * 384
+            return [0.0] * EMBEDDING_DIM
+
+    def _chunk_payload(self, entry: Dict, index: int) -> Dict:
+        """Qdrant payload for one chunk of an entry"""
+        return {
+            'parent_id': entry['id'],
+            'chunk_index': index,
+            'title': entry['title'],
+            'domain': entry.get('domain'),
+            'project': entry.get('project'),
+            'owner': entry['owner'],
+            'content_type': entry.get('content_type'),
+            'timestamp': entry.get('timestamp')
+        }
+
+    def _encode_batch(self, texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> List[List[float]]:
+        """Encode many passages in batched model calls"""
+        if not texts:
+            return []
+        embeddings = self.embedding_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        return embeddings.tolist()
 
-    def _store_embedding(self, entry_id: str, embedding: List[float], entry: Dict) -> str:
-        """Store embedding in Qdrant"""
-        try:
-            point = PointStruct(
-                id=entry_id,
-                vector=embedding,
-                payload={
-                    'title': entry['title'],
-                    'domain': entry.get('domain'),
-                    'owner': entry['owner'],
-                    'content_type': entry.get('content_type'),
-                    'timestamp': entry.get('timestamp')
-                }
-            )
+    def _parent_filter(self, entry_ids: List[str]) -> 'Filter':
+        """Qdrant filter matching every chunk of the given entries"""
+        from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+        return Filter(must=[FieldCondition(key='parent_id', match=MatchAny(any=list(entry_ids)))])
 
-            self.qdrant.upsert(
+    def _chunk_vectors(self, entry_ids: List[str]) -> Dict[str, List[Dict]]:
+        """Stored chunk vectors per entry: {entry_id: [{'index', 'vector'}, ...]}"""
+        chunks: Dict[str, List[Dict]] = {}
+        offset = None
+        while True:
+            points, offset = self.qdrant.scroll(
                 collection_name=self.collection_name,
-                points=[point]
+                scroll_filter=self._parent_filter(entry_ids),
+                limit=256,
+                offset=offset,
+                with_payload=['parent_id', 'chunk_index'],
+                with_vectors=True
             )
+            for point in points:
+                chunks.setdefault(point.payload['parent_id'], []).append(
+                    {'index': point.payload.get('chunk_index', 0), 'vector': point.vector}
+                )
+            if offset is None:
+                break
+        return chunks
 
-            logger.info(f"Stored embedding for {entry_id} in Qdrant")
-            return entry_id
-        except Exception as e:
-            logger.error(f"Error storing embedding in Qdrant: {e}")
-            return entry_id
+    def _entry_vectors(self, entry_ids: List[str]) -> Dict[str, List[float]]:
+        """Entry-level vectors: the normalised centroid of each entry's chunks"""
+        return {
+            entry_id: mean_vector([chunk['vector'] for chunk in chunks])
+            for entry_id, chunks in self._chunk_vectors(entry_ids).items()
+        }
 
     def _delete_embedding(self, entry_id: str):
-        """Delete embedding from Qdrant"""
+        """Delete an entry's chunk embeddings from Qdrant"""
+        from qdrant_client.models import FieldCondition, Filter, FilterSelector, MatchValue
+
         try:
             self.qdrant.delete(
                 collection_name=self.collection_name,
-                points_selector=entry_id
+                points_selector=FilterSelector(filter=Filter(
+                    must=[FieldCondition(key='parent_id', match=MatchValue(value=entry_id))]
+                ))
             )
             logger.info(f"Deleted embedding for {entry_id} from Qdrant")
         except Exception as e:
@@ -340,265 +557,723 @@ class BrainModule:
 
     def _extract_anki_content(self, content: str) -> tuple:
         """Extract front/back content for Anki card"""
-        # Look for Q: / A: pattern
-        qa_match = re.search(r'Q:\s*(.+?)\s*\n\s*A:\s*(.+)', content, re.DOTALL)
-
-        if qa_match:
-            front = qa_match.group(1).strip()
-            back = qa_match.group(2).strip()
-        else:
-            # Fallback: first paragraph = front, rest = back
-            paragraphs = content.split('\n\n')
-            front = paragraphs[0].strip()[:200]  # Limit length
-            back = '\n\n'.join(paragraphs[1:]).strip()
-
-        return front, back
+        return extract_card_content(content)
 
     def _create_anki_card_via_api(self, card_data: Dict) -> str:
         """Create card via AnkiConnect API"""
         try:
-            response = requests.post(
-                self.anki_url,
-                json={
-                    'action': 'addNote',
-                    'version': 6,
-                    'params': {
-                        'note': {
-                            'deckName': card_data['deck'],
-                            'modelName': 'Basic',
-                            'fields': {
-                                'Front': card_data['front'],
-                                'Back': card_data['back']
-                            },
-                            'tags': card_data['tags']
-                        }
-                    }
+            note_id = self.anki.invoke('addNote', note={
+                'deckName': card_data['deck'],
+                'modelName': 'Basic',
+                'fields': {
+                    'Front': card_data['front'],
+                    'Back': card_data['back']
                 },
-                timeout=10
-            )
+                'tags': card_data['tags']
+            })
 
-            result = response.json()
-
-            if result.get('error'):
-                logger.error(f"AnkiConnect error: {result['error']}")
-                return None
-
-            logger.info(f"Created Anki card: {result['result']}")
-            return result['result']
+            logger.info(f"Created Anki card: {note_id}")
+            return note_id
 
+        except AnkiConnectError as e:
+            logger.error(f"AnkiConnect error: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error creating Anki card: {e}")
             return None
 
-    # ========== WEB CLIPPING ==========
+    def sync_anki_cards(self, user_id: str, batch_size: int = ANKI_BATCH_SIZE) -> Dict:
+        """
+        Push SRS-eligible entries to Anki in batches
+
+        Incremental: only entries changed since the user's last run (plus any
+        still without a card) are sent. New entries go out as addNotes
+        actions; edited ones get updateNoteFields plus changeDeck/addTags/
+        removeTags to match the entry's domain and tags (current tags and
+        cards come from one notesInfo call), all inside `multi` requests over
+        one session. An entry whose note was deleted in Anki is added again
+        as a new note. Card ids and the new watermark are written in a single
+        transaction.
+        """
+        with get_db() as conn:
+            state = conn.execute(
+                "SELECT last_synced_at FROM anki_sync_state WHERE owner = ?",
+                (user_id,)
+            ).fetchone()
+            since = state['last_synced_at'] if state else None
 
-    def create_web_clip(self, url: str, user_id: str, metadata: Dict = None) -> Dict:
-        """Clip a web page as knowledge entry"""
-        # Extract content from URL
-        content_data = self._extract_web_content(url)
+            # Taken before reading so edits made during the sync are picked up next run
+            started_at = conn.execute("SELECT strftime('%Y-%m-%d %H:%M:%f', 'now')").fetchone()[0]
 
-        if not content_data:
-            return {'error': 'Failed to extract content from URL'}
+            query = """SELECT id, content, domain, tags, srs_card_id FROM knowledge_entries
+                       WHERE owner IN (?, 'shared') AND is_srs_eligible = 1"""
+            params = [user_id]
+            if since:
+                query += " AND (srs_card_id IS NULL OR updated_at >= ?)"
+                params.append(since)
 
-        # Create entry
-        entry_id = f"knl_{generate_uuid()}"
+            entries = []
+            for row in conn.execute(query, params):
+                entry = dict(row)
+                entry['tags'] = json.loads(entry['tags']) if entry['tags'] else []
+                entries.append(entry)
+
+        new_entries = [e for e in entries if not e['srs_card_id']]
+        changed_entries = [e for e in entries if e['srs_card_id']]
+
+        requests_before = self.anki.requests_made
+        try:
+            infos = self.anki.invoke(
+                'notesInfo', notes=[int(e['srs_card_id']) for e in changed_entries]
+            ) if changed_entries else []
+
+            # Notes deleted in Anki come back empty: add them again instead of updating
+            missing = [e for e, info in zip(changed_entries, infos) if not info]
+            changed_entries = [e for e, info in zip(changed_entries, infos) if info]
+            infos = [info for info in infos if info]
+            new_entries += missing
+
+            # One addNotes action per batch of new notes; field, deck and tag updates for edits
+            new_batches = [new_entries[i:i + batch_size] for i in range(0, len(new_entries), batch_size)]
+            edits, affected = update_actions(changed_entries, infos)
+            actions = [
+                {'action': 'addNotes', 'params': {'notes': [build_note(e) for e in batch]}}
+                for batch in new_batches
+            ] + edits
+
+            responses = self.anki.multi(actions, batch_size=batch_size) if actions else []
+        except Exception as e:
+            logger.error(f"Anki sync failed: {e}")
+            return {'error': f"AnkiConnect unavailable: {e}"}
+
+        card_ids, stale_ids, failed = [], [], 0
+        for batch, response in zip(new_batches, responses):
+            note_ids = response['result'] if not response['error'] else [None] * len(batch)
+            for entry, note_id in zip(batch, note_ids):
+                if note_id:
+                    card_ids.append((str(note_id), entry['id']))
+                else:
+                    failed += 1
+                    if entry['srs_card_id']:
+                        stale_ids.append((entry['id'],))
+
+        # An edited entry counts as updated only if all of its actions succeeded
+        not_updated = {
+            entry_id
+            for entry_ids, response in zip(affected, responses[len(new_batches):])
+            if response['error']
+            for entry_id in entry_ids
+        }
+        updated = len(changed_entries) - len(not_updated)
+        failed += len(not_updated)
 
         with get_db() as conn:
+            conn.executemany(
+                "UPDATE knowledge_entries SET srs_card_id = ? WHERE id = ?",
+                card_ids
+            )
+            # A deleted note whose re-add failed is retried as new next run
+            conn.executemany(
+                "UPDATE knowledge_entries SET srs_card_id = NULL WHERE id = ?",
+                stale_ids
+            )
             conn.execute(
-                """INSERT INTO knowledge_entries
-                   (id, owner, created_by, title, content, content_type, source_url,
-                    domain, project, tags)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    entry_id,
-                    metadata.get('owner', user_id) if metadata else user_id,
-                    user_id,
-                    metadata.get('title') or content_data.get('title', url),
-                    content_data['content'],
-                    'web_clip',
-                    url,
-                    metadata.get('domain'),
-                    metadata.get('project'),
-                    json.dumps(metadata.get('tags', [])) if metadata else '[]'
-                )
+                """INSERT INTO anki_sync_state (owner, last_synced_at, notes_added, notes_updated)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(owner) DO UPDATE SET
+                       last_synced_at = excluded.last_synced_at,
+                       notes_added = notes_added + excluded.notes_added,
+                       notes_updated = notes_updated + excluded.notes_updated""",
+                (user_id, started_at, len(card_ids), updated)
             )
 
-        log_audit(user_id, 'brain', 'create', 'web_clip', entry_id,
-                 {'url': url, 'title': content_data.get('title')})
+        result = {
+            'status': 'completed',
+            'since': since,
+            'added': len(card_ids),
+            'updated': updated,
+            'failed': failed,
+            'requests': self.anki.requests_made - requests_before
+        }
+
+        log_audit(user_id, 'brain', 'sync', 'anki_cards', None, result)
+
+        return result
+
+    # ========== WEB CLIPPING ==========
+
+    async def create_web_clip(self, url: str, user_id: str, metadata: Dict = None) -> Dict:
+        """Clip a web page as knowledge entry"""
+        return (await self.create_web_clips([{**(metadata or {}), 'url': url}], user_id))[0]
+
+    async def create_web_clips(self, clips: List[Dict], user_id: str) -> List[Dict]:
+        """
+        Clip many web pages concurrently
+
+        Each clip is a dict with url and optional owner, title, domain,
+        project and tags. Pages are fetched through the pooled clipper;
+        successful ones are saved in one transaction. Results are in input
+        order, each either created or carrying an error.
+        """
+        pages = await self.clipper.fetch_many([clip['url'] for clip in clips])
+        return await asyncio.to_thread(self._save_web_clips, clips, pages, user_id)
+
+    def _save_web_clips(self, clips: List[Dict], pages: List[Dict], user_id: str) -> List[Dict]:
+        """
+        Insert fetched pages as web_clip entries
+
+        Pages near-duplicating an existing entry (or an earlier page in the
+        batch) carry 'duplicates'; clips with on_duplicate='skip' aren't saved.
+        """
+        results, rows = [], []
+        signatures: Dict[str, List[int]] = {}
+        pending: List[Dict] = []
+
+        for clip, page in zip(clips, pages):
+            if 'error' in page:
+                results.append({
+                    'url': clip['url'],
+                    'error': 'Failed to extract content from URL',
+                    'reason': page['error']
+                })
+                continue
+
+            owner = clip.get('owner', user_id)
+            signature = minhash(page['content'])
+            duplicates = []
+            if signature:
+                duplicates = self._find_similar(signature, owner) + [
+                    {**other, 'similarity': round(similarity(signature, signatures[other['id']]), 3)}
+                    for other in pending
+                    if can_link(owner, other['owner'])
+                    and similarity(signature, signatures[other['id']]) >= DUPLICATE_THRESHOLD
+                ]
+            if duplicates and clip.get('on_duplicate') == 'skip':
+                results.append({
+                    'url': clip['url'],
+                    'id': duplicates[0]['id'],
+                    'status': 'duplicate',
+                    'duplicates': duplicates
+                })
+                continue
+
+            entry_id = f"knl_{generate_uuid()}"
+            if signature:
+                signatures[entry_id] = signature
+                pending.append({'id': entry_id, 'title': clip.get('title') or page['title'], 'owner': owner})
+
+            rows.append((
+                entry_id,
+                owner,
+                user_id,
+                clip.get('title') or page['title'],
+                page['content'],
+                'web_clip',
+                clip['url'],
+                clip.get('domain'),
+                clip.get('project'),
+                json.dumps(clip.get('tags', []))
+            ))
+            results.append({
+                'url': clip['url'],
+                'id': entry_id,
+                'status': 'created',
+                'title': page['title'],
+                'cached': page['cached']
+            })
+            if duplicates:
+                results[-1]['duplicates'] = duplicates
+
+        if rows:
+            with get_db() as conn:
+                conn.executemany(
+                    """INSERT INTO knowledge_entries
+                       (id, owner, created_by, title, content, content_type, source_url,
+                        domain, project, tags)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    rows
+                )
+            for owner in {row[1] for row in rows}:
+                self.search_cache.invalidate(owner)
+            self._index_suggestions([row[0] for row in rows])
+            self._store_signatures(signatures)
 
-        return {'id': entry_id, 'status': 'created', 'title': content_data.get('title')}
+        for result in results:
+            if result.get('status') == 'created':
+                log_audit(user_id, 'brain', 'create', 'web_clip', result['id'],
+                          {'url': result['url'], 'title': result['title']})
+                self._update_entry_edges(result['id'])
 
-    def _extract_web_content(self, url: str) -> Optional[Dict]:
-        """Extract content from web page using beautifulsoup4"""
+        return results
+
+    async def _extract_web_content(self, url: str) -> Optional[Dict]:
+        """Fetch and extract a single page (title, content) or None"""
+        page = await self.clipper.fetch(url)
+        if 'error' in page:
+            return None
+        return {'title': page['title'], 'content': page['content']}
+
+    # ========== KNOWLEDGE GRAPH ==========
+
+    def get_related(self, entry_id: str, user_id: str, limit: int = 10) -> Optional[List[Dict]]:
+        """Ranked related entries, or None if the entry doesn't exist or isn't visible"""
+        with get_db() as conn:
+            row = conn.execute("SELECT owner FROM knowledge_entries WHERE id = ?", (entry_id,)).fetchone()
+        if not row or row['owner'] not in (user_id, 'shared'):
+            return None
+        return self._cached_related(entry_id, user_id, limit)
+
+    def _cached_related(self, entry_id: str, user_id: str, limit: int = 10) -> List[Dict]:
+        """Related entries through the per-owner neighbourhood cache"""
+        key = f"{entry_id}:{limit}"
+        related = self.related_cache.get(user_id, key)
+        if related is None:
+            generation = self.related_cache.generation(user_id)
+            related = self._get_related_entries(entry_id, user_id, limit=limit)
+            self.related_cache.put(user_id, key, related, generation)
+        return [dict(entry) for entry in related]
+
+    def _get_related_entries(self, entry_id: str, user_id: str, max_depth: int = 2,
+                             limit: int = 10) -> List[Dict]:
+        """
+        Related knowledge entries, best first
+
+        Neighbours are found by walking persisted knowledge_edges (one
+        indexed lookup per hop). Each gets a graph weight (the edge weight,
+        or the decayed product along the strongest path for further hops)
+        and an embedding similarity (the embedding edge weight, else the
+        cosine of the entries' centroid vectors when both are embedded);
+        see graph.related_score. Entry rows are fetched in one IN query.
+        """
         try:
-            # Set user agent to avoid blocking
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
+            graph_weight: Dict[str, float] = {}
+            embedding_similarity: Dict[str, float] = {}
+            hops: Dict[str, int] = {}
+            frontier = {entry_id: 1.0}
 
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
+            with get_db() as conn:
+                for depth in range(1, max_depth + 1):
+                    if not frontier:
+                        break
+
+                    placeholders = ','.join(['?' for _ in frontier])
+                    rows = conn.execute(
+                        f"""SELECT e.src_id, e.dst_id, e.edge_type, e.weight
+                            FROM knowledge_edges e
+                            JOIN knowledge_entries k ON k.id = e.dst_id
+                            WHERE e.src_id IN ({placeholders})
+                              AND k.owner IN (?, 'shared')""",
+                        list(frontier) + [user_id]
+                    ).fetchall()
+
+                    reached: Dict[str, float] = {}
+                    for row in rows:
+                        dst = row['dst_id']
+                        if dst == entry_id or hops.get(dst, depth) < depth:
+                            continue
+                        if depth == 1 and row['edge_type'] == 'embedding':
+                            embedding_similarity[dst] = row['weight']
+                        decay = 1.0 if depth == 1 else RELATED_HOP_DECAY
+                        strength = frontier[row['src_id']] * row['weight'] * decay
+                        reached[dst] = max(reached.get(dst, 0.0), strength)
+
+                    for dst, strength in reached.items():
+                        hops[dst] = depth
+                        graph_weight[dst] = strength
+                    frontier = reached
+
+                if not graph_weight:
+                    return []
+
+                # Best graph candidates only; similarity refines their order
+                candidates = sorted(graph_weight, key=graph_weight.get, reverse=True)[:limit * 3]
+                placeholders = ','.join(['?' for _ in candidates])
+                rows = conn.execute(
+                    f"SELECT * FROM knowledge_entries WHERE id IN ({placeholders})",
+                    candidates
+                ).fetchall()
+                source = conn.execute(
+                    "SELECT embedding_synced FROM knowledge_entries WHERE id = ?", (entry_id,)
+                ).fetchone()
+
+            entries_map = {}
+            for row in rows:
+                entry = dict(row)
+                if entry.get('tags'):
+                    entry['tags'] = json.loads(entry['tags'])
+                entries_map[entry['id']] = entry
+
+            missing = [c for c in candidates if c not in embedding_similarity
+                       and entries_map.get(c, {}).get('embedding_synced')]
+            if missing and source and source['embedding_synced']:
+                try:
+                    vectors = self._entry_vectors([entry_id] + missing)
+                    if entry_id in vectors:
+                        for candidate in missing:
+                            if candidate in vectors:
+                                embedding_similarity[candidate] = sum(
+                                    x * y for x, y in zip(vectors[entry_id], vectors[candidate])
+                                )
+                except Exception as e:
+                    logger.warning(f"Embedding similarity unavailable for related entries: {e}")
 
-            soup = bs4(response.text, 'html.parser')
+            related = []
+            for candidate in candidates:
+                if candidate not in entries_map:
+                    continue
+                similarity = embedding_similarity.get(candidate, 0.0)
+                related.append({
+                    **entries_map[candidate],
+                    'score': round(related_score(graph_weight[candidate], similarity), 4),
+                    'graph_weight': round(graph_weight[candidate], 4),
+                    'embedding_similarity': round(similarity, 4),
+                    'hops': hops[candidate]
+                })
+
+            related.sort(key=lambda entry: entry['score'], reverse=True)
+            return related[:limit]
 
-            # Extract title
-            title_tag = soup.find('title')
-            title = title_tag.text if title_tag else url
+        except Exception as e:
+            logger.error(f"Error getting related entries: {e}")
+            return []
 
-            # Extract main content (try common content selectors first)
-            content = ''
+    def _update_entry_edges(self, entry_id: str) -> int:
+        """
+        Recompute the metadata edges of a single entry
 
-            # Try common article/content containers
-            for selector in ['article', 'main', '[role="main"]', '.content', '.article']:
-                container = soup.select_one(selector)
-                if container:
-                    break
+        Candidates are only entries sharing a tag (knowledge_tags) or the
+        project: domain alone scores 0.3, which never clears EDGE_THRESHOLD.
+        """
+        with get_db() as conn:
+            row = conn.execute(
+                "SELECT id, owner, domain, project, tags FROM knowledge_entries WHERE id = ?",
+                (entry_id,)
+            ).fetchone()
 
-            if not container:
-                # Fallback to body
-                container = soup.find('body')
+            conn.execute(
+                """DELETE FROM knowledge_edges
+                   WHERE (src_id = ? OR dst_id = ?) AND edge_type = 'metadata'""",
+                (entry_id, entry_id)
+            )
 
-            if container:
-                # Extract text from paragraphs, headings, and lists
-                for tag in container.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'li']):
-                    text = tag.get_text(strip=True)
-                    if text:
-                        content += text + '\n'
+            if not row:
+                return 0
 
-            content = content.strip()
+            entry = dict(row)
+            entry['tags'] = json.loads(entry['tags']) if entry.get('tags') else []
+
+            candidate_query = """
+                SELECT id, owner, domain, project, tags FROM knowledge_entries
+                WHERE id != ?
+                  AND ((project IS NOT NULL AND project = ?)
+                       OR id IN (SELECT entry_id FROM knowledge_tags WHERE tag IN ({})))
+            """.format(','.join(['?' for _ in entry['tags']]) or 'NULL')
+            params = [entry_id, entry.get('project')] + entry['tags']
+
+            # Private entries only link within their owner's view; shared ones link to all
+            if entry['owner'] != 'shared':
+                candidate_query += " AND owner IN (?, 'shared')"
+                params.append(entry['owner'])
+
+            edges = []
+            for candidate_row in conn.execute(candidate_query, params):
+                candidate = dict(candidate_row)
+                candidate['tags'] = json.loads(candidate['tags']) if candidate.get('tags') else []
+
+                weight = self._calculate_entry_similarity(entry, candidate)
+                if weight > EDGE_THRESHOLD:
+                    edges.append((entry_id, candidate['id'], weight))
+                    edges.append((candidate['id'], entry_id, weight))
+
+            conn.executemany(
+                """INSERT OR REPLACE INTO knowledge_edges (src_id, dst_id, edge_type, weight)
+                   VALUES (?, ?, 'metadata', ?)""",
+                edges
+            )
 
-            if not content:
-                return None
+        self._invalidate_graph(entry['owner'])
 
-            logger.info(f"Extracted content from {url}: {len(content)} chars")
+        return len(edges) // 2
 
-            return {'title': title, 'content': content}
+    def _owner_filter(self, owner: str) -> Optional['Filter']:
+        """Qdrant payload filter for entries an owner's entry may link to"""
+        from qdrant_client.models import FieldCondition, Filter, MatchAny
 
-        except Exception as e:
-            logger.error(f"Error extracting web content from {url}: {e}")
+        if owner == 'shared':
             return None
+        return Filter(must=[FieldCondition(key='owner', match=MatchAny(any=[owner, 'shared']))])
 
-    # ========== KNOWLEDGE GRAPH ==========
+    def _update_embedding_edges(self, entry_ids: List[str], batch_size: int = 64,
+                                replace: bool = True) -> int:
+        """
+        Link entries to their k nearest neighbours in the embedding index
 
-    def _get_related_entries(self, entry_id: str, user_id: str, max_depth: int = 2) -> List[Dict]:
-        """Get related knowledge entries via graph traversal using networkx"""
-        try:
-            # Rebuild graph for user (in production, cache this)
-            self._build_knowledge_graph(user_id)
+        Each entry queries with the centroid of its chunk vectors; chunk hits
+        are collapsed to entries. A batch costs one scroll plus one
+        query_batch_points call; entries are never compared pairwise.
+        replace=False skips dropping the entries' existing embedding edges
+        (full rebuilds clear them once up front).
+        """
+        from qdrant_client.models import QueryRequest
 
-            if entry_id not in self.knowledge_graph:
-                return []
+        edge_count = 0
 
-            # BFS traversal to find related entries
-            related = []
-            visited = set([entry_id])
+        for start in range(0, len(entry_ids), batch_size):
+            batch = entry_ids[start:start + batch_size]
+            placeholders = ','.join(['?' for _ in batch])
 
-            for depth in range(max_depth):
-                if depth == 0:
-                    # Get direct neighbors
-                    neighbors = list(self.knowledge_graph.neighbors(entry_id))
-                else:
-                    # Get neighbors of current related entries
-                    new_neighbors = []
-                    for rel_id in related:
-                        if rel_id not in visited:
-                            new_neighbors.extend(
-                                [n for n in self.knowledge_graph.neighbors(rel_id) if n not in visited]
-                            )
-                    neighbors = new_neighbors
-
-                # Add neighbors to visited and related
-                for neighbor in neighbors:
-                    if neighbor not in visited and neighbor != entry_id:
-                        visited.add(neighbor)
-                        related.append(neighbor)
-
-                if not neighbors:
-                    break
-
-            # Fetch entry details
-            entries = []
-            for rel_id in related[:10]:  # Limit to 10 related entries
-                entry = self.get_entry(rel_id, user_id)
-                if entry:
-                    entries.append(entry)
+            with get_db() as conn:
+                owners = {row['id']: row['owner'] for row in conn.execute(
+                    f"SELECT id, owner FROM knowledge_entries WHERE id IN ({placeholders})",
+                    batch
+                )}
+
+            vectors = {
+                entry_id: vector for entry_id, vector in self._entry_vectors(batch).items()
+                if entry_id in owners
+            }
+            sources = list(vectors)
 
-            return entries
+            responses = []
+            if sources:
+                responses = self.qdrant.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=[
+                        QueryRequest(
+                            query=vectors[entry_id],
+                            filter=self._owner_filter(owners[entry_id]),
+                            # The entry's own chunks are hits too
+                            limit=(KNN_NEIGHBORS + 1) * CHUNK_OVERFETCH,
+                            score_threshold=KNN_MIN_SCORE,
+                            with_payload=['parent_id', 'chunk_index']
+                        )
+                        for entry_id in sources
+                    ]
+                )
 
-        except Exception as e:
-            logger.error(f"Error getting related entries: {e}")
-            return []
+            # Undirected: a pair found from both ends is stored once per direction
+            pairs = {}
+            for src_id, response in zip(sources, responses):
+                neighbours = [hit for hit in aggregate_chunk_hits(response.points) if hit['id'] != src_id]
+                for hit in neighbours[:KNN_NEIGHBORS]:
+                    pairs[tuple(sorted((src_id, hit['id'])))] = hit['score']
 
-    def _build_knowledge_graph(self, user_id: str):
-        """Build knowledge graph using networkx"""
-        try:
-            # Clear existing graph
-            self.knowledge_graph = nx.DiGraph()
-
-            # Get all entries for user
-            entries = self.get_entries(user_id, include_shared=True, limit=1000)
-
-            # Add nodes
-            for entry in entries:
-                self.knowledge_graph.add_node(
-                    entry['id'],
-                    title=entry['title'],
-                    domain=entry.get('domain'),
-                    tags=entry.get('tags', [])
+            edges = []
+            for (a, b), score in pairs.items():
+                edges.append((a, b, score))
+                edges.append((b, a, score))
+
+            with get_db() as conn:
+                if replace:
+                    conn.execute(
+                        f"""DELETE FROM knowledge_edges
+                            WHERE edge_type = 'embedding'
+                              AND (src_id IN ({placeholders}) OR dst_id IN ({placeholders}))""",
+                        batch + batch
+                    )
+                conn.executemany(
+                    """INSERT OR REPLACE INTO knowledge_edges (src_id, dst_id, edge_type, weight)
+                       VALUES (?, ?, 'embedding', ?)""",
+                    edges
                 )
 
-            # Add edges based on:
-            # 1. Same domain
-            # 2. Common tags
-            # 3. Same project
-            entries_dict = {e['id']: e for e in entries}
-
-            for i, entry1 in enumerate(entries):
-                for entry2 in entries[i+1:]:
-                    # Skip self
-                    if entry1['id'] == entry2['id']:
-                        continue
-
-                    # Calculate similarity score
-                    similarity = self._calculate_entry_similarity(entry1, entry2)
-
-                    # Add edge if similarity > threshold
-                    if similarity > 0.3:
-                        self.knowledge_graph.add_edge(
-                            entry1['id'],
-                            entry2['id'],
-                            weight=similarity
-                        )
+            for owner in set(owners.values()):
+                self._invalidate_graph(owner)
 
-            logger.info(f"Built knowledge graph: {len(self.knowledge_graph.nodes)} nodes, {len(self.knowledge_graph.edges)} edges")
+            edge_count += len(pairs)
 
-        except Exception as e:
-            logger.error(f"Error building knowledge graph: {e}")
+        return edge_count
 
-    def _calculate_entry_similarity(self, entry1: Dict, entry2: Dict) -> float:
-        """Calculate similarity between two entries"""
-        score = 0.0
+    def rebuild_embedding_edges(self, user_id: str) -> Dict:
+        """Recompute k-nearest-neighbour edges for the user's embedded entries"""
+        with get_db() as conn:
+            entry_ids = [row['id'] for row in conn.execute(
+                """SELECT id FROM knowledge_entries
+                   WHERE owner IN (?, 'shared') AND embedding_synced = 1""",
+                (user_id,)
+            )]
 
-        # Domain match (30%)
-        if entry1.get('domain') and entry2.get('domain'):
-            if entry1['domain'] == entry2['domain']:
-                score += 0.3
+            # Drop every in-scope embedding edge once, so batch boundaries
+            # don't discard pairs found by an earlier batch
+            conn.execute(
+                """DELETE FROM knowledge_edges
+                   WHERE edge_type = 'embedding'
+                     AND src_id IN (SELECT id FROM knowledge_entries WHERE owner IN (?, 'shared'))""",
+                (user_id,)
+            )
 
-        # Tag overlap (40%)
-        tags1 = set(entry1.get('tags', []))
-        tags2 = set(entry2.get('tags', []))
-        if tags1 and tags2:
-            overlap = len(tags1 & tags2)
-            total = len(tags1 | tags2)
-            if total > 0:
-                score += 0.4 * (overlap / total)
+        edge_count = self._update_embedding_edges(entry_ids, replace=False)
 
-        # Project match (30%)
-        if entry1.get('project') and entry2.get('project'):
-            if entry1['project'] == entry2['project']:
-                score += 0.3
+        return {'status': 'completed', 'nodes': len(entry_ids), 'edges': edge_count}
 
-        return score
+    def rebuild_knowledge_graph(self, user_id: str) -> Dict:
+        """
+        Recompute all metadata edges among entries visible to the user
+
+        Candidate pairs come from inverted tag/project indexes and are scored
+        in bulk (see graph.compute_edges), then written in one transaction.
+        """
+        with get_db() as conn:
+            entries = []
+            for row in conn.execute(
+                """SELECT id, owner, domain, project, tags FROM knowledge_entries
+                   WHERE owner IN (?, 'shared')""",
+                (user_id,)
+            ):
+                entry = dict(row)
+                entry['tags'] = json.loads(entry['tags']) if entry.get('tags') else []
+                entries.append(entry)
+
+            edges = compute_edges(entries)
+
+            scope = "SELECT id FROM knowledge_entries WHERE owner IN (?, 'shared')"
+            conn.execute(
+                f"""DELETE FROM knowledge_edges
+                    WHERE edge_type = 'metadata'
+                      AND src_id IN ({scope}) AND dst_id IN ({scope})""",
+                (user_id, user_id)
+            )
+            conn.executemany(
+                """INSERT OR REPLACE INTO knowledge_edges (src_id, dst_id, edge_type, weight)
+                   VALUES (?, ?, 'metadata', ?)""",
+                [(src, dst, weight) for src, dst, weight in edges] +
+                [(dst, src, weight) for src, dst, weight in edges]
+            )
+
+        self._invalidate_graph(user_id)
+        logger.info(f"Rebuilt knowledge graph for {user_id}: {len(entries)} nodes, {len(edges)} edges")
+
+        return {'status': 'completed', 'nodes': len(entries), 'edges': len(edges)}
+
+    def _build_knowledge_graph(self, user_id: str) -> 'nx.DiGraph':
+        """Load the user's persisted knowledge graph into networkx"""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+
+        try:
+            with get_db() as conn:
+                for row in conn.execute(
+                    """SELECT id, title, domain, tags FROM knowledge_entries
+                       WHERE owner IN (?, 'shared')""",
+                    (user_id,)
+                ):
+                    graph.add_node(
+                        row['id'],
+                        title=row['title'],
+                        domain=row['domain'],
+                        tags=json.loads(row['tags']) if row['tags'] else []
+                    )
+
+                for row in conn.execute(
+                    """SELECT e.src_id, e.dst_id, e.weight, e.edge_type
+                       FROM knowledge_edges e
+                       JOIN knowledge_entries s ON s.id = e.src_id
+                       JOIN knowledge_entries d ON d.id = e.dst_id
+                       WHERE s.owner IN (?, 'shared') AND d.owner IN (?, 'shared')""",
+                    (user_id, user_id)
+                ):
+                    # Metadata and embedding edges may join the same pair; keep the strongest
+                    if graph.has_edge(row['src_id'], row['dst_id']):
+                        if graph[row['src_id']][row['dst_id']]['weight'] >= row['weight']:
+                            continue
+                    graph.add_edge(row['src_id'], row['dst_id'],
+                                   weight=row['weight'], edge_type=row['edge_type'])
+
+            logger.info(f"Loaded knowledge graph: {len(graph.nodes)} nodes, {len(graph.edges)} edges")
+
+        except Exception as e:
+            logger.error(f"Error building knowledge graph: {e}")
+
+        return graph
+
+    # ========== GRAPH ANALYTICS ==========
+
+    def _invalidate_graph(self, owner: str):
+        """Mark cached analytics and neighbourhoods stale for every owner who can see the changed entry"""
+        self.related_cache.invalidate(owner)
+        if owner == 'shared':
+            self._graph_dirty.update(self._graph_analytics.keys())
+        elif owner in self._graph_analytics:
+            self._graph_dirty.add(owner)
+
+    def refresh_graph_analytics(self, user_id: str) -> Dict:
+        """Reload the user's graph and recompute PageRank, communities and components"""
+        # Cleared first so writes landing during the computation mark it stale again
+        self._graph_dirty.discard(user_id)
+
+        graph = self._build_knowledge_graph(user_id)
+        previous = self._graph_analytics.get(user_id, {}).get('pagerank')
+        analytics = analyze_graph(graph, previous_pagerank=previous)
+
+        self.knowledge_graph[user_id] = graph
+        self._graph_analytics[user_id] = analytics
+
+        logger.info(f"Graph analytics for {user_id}: {analytics['nodes']} nodes, "
+                    f"{len(analytics['communities'])} communities in {analytics['elapsed_ms']} ms")
+
+        return analytics
+
+    def refresh_stale_graphs(self) -> List[str]:
+        """Recompute analytics for owners with writes since the last run (background job)"""
+        owners = list(self._graph_dirty)
+        for owner in owners:
+            try:
+                self.refresh_graph_analytics(owner)
+            except Exception as e:
+                logger.error(f"Error refreshing graph analytics for {owner}: {e}")
+        return owners
+
+    def get_graph_analytics(self, user_id: str) -> Dict:
+        """Cached graph analytics (computed on first use, refreshed in the background)"""
+        if user_id not in self._graph_analytics:
+            self.refresh_graph_analytics(user_id)
+        return {**self._graph_analytics[user_id], 'stale': user_id in self._graph_dirty}
+
+    def _describe_nodes(self, user_id: str, entry_ids: List[str]) -> List[Dict]:
+        """Id, title and domain for graph nodes"""
+        graph = self.knowledge_graph.get(user_id)
+        nodes = []
+        for entry_id in entry_ids:
+            attrs = graph.nodes[entry_id] if graph is not None and entry_id in graph else {}
+            nodes.append({'id': entry_id, 'title': attrs.get('title'), 'domain': attrs.get('domain')})
+        return nodes
+
+    def get_graph_stats(self, user_id: str) -> Dict:
+        """Graph size and analytics summary"""
+        analytics = self.get_graph_analytics(user_id)
+        return {
+            'nodes': analytics['nodes'],
+            'edges': analytics['edges'],
+            'communities': len(analytics['communities']),
+            'components': len(analytics['components']),
+            'largest_component': len(analytics['components'][0]) if analytics['components'] else 0,
+            'computed_at': analytics['computed_at'],
+            'elapsed_ms': analytics['elapsed_ms'],
+            'stale': analytics['stale']
+        }
+
+    def get_graph_pagerank(self, user_id: str, limit: int = 20) -> List[Dict]:
+        """Most central entries by PageRank"""
+        analytics = self.get_graph_analytics(user_id)
+        ranked = sorted(analytics['pagerank'].items(), key=lambda item: item[1], reverse=True)[:limit]
+
+        nodes = self._describe_nodes(user_id, [entry_id for entry_id, _ in ranked])
+        for node, (_, score) in zip(nodes, ranked):
+            node['pagerank'] = round(score, 6)
+        return nodes
+
+    def get_graph_groups(self, user_id: str, kind: str = 'communities', limit: int = 20) -> List[Dict]:
+        """Largest communities or connected components with their entries"""
+        analytics = self.get_graph_analytics(user_id)
+        return [
+            {'id': i, 'size': len(members), 'entries': self._describe_nodes(user_id, members)}
+            for i, members in enumerate(analytics[kind][:limit])
+        ]
+
+    def _calculate_entry_similarity(self, entry1: Dict, entry2: Dict) -> float:
+        """Calculate similarity between two entries"""
+        return entry_similarity(entry1, entry2)
 
     # ========== WORKTREE MANAGEMENT ==========
 
@@ -653,86 +1328,259 @@ class BrainModule:
 
     def search_entries(self, query: str, user_id: str, filters: Dict = None) -> List[Dict]:
         """Search knowledge entries with keyword and semantic search"""
+        return self.search(query, user_id, filters)['results']
+
+    def search(self, query: str, user_id: str, filters: Dict = None) -> Dict:
+        """
+        Search knowledge entries and report per-stage timings
+
+        Modes (selected via filters):
+        - default: BM25 keyword ranking over the knowledge_fts index
+        - semantic_only: Qdrant vector recall only
+        - semantic / hybrid: both rankings merged with reciprocal-rank fusion
+        """
         filters = filters or {}
+        limit = filters.get('limit', 50)
+        timer = StageTimer()
 
-        # Keyword search (SQL LIKE)
-        results = []
+        cache_key = self.search_cache.key(query, filters)
+        cached = self.search_cache.get(user_id, cache_key)
+        if cached is not None:
+            return {
+                **cached,
+                'results': [dict(entry) for entry in cached['results']],
+                'cached': True,
+                'timings_ms': timer.as_dict()
+            }
+        generation = self.search_cache.generation(user_id)
 
-        if not filters.get('semantic_only'):
-            search_query = """
-                SELECT * FROM knowledge_entries
-                WHERE owner IN (?, 'shared')
-                  AND (title LIKE ? OR content LIKE ?)
-            """
-            params = [user_id, f"%{query}%", f"%{query}%"]
+        if filters.get('semantic_only'):
+            mode = 'semantic'
+        elif filters.get('semantic') or filters.get('hybrid'):
+            mode = 'hybrid'
+        else:
+            mode = 'keyword'
 
-            if filters.get('domain'):
-                search_query += " AND domain = ?"
-                params.append(filters['domain'])
+        keyword_results = []
+        semantic_results = []
 
-            if filters.get('project'):
-                search_query += " AND project = ?"
-                params.append(filters['project'])
+        if mode != 'semantic':
+            with timer.stage('keyword'):
+                keyword_results = self._keyword_search(query, user_id, filters, limit)
+            for entry in keyword_results:
+                entry['match_type'] = 'keyword'
+
+        if mode != 'keyword':
+            semantic_results = self._semantic_search(query, user_id, filters, timer=timer)
+            for entry in semantic_results:
+                entry['match_type'] = 'semantic'
+
+        if mode == 'hybrid':
+            with timer.stage('fusion'):
+                results = self._fuse_results(keyword_results, semantic_results, limit)
+        else:
+            results = (keyword_results or semantic_results)[:limit]
+
+        result = {
+            'results': results,
+            'count': len(results),
+            'mode': mode,
+            'timings_ms': timer.as_dict()
+        }
+        self.search_cache.put(user_id, cache_key, {**result, 'results': [dict(entry) for entry in results]},
+                              generation)
+
+        return {**result, 'cached': False}
+
+    def get_search_cache_stats(self) -> Dict:
+        """Search result cache hit rate and size"""
+        return self.search_cache.stats()
+
+    def _keyword_search(self, query: str, user_id: str, filters: Dict, limit: int) -> List[Dict]:
+        """
+        BM25-ranked keyword search over the knowledge_fts index
+
+        filters['prefix'] treats the last word as a prefix (type-ahead);
+        filters['highlight'] adds a content snippet and highlighted title.
+        """
+        match_query = build_match_query(query, prefix=filters.get('prefix', False))
+        if not match_query:
+            return []
 
-            search_query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(filters.get('limit', 50))
+        scope = "k.owner IN (?, 'shared')"
+        scope_params = [user_id]
+        if filters.get('domain'):
+            scope += " AND k.domain = ?"
+            scope_params.append(filters['domain'])
+        if filters.get('project'):
+            scope += " AND k.project = ?"
+            scope_params.append(filters['project'])
+
+        # bm25() runs for every row it is given, so rank only the newest
+        # KEYWORD_CANDIDATES matches (exact when there are fewer), then fetch
+        # the full rows for the final LIMIT
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        search_query = f"""
+            SELECT k.*, ranked.bm25_rank
+            FROM (
+                SELECT knowledge_fts.rowid AS doc_id, bm25(knowledge_fts, {weights}) AS bm25_rank
+                FROM knowledge_fts
+                JOIN knowledge_entries k ON k.doc_id = knowledge_fts.rowid
+                WHERE knowledge_fts MATCH ? AND {scope}
+                  AND knowledge_fts.rowid >= (
+                      SELECT IFNULL(MIN(doc_id), 0) FROM (
+                          SELECT knowledge_fts.rowid AS doc_id
+                          FROM knowledge_fts
+                          JOIN knowledge_entries k ON k.doc_id = knowledge_fts.rowid
+                          WHERE knowledge_fts MATCH ? AND {scope}
+                          ORDER BY knowledge_fts.rowid DESC
+                          LIMIT ?
+                      )
+                  )
+                ORDER BY bm25_rank
+                LIMIT ?
+            ) ranked
+            JOIN knowledge_entries k ON k.doc_id = ranked.doc_id
+            ORDER BY ranked.bm25_rank
+        """
+        params = ([match_query] + scope_params + [match_query] + scope_params
+                  + [KEYWORD_CANDIDATES, limit])
 
+        try:
             with get_db() as conn:
-                cursor = conn.execute(search_query, params)
-                rows = cursor.fetchall()
+                rows = conn.execute(search_query, params).fetchall()
+        except sqlite3.OperationalError as e:
+            # Database predates the knowledge_fts index
+            logger.warning(f"FTS keyword search unavailable ({e}), falling back to LIKE scan")
+            return self._like_search(query, user_id, filters, limit)
 
-            for row in rows:
-                entry = dict(row)
-                if entry.get('tags'):
-                    entry['tags'] = json.loads(entry['tags'])
-                # Mark as keyword match
-                entry['match_type'] = 'keyword'
-                results.append(entry)
+        results = []
+        for row in rows:
+            entry = dict(row)
+            if entry.get('tags'):
+                entry['tags'] = json.loads(entry['tags'])
+            # bm25() is negative with lower = better; expose a positive score
+            entry['keyword_score'] = round(-entry.pop('bm25_rank'), 6)
+            results.append(entry)
+
+        if filters.get('highlight') and results:
+            self._add_highlights(results, match_query)
 
-        # Semantic search via Qdrant (if requested or if keyword search yields few results)
-        if filters.get('semantic') or (filters.get('hybrid') and len(results) < 5):
-            semantic_results = self._semantic_search(query, user_id, filters)
+        return results
 
-            # Remove duplicates (by entry ID)
-            seen_ids = {r['id'] for r in results}
+    def _add_highlights(self, results: List[Dict], match_query: str):
+        """
+        Attach FTS5 snippet/highlight markup to ranked results
 
-            for entry in semantic_results:
-                if entry['id'] not in seen_ids:
-                    entry['match_type'] = 'semantic'
-                    results.append(entry)
-                    seen_ids.add(entry['id'])
+        Runs as a second pass over the final top-N rowids only, so snippets
+        are never built for rows that the LIMIT discards.
+        """
+        doc_ids = [entry['doc_id'] for entry in results]
+        placeholders = ','.join(['?' for _ in doc_ids])
+
+        # Constrained on rowid, so FTS5 seeks to each entry instead of
+        # walking the whole doclist of a common term
+        with get_db() as conn:
+            rows = conn.execute(
+                f"""SELECT rowid AS doc_id,
+                           highlight(knowledge_fts, 0, ?, ?) AS title_highlight,
+                           snippet(knowledge_fts, 1, ?, ?, '…', ?) AS snippet
+                    FROM knowledge_fts
+                    WHERE knowledge_fts MATCH ? AND rowid IN ({placeholders})""",
+                [HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE, HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE,
+                 SNIPPET_TOKENS, match_query] + doc_ids
+            ).fetchall()
 
-                # Stop if we have enough results
-                if len(results) >= filters.get('limit', 50):
-                    break
+        markup = {row['doc_id']: row for row in rows}
+        for entry in results:
+            if entry['doc_id'] in markup:
+                entry['title_highlight'] = markup[entry['doc_id']]['title_highlight']
+                entry['snippet'] = markup[entry['doc_id']]['snippet']
+
+    def _like_search(self, query: str, user_id: str, filters: Dict, limit: int) -> List[Dict]:
+        """Unranked substring search (fallback when the FTS index is missing)"""
+        search_query = """
+            SELECT * FROM knowledge_entries
+            WHERE owner IN (?, 'shared')
+              AND (title LIKE ? OR content LIKE ?)
+        """
+        params = [user_id, f"%{query}%", f"%{query}%"]
+
+        if filters.get('domain'):
+            search_query += " AND domain = ?"
+            params.append(filters['domain'])
+
+        if filters.get('project'):
+            search_query += " AND project = ?"
+            params.append(filters['project'])
+
+        search_query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+
+        with get_db() as conn:
+            rows = conn.execute(search_query, params).fetchall()
+
+        results = []
+        for row in rows:
+            entry = dict(row)
+            if entry.get('tags'):
+                entry['tags'] = json.loads(entry['tags'])
+            results.append(entry)
+
+        return results
+
+    def _fuse_results(self, keyword_results: List[Dict], semantic_results: List[Dict],
+                      limit: int) -> List[Dict]:
+        """Merge keyword and semantic rankings with reciprocal-rank fusion"""
+        entries = {entry['id']: entry for entry in semantic_results}
+        for entry in keyword_results:
+            if entry['id'] in entries:
+                entries[entry['id']] = {**entries[entry['id']], **entry, 'match_type': 'hybrid'}
+            else:
+                entries[entry['id']] = entry
+
+        fused = reciprocal_rank_fusion([
+            [entry['id'] for entry in keyword_results],
+            [entry['id'] for entry in semantic_results]
+        ])
+
+        results = []
+        for entry_id, score in fused[:limit]:
+            entry = entries[entry_id]
+            entry['rrf_score'] = round(score, 6)
+            results.append(entry)
 
         return results
 
-    def _semantic_search(self, query: str, user_id: str, filters: Dict = None) -> List[Dict]:
+    def _semantic_search(self, query: str, user_id: str, filters: Dict = None,
+                         timer: StageTimer = None) -> List[Dict]:
         """Semantic search using Qdrant vector embeddings"""
         try:
             filters = filters or {}
+            timer = timer or StageTimer()
 
             # Generate query embedding
-            query_embedding = self._generate_embedding_vector(query)
-
-            # Build Qdrant filter
-            qdrant_filter = None
+            with timer.stage('embed'):
+                query_embedding = self._generate_embedding_vector(query)
+
+            # Search chunks in Qdrant (owner/shared filtered server-side),
+            # over-fetching so several chunks of one entry don't fill the limit
+            limit = filters.get('limit', 20)
+            with timer.stage('vector'):
+                chunk_hits = self.qdrant.query_points(
+                    collection_name=self.collection_name,
+                    query=query_embedding,
+                    query_filter=self._owner_filter(user_id),
+                    limit=limit * CHUNK_OVERFETCH,
+                    score_threshold=0.5,  # Minimum similarity score
+                    with_payload=['parent_id', 'chunk_index']
+                ).points
 
-            # Only search for entries owned by user or shared
-            # This is done by filtering after retrieval for simplicity
-            # In production, use Qdrant's payload filter
-
-            # Search in Qdrant
-            search_results = self.qdrant.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=filters.get('limit', 20),
-                score_threshold=0.5  # Minimum similarity score
-            )
+            # Collapse chunk hits to entries (best chunk wins)
+            search_results = aggregate_chunk_hits(chunk_hits, limit=limit)
 
             # Fetch full entries from database
-            entry_ids = [hit.id for hit in search_results]
+            entry_ids = [hit['id'] for hit in search_results]
             if not entry_ids:
                 return []
 
@@ -740,9 +1588,18 @@ class BrainModule:
             db_query = f"SELECT * FROM knowledge_entries WHERE id IN ({placeholders}) AND owner IN (?, 'shared')"
             db_params = entry_ids + [user_id]
 
-            with get_db() as conn:
-                cursor = conn.execute(db_query, db_params)
-                rows = cursor.fetchall()
+            if filters.get('domain'):
+                db_query += " AND domain = ?"
+                db_params.append(filters['domain'])
+
+            if filters.get('project'):
+                db_query += " AND project = ?"
+                db_params.append(filters['project'])
+
+            with timer.stage('hydrate'):
+                with get_db() as conn:
+                    cursor = conn.execute(db_query, db_params)
+                    rows = cursor.fetchall()
 
             # Build results map for quick lookup
             entries_map = {row['id']: dict(row) for row in rows}
@@ -750,11 +1607,13 @@ class BrainModule:
             # Combine with Qdrant scores
             results = []
             for hit in search_results:
-                if hit.id in entries_map:
-                    entry = entries_map[hit.id]
+                if hit['id'] in entries_map:
+                    entry = entries_map[hit['id']]
                     if entry.get('tags'):
                         entry['tags'] = json.loads(entry['tags'])
-                    entry['similarity_score'] = hit.score
+                    entry['similarity_score'] = hit['score']
+                    entry['matched_chunk'] = hit['chunk_index']
+                    entry['chunk_hits'] = hit['chunk_hits']
                     results.append(entry)
 
             # Sort by similarity score (descending)
@@ -768,6 +1627,448 @@ class BrainModule:
             logger.error(f"Error in semantic search: {e}")
             return []
 
+    # ========== SUGGESTIONS ==========
+
+    def suggest(self, prefix: str, user_id: str, limit: int = SUGGEST_LIMIT) -> Dict:
+        """
+        Title, tag and project suggestions for a typed prefix
+
+        Served from in-memory prefix indexes (the user's and 'shared'),
+        never from SQLite; tag/project counts are merged across both.
+        """
+        start = time.perf_counter()
+
+        owners = [user_id] if user_id == 'shared' else [user_id, 'shared']
+        merged: Dict[tuple, Dict] = {}
+        for owner in owners:
+            for item in self._suggest_index(owner).search(prefix, limit):
+                ident = (item['type'], item.get('id') or item['text'])
+                if ident in merged and 'count' in item:
+                    merged[ident]['count'] += item['count']
+                else:
+                    merged.setdefault(ident, item)
+
+        suggestions = sorted(merged.values(), key=lambda item: item['key'])[:limit]
+        for item in suggestions:
+            del item['key']
+
+        return {
+            'suggestions': suggestions,
+            'count': len(suggestions),
+            'elapsed_us': round((time.perf_counter() - start) * 1e6, 1)
+        }
+
+    def _suggest_index(self, owner: str) -> PrefixIndex:
+        """Owner's prefix index, loaded from knowledge_entries on first use"""
+        index = self._suggest_indexes.get(owner)
+        if index is not None:
+            return index
+
+        # Built under the lock so writes committed meanwhile are applied after it
+        with self._suggest_lock:
+            if owner not in self._suggest_indexes:
+                index = PrefixIndex()
+                with get_db() as conn:
+                    rows = conn.execute(
+                        "SELECT id, title, tags, project FROM knowledge_entries WHERE owner = ?",
+                        (owner,)
+                    )
+                    index.add_many(
+                        {**row, 'tags': json.loads(row['tags']) if row['tags'] else []}
+                        for row in map(dict, rows)
+                    )
+                self._suggest_indexes[owner] = index
+            return self._suggest_indexes[owner]
+
+    def _index_suggestions(self, entry_ids: List[str]):
+        """(Re)index written entries in whichever owner indexes are loaded"""
+        with self._suggest_lock:
+            if not self._suggest_indexes or not entry_ids:
+                return
+
+            placeholders = ','.join(['?' for _ in entry_ids])
+            with get_db() as conn:
+                rows = conn.execute(
+                    f"SELECT id, owner, title, tags, project FROM knowledge_entries WHERE id IN ({placeholders})",
+                    entry_ids
+                ).fetchall()
+
+            for row in rows:
+                index = self._suggest_indexes.get(row['owner'])
+                if index is not None:
+                    entry = dict(row)
+                    entry['tags'] = json.loads(entry['tags']) if entry.get('tags') else []
+                    index.add(entry)
+
+    def _unindex_suggestion(self, entry_id: str, owner: str):
+        with self._suggest_lock:
+            index = self._suggest_indexes.get(owner)
+            if index is not None:
+                index.remove(entry_id)
+
+    # ========== DUPLICATES ==========
+
+    def _store_signatures(self, signatures: Dict[str, List[int]]):
+        """Persist MinHash signatures and their LSH bucket rows"""
+        if not signatures:
+            return
+
+        placeholders = ','.join(['?' for _ in signatures])
+        with get_db() as conn:
+            conn.execute(f"DELETE FROM knowledge_lsh WHERE entry_id IN ({placeholders})", list(signatures))
+            conn.executemany(
+                """INSERT OR REPLACE INTO knowledge_signatures (entry_id, signature, updated_at)
+                   VALUES (?, ?, CURRENT_TIMESTAMP)""",
+                [(entry_id, pack_signature(signature)) for entry_id, signature in signatures.items()]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO knowledge_lsh (band_key, entry_id) VALUES (?, ?)",
+                [(key, entry_id) for entry_id, signature in signatures.items() for key in band_keys(signature)]
+            )
+
+    def _index_signatures(self, entry_ids: List[str]) -> int:
+        """Compute and store signatures for entries already in the database"""
+        if not entry_ids:
+            return 0
+
+        placeholders = ','.join(['?' for _ in entry_ids])
+        with get_db() as conn:
+            rows = conn.execute(
+                f"SELECT id, title, content FROM knowledge_entries WHERE id IN ({placeholders})",
+                entry_ids
+            ).fetchall()
+
+        signatures = {}
+        for row in rows:
+            signature = minhash(entry_text(dict(row)))
+            if signature:
+                signatures[row['id']] = signature
+        self._store_signatures(signatures)
+        return len(signatures)
+
+    def _find_similar(self, signature: List[int], owner: str, exclude: str = None,
+                      threshold: float = DUPLICATE_THRESHOLD) -> List[Dict]:
+        """Entries the owner's entry may link to whose signature is within threshold, best first"""
+        keys = band_keys(signature)
+        with get_db() as conn:
+            rows = conn.execute(
+                f"""SELECT DISTINCT k.id, k.title, k.owner, s.signature
+                    FROM knowledge_lsh l
+                    JOIN knowledge_signatures s ON s.entry_id = l.entry_id
+                    JOIN knowledge_entries k ON k.id = l.entry_id
+                    WHERE l.band_key IN ({','.join(['?' for _ in keys])})""",
+                keys
+            ).fetchall()
+
+        matches = []
+        for row in rows:
+            if row['id'] == exclude or not can_link(owner, row['owner']):
+                continue
+            score = similarity(signature, unpack_signature(row['signature']))
+            if score >= threshold:
+                matches.append({'id': row['id'], 'title': row['title'], 'owner': row['owner'],
+                                'similarity': round(score, 3)})
+        return sorted(matches, key=lambda m: m['similarity'], reverse=True)
+
+    def _backfill_signatures(self, user_id: str, batch_size: int = 500) -> int:
+        """Sign visible entries created before dedup existed (or skipped since)"""
+        total = 0
+        while True:
+            with get_db() as conn:
+                ids = [row['id'] for row in conn.execute(
+                    """SELECT k.id FROM knowledge_entries k
+                       WHERE k.owner IN (?, 'shared')
+                         AND NOT EXISTS (SELECT 1 FROM knowledge_signatures s WHERE s.entry_id = k.id)
+                       LIMIT ?""",
+                    (user_id, batch_size)
+                )]
+            if not ids:
+                return total
+            signed = self._index_signatures(ids)
+            total += signed
+            if signed < len(ids):
+                # Entries without any words never get a signature
+                return total
+
+    def get_duplicates(self, user_id: str, threshold: float = DUPLICATE_THRESHOLD) -> Dict:
+        """
+        Groups of near-duplicate entries visible to the user
+
+        Candidate pairs come from shared LSH buckets only; each is confirmed
+        by signature similarity, and confirmed pairs are grouped. The oldest
+        entry of a group is suggested as the one to keep.
+        """
+        backfilled = self._backfill_signatures(user_id)
+
+        with get_db() as conn:
+            buckets = [row['ids'].split(',') for row in conn.execute(
+                """SELECT GROUP_CONCAT(l.entry_id) AS ids
+                   FROM knowledge_lsh l
+                   JOIN knowledge_entries k ON k.id = l.entry_id
+                   WHERE k.owner IN (?, 'shared')
+                   GROUP BY l.band_key
+                   HAVING COUNT(*) > 1""",
+                (user_id,)
+            )]
+
+            candidates = {tuple(sorted((a, b))) for ids in buckets
+                          for i, a in enumerate(ids) for b in ids[i + 1:]}
+            involved = sorted({entry_id for pair in candidates for entry_id in pair})
+            entries = {}
+            for start in range(0, len(involved), 500):
+                chunk = involved[start:start + 500]
+                for row in conn.execute(
+                    f"""SELECT k.id, k.title, k.owner, k.content_type, k.source_url, k.timestamp, s.signature
+                        FROM knowledge_entries k
+                        JOIN knowledge_signatures s ON s.entry_id = k.id
+                        WHERE k.id IN ({','.join(['?' for _ in chunk])})""",
+                    chunk
+                ):
+                    entry = dict(row)
+                    entry['signature'] = unpack_signature(entry['signature'])
+                    entries[entry['id']] = entry
+
+        pairs = {}
+        for a, b in candidates:
+            if a in entries and b in entries and can_link(entries[a]['owner'], entries[b]['owner']):
+                score = similarity(entries[a]['signature'], entries[b]['signature'])
+                if score >= threshold:
+                    pairs[(a, b)] = score
+
+        groups = []
+        for ids in group_pairs(pairs):
+            members = sorted((entries[i] for i in ids), key=lambda e: e['timestamp'] or '')
+            scores = [score for (a, b), score in pairs.items() if a in ids]
+            groups.append({
+                'keep': members[0]['id'],
+                'entries': [{k: v for k, v in e.items() if k != 'signature'} for e in members],
+                'similarity': round(min(scores), 3)
+            })
+        groups.sort(key=lambda g: len(g['entries']), reverse=True)
+
+        return {
+            'groups': groups,
+            'count': len(groups),
+            'duplicate_entries': sum(len(g['entries']) - 1 for g in groups),
+            'pairs': len(pairs),
+            'candidates': len(candidates),
+            'backfilled': backfilled
+        }
+
+    def merge_entries(self, keep_id: str, merge_ids: List[str], user_id: str) -> Dict:
+        """
+        Fold duplicates into one entry
+
+        The kept entry gains the others' tags (and domain/project if it has
+        none); the others are deleted with their vectors and edges.
+        """
+        merge_ids = [entry_id for entry_id in dict.fromkeys(merge_ids) if entry_id != keep_id]
+        if not merge_ids:
+            return {'error': 'Nothing to merge'}
+
+        ids = [keep_id] + merge_ids
+        with get_db() as conn:
+            rows = {row['id']: dict(row) for row in conn.execute(
+                f"SELECT id, owner, domain, project, tags FROM knowledge_entries WHERE id IN ({','.join(['?' for _ in ids])})",
+                ids
+            )}
+
+        if len(rows) != len(ids):
+            return {'error': 'Entry not found'}
+        if any(row['owner'] not in (user_id, 'shared') for row in rows.values()):
+            return {'error': 'Permission denied'}
+
+        keep = rows[keep_id]
+        tags = json.loads(keep['tags']) if keep.get('tags') else []
+        update = {}
+        for entry_id in merge_ids:
+            other = rows[entry_id]
+            for tag in json.loads(other['tags']) if other.get('tags') else []:
+                if tag not in tags:
+                    tags.append(tag)
+                    update['tags'] = tags
+            for field in ('domain', 'project'):
+                if not keep.get(field) and not update.get(field) and other.get(field):
+                    update[field] = other[field]
+
+        if update:
+            self.update_entry(keep_id, update, user_id)
+        for entry_id in merge_ids:
+            self.delete_entry(entry_id, user_id)
+
+        log_audit(user_id, 'brain', 'merge', 'knowledge_entry', keep_id, {'merged': merge_ids})
+
+        return {'id': keep_id, 'status': 'merged', 'merged': merge_ids, 'tags': tags}
+
+    # ========== EXPORT / IMPORT ==========
+
+    def export_entries(self, user_id: str, include_embeddings: bool = True,
+                       page_size: int = EXPORT_PAGE_SIZE) -> Iterator[Dict]:
+        """
+        Stream the user's entries as export records (header first)
+
+        Keyset-paginated by id with a fresh connection per page, so memory
+        and lock time don't grow with the knowledge base.
+        """
+        yield header(user_id, include_embeddings)
+
+        last_id = ''
+        while True:
+            with get_db() as conn:
+                rows = [dict(row) for row in conn.execute(
+                    """SELECT * FROM knowledge_entries
+                       WHERE owner IN (?, 'shared') AND id > ?
+                       ORDER BY id
+                       LIMIT ?""",
+                    (user_id, last_id, page_size)
+                )]
+
+            if not rows:
+                return
+
+            vectors = self._chunk_vectors([row['id'] for row in rows]) if include_embeddings else {}
+            for row in rows:
+                yield entry_record(row, vectors.get(row['id'], []) if include_embeddings else None)
+
+            last_id = rows[-1]['id']
+
+    def import_entries(self, lines: Iterable, user_id: str, on_conflict: str = 'skip',
+                       include_embeddings: bool = True, batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+        """
+        Restore entries from an NDJSON export
+
+        Rows are bulk-inserted batch_size at a time and stored chunk vectors
+        are upserted to Qdrant as-is (no re-encoding). on_conflict='skip'
+        keeps existing entries, 'replace' overwrites them (and drops their old
+        vectors); entries owned by someone else are never touched. Edges are
+        rebuilt once at the end.
+
+        A malformed line is skipped and reported in errors (with its line
+        number), so earlier and later batches still apply and the result says
+        exactly what was not imported; only a missing or unsupported header
+        fails the whole import, before anything is written.
+        """
+        if on_conflict not in ('skip', 'replace'):
+            return {'error': "on_conflict must be 'skip' or 'replace'"}
+
+        with get_db() as conn:
+            columns = [row['name'] for row in conn.execute("PRAGMA table_info(knowledge_entries)")]
+
+        stats = {'imported': 0, 'skipped': 0, 'vectors': 0, 'needs_embedding': 0}
+        failed, batch = [], []
+        for record in read_ndjson(lines, errors=failed):
+            if record.get('type') != 'entry':
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._import_batch(batch, user_id, columns, on_conflict, include_embeddings, stats)
+                batch = []
+        if batch:
+            self._import_batch(batch, user_id, columns, on_conflict, include_embeddings, stats)
+
+        if stats['imported']:
+            self.rebuild_knowledge_graph(user_id)
+            self._invalidate_graph('shared')
+
+        stats['failed'] = len(failed)
+        log_audit(user_id, 'brain', 'import', 'knowledge_entries', None, stats)
+
+        return {'status': 'completed', **stats, 'errors': failed}
+
+    def _import_batch(self, records: List[Dict], user_id: str, columns: List[str],
+                      on_conflict: str, include_embeddings: bool, stats: Dict):
+        """Insert one batch of export records and upsert their vectors"""
+        from qdrant_client.models import PointStruct
+
+        ids = [record['entry']['id'] for record in records]
+        placeholders = ','.join(['?' for _ in ids])
+        with get_db() as conn:
+            existing = {row['id']: row['owner'] for row in conn.execute(
+                f"SELECT id, owner FROM knowledge_entries WHERE id IN ({placeholders})",
+                ids
+            )}
+
+        accepted = []
+        for record in records:
+            entry = record['entry']
+            if entry.get('owner') not in (user_id, 'shared'):
+                stats['skipped'] += 1
+            elif entry['id'] in existing and (
+                    on_conflict == 'skip' or existing[entry['id']] not in (user_id, 'shared')):
+                stats['skipped'] += 1
+            else:
+                accepted.append(record)
+
+        if not accepted:
+            return
+
+        insert_columns = [c for c in columns if c not in DERIVED_COLUMNS + LOCAL_COLUMNS]
+        rows, points, replaced = [], [], []
+        for record in accepted:
+            entry = record['entry']
+            chunks = (record.get('chunks') or []) if include_embeddings else []
+
+            values = [entry.get(c) for c in insert_columns]
+            values[insert_columns.index('tags')] = json.dumps(entry.get('tags') or [])
+            rows.append(values + [entry['id'] if chunks else None, 1 if chunks else 0, len(chunks)])
+
+            if entry['id'] in existing:
+                replaced.append(entry['id'])
+            if not chunks:
+                stats['needs_embedding'] += 1
+            for chunk in chunks:
+                points.append(PointStruct(
+                    id=chunk_point_id(entry['id'], chunk['index']),
+                    vector=decode_vector(chunk['vector']),
+                    payload=self._chunk_payload(entry, chunk['index'])
+                ))
+
+        # Vectors first: a failed upsert must not leave rows marked as embedded.
+        # Replaced entries always lose their old chunks; without restored
+        # vectors they are left unembedded (needs_embedding) rather than stale
+        if replaced:
+            from qdrant_client.models import FilterSelector
+
+            self.qdrant.delete(
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(filter=self._parent_filter(replaced))
+            )
+        for i in range(0, len(points), 512):
+            self.qdrant.upsert(collection_name=self.collection_name, points=points[i:i + 512])
+
+        # An upsert rather than INSERT OR REPLACE: REPLACE deletes the old row
+        # without firing delete triggers, leaving its terms in knowledge_fts.
+        # DO UPDATE fires the update triggers (FTS, knowledge_tags)
+        all_columns = insert_columns + list(DERIVED_COLUMNS)
+        updates = ', '.join(f"{c} = excluded.{c}" for c in all_columns if c != 'id')
+        with get_db() as conn:
+            conn.executemany(
+                f"""INSERT INTO knowledge_entries ({', '.join(all_columns)})
+                    VALUES ({', '.join(['?' for _ in all_columns])})
+                    ON CONFLICT(id) DO UPDATE SET {updates}""",
+                rows
+            )
+            if replaced:
+                # Rebuilt below (embedding) and after the import (metadata)
+                placeholders = ','.join(['?' for _ in replaced])
+                conn.execute(
+                    f"""DELETE FROM knowledge_edges
+                        WHERE src_id IN ({placeholders}) OR dst_id IN ({placeholders})""",
+                    replaced + replaced
+                )
+
+        stats['imported'] += len(rows)
+        stats['vectors'] += len(points)
+        for owner in {record['entry']['owner'] for record in accepted}:
+            self.search_cache.invalidate(owner)
+        self._index_suggestions([record['entry']['id'] for record in accepted])
+        self._index_signatures([record['entry']['id'] for record in accepted])
+
+        # Similarity edges straight from the restored vectors
+        embedded = [record['entry']['id'] for record in accepted if record.get('chunks')]
+        if embedded and include_embeddings:
+            self._update_embedding_edges(embedded)
+
     # ========== STATISTICS ==========
 
     def get_stats(self, user_id: str) -> Dict:
@@ -804,34 +2105,33 @@ class BrainModule:
                 (user_id,)
             ).fetchone()['count']
 
+            # Stored chunk vectors (embedding cost)
+            chunk_count = conn.execute(
+                """SELECT COALESCE(SUM(embedding_chunks), 0) as count
+                   FROM knowledge_entries
+                   WHERE owner IN (?, 'shared') AND embedding_synced = 1""",
+                (user_id,)
+            ).fetchone()['count']
+
             return {
                 'total_entries': total,
                 'entries_by_domain': {row['domain']: row['count'] for row in by_domain},
                 'srs_cards_created': srs_count,
-                'entries_with_embeddings': synced_count
+                'entries_with_embeddings': synced_count,
+                'embedding_chunks': chunk_count,
+                'chunks_per_entry': round(chunk_count / synced_count, 3) if synced_count else 0.0
             }
 
     def _trigger_anki_sync(self) -> Dict:
         """Trigger AnkiConnect to sync with AnkiWeb"""
         try:
-            response = requests.post(
-                self.anki_url,
-                json={
-                    'action': 'sync',
-                    'version': 6
-                },
-                timeout=30
-            )
-
-            result = response.json()
-
-            if result.get('error'):
-                logger.error(f"AnkiConnect sync error: {result['error']}")
-                return {'error': result['error']}
-
+            result = self.anki.invoke('sync', timeout=30)
             logger.info("AnkiWeb sync triggered successfully")
-            return result
+            return {'result': result, 'error': None}
 
+        except AnkiConnectError as e:
+            logger.error(f"AnkiConnect sync error: {e}")
+            return {'error': str(e)}
         except Exception as e:
             logger.error(f"Error triggering AnkiWeb sync: {e}")
             return {'error': str(e)}
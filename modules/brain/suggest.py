@@ -0,0 +1,129 @@
+"""
+Search-as-you-type suggestions for The Brain
+
+An in-memory sorted array of (key, kind, value) terms per owner, scanned
+with bisect: a lookup is one binary search plus a walk over the matches, so
+suggestions don't touch SQLite at all. Titles are indexed from every word
+("netw" finds "Docker networking"); tags and projects are reference-counted
+so a tag used by many entries is one term.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+
+# Title words indexed as term starts (long titles only need their head)
+MAX_TITLE_WORDS = 12
+
+SUGGEST_LIMIT = 10
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+Term = Tuple[str, str, str]
+
+
+def normalize_prefix(text: str) -> str:
+    """Lowercased words joined by single spaces (punctuation dropped)"""
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def entry_terms(entry: Dict) -> List[Term]:
+    """(key, kind, value) terms for an entry: title word starts, tags, project"""
+    terms = []
+
+    words = normalize_prefix(entry.get('title')).split()
+    for i in range(min(len(words), MAX_TITLE_WORDS)):
+        terms.append((' '.join(words[i:]), 'title', entry['id']))
+
+    for tag in entry.get('tags') or []:
+        key = normalize_prefix(tag)
+        if key:
+            terms.append((key, 'tag', tag))
+
+    key = normalize_prefix(entry.get('project'))
+    if key:
+        terms.append((key, 'project', entry['project']))
+
+    return terms
+
+
+class PrefixIndex:
+    """Sorted term array with per-term reference counts, updated incrementally"""
+
+    def __init__(self):
+        self._keys: List[Term] = []
+        self._counts: Dict[Term, int] = {}
+        self._entry_terms: Dict[str, List[Term]] = {}
+        self._titles: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entry_terms)
+
+    def add(self, entry: Dict):
+        """Index an entry (replacing what was indexed for it before)"""
+        terms = entry_terms(entry)
+        with self._lock:
+            self._remove(entry['id'])
+            for term in terms:
+                count = self._counts.get(term, 0)
+                if count == 0:
+                    insort(self._keys, term)
+                self._counts[term] = count + 1
+            self._entry_terms[entry['id']] = terms
+            self._titles[entry['id']] = entry.get('title') or ''
+
+    def add_many(self, entries: Iterable[Dict]):
+        """Index many entries at once: counts first, then one sort of the keys"""
+        with self._lock:
+            for entry in entries:
+                terms = entry_terms(entry)
+                self._remove(entry['id'])
+                for term in terms:
+                    self._counts[term] = self._counts.get(term, 0) + 1
+                self._entry_terms[entry['id']] = terms
+                self._titles[entry['id']] = entry.get('title') or ''
+            self._keys = sorted(self._counts)
+
+    def remove(self, entry_id: str):
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: str):
+        for term in self._entry_terms.pop(entry_id, []):
+            count = self._counts[term] - 1
+            if count:
+                self._counts[term] = count
+            else:
+                del self._counts[term]
+                del self._keys[bisect_left(self._keys, term)]
+        self._titles.pop(entry_id, None)
+
+    def search(self, prefix: str, limit: int = SUGGEST_LIMIT) -> List[Dict]:
+        """
+        Terms starting with prefix, in key order
+
+        Returns {'key', 'text', 'type', 'id' (titles) or 'count'} dicts,
+        one per title/tag/project.
+        """
+        prefix = normalize_prefix(prefix)
+        if not prefix:
+            return []
+
+        results, seen = [], set()
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(results) < limit:
+                key, kind, value = term = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                i += 1
+                if (kind, value) in seen:
+                    continue
+                seen.add((kind, value))
+
+                if kind == 'title':
+                    results.append({'key': key, 'text': self._titles[value], 'type': kind, 'id': value})
+                else:
+                    results.append({'key': key, 'text': value, 'type': kind, 'count': self._counts[term]})
+        return results
@@ -2,7 +2,10 @@
 API routes for The Circle module (Social CRM)
 FastAPI endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
+import asyncio
+import logging
+
+from fastapi import APIRouter, HTTPException, Query, Depends, File, UploadFile
 from typing import Optional, List
 
 from .service import CircleModule
@@ -12,6 +15,7 @@ from core.auth import get_current_user_cloudflare
 router = APIRouter(prefix="/api/v1/circle", tags=["circle"])
 circle = CircleModule()
 get_current_user = get_current_user_cloudflare
+logger = logging.getLogger(__name__)
 
 
 # ========== CONTACT ENDPOINTS ==========
@@ -86,6 +90,41 @@ async def record_contact(contact_id: str, user: dict = Depends(get_current_user)
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/contacts/interactions")
+async def record_contacts(batch: dict, user: dict = Depends(get_current_user)):
+    """Record many interactions at once ({"interactions": [{"contact_id" | "phone" | ..., "date"}]})"""
+    try:
+        interactions = batch.get('interactions')
+        if not isinstance(interactions, list):
+            raise HTTPException(status_code=400, detail="interactions must be a list")
+        return circle.record_contacts(interactions, user_id=user['user_id'])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/contacts/import")
+async def import_contacts(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern='^(vcard|csv)$'),
+    on_conflict: str = Query('skip', pattern='^(skip|update)$'),
+    user: dict = Depends(get_current_user)
+):
+    """Import contacts from a vCard (.vcf) or CSV file"""
+    try:
+        content = (await file.read()).decode('utf-8-sig')
+        result = circle.import_contacts(content, user['user_id'], fmt=format,
+                                        filename=file.filename, on_conflict=on_conflict)
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ========== HEALTH LOG ENDPOINTS ==========
 
 @router.post("/health-logs")
@@ -122,20 +161,6 @@ async def list_health_logs(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/health-logs/{log_id}")
-async def get_health_log(log_id: str, user: dict = Depends(get_current_user)):
-    """Get a single health log"""
-    try:
-        log = circle.get_health_log(log_id, user_id=user['user_id'])
-        if not log:
-            raise HTTPException(status_code=404, detail="Health log not found")
-        return log
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-
 @router.get("/health-logs/analysis")
 async def analyze_health(
     owner: str,
@@ -150,6 +175,33 @@ async def analyze_health(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/health-logs/correlations")
+async def analyze_health_correlations(
+    owner: str,
+    days: int = Query(90, ge=7, le=365),
+    user: dict = Depends(get_current_user)
+):
+    """Trigger lift, lagged biometric correlations and trends for all symptom types"""
+    try:
+        return circle.analyze_health_correlations(owner, days)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/health-logs/{log_id}")
+async def get_health_log(log_id: str, user: dict = Depends(get_current_user)):
+    """Get a single health log"""
+    try:
+        log = circle.get_health_log(log_id, user_id=user['user_id'])
+        if not log:
+            raise HTTPException(status_code=404, detail="Health log not found")
+        return log
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ========== CHECK-IN ENDPOINTS ==========
 
 @router.post("/checkins")
@@ -187,11 +239,21 @@ async def list_checkins(
 
 
 @router.get("/checkins/trends")
-async def get_checkin_trends(days: int = Query(30, le=90)):
-    """Get mood and relationship trends"""
+async def get_checkin_trends(
+    days: int = Query(30, ge=1, le=3650),
+    window: int = Query(7, ge=1, le=365),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """Get mood and relationship trends (moving averages, slopes, change-points)"""
     try:
-        trends = circle.get_checkin_trends(days=days)
+        trends = circle.get_checkin_trends(days=days, window=window,
+                                           start_date=start_date, end_date=end_date)
+        if 'error' in trends:
+            raise HTTPException(status_code=400, detail=trends['error'])
         return trends
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -218,3 +280,21 @@ async def get_stats(user: dict = Depends(get_current_user)):
         return stats
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+async def reminder_scheduler(interval_seconds: int = 60):
+    """Background task: resync the reminder queue, then fire due reminders every tick"""
+    try:
+        queued = await asyncio.to_thread(circle.rebuild_reminders)
+        logger.info(f"Reminder queue synced ({queued} reminders)")
+    except Exception as e:
+        logger.error(f"Reminder queue sync failed: {e}")
+    
+    while True:
+        try:
+            fired = await asyncio.to_thread(circle.drain_reminders)
+            if fired:
+                logger.info(f"Fired {len(fired)} reminders")
+        except Exception as e:
+            logger.error(f"Reminder tick failed: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,183 @@
+"""
+Contact import for The Circle (vCard and CSV)
+
+Parsers turn a file into contact dicts keyed by contacts-table columns;
+CircleModule.import_contacts validates them and bulk-inserts each batch
+in one transaction. contact_keys() gives the normalised identifiers
+(email, phone, Telegram handle, name) used to match imports and logged
+interactions against existing contacts.
+"""
+import csv
+import io
+import re
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+FORMATS = ('vcard', 'csv')
+
+# Keys a contact can be matched on, most specific first
+MATCH_KEYS = ('email', 'phone', 'telegram_handle', 'name')
+
+# CSV header aliases (lowercased, spaces/dashes as underscores)
+CSV_ALIASES = {
+    'full_name': 'name',
+    'display_name': 'name',
+    'mobile': 'phone',
+    'phone_number': 'phone',
+    'e_mail': 'email',
+    'email_address': 'email',
+    'telegram': 'telegram_handle',
+    'frequency': 'contact_frequency',
+    'birthdate': 'birthday',
+    'date_of_birth': 'birthday',
+    'last_contact': 'last_contact_date',
+    'note': 'notes',
+}
+
+CSV_COLUMNS = ('name', 'relationship', 'inner_circle', 'phone', 'email', 'telegram_handle',
+               'contact_frequency', 'birthday', 'last_contact_date', 'notes')
+
+_VCARD_ESCAPES = re.compile(r"\\([\\,;nN])")
+
+
+def detect_format(filename: Optional[str], content: str) -> str:
+    """'vcard' or 'csv' from the file extension, else from the content"""
+    name = (filename or '').lower()
+    if name.endswith(('.vcf', '.vcard')):
+        return 'vcard'
+    if name.endswith('.csv'):
+        return 'csv'
+    return 'vcard' if content.lstrip().upper().startswith('BEGIN:VCARD') else 'csv'
+
+
+def parse_date(value: Optional[str]) -> Optional[str]:
+    """ISO date from YYYY-MM-DD, YYYYMMDD or a timestamp; None if unparseable or yearless"""
+    value = (value or '').strip()
+    if not value or value.startswith('--'):
+        return None
+    digits = value[:10].replace('-', '') if '-' in value[:10] else value[:8]
+    try:
+        return date(int(digits[:4]), int(digits[4:6]), int(digits[6:8])).isoformat()
+    except ValueError:
+        return None
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """Digits only, keeping a leading +"""
+    value = (value or '').strip()
+    digits = re.sub(r"\D", '', value)
+    return ('+' + digits) if value.startswith('+') and digits else digits
+
+
+def contact_keys(contact: Dict) -> List[Tuple[str, str]]:
+    """Normalised (key, value) identifiers of a contact, in MATCH_KEYS order"""
+    keys = []
+    if contact.get('email'):
+        keys.append(('email', contact['email'].strip().lower()))
+    phone = normalize_phone(contact.get('phone'))
+    if phone:
+        keys.append(('phone', phone))
+    if contact.get('telegram_handle'):
+        keys.append(('telegram_handle', contact['telegram_handle'].strip().lstrip('@').lower()))
+    if contact.get('name'):
+        keys.append(('name', ' '.join(contact['name'].split()).lower()))
+    return [(k, v) for k, v in keys if v]
+
+
+def _unescape(value: str) -> str:
+    return _VCARD_ESCAPES.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+def _unfold(text: str) -> Iterator[str]:
+    """vCard logical lines (continuation lines start with a space or tab)"""
+    line = None
+    for raw in text.splitlines():
+        if raw[:1] in (' ', '\t') and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def parse_vcard(text: str) -> Iterator[Tuple[int, Dict]]:
+    """(card number, contact) per BEGIN:VCARD ... END:VCARD block"""
+    card, number = None, 0
+    for line in _unfold(text):
+        if ':' not in line:
+            continue
+        head, value = line.split(':', 1)
+        prop, *params = head.split(';')
+        prop = prop.split('.')[-1].upper()  # drop "item1." groups
+
+        if prop == 'BEGIN' and value.strip().upper() == 'VCARD':
+            card, number = {}, number + 1
+            continue
+        if card is None:
+            continue
+        if prop == 'END':
+            if not card.get('name') and card.get('_n'):
+                family, given = (card['_n'].split(';') + ['', ''])[:2]
+                card['name'] = ' '.join(p for p in (_unescape(given), _unescape(family)) if p)
+            card.pop('_n', None)
+            yield number, card
+            card = None
+            continue
+
+        value = value.strip()
+        if prop == 'FN':
+            card['name'] = _unescape(value)
+        elif prop == 'N':
+            card['_n'] = value
+        elif prop == 'TEL':
+            card.setdefault('phone', value)
+        elif prop == 'EMAIL':
+            card.setdefault('email', value)
+        elif prop == 'BDAY':
+            card['birthday'] = parse_date(value)
+        elif prop == 'ANNIVERSARY' and parse_date(value):
+            card.setdefault('important_dates', []).append(
+                {'type': 'anniversary', 'date': parse_date(value)}
+            )
+        elif prop == 'NOTE':
+            card['notes'] = _unescape(value)
+        elif prop == 'X-TELEGRAM' or (prop == 'IMPP' and value.lower().startswith('telegram:')):
+            card['telegram_handle'] = value.split(':', 1)[-1] if prop == 'IMPP' else value
+        elif prop == 'CATEGORIES':
+            card['categories'] = [_unescape(c).strip().lower() for c in value.split(',')]
+
+
+def parse_csv(text: str) -> Iterator[Tuple[int, Dict]]:
+    """(line number, contact) per CSV row; headers are matched case-insensitively"""
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {}
+    for header in reader.fieldnames or []:
+        key = re.sub(r"[\s\-]+", '_', (header or '').strip().lower())
+        key = CSV_ALIASES.get(key, key)
+        if key in CSV_COLUMNS:
+            columns[header] = key
+
+    for row in reader:
+        contact = {}
+        for header, key in columns.items():
+            value = (row.get(header) or '').strip()
+            if value:
+                contact[key] = value
+        if 'birthday' in contact:
+            contact['birthday'] = parse_date(contact['birthday'])
+        if 'last_contact_date' in contact:
+            contact['last_contact_date'] = parse_date(contact['last_contact_date'])
+        if 'inner_circle' in contact:
+            contact['inner_circle'] = contact['inner_circle'].lower() in ('1', 'true', 'yes', 'y')
+        yield reader.line_num, contact
+
+
+def parse_contacts(text: str, fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """Dispatch to the vCard or CSV parser"""
+    if fmt == 'vcard':
+        return parse_vcard(text)
+    if fmt == 'csv':
+        return parse_csv(text)
+    raise ValueError(f"Unsupported contact format: {fmt} (expected one of {', '.join(FORMATS)})")
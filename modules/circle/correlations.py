@@ -0,0 +1,268 @@
+"""
+Health-trigger correlation engine for The Circle
+
+An owner's health logs and daily biometrics are loaded once into columnar
+NumPy arrays, and every symptom type is analysed in the same pass:
+
+- trigger lift: P(symptom | trigger) / P(symptom), and the mean severity of
+  episodes with the trigger minus those without it
+- lagged correlations: Pearson r between daily mean severity and each daily
+  metric (biometrics, reported stress and sleep) 0..MAX_LAG_DAYS days earlier
+- trends: ROLLING_DAYS rolling mean of daily severity and the least-squares
+  severity slope over the window
+
+Symptoms are a one-hot (log x symptom) matrix and triggers a (log x trigger)
+incidence matrix, so per-symptom statistics are matrix products instead of
+one query and Counter per symptom type.
+"""
+import json
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Tuple
+
+# numpy is imported where used, so importing the API doesn't pay for it
+if TYPE_CHECKING:
+    import numpy as np
+
+MAX_LAG_DAYS = 3
+ROLLING_DAYS = 7
+
+# Paired days needed before a correlation is reported
+MIN_CORRELATION_DAYS = 5
+
+# Severity change (points) across the window beyond which a trend isn't 'stable'
+TREND_THRESHOLD = 1.0
+
+TOP_TRIGGERS = 5
+
+BIOMETRIC_METRICS = ('sleep_score', 'sleep_hours', 'deep_sleep_pct', 'hrv',
+                     'resting_hr', 'recovery_score')
+LOG_METRICS = ('stress_level', 'sleep_quality')
+METRICS = BIOMETRIC_METRICS + LOG_METRICS
+
+
+def biometrics_version(conn, owner: str, start: date, end: date) -> Tuple:
+    """
+    Row count, latest date and metric totals of the owner's biometrics between
+    start and end: changes with any write in the window, by any process, so
+    it can key a cache of the analysis
+    """
+    totals = ', '.join(f"COUNT({m}), TOTAL({m})" for m in BIOMETRIC_METRICS)
+    return tuple(conn.execute(
+        f"""SELECT COUNT(*), MAX(date), {totals} FROM biometrics
+            WHERE owner = ? AND date BETWEEN ? AND ?""",
+        (owner, start.isoformat(), end.isoformat())
+    ).fetchone())
+
+
+def load(conn, owner: str, start: date, end: date, symptom_types: Sequence[str]) -> Dict:
+    """
+    Columnar health logs and daily metrics for owner between start and end
+
+    Returns day offsets from start, symptom codes, severities, a trigger
+    incidence matrix and a (day x metric) matrix with NaN for missing days.
+    """
+    import numpy as np
+
+    n_days = (end - start).days + 1
+    codes = {symptom: i for i, symptom in enumerate(symptom_types)}
+
+    rows = conn.execute(
+        """SELECT date(timestamp) AS day, symptom_type, severity, triggers,
+                  stress_level, sleep_quality
+           FROM health_logs
+           WHERE owner = ? AND timestamp >= ? AND date(timestamp) <= ?""",
+        (owner, start.isoformat(), end.isoformat())
+    ).fetchall()
+    rows = [row for row in rows if row['symptom_type'] in codes and row['severity'] is not None]
+
+    day = np.array([(date.fromisoformat(row['day']) - start).days for row in rows], dtype=np.int64)
+    symptom = np.array([codes[row['symptom_type']] for row in rows], dtype=np.int64)
+    severity = np.array([row['severity'] for row in rows], dtype=np.float64)
+
+    # Log x trigger incidence (a trigger listed twice on one log counts once)
+    trigger_names: Dict[str, int] = {}
+    log_idx, trigger_idx = [], []
+    for i, row in enumerate(rows):
+        for trigger in set(json.loads(row['triggers']) if row['triggers'] else []):
+            log_idx.append(i)
+            trigger_idx.append(trigger_names.setdefault(trigger, len(trigger_names)))
+    triggers = np.zeros((len(rows), len(trigger_names)), dtype=np.float64)
+    triggers[log_idx, trigger_idx] = 1.0
+
+    metrics = np.full((n_days, len(METRICS)), np.nan)
+
+    biometric_columns = ', '.join(f"AVG({m}) AS {m}" for m in BIOMETRIC_METRICS)
+    for row in conn.execute(
+        f"""SELECT date(date) AS day, {biometric_columns}
+            FROM biometrics
+            WHERE owner = ? AND date BETWEEN ? AND ?
+            GROUP BY date(date)""",
+        (owner, start.isoformat(), end.isoformat())
+    ):
+        offset = (date.fromisoformat(row['day']) - start).days
+        metrics[offset, :len(BIOMETRIC_METRICS)] = [
+            np.nan if row[m] is None else row[m] for m in BIOMETRIC_METRICS
+        ]
+
+    # Reported stress/sleep: daily mean over all of the owner's logs
+    for j, name in enumerate(LOG_METRICS, start=len(BIOMETRIC_METRICS)):
+        values = np.array([np.nan if row[name] is None else row[name] for row in rows], dtype=np.float64)
+        present = ~np.isnan(values)
+        sums = np.bincount(day[present], weights=values[present], minlength=n_days)
+        counts = np.bincount(day[present], minlength=n_days)
+        metrics[:, j] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    return {
+        'start': start,
+        'n_days': n_days,
+        'symptom_types': list(symptom_types),
+        'day': day,
+        'symptom': symptom,
+        'severity': severity,
+        'trigger_names': list(trigger_names),
+        'triggers': triggers,
+        'metrics': metrics
+    }
+
+
+def pearson(a: 'np.ndarray', b: 'np.ndarray'):
+    """
+    Pairwise Pearson r between the columns of a (n x p) and b (n x q)
+
+    NaNs are skipped pairwise. Returns (r, n) as (p x q) arrays; r is NaN
+    where fewer than MIN_CORRELATION_DAYS rows pair up or a side is constant.
+    """
+    import numpy as np
+
+    valid_a, valid_b = ~np.isnan(a), ~np.isnan(b)
+    a0, b0 = np.where(valid_a, a, 0.0), np.where(valid_b, b, 0.0)
+    wa, wb = valid_a.astype(np.float64), valid_b.astype(np.float64)
+
+    n = wa.T @ wb
+    sum_a, sum_b = a0.T @ wb, wa.T @ b0
+    cov = n * (a0.T @ b0) - sum_a * sum_b
+    var_a = n * ((a0 * a0).T @ wb) - sum_a ** 2
+    var_b = n * (wa.T @ (b0 * b0)) - sum_b ** 2
+
+    denom = np.sqrt(np.clip(var_a, 0, None) * np.clip(var_b, 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = np.where((n >= MIN_CORRELATION_DAYS) & (denom > 1e-12), cov / denom, np.nan)
+    return np.clip(r, -1.0, 1.0), n
+
+
+def _round(value, digits: int = 2) -> Optional[float]:
+    return None if value != value else round(float(value), digits)
+
+
+def analyze(data: Dict) -> Dict[str, Dict]:
+    """Per-symptom triggers, lagged correlations and trends from load() output"""
+    import numpy as np
+
+    symptom_types = data['symptom_types']
+    n_days, n_sym = data['n_days'], len(symptom_types)
+    day, severity, triggers = data['day'], data['severity'], data['triggers']
+    n_logs = len(severity)
+    if not n_logs:
+        return {}
+
+    onehot = np.zeros((n_logs, n_sym))
+    onehot[np.arange(n_logs), data['symptom']] = 1.0
+
+    episodes = onehot.sum(axis=0)
+    severity_sum = onehot.T @ severity
+
+    # Trigger lift and severity deltas (symptom x trigger)
+    with_trigger = onehot.T @ triggers
+    with_trigger_severity = onehot.T @ (triggers * severity[:, None])
+    trigger_total = triggers.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = (with_trigger / trigger_total) / (episodes[:, None] / n_logs)
+        severity_with = with_trigger_severity / with_trigger
+        severity_without = ((severity_sum[:, None] - with_trigger_severity)
+                            / (episodes[:, None] - with_trigger))
+
+    # Daily mean severity per symptom (NaN on days without an episode)
+    daily_sum = np.zeros((n_days, n_sym))
+    daily_n = np.zeros((n_days, n_sym))
+    np.add.at(daily_sum, (day, data['symptom']), severity)
+    np.add.at(daily_n, (day, data['symptom']), 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily = np.where(daily_n > 0, daily_sum / daily_n, np.nan)
+
+    # Every metric at every lag side by side: one correlation matrix product
+    metrics = data['metrics']
+    n_met = metrics.shape[1]
+    lagged = np.full((n_days, (MAX_LAG_DAYS + 1) * n_met), np.nan)
+    for lag in range(MAX_LAG_DAYS + 1):
+        if lag < n_days:
+            lagged[lag:, lag * n_met:(lag + 1) * n_met] = metrics[:n_days - lag]
+    r, paired = pearson(daily, lagged)
+
+    # Rolling mean of daily severity over ROLLING_DAYS (cumulative sums)
+    cum_sum = np.vstack([np.zeros((1, n_sym)), np.cumsum(daily_sum, axis=0)])
+    cum_n = np.vstack([np.zeros((1, n_sym)), np.cumsum(daily_n, axis=0)])
+    idx = np.arange(n_days)
+    lo = np.maximum(idx + 1 - ROLLING_DAYS, 0)
+    window_sum, window_n = cum_sum[idx + 1] - cum_sum[lo], cum_n[idx + 1] - cum_n[lo]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rolling = np.where(window_n > 0, window_sum / window_n, np.nan)
+
+    # Least-squares severity slope per symptom (points per day)
+    x = day.astype(np.float64)
+    sum_x, sum_xx, sum_xy = onehot.T @ x, onehot.T @ (x * x), onehot.T @ (x * severity)
+    denom = episodes * sum_xx - sum_x ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denom > 0, (episodes * sum_xy - sum_x * severity_sum) / denom, np.nan)
+    first_day = np.where(onehot > 0, x[:, None], np.inf).min(axis=0)
+    last_day = np.where(onehot > 0, x[:, None], -np.inf).max(axis=0)
+
+    start = data['start']
+    results = {}
+    for s, symptom_type in enumerate(symptom_types):
+        if not episodes[s]:
+            continue
+
+        seen = np.nonzero(with_trigger[s])[0]
+        order = sorted(seen, key=lambda t: (-lift[s, t], -with_trigger[s, t], data['trigger_names'][t]))
+        top = [{
+            'trigger': data['trigger_names'][t],
+            'count': int(with_trigger[s, t]),
+            'lift': _round(lift[s, t]),
+            'severity_with': _round(severity_with[s, t], 1),
+            'severity_delta': _round(severity_with[s, t] - severity_without[s, t], 1)
+        } for t in order[:TOP_TRIGGERS]]
+
+        correlations = []
+        for k in np.nonzero(~np.isnan(r[s]))[0]:
+            correlations.append({
+                'metric': METRICS[k % n_met],
+                'lag_days': int(k // n_met),
+                'r': _round(r[s, k], 3),
+                'days': int(paired[s, k])
+            })
+        correlations.sort(key=lambda c: -abs(c['r']))
+
+        change = slope[s] * (last_day[s] - first_day[s])
+        if change != change:
+            trend = 'unknown'
+        elif change < -TREND_THRESHOLD:
+            trend = 'improving'
+        elif change > TREND_THRESHOLD:
+            trend = 'worsening'
+        else:
+            trend = 'stable'
+
+        results[symptom_type] = {
+            'episode_count': int(episodes[s]),
+            'avg_severity': _round(severity_sum[s] / episodes[s], 1),
+            'severity_trend': trend,
+            'slope_per_week': _round(slope[s] * 7),
+            'triggers': top,
+            'correlations': correlations,
+            'rolling': [
+                {'date': (start + timedelta(days=int(i))).isoformat(),
+                 'avg_severity': _round(rolling[i, s])}
+                for i in np.nonzero(~np.isnan(rolling[:, s]))[0]
+            ]
+        }
+    return results
@@ -0,0 +1,184 @@
+"""
+Reminder queue for The Circle
+
+Reminders are materialised into reminder_queue when the data behind them
+changes, instead of being recomputed on every read:
+
+- contact_ping: due on the contact's next_scheduled_ping
+- birthday: due BIRTHDAY_WINDOW_DAYS before the next birthday, expires
+  the day after it (then rolled to the following year)
+- health_alert: due when an owner's 7-day reflux average goes above 6,
+  removed when it drops back
+
+One row per (kind, ref_id). Reads are range scans on (owner, kind, due_at);
+the scheduler tick fires rows whose due_at has passed (fired_at is set) and
+rolls expired birthdays forward. Timestamps (health alert due_at, fired_at)
+are naive UTC, like the CURRENT_TIMESTAMP health_logs are stamped with;
+contact pings and birthdays are due on calendar dates.
+"""
+import json
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+BIRTHDAY_WINDOW_DAYS = 30
+
+# Health alert rule: reflux episodes over the last week
+HEALTH_ALERT_SYMPTOM = 'reflux'
+HEALTH_ALERT_DAYS = 7
+HEALTH_ALERT_SEVERITY = 6
+
+
+def next_birthday(birthday: date, today: date) -> date:
+    """Next occurrence on or after today (29 Feb falls on 28 Feb in common years)"""
+    for year in (today.year, today.year + 1):
+        try:
+            candidate = birthday.replace(year=year)
+        except ValueError:
+            candidate = date(year, 2, 28)
+        if candidate >= today:
+            return candidate
+    return candidate
+
+
+def _upsert(conn, owner: str, kind: str, ref_id: str, due_at: str,
+            expires_at: Optional[str] = None, payload: Optional[Dict] = None):
+    """Insert or move a reminder; moving it to a new due_at re-arms it"""
+    conn.execute(
+        """INSERT INTO reminder_queue (owner, kind, ref_id, due_at, expires_at, payload)
+           VALUES (?, ?, ?, ?, ?, ?)
+           ON CONFLICT(kind, ref_id) DO UPDATE SET
+               owner = excluded.owner,
+               expires_at = excluded.expires_at,
+               payload = excluded.payload,
+               fired_at = CASE WHEN due_at = excluded.due_at THEN fired_at END,
+               due_at = excluded.due_at""",
+        (owner, kind, ref_id, due_at, expires_at, json.dumps(payload) if payload is not None else None)
+    )
+
+
+def _remove(conn, kind: str, ref_id: str):
+    conn.execute("DELETE FROM reminder_queue WHERE kind = ? AND ref_id = ?", (kind, ref_id))
+
+
+def schedule_contact(conn, contact: Dict, today: date):
+    """(Re)schedule a contact's ping and birthday reminders"""
+    if contact.get('next_scheduled_ping'):
+        _upsert(conn, contact['owner'], 'contact_ping', contact['id'], contact['next_scheduled_ping'])
+    else:
+        _remove(conn, 'contact_ping', contact['id'])
+
+    if contact.get('birthday'):
+        upcoming = next_birthday(date.fromisoformat(contact['birthday']), today)
+        _upsert(conn, contact['owner'], 'birthday', contact['id'],
+                (upcoming - timedelta(days=BIRTHDAY_WINDOW_DAYS)).isoformat(),
+                expires_at=(upcoming + timedelta(days=1)).isoformat(),
+                payload={'date': upcoming.isoformat()})
+    else:
+        _remove(conn, 'birthday', contact['id'])
+
+
+def schedule_contacts(conn, contact_ids: List[str], today: date):
+    """(Re)schedule several contacts after a batch write"""
+    for contact in conn.execute(
+        """SELECT id, owner, next_scheduled_ping, birthday FROM contacts
+           WHERE id IN (SELECT value FROM json_each(?))""",
+        (json.dumps(contact_ids),)
+    ).fetchall():
+        schedule_contact(conn, dict(contact), today)
+
+
+def utcnow() -> datetime:
+    """Current time as naive UTC, the clock SQLite's CURRENT_TIMESTAMP and datetime('now') use"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def refresh_health_alert(conn, owner: str):
+    """Raise or clear the owner's health alert from the last week of logs"""
+    row = conn.execute(
+        f"""SELECT COUNT(*) AS count, AVG(severity) AS avg_severity
+            FROM health_logs
+            WHERE owner = ? AND symptom_type = ?
+              AND timestamp > datetime('now', '-{HEALTH_ALERT_DAYS} days')""",
+        (owner, HEALTH_ALERT_SYMPTOM)
+    ).fetchone()
+
+    ref_id = f"{owner}:{HEALTH_ALERT_SYMPTOM}"
+    if row['count'] and row['avg_severity'] > HEALTH_ALERT_SEVERITY:
+        existing = conn.execute(
+            "SELECT due_at FROM reminder_queue WHERE kind = 'health_alert' AND ref_id = ?",
+            (ref_id,)
+        ).fetchone()
+        due_at = existing['due_at'] if existing else utcnow().isoformat(timespec='seconds')
+        _upsert(conn, owner, 'health_alert', ref_id, due_at, payload={
+            'symptom_type': HEALTH_ALERT_SYMPTOM,
+            'episode_count': row['count'],
+            'avg_severity': round(row['avg_severity'], 1)
+        })
+    else:
+        _remove(conn, 'health_alert', ref_id)
+
+
+def rebuild(conn, today: date) -> int:
+    """
+    Reschedule every contact and health alert (startup / backfill)
+
+    Idempotent: rows whose due_at doesn't change keep their fired state,
+    so a restart doesn't fire reminders again.
+    """
+    conn.execute(
+        """DELETE FROM reminder_queue
+           WHERE kind IN ('contact_ping', 'birthday')
+             AND ref_id NOT IN (SELECT id FROM contacts)"""
+    )
+    contacts = conn.execute(
+        """SELECT id, owner, next_scheduled_ping, birthday FROM contacts
+           WHERE next_scheduled_ping IS NOT NULL OR birthday IS NOT NULL"""
+    ).fetchall()
+    for contact in contacts:
+        schedule_contact(conn, dict(contact), today)
+    for row in conn.execute("SELECT DISTINCT owner FROM health_logs WHERE symptom_type = ?",
+                            (HEALTH_ALERT_SYMPTOM,)).fetchall():
+        refresh_health_alert(conn, row['owner'])
+    return conn.execute("SELECT COUNT(*) FROM reminder_queue").fetchone()[0]
+
+
+def drain(conn, now: datetime) -> List[Dict]:
+    """
+    Fire due reminders and roll the queue forward
+
+    Marks every unfired row with due_at <= now as fired and returns them;
+    birthdays past their expiry are rescheduled for the next year, and
+    active health alerts are re-evaluated as episodes age out. `now` is
+    UTC; an aware datetime is converted.
+    """
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)
+    now_str = now.isoformat(timespec='seconds')
+    today = now.date()
+
+    due = [dict(row) for row in conn.execute(
+        """SELECT owner, kind, ref_id, due_at, payload FROM reminder_queue
+           WHERE fired_at IS NULL AND due_at <= ?
+           ORDER BY due_at""",
+        (now_str,)
+    )]
+    conn.executemany(
+        "UPDATE reminder_queue SET fired_at = ? WHERE kind = ? AND ref_id = ?",
+        [(now_str, row['kind'], row['ref_id']) for row in due]
+    )
+
+    expired = conn.execute(
+        """SELECT c.id, c.owner, c.next_scheduled_ping, c.birthday
+           FROM reminder_queue q JOIN contacts c ON c.id = q.ref_id
+           WHERE q.kind = 'birthday' AND q.expires_at <= ?""",
+        (today.isoformat(),)
+    ).fetchall()
+    for contact in expired:
+        schedule_contact(conn, dict(contact), today)
+
+    for row in conn.execute("SELECT owner FROM reminder_queue WHERE kind = 'health_alert'").fetchall():
+        refresh_health_alert(conn, row['owner'])
+
+    for row in due:
+        row['payload'] = json.loads(row['payload']) if row['payload'] else None
+    return due
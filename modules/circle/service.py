@@ -2,13 +2,17 @@
 Module 3: The Circle (Social CRM)
 Contact management, health logs, couple journal, insights
 """
+import copy
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
 from collections import Counter
 from pathlib import Path
 
 from core.database import get_db, generate_uuid, log_audit
+from modules.circle import contact_import, correlations
+from modules.circle import reminders as reminder_queue
+from modules.circle import trends
 
 
 class CircleModule:
@@ -17,9 +21,23 @@ class CircleModule:
     SYMPTOM_TYPES = ['allergy', 'reflux', 'mood', 'energy', 'pain', 'sleep']
     RELATIONSHIP_TYPES = ['family', 'friend', 'colleague', 'mentor', 'other']
     CONTACT_FREQUENCIES = ['weekly', 'biweekly', 'monthly', 'quarterly']
+    CONTACT_FREQUENCY_DAYS = {'weekly': 7, 'biweekly': 14, 'monthly': 30, 'quarterly': 90}
+    
+    # Reminders: birthday look-ahead, and check-ins behind the relationship alert
+    BIRTHDAY_WINDOW_DAYS = reminder_queue.BIRTHDAY_WINDOW_DAYS
+    VIBE_TREND_CHECKINS = 14
     
     def __init__(self):
         self.db_path = Path(__file__).parent.parent.parent / "data" / "levy.db"
+        
+        # Per-user reminders: (date computed, write generation, reminders)
+        self._reminders_cache: Dict[str, Tuple[date, int, Dict]] = {}
+        self._reminders_generation = 0
+        
+        # Per-(owner, days) correlation analysis:
+        # (date computed, owner's (health log generation, biometrics version), result)
+        self._correlations_cache: Dict[Tuple[str, int], Tuple[date, Tuple[int, Tuple], Dict]] = {}
+        self._health_generations: Dict[str, int] = {}
     
     # ========== CONTACT MANAGEMENT ==========
     
@@ -53,9 +71,11 @@ class CircleModule:
                     data.get('notes')
                 )
             )
+            self._schedule_contact(conn, contact_id)
         
         log_audit(user_id, 'circle', 'create', 'contact', contact_id,
                  {'name': data['name'], 'relationship': data['relationship']})
+        self._invalidate_reminders()
         
         return {'id': contact_id, 'status': 'created', 'next_scheduled_ping': next_ping}
     
@@ -112,7 +132,7 @@ class CircleModule:
         
         for field in ['name', 'relationship', 'inner_circle', 'phone', 'email',
                      'telegram_handle', 'last_contact_date', 'contact_frequency',
-                     'notes']:
+                     'birthday', 'notes']:
             if field in data:
                 update_fields.append(f"{field} = ?")
                 params.append(data[field])
@@ -137,55 +157,236 @@ class CircleModule:
                 f"UPDATE contacts SET {', '.join(update_fields)} WHERE id = ?",
                 params
             )
+            self._schedule_contact(conn, contact_id)
         
         log_audit(user_id, 'circle', 'update', 'contact', contact_id, data)
+        self._invalidate_reminders()
         
         return {'id': contact_id, 'status': 'updated'}
     
     def record_contact(self, contact_id: str, user_id: str) -> Dict:
         """Record that you contacted this person"""
-        contact = self.get_contact(contact_id, user_id)
-        if not contact:
-            return {'error': 'Contact not found'}
+        today = datetime.now().date().isoformat()
         
-        # Update last contact date
+        # Update last contact date and recalculate next ping in one statement
         with get_db() as conn:
-            conn.execute(
-                "UPDATE contacts SET last_contact_date = ? WHERE id = ?",
-                (datetime.now().date().isoformat(), contact_id)
-            )
+            row = conn.execute(
+                f"""UPDATE contacts
+                    SET last_contact_date = ?, next_scheduled_ping = {self._next_ping_sql('?')}
+                    WHERE id = ?
+                    RETURNING name, next_scheduled_ping""",
+                (today, today, contact_id)
+            ).fetchone()
+            if not row:
+                return {'error': 'Contact not found'}
+            self._schedule_contact(conn, contact_id)
         
-        # Recalculate next ping
-        next_ping = self._calculate_next_ping(contact.get('contact_frequency'))
+        log_audit(user_id, 'circle', 'contact', 'contact', contact_id,
+                 {'contact_name': row['name']})
+        self._invalidate_reminders()
+        
+        return {'id': contact_id, 'last_contact_date': today,
+                'next_scheduled_ping': row['next_scheduled_ping']}
+    
+    def record_contacts(self, interactions: List[Dict], user_id: str) -> Dict:
+        """
+        Record many interactions at once (e.g. from a chat-log import)
+        
+        Each interaction names one of the user's contacts by contact_id,
+        email, phone, telegram_handle or name, with an optional ISO date
+        (default today). One transaction: last_contact_date is moved forward
+        with a single executemany and next_scheduled_ping recomputed set-wise
+        from it; one audit entry covers the batch.
+        """
+        today = datetime.now().date()
+        latest: Dict[str, str] = {}
+        unmatched, invalid = [], []
         
         with get_db() as conn:
-            conn.execute(
-                "UPDATE contacts SET next_scheduled_ping = ? WHERE id = ?",
-                (next_ping, contact_id)
+            lookup = self._contact_lookup(conn, user_id)
+            
+            for i, interaction in enumerate(interactions):
+                when = contact_import.parse_date(str(interaction.get('date') or today.isoformat()))
+                if not when or when > today.isoformat():
+                    invalid.append(i)
+                    continue
+                
+                contact_id = interaction.get('contact_id')
+                if contact_id not in lookup['ids']:
+                    contact_id = self._match_contact(lookup, interaction)
+                if not contact_id:
+                    unmatched.append(i)
+                    continue
+                latest[contact_id] = max(latest.get(contact_id, ''), when)
+            
+            if latest:
+                conn.executemany(
+                    """UPDATE contacts SET last_contact_date = ?
+                       WHERE id = ? AND (last_contact_date IS NULL OR last_contact_date < ?)""",
+                    [(when, contact_id, when) for contact_id, when in latest.items()]
+                )
+                ids = json.dumps(list(latest))
+                conn.execute(
+                    f"""UPDATE contacts SET next_scheduled_ping = {self._next_ping_sql('last_contact_date')}
+                        WHERE id IN (SELECT value FROM json_each(?))""",
+                    (ids,)
+                )
+                reminder_queue.schedule_contacts(conn, list(latest), today)
+                contacts = [dict(row) for row in conn.execute(
+                    """SELECT id, name, last_contact_date, next_scheduled_ping FROM contacts
+                       WHERE id IN (SELECT value FROM json_each(?)) ORDER BY name""",
+                    (ids,)
+                )]
+            else:
+                contacts = []
+        
+        if latest:
+            log_audit(user_id, 'circle', 'contact', 'contact_batch', None,
+                     {'contacts': len(latest), 'interactions': len(interactions) - len(unmatched) - len(invalid)})
+            self._invalidate_reminders()
+        
+        return {
+            'recorded': len(latest),
+            'interactions': len(interactions) - len(unmatched) - len(invalid),
+            'unmatched': unmatched,
+            'invalid': invalid,
+            'contacts': contacts
+        }
+    
+    def import_contacts(self, content: str, user_id: str, fmt: str = None,
+                        filename: str = None, on_conflict: str = 'skip') -> Dict:
+        """
+        Import contacts from a vCard or CSV file
+        
+        Contacts matching an existing one of the user's (by email, phone or
+        Telegram handle) are skipped, or filled in with on_conflict='update'.
+        New and updated rows are each one executemany in a single
+        transaction; next_scheduled_ping is then computed set-wise.
+        """
+        if on_conflict not in ('skip', 'update'):
+            return {'error': "on_conflict must be 'skip' or 'update'"}
+        
+        fmt = fmt or contact_import.detect_format(filename, content)
+        if fmt not in contact_import.FORMATS:
+            return {'error': f"Unsupported format: {fmt}"}
+        
+        columns = ['relationship', 'inner_circle', 'phone', 'email', 'telegram_handle',
+                   'contact_frequency', 'birthday', 'last_contact_date', 'notes']
+        today = datetime.now().date()
+        new, updates, failed = [], [], []
+        skipped = 0
+        rescheduled = []
+        
+        with get_db() as conn:
+            lookup = self._contact_lookup(conn, user_id)
+            
+            for number, contact in contact_import.parse_contacts(content, fmt):
+                if not contact.get('name'):
+                    failed.append({'record': number, 'error': 'Missing name'})
+                    continue
+                
+                # Unknown relationships fall back to a category; 'other' only for new
+                # contacts, so an update keeps the stored relationship
+                if contact.get('relationship') not in self.RELATIONSHIP_TYPES:
+                    categories = [c for c in contact.get('categories', []) if c in self.RELATIONSHIP_TYPES]
+                    contact['relationship'] = categories[0] if categories else None
+                if contact.get('contact_frequency') not in self.CONTACT_FREQUENCIES:
+                    contact['contact_frequency'] = None
+                
+                existing = self._match_contact(lookup, contact, keys=('email', 'phone', 'telegram_handle'))
+                if existing:
+                    if on_conflict == 'update':
+                        updates.append([contact.get(c) for c in ['name'] + columns] + [existing])
+                        if contact.get('contact_frequency'):
+                            rescheduled.append(existing)
+                    else:
+                        skipped += 1
+                    continue
+                
+                contact_id = f"cnt_{generate_uuid()}"
+                values = dict(contact, relationship=contact['relationship'] or 'other',
+                              inner_circle=bool(contact.get('inner_circle')))
+                new.append([contact_id, user_id, contact['name']]
+                           + [values.get(c) for c in columns]
+                           + [json.dumps(contact.get('important_dates', []))])
+                rescheduled.append(contact_id)
+                
+                # Later rows in the same file match this one
+                lookup['ids'].add(contact_id)
+                for key in contact_import.contact_keys(contact):
+                    lookup['keys'].setdefault(key, contact_id)
+            
+            conn.executemany(
+                f"""INSERT INTO contacts (id, owner, name, {', '.join(columns)}, important_dates)
+                    VALUES ({', '.join('?' * (len(columns) + 4))})""",
+                new
+            )
+            conn.executemany(
+                f"""UPDATE contacts SET {', '.join(f'{c} = COALESCE(?, {c})' for c in ['name'] + columns)}
+                    WHERE id = ?""",
+                updates
             )
+            if rescheduled:
+                conn.execute(
+                    f"""UPDATE contacts
+                        SET next_scheduled_ping = {self._next_ping_sql('COALESCE(last_contact_date, ?)')}
+                        WHERE id IN (SELECT value FROM json_each(?))""",
+                    (today.isoformat(), json.dumps(rescheduled))
+                )
+            reminder_queue.schedule_contacts(conn, [row[0] for row in new] + [row[-1] for row in updates], today)
         
-        log_audit(user_id, 'circle', 'contact', 'contact', contact_id,
-                 {'contact_name': contact['name']})
+        stats = {'imported': len(new), 'updated': len(updates), 'skipped': skipped, 'failed': len(failed)}
+        log_audit(user_id, 'circle', 'import', 'contacts', None, {'format': fmt, **stats})
+        if new or updates:
+            self._invalidate_reminders()
         
-        return {'id': contact_id, 'last_contact_date': datetime.now().date().isoformat(),
-                'next_scheduled_ping': next_ping}
+        return {'status': 'completed', 'format': fmt, **stats, 'errors': failed}
+    
+    def _contact_lookup(self, conn, user_id: str) -> Dict:
+        """The user's contact ids and their normalised identifiers (ambiguous ones map to None)"""
+        lookup = {'ids': set(), 'keys': {}}
+        for row in conn.execute(
+            "SELECT id, name, phone, email, telegram_handle FROM contacts WHERE owner = ?",
+            (user_id,)
+        ):
+            lookup['ids'].add(row['id'])
+            for key in contact_import.contact_keys(dict(row)):
+                if lookup['keys'].setdefault(key, row['id']) != row['id']:
+                    lookup['keys'][key] = None
+        return lookup
+    
+    def _match_contact(self, lookup: Dict, data: Dict,
+                       keys=contact_import.MATCH_KEYS) -> Optional[str]:
+        """First contact id whose identifiers match data's, by key specificity"""
+        for key in contact_import.contact_keys(data):
+            if key[0] in keys and lookup['keys'].get(key):
+                return lookup['keys'][key]
+        return None
     
     def _calculate_next_ping(self, frequency: str) -> Optional[str]:
         """Calculate next scheduled ping date"""
         if not frequency:
             return None
         
-        days_map = {
-            'weekly': 7,
-            'biweekly': 14,
-            'monthly': 30,
-            'quarterly': 90
-        }
-        
-        days = days_map.get(frequency, 30)
+        days = self.CONTACT_FREQUENCY_DAYS.get(frequency, 30)
         next_date = datetime.now() + timedelta(days=days)
         return next_date.date().isoformat()
     
+    def _next_ping_sql(self, base: str) -> str:
+        """SQL for _calculate_next_ping counted from `base` (per row, set-wise)"""
+        cases = ' '.join(f"WHEN '{f}' THEN {d}" for f, d in self.CONTACT_FREQUENCY_DAYS.items())
+        return (f"CASE WHEN IFNULL(contact_frequency, '') = '' THEN NULL "
+                f"ELSE date({base}, '+' || (CASE contact_frequency {cases} ELSE 30 END) || ' days') END")
+    
+    def _schedule_contact(self, conn, contact_id: str):
+        """Move the contact's queued ping/birthday reminders (same transaction as the write)"""
+        row = conn.execute(
+            "SELECT id, owner, next_scheduled_ping, birthday FROM contacts WHERE id = ?",
+            (contact_id,)
+        ).fetchone()
+        if row:
+            reminder_queue.schedule_contact(conn, dict(row), datetime.now().date())
+    
     # ========== HEALTH LOGS ==========
     
     def create_health_log(self, data: Dict, logged_by: str) -> Dict:
@@ -220,9 +421,13 @@ class CircleModule:
                     data.get('remedy_effectiveness')
                 )
             )
+            if data['symptom_type'] == reminder_queue.HEALTH_ALERT_SYMPTOM:
+                reminder_queue.refresh_health_alert(conn, data['owner'])
         
         log_audit(logged_by, 'circle', 'create', 'health_log', log_id,
                  {'owner': data['owner'], 'symptom': data['symptom_type'], 'severity': severity})
+        self._invalidate_reminders()
+        self._health_generations[data['owner']] = self._health_generations.get(data['owner'], 0) + 1
         
         return {'id': log_id, 'status': 'created'}
     
@@ -342,6 +547,42 @@ class CircleModule:
             'insights': insights
         }
     
+    def analyze_health_correlations(self, owner: str, days: int = 90) -> Dict:
+        """
+        Trigger lift, lagged biometric correlations and severity trends for
+        every symptom type of an owner (see circle/correlations.py)
+        
+        Cached per owner and window for the day; a new health log for the
+        owner recomputes it, as does any change to the owner's biometrics in
+        the window (read from the database, so imports by other processes
+        such as bin/ingest-biometrics count).
+        """
+        today = datetime.now().date()
+        key = (owner, days)
+        start = today - timedelta(days=days - 1)
+        
+        with get_db() as conn:
+            generation = (self._health_generations.get(owner, 0),
+                          correlations.biometrics_version(conn, owner, start, today))
+            cached = self._correlations_cache.get(key)
+            if cached and cached[0] == today and cached[1] == generation:
+                return copy.deepcopy(cached[2])
+            
+            data = correlations.load(conn, owner, start, today, self.SYMPTOM_TYPES)
+        symptoms = correlations.analyze(data)
+        
+        result = {
+            'owner': owner,
+            'days': days,
+            'start_date': start.isoformat(),
+            'end_date': today.isoformat(),
+            'episode_count': sum(s['episode_count'] for s in symptoms.values()),
+            'symptoms': symptoms
+        }
+        self._correlations_cache[key] = (today, generation, result)
+        
+        return copy.deepcopy(result)
+    
     # ========== RELATIONSHIP CHECK-INS ==========
     
     def create_checkin(self, data: Dict, user_id: str) -> Dict:
@@ -381,6 +622,7 @@ class CircleModule:
         log_audit(user_id, 'circle', 'create', 'checkin', checkin_id,
                  {'faza_mood': data['faza_mood'], 'gaby_mood': data['gaby_mood'],
                   'vibe': data['relationship_vibe']})
+        self._invalidate_reminders()
         
         return {'id': checkin_id, 'status': 'created', 'sentiment_score': sentiment_score}
     
@@ -418,40 +660,63 @@ class CircleModule:
         
         return checkins
     
-    def get_checkin_trends(self, days: int = 30) -> Dict:
-        """Get mood and relationship trends"""
-        checkins = self.get_checkins(limit=days)
+    def get_checkin_trends(self, days: int = 30, window: int = trends.MOVING_AVERAGE_DAYS,
+                          start_date: str = None, end_date: str = None) -> Dict:
+        """
+        Mood and relationship trends over a date range
         
-        if not checkins:
-            return {
+        The range is start_date..end_date, or the last `days` calendar days.
+        Everything is read from the daily rollup, so cost grows with the
+        number of days, not check-ins (see circle/trends.py).
+        """
+        end = date.fromisoformat(end_date) if end_date else datetime.now().date()
+        start = date.fromisoformat(start_date) if start_date else end - timedelta(days=days - 1)
+        if start > end:
+            return {'error': 'start_date must be on or before end_date'}
+        
+        with get_db() as conn:
+            totals = trends.summary(conn, start, end)
+            moving = trends.moving_averages(conn, start, end, window)
+            changes = trends.change_points(conn, start, end)
+        
+        metrics = totals['metrics']
+        for name, metric in metrics.items():
+            metric['change_point'] = changes[name]
+        
+        result = {
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'window_days': window,
+            'checkin_count': totals['checkins'],
+            'days_with_checkins': totals['days_with_checkins'],
+            'metrics': metrics,
+            'moving_averages': moving
+        }
+        
+        if not totals['checkins']:
+            result.update({
                 'faza_avg_mood': 0,
                 'gaby_avg_mood': 0,
                 'relationship_avg_vibe': 0,
                 'trend': 'unknown',
                 'insights': []
-            }
-        
-        # Calculate averages
-        faza_avg = sum(c['faza_mood'] for c in checkins) / len(checkins)
-        gaby_avg = sum(c['gaby_mood'] for c in checkins) / len(checkins)
-        vibe_avg = sum(c['relationship_vibe'] for c in checkins) / len(checkins)
+            })
+            return result
         
-        # Determine trend
-        recent = checkins[:len(checkins)//3] if len(checkins) >= 3 else checkins
-        early = checkins[-len(checkins)//3:] if len(checkins) >= 3 else checkins
+        faza_avg = metrics['faza_mood']['avg'] or 0
+        gaby_avg = metrics['gaby_mood']['avg'] or 0
+        vibe_avg = metrics['relationship_vibe']['avg'] or 0
         
-        if len(recent) > 0 and len(early) > 0:
-            recent_vibe = sum(c['relationship_vibe'] for c in recent) / len(recent)
-            early_vibe = sum(c['relationship_vibe'] for c in early) / len(early)
-            
-            if recent_vibe > early_vibe + 0.5:
-                trend = 'improving'
-            elif recent_vibe < early_vibe - 0.5:
-                trend = 'declining'
-            else:
-                trend = 'stable'
-        else:
+        # Trend: fitted vibe change across the range, same 0.5 point bar as _vibe_trend
+        slope = metrics['relationship_vibe']['slope_per_day']
+        if slope is None:
             trend = 'unknown'
+        elif slope * (end - start).days > 0.5:
+            trend = 'improving'
+        elif slope * (end - start).days < -0.5:
+            trend = 'declining'
+        else:
+            trend = 'stable'
         
         # Generate insights
         insights = []
@@ -470,20 +735,67 @@ class CircleModule:
         elif trend == 'declining':
             insights.append("Relationship health is declining - consider addressing friction points")
         
-        return {
+        vibe_change = changes['relationship_vibe']
+        if vibe_change:
+            direction = 'rose' if vibe_change['delta'] > 0 else 'dropped'
+            insights.append(f"Relationship vibe {direction} from {vibe_change['before']:.1f} "
+                            f"to {vibe_change['after']:.1f} around {vibe_change['date']}")
+        
+        result.update({
             'faza_avg_mood': round(faza_avg, 1),
             'gaby_avg_mood': round(gaby_avg, 1),
             'relationship_avg_vibe': round(vibe_avg, 1),
             'trend': trend,
-            'checkin_count': len(checkins),
             'insights': insights
-        }
+        })
+        return result
+    
+    def _vibe_trend(self, vibes: List[int]) -> str:
+        """Compare the newest third of vibes (newest first) with the oldest third"""
+        recent = vibes[:len(vibes)//3] if len(vibes) >= 3 else vibes
+        early = vibes[-len(vibes)//3:] if len(vibes) >= 3 else vibes
+        
+        if not recent or not early:
+            return 'unknown'
+        
+        recent_vibe = sum(recent) / len(recent)
+        early_vibe = sum(early) / len(early)
+        
+        if recent_vibe > early_vibe + 0.5:
+            return 'improving'
+        elif recent_vibe < early_vibe - 0.5:
+            return 'declining'
+        return 'stable'
     
     # ========== REMINDERS ==========
     
     def get_reminders(self, user_id: str) -> Dict:
-        """Get pending reminders (contacts, birthdays, health alerts)"""
+        """
+        Get pending reminders (contacts, birthdays, health alerts)
+        
+        Cached per user until the next contact, health log or check-in
+        write, or until midnight (birthday and ping windows move daily).
+        """
         today = datetime.now().date()
+        
+        cached = self._reminders_cache.get(user_id)
+        if cached and cached[0] == today and cached[1] == self._reminders_generation:
+            return copy.deepcopy(cached[2])
+        
+        generation = self._reminders_generation
+        reminders = self._compute_reminders(user_id, today)
+        self._reminders_cache[user_id] = (today, generation, reminders)
+        
+        return copy.deepcopy(reminders)
+    
+    def _compute_reminders(self, user_id: str, today: date) -> Dict:
+        """
+        All reminder sections on one connection, read from reminder_queue
+        
+        Pings and birthdays are range scans on (owner, kind, due_at); the
+        queue is kept current by contact/health log writes and the
+        scheduler tick, so nothing is derived from contacts here.
+        """
         today_str = today.isoformat()
         
         reminders = {
@@ -493,86 +805,105 @@ class CircleModule:
             'relationship_alerts': []
         }
         
-        # Contact reminders (overdue pings)
         with get_db() as conn:
-            cursor = conn.execute(
-                """SELECT * FROM contacts
-                   WHERE owner = ? AND next_scheduled_ping IS NOT NULL
-                   AND next_scheduled_ping <= ?
-                   ORDER BY next_scheduled_ping""",
+            # Contact reminders (overdue pings)
+            for row in conn.execute(
+                """SELECT c.id, c.name, c.relationship, c.last_contact_date, q.due_at
+                   FROM reminder_queue q JOIN contacts c ON c.id = q.ref_id
+                   WHERE q.owner = ? AND q.kind = 'contact_ping' AND q.due_at <= ?
+                   ORDER BY q.due_at""",
                 (user_id, today_str)
-            )
-            
-            for row in cursor:
-                contact = dict(row)
+            ):
                 reminders['contacts_to_ping'].append({
-                    'id': contact['id'],
-                    'name': contact['name'],
-                    'relationship': contact['relationship'],
-                    'last_contact': contact['last_contact_date'],
-                    'next_scheduled_ping': contact['next_scheduled_ping'],
-                    'overdue_days': (today - datetime.fromisoformat(contact['next_scheduled_ping']).date()).days
+                    'id': row['id'],
+                    'name': row['name'],
+                    'relationship': row['relationship'],
+                    'last_contact': row['last_contact_date'],
+                    'next_scheduled_ping': row['due_at'],
+                    'overdue_days': (today - date.fromisoformat(row['due_at'])).days
                 })
-        
-        # Birthday reminders (next 30 days)
-        with get_db() as conn:
-            cursor = conn.execute(
-                """SELECT * FROM contacts
-                   WHERE owner = ? AND birthday IS NOT NULL""",
-                (user_id,)
-            )
             
-            for row in cursor:
-                contact = dict(row)
-                birthday = datetime.strptime(contact['birthday'], '%Y-%m-%d').date()
-                birthday_this_year = birthday.replace(year=today.year)
-                
-                if birthday_this_year < today:
-                    birthday_this_year = birthday.replace(year=today.year + 1)
-                
-                days_until = (birthday_this_year - today).days
-                
-                if 0 <= days_until <= 30:
-                    reminders['upcoming_birthdays'].append({
-                        'id': contact['id'],
-                        'name': contact['name'],
-                        'birthday': contact['birthday'],
-                        'age': birthday_this_year.year - birthday.year,
-                        'days_until': days_until
-                    })
-        
-        # Health alerts (increased severity)
-        # Check for reflux episodes in last 7 days
-        with get_db() as conn:
-            cursor = conn.execute(
-                """SELECT owner, symptom_type, COUNT(*) as count, AVG(severity) as avg_severity
-                   FROM health_logs
-                   WHERE timestamp > datetime('now', '-7 days')
-                     AND symptom_type = 'reflux'
-                   GROUP BY owner, symptom_type
-                   HAVING avg_severity > 6"""
-            )
+            # Birthday reminders (next BIRTHDAY_WINDOW_DAYS days)
+            for row in conn.execute(
+                """SELECT c.id, c.name, c.birthday, q.payload
+                   FROM reminder_queue q JOIN contacts c ON c.id = q.ref_id
+                   WHERE q.owner = ? AND q.kind = 'birthday'
+                     AND q.due_at <= ? AND q.expires_at > ?""",
+                (user_id, today_str, today_str)
+            ):
+                birthday = date.fromisoformat(row['birthday'])
+                next_birthday = date.fromisoformat(json.loads(row['payload'])['date'])
+                reminders['upcoming_birthdays'].append({
+                    'id': row['id'],
+                    'name': row['name'],
+                    'birthday': row['birthday'],
+                    'age': next_birthday.year - birthday.year,
+                    'days_until': (next_birthday - today).days
+                })
             
-            for row in cursor:
+            # Health alerts (reflux severity over the last week, any owner)
+            for row in conn.execute(
+                "SELECT owner, payload FROM reminder_queue WHERE kind = 'health_alert' ORDER BY owner"
+            ):
+                alert = json.loads(row['payload'])
                 reminders['health_alerts'].append({
                     'owner': row['owner'],
-                    'symptom_type': row['symptom_type'],
-                    'episode_count': row['count'],
-                    'avg_severity': round(row['avg_severity'], 1),
-                    'message': f"High reflux severity for {row['owner']} in last 7 days"
+                    **alert,
+                    'message': f"High {alert['symptom_type']} severity for {row['owner']} "
+                               f"in last {reminder_queue.HEALTH_ALERT_DAYS} days"
+                })
+            
+            # Relationship alerts (declining vibe over the latest check-ins)
+            vibes = [row['relationship_vibe'] for row in conn.execute(
+                "SELECT relationship_vibe FROM relationship_checkins ORDER BY timestamp DESC LIMIT ?",
+                (self.VIBE_TREND_CHECKINS,)
+            )]
+        
+        reminders['upcoming_birthdays'].sort(key=lambda b: b['days_until'])
+        
+        if vibes:
+            vibe_avg = round(sum(vibes) / len(vibes), 1)
+            if self._vibe_trend(vibes) == 'declining' and vibe_avg < 6:
+                reminders['relationship_alerts'].append({
+                    'message': "Relationship vibe declining - consider a check-in",
+                    'current_vibe': vibe_avg,
+                    'trend': 'declining'
                 })
-        
-        # Relationship alerts (declining vibe)
-        trends = self.get_checkin_trends(days=14)
-        if trends['trend'] == 'declining' and trends['relationship_avg_vibe'] < 6:
-            reminders['relationship_alerts'].append({
-                'message': "Relationship vibe declining - consider a check-in",
-                'current_vibe': trends['relationship_avg_vibe'],
-                'trend': 'declining'
-            })
         
         return reminders
     
+    def rebuild_reminders(self) -> int:
+        """Reschedule the whole reminder queue from contacts and health logs"""
+        with get_db() as conn:
+            count = reminder_queue.rebuild(conn, datetime.now().date())
+        self._invalidate_reminders()
+        return count
+    
+    def drain_reminders(self, now: datetime = None) -> List[Dict]:
+        """
+        Fire reminders that have come due (called by the scheduler tick)
+        
+        Each fired reminder is written to the audit log once; cached
+        reminders are only dropped if the tick changed the queue. `now`
+        defaults to the current UTC time.
+        """
+        with get_db() as conn:
+            before = conn.total_changes
+            fired = reminder_queue.drain(conn, now or reminder_queue.utcnow())
+            changed = conn.total_changes != before
+        
+        for reminder in fired:
+            log_audit(reminder['owner'], 'circle', 'remind', reminder['kind'], reminder['ref_id'],
+                     {'due_at': reminder['due_at'], **(reminder['payload'] or {})})
+        if changed:
+            self._invalidate_reminders()
+        
+        return fired
+    
+    def _invalidate_reminders(self):
+        """Drop cached reminders (called after contact, health log and check-in writes)"""
+        self._reminders_generation += 1
+    
     # ========== STATISTICS ==========
     
     def get_stats(self, user_id: str) -> Dict:
@@ -0,0 +1,130 @@
+"""
+Check-in trends for The Circle
+
+relationship_checkin_daily keeps per-day sums and counts of each score,
+maintained by triggers on relationship_checkins, so every query here reads
+one row per day rather than one per check-in:
+
+- moving averages: exact N-calendar-day windows (RANGE over julianday, so
+  days without check-ins don't shift the window) of sum / count
+- slopes: least-squares fit of individual scores against day, from
+  weighted daily sums (points per day)
+- change-points: the split that best separates earlier from later scores
+  (largest n1 * n2 / n * (mean1 - mean2)^2), from cumulative window sums
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+METRICS = ('faza_mood', 'gaby_mood', 'relationship_vibe')
+
+MOVING_AVERAGE_DAYS = 7
+
+# A change-point needs this many check-ins on each side and a shift of at
+# least this many points between the two means
+CHANGE_POINT_MIN_CHECKINS = 3
+CHANGE_POINT_MIN_DELTA = 1.0
+
+
+def _mean(total: Optional[float], count: Optional[int]) -> Optional[float]:
+    return round(total / count, 2) if count else None
+
+
+def moving_averages(conn, start: date, end: date, window: int = MOVING_AVERAGE_DAYS) -> List[Dict]:
+    """Trailing window-day averages for each day with check-ins in [start, end]"""
+    window = int(window)
+    averages = ',\n                  '.join(
+        f"SUM({m}_sum) OVER w AS {m}_sum, SUM({m}_n) OVER w AS {m}_n" for m in METRICS
+    )
+    rows = conn.execute(
+        f"""SELECT day, checkins,
+                  SUM(checkins) OVER w AS window_checkins,
+                  {averages}
+           FROM relationship_checkin_daily
+           WHERE day BETWEEN date(?, '-{window - 1} days') AND ?
+           WINDOW w AS (ORDER BY julianday(day) RANGE BETWEEN {window - 1} PRECEDING AND CURRENT ROW)
+           ORDER BY day""",
+        (start.isoformat(), end.isoformat())
+    ).fetchall()
+
+    return [
+        {
+            'date': row['day'],
+            'checkins': row['checkins'],
+            'window_checkins': row['window_checkins'],
+            **{m: _mean(row[f'{m}_sum'], row[f'{m}_n']) for m in METRICS}
+        }
+        for row in rows if row['day'] >= start.isoformat()
+    ]
+
+
+def summary(conn, start: date, end: date) -> Dict:
+    """Check-in count, mean and least-squares slope (points per day) per score"""
+    sums = ',\n                  '.join(
+        f"SUM({m}_n) AS {m}_n, SUM({m}_sum) AS {m}_sy, "
+        f"SUM({m}_n * x) AS {m}_sx, SUM({m}_n * x * x) AS {m}_sxx, SUM({m}_sum * x) AS {m}_sxy"
+        for m in METRICS
+    )
+    row = conn.execute(
+        f"""SELECT SUM(checkins) AS checkins, COUNT(*) AS days,
+                  {sums}
+           FROM (SELECT *, julianday(day) - julianday(?) AS x
+                 FROM relationship_checkin_daily
+                 WHERE day BETWEEN ? AND ?)""",
+        (start.isoformat(), start.isoformat(), end.isoformat())
+    ).fetchone()
+
+    result = {'checkins': row['checkins'] or 0, 'days_with_checkins': row['days'], 'metrics': {}}
+    for m in METRICS:
+        n = row[f'{m}_n'] or 0
+        slope = None
+        if n:
+            denom = n * row[f'{m}_sxx'] - row[f'{m}_sx'] ** 2
+            if denom > 1e-9:
+                slope = (n * row[f'{m}_sxy'] - row[f'{m}_sx'] * row[f'{m}_sy']) / denom
+        result['metrics'][m] = {
+            'avg': _mean(row[f'{m}_sy'], n),
+            'slope_per_day': None if slope is None else round(slope, 4),
+            'count': n
+        }
+    return result
+
+
+def change_points(conn, start: date, end: date) -> Dict[str, Optional[Dict]]:
+    """Most significant mean shift per score in [start, end] (None if below the minimums)"""
+    cumulative = ',\n                  '.join(
+        f"SUM({m}_n) OVER before AS {m}_n1, SUM({m}_sum) OVER before AS {m}_s1, "
+        f"SUM({m}_n) OVER () AS {m}_n, SUM({m}_sum) OVER () AS {m}_s"
+        for m in METRICS
+    )
+    rows = conn.execute(
+        f"""SELECT day, LEAD(day) OVER (ORDER BY day) AS next_day,
+                  {cumulative}
+           FROM relationship_checkin_daily
+           WHERE day BETWEEN ? AND ?
+           WINDOW before AS (ORDER BY day ROWS UNBOUNDED PRECEDING)""",
+        (start.isoformat(), end.isoformat())
+    ).fetchall()
+
+    points = {}
+    for m in METRICS:
+        best, best_score = None, 0.0
+        for row in rows:
+            n1, n = row[f'{m}_n1'], row[f'{m}_n']
+            n2 = (n or 0) - (n1 or 0)
+            if not row['next_day'] or (n1 or 0) < CHANGE_POINT_MIN_CHECKINS or n2 < CHANGE_POINT_MIN_CHECKINS:
+                continue
+            before = row[f'{m}_s1'] / n1
+            after = (row[f'{m}_s'] - row[f'{m}_s1']) / n2
+            if abs(after - before) < CHANGE_POINT_MIN_DELTA:
+                continue
+            score = n1 * n2 / n * (after - before) ** 2
+            if score > best_score:
+                best_score = score
+                best = {
+                    'date': row['next_day'],
+                    'before': round(before, 2),
+                    'after': round(after, 2),
+                    'delta': round(after - before, 2)
+                }
+        points[m] = best
+    return points
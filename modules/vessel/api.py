@@ -2,7 +2,9 @@
 API routes for The Vessel module (Health Tracking)
 FastAPI endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
+import codecs
+
+from fastapi import APIRouter, HTTPException, Query, Depends, File, UploadFile
 from typing import Optional
 from datetime import datetime
 
@@ -53,6 +55,38 @@ async def list_blueprint_logs(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/blueprint/bulk")
+async def log_blueprints(batch: dict, user: dict = Depends(get_current_user)):
+    """Backfill many days of Blueprint logs in one transaction ({"logs": [{"owner", "date", ...}]})"""
+    try:
+        logs = batch.get('logs')
+        if not isinstance(logs, list):
+            raise HTTPException(status_code=400, detail="logs must be a list")
+        return vessel.log_blueprints(logs, user_id=user['user_id'])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/blueprint/heatmap")
+async def get_blueprint_heatmap(
+    owner: str,
+    days: int = Query(365, ge=1, le=1096),
+    end_date: Optional[str] = None
+):
+    """Daily compliance scores and streaks for a calendar heatmap"""
+    try:
+        result = vessel.get_blueprint_heatmap(owner, days=days, end_date=end_date)
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/blueprint/{log_date}")
 async def get_blueprint_log(log_date: str, owner: str, user: dict = Depends(get_current_user)):
     """Get Blueprint log for a specific date"""
@@ -139,6 +173,29 @@ async def list_biometrics(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/biometrics/import")
+async def import_biometrics(
+    owner: str,
+    file: UploadFile = File(...),
+    device_source: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern='^(csv|json|ndjson)$'),
+    user: dict = Depends(get_current_user)
+):
+    """Bulk-import a wearable export (CSV, JSON or JSON Lines), upserting per day and device"""
+    try:
+        # Decoded line by line, so large exports are never held in memory as one string
+        lines = codecs.iterdecode(file.file, 'utf-8-sig')
+        result = vessel.ingest_biometrics(lines, owner, user['user_id'], fmt=format,
+                                          filename=file.filename, device_source=device_source)
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/biometrics/trends")
 async def get_biometric_trends(owner: str, days: int = Query(30, le=365)):
     """Get biometric trends"""
@@ -149,6 +206,52 @@ async def get_biometric_trends(owner: str, days: int = Query(30, le=365)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/biometrics/series")
+async def get_biometric_series(
+    owner: str,
+    days: int = Query(90, ge=1, le=3650),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    metrics: Optional[str] = Query(None, description="Comma-separated, e.g. hrv,resting_hr,load"),
+    max_points: int = Query(366, ge=10, le=2000)
+):
+    """EWMA, baseline, z-score anomalies, slopes and acute:chronic load, downsampled for charts"""
+    try:
+        result = vessel.get_biometric_series(
+            owner,
+            days=days,
+            start_date=start_date,
+            end_date=end_date,
+            metrics=[m.strip() for m in metrics.split(',') if m.strip()] if metrics else None,
+            max_points=max_points
+        )
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/rollups")
+async def get_rollups(
+    owner: str,
+    days: int = Query(90, ge=1, le=730),
+    period: str = Query('daily', pattern='^(daily|weekly)$')
+):
+    """Daily or weekly biometric means and workout totals"""
+    try:
+        result = vessel.get_rollups(owner, days=days, period=period)
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ========== SOBRIETY TRACKER ENDPOINTS ==========
 
 @router.post("/sobriety")
@@ -179,6 +282,20 @@ async def get_sobriety_tracker(tracker_id: str, user: dict = Depends(get_current
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.put("/sobriety/{tracker_id}")
+async def update_sobriety_tracker(tracker_id: str, tracker_data: dict, user: dict = Depends(get_current_user)):
+    """Update a tracker's cost_per_day (for savings) or why_i_started"""
+    try:
+        result = vessel.update_sobriety_tracker(tracker_id, tracker_data, user_id=user['user_id'])
+        if 'error' in result:
+            raise HTTPException(status_code=400, detail=result['error'])
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.put("/sobriety/{tracker_id}/relapse")
 async def log_relapse(tracker_id: str, relapse_data: dict, user: dict = Depends(get_current_user)):
     """Log a relapse"""
@@ -0,0 +1,132 @@
+"""
+Wearable export ingestion for The Vessel (CSV, JSON, JSON Lines)
+
+Parsers read an export line by line and yield biometrics-table records;
+VesselModule.ingest_biometrics upserts them in batches on (owner, date,
+device_source), so re-importing an export updates its days in place.
+Headers from Oura, Whoop and Garmin exports are mapped onto biometrics
+columns, with sleep durations converted to hours.
+"""
+import csv
+import json
+import re
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+FORMATS = ('csv', 'json', 'ndjson')
+
+COLUMNS = ('sleep_score', 'sleep_hours', 'deep_sleep_pct', 'hrv', 'resting_hr',
+           'recovery_score', 'weight_kg', 'body_fat_pct')
+
+# Normalised header -> (column, multiplier); units in brackets and % are dropped
+ALIASES = {
+    'date': ('date', None),
+    'day': ('date', None),
+    'summary_date': ('date', None),           # Oura
+    'calendar_date': ('date', None),          # Garmin
+    'cycle_start_time': ('date', None),       # Whoop
+    'sleep_score': ('sleep_score', 1),
+    'sleep_performance': ('sleep_score', 1),  # Whoop
+    'sleep_hours': ('sleep_hours', 1),
+    'total_sleep_duration': ('sleep_hours', 1 / 3600),  # Oura, seconds
+    'asleep_duration': ('sleep_hours', 1 / 60),         # Whoop, minutes
+    'deep_sleep_pct': ('deep_sleep_pct', 1),
+    'deep_sleep_percentage': ('deep_sleep_pct', 1),
+    'hrv': ('hrv', 1),
+    'average_hrv': ('hrv', 1),
+    'heart_rate_variability': ('hrv', 1),
+    'hrv_rmssd': ('hrv', 1),
+    'resting_hr': ('resting_hr', 1),
+    'resting_heart_rate': ('resting_hr', 1),
+    'lowest_resting_heart_rate': ('resting_hr', 1),
+    'recovery_score': ('recovery_score', 1),
+    'readiness_score': ('recovery_score', 1),  # Oura
+    'weight_kg': ('weight_kg', 1),
+    'weight': ('weight_kg', 1),
+    'body_fat_pct': ('body_fat_pct', 1),
+    'body_fat': ('body_fat_pct', 1),
+    'owner': ('owner', None),
+    'device_source': ('device_source', None),
+    'source': ('device_source', None),
+    'device': ('device_source', None),
+}
+
+_DATE = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})")
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """'json', 'ndjson' or 'csv' from the file extension (CSV if unknown)"""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.json'):
+        return 'json'
+    return 'csv'
+
+
+def normalize_header(header: str) -> str:
+    """'Resting heart rate (bpm)' -> 'resting_heart_rate'"""
+    header = re.sub(r"\(.*?\)|\[.*?\]|%", '', (header or '').strip().lower())
+    return re.sub(r"[^a-z0-9]+", '_', header).strip('_')
+
+
+def parse_date(value) -> Optional[str]:
+    """ISO date from YYYY-MM-DD, YYYYMMDD or a timestamp"""
+    match = _DATE.match(str(value or '').strip())
+    return '-'.join(match.groups()) if match else None
+
+
+def to_record(raw: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """(record, None) or (None, error) for one parsed row"""
+    record = {}
+    for key, value in raw.items():
+        column, scale = ALIASES.get(normalize_header(key), (None, None))
+        if column is None or value is None or str(value).strip() == '' or column in record:
+            continue
+        if scale is None:
+            record[column] = str(value).strip()
+            continue
+        try:
+            number = float(str(value).strip().rstrip('%'))
+        except ValueError:
+            return None, f"Invalid {column}: {value!r}"
+        record[column] = round(number * scale, 2)
+
+    day = parse_date(record.pop('date', None))
+    if not day:
+        return None, 'Missing or invalid date'
+    record['date'] = day
+    return record, None
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """(line number, row) per CSV row"""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """(line number, object) per non-blank JSON line"""
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield number, json.loads(line)
+
+
+def parse_json(lines: Iterable[str]) -> Iterator[Tuple[int, Dict]]:
+    """(index, object) from a JSON array, or an object holding one under 'data'"""
+    payload = json.loads(''.join(lines))
+    if isinstance(payload, dict):
+        payload = payload.get('data', [payload])
+    for number, item in enumerate(payload, start=1):
+        yield number, item
+
+
+def parse_export(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """Dispatch to the CSV, JSON or JSON Lines parser"""
+    if fmt == 'csv':
+        return parse_csv(lines)
+    if fmt == 'ndjson':
+        return parse_ndjson(lines)
+    if fmt == 'json':
+        return parse_json(lines)
+    raise ValueError(f"Unsupported export format: {fmt} (expected one of {', '.join(FORMATS)})")
@@ -0,0 +1,155 @@
+"""
+Pre-aggregated biometrics and workouts for The Vessel
+
+biometrics_daily and workouts_daily hold per-owner daily sums and counts,
+kept current by triggers on the raw tables; biometrics_weekly and
+workouts_weekly are Monday-start views over them. Analytics read one row
+per day (or week) instead of every raw row with its JSON columns.
+
+Bulk writes suspend the biometrics_daily triggers and call
+refresh_biometric_days once per batch instead.
+"""
+import json
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+BIOMETRIC_METRICS = ('sleep_score', 'sleep_hours', 'hrv', 'resting_hr', 'recovery_score', 'weight_kg')
+
+PERIODS = ('daily', 'weekly')
+
+
+def _mean(total: Optional[float], count: Optional[int]) -> Optional[float]:
+    return total / count if count else None
+
+
+def biometric_days(conn, owner: str, days: int) -> List[Dict]:
+    """Per-day metric means for the last `days` days, newest first"""
+    columns = ', '.join(f"{m}_sum, {m}_n" for m in BIOMETRIC_METRICS)
+    rows = conn.execute(
+        f"""SELECT day, readings, {columns} FROM biometrics_daily
+            WHERE owner = ? AND day > date('now', ?)
+            ORDER BY day DESC""",
+        (owner, f'-{days} days')
+    ).fetchall()
+    return [
+        {'date': row['day'], 'readings': row['readings'],
+         **{m: _mean(row[f'{m}_sum'], row[f'{m}_n']) for m in BIOMETRIC_METRICS}}
+        for row in rows
+    ]
+
+
+def biometric_totals(conn, owner: str, days: int) -> Dict:
+    """Means over the window, weighted by readings (same as averaging raw rows)"""
+    columns = ', '.join(f"SUM({m}_sum) AS {m}_sum, SUM({m}_n) AS {m}_n" for m in BIOMETRIC_METRICS)
+    row = conn.execute(
+        f"""SELECT SUM(readings) AS readings, {columns} FROM biometrics_daily
+            WHERE owner = ? AND day > date('now', ?)""",
+        (owner, f'-{days} days')
+    ).fetchone()
+    return {'readings': row['readings'] or 0,
+            **{m: _mean(row[f'{m}_sum'], row[f'{m}_n']) for m in BIOMETRIC_METRICS}}
+
+
+def workout_totals(conn, owner: str, days: int) -> Dict:
+    """Workout count, minutes, volume, RPE and PRs over the window, with per-type counts"""
+    rows = conn.execute(
+        """SELECT workout_type, SUM(workouts) AS workouts, SUM(minutes) AS minutes,
+                  SUM(volume_kg) AS volume_kg, SUM(rpe_sum) AS rpe_sum, SUM(rpe_n) AS rpe_n,
+                  SUM(prs) AS prs
+           FROM workouts_daily
+           WHERE owner = ? AND day > date('now', ?)
+           GROUP BY workout_type""",
+        (owner, f'-{days} days')
+    ).fetchall()
+
+    totals = {'workouts': 0, 'minutes': 0, 'volume_kg': 0, 'rpe_sum': 0.0, 'rpe_n': 0, 'prs': 0}
+    by_type = {}
+    for row in rows:
+        for key in totals:
+            totals[key] += row[key] or 0
+        by_type[row['workout_type']] = row['workouts']
+    totals['by_type'] = by_type
+    return totals
+
+
+def series(conn, owner: str, days: int, period: str = 'daily') -> List[Dict]:
+    """Biometric means and workout totals per day or week (overlapping the window), oldest first"""
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+    key = 'day' if period == 'daily' else 'week'
+    bio_source = 'biometrics_daily' if period == 'daily' else 'biometrics_weekly'
+    workout_source = (
+        """(SELECT owner, day, SUM(workouts) AS workouts, SUM(minutes) AS minutes,
+                   SUM(volume_kg) AS volume_kg, SUM(prs) AS prs
+            FROM workouts_daily GROUP BY owner, day)"""
+        if period == 'daily' else 'workouts_weekly'
+    )
+    columns = ', '.join(f"{m}_sum, {m}_n" for m in BIOMETRIC_METRICS)
+    since = f'-{days} days'
+    # A week is included if any of its days falls in the window
+    start = "date('now', ?)" if period == 'daily' else "date('now', ?, '-6 days')"
+
+    points: Dict[str, Dict] = {}
+    for row in conn.execute(
+        f"SELECT {key} AS period, {columns} FROM {bio_source} WHERE owner = ? AND {key} > {start}",
+        (owner, since)
+    ):
+        point = points.setdefault(row['period'], {})
+        for m in BIOMETRIC_METRICS:
+            value = _mean(row[f'{m}_sum'], row[f'{m}_n'])
+            point[m] = None if value is None else round(value, 1)
+
+    for row in conn.execute(
+        f"""SELECT {key} AS period, workouts, minutes, volume_kg, prs FROM {workout_source}
+            WHERE owner = ? AND {key} > {start}""",
+        (owner, since)
+    ):
+        points.setdefault(row['period'], {}).update(
+            workouts=row['workouts'], minutes=row['minutes'],
+            volume_kg=row['volume_kg'], prs=row['prs']
+        )
+
+    empty = dict.fromkeys(BIOMETRIC_METRICS)
+    empty.update(workouts=0, minutes=0, volume_kg=0, prs=0)
+    return [{'period': period_start, **empty, **points[period_start]} for period_start in sorted(points)]
+
+
+@contextmanager
+def suspended(conn, name: str):
+    """
+    Pause a rollup's triggers for the rest of this transaction
+
+    For bulk writes that rebuild the affected rows once afterwards (see
+    refresh_biometric_days). The flag row never outlives the transaction.
+    """
+    conn.execute("INSERT OR IGNORE INTO rollup_suspended (name) VALUES (?)", (name,))
+    try:
+        yield
+    finally:
+        conn.execute("DELETE FROM rollup_suspended WHERE name = ?", (name,))
+
+
+def refresh_biometric_days(conn, keys: Iterable[Tuple[str, str]]):
+    """Recompute biometrics_daily for the given (owner, day) pairs from the raw rows"""
+    keys_json = json.dumps(sorted(set(keys)))
+    conn.execute(
+        """DELETE FROM biometrics_daily
+           WHERE (owner, day) IN (SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+                                  FROM json_each(?))""",
+        (keys_json,)
+    )
+    columns = ', '.join(f"{m}_sum, {m}_n" for m in BIOMETRIC_METRICS)
+    aggregates = ', '.join(f"IFNULL(SUM(b.{m}), 0), COUNT(b.{m})" for m in BIOMETRIC_METRICS)
+    # Range on date (not date(date)) so idx_biometrics_owner_date is used
+    conn.execute(
+        f"""INSERT INTO biometrics_daily (owner, day, readings, {columns})
+            SELECT b.owner, k.day, COUNT(*), {aggregates}
+            FROM (SELECT DISTINCT json_extract(value, '$[0]') AS owner,
+                                  json_extract(value, '$[1]') AS day
+                  FROM json_each(?)) k
+            JOIN biometrics b ON b.owner = k.owner
+                             AND b.date >= k.day AND b.date < date(k.day, '+1 day')
+            GROUP BY b.owner, k.day""",
+        (keys_json,)
+    )
@@ -2,13 +2,14 @@
 Module 4: The Vessel (Health Tracking)
 Blueprint protocol, Empire Fit workouts, biometrics, sobriety tracking
 """
+import csv
 import json
-from datetime import datetime, timedelta, date
-from typing import Dict, List, Optional, Any
-from collections import Counter
+from datetime import timedelta, date
+from typing import Dict, Iterable, List, Optional, Any
 from pathlib import Path
 
 from core.database import get_db, generate_uuid, log_audit
+from modules.vessel import ingest, rollups, timeseries
 
 
 class VesselModule:
@@ -16,6 +17,15 @@ class VesselModule:
     
     WORKOUT_TYPES = ['hyperpump', 'cardio', 'recovery', 'mobility']
     HABIT_TYPES = ['alcohol', 'nicotine', 'caffeine', 'social_media', 'gaming', 'other']
+    OWNERS = ['faza', 'gaby', 'shared']
+    BLUEPRINT_FIELDS = ('supplements_taken', 'super_veggie_eaten', 'nutty_pudding_eaten', 'exercise_done',
+                        'supplement_list', 'meals_logged', 'water_intake_ml', 'compliance_score')
+    
+    # Blueprint score at which a day counts towards a compliance streak
+    COMPLIANT_SCORE = 80
+    
+    # Rows per transaction (and per biometrics_daily refresh) in bulk ingestion
+    INGEST_BATCH_SIZE = 500
     
     def __init__(self):
         self.db_path = Path(__file__).parent.parent.parent / "data" / "levy.db"
@@ -23,69 +33,139 @@ class VesselModule:
     # ========== BLUEPRINT PROTOCOL ==========
     
     def log_blueprint(self, data: Dict, user_id: str) -> Dict:
-        """Log Blueprint protocol compliance for a day"""
-        # Calculate compliance score
-        compliance_score = self._calculate_blueprint_score(data)
+        """Log Blueprint protocol compliance for a day (upsert on owner and date)"""
+        log_id = f"bpl_{generate_uuid()}"
+        values = self._blueprint_values(log_id, data)
         
-        # Check if entry exists
         with get_db() as conn:
-            existing = conn.execute(
-                "SELECT id FROM blueprint_logs WHERE date = ? AND owner = ?",
-                (data['date'], data['owner'])
-            ).fetchone()
-            
-            if existing:
-                # Update existing entry
-                log_id = existing['id']
-                conn.execute(
-                    """UPDATE blueprint_logs
-                       SET supplements_taken = ?, super_veggie_eaten = ?,
-                           nutty_pudding_eaten = ?, exercise_done = ?,
-                           supplement_list = ?, meals_logged = ?,
-                           water_intake_ml = ?, compliance_score = ?
-                       WHERE id = ?""",
-                    (
-                        data.get('supplements_taken', False),
-                        data.get('super_veggie_eaten', False),
-                        data.get('nutty_pudding_eaten', False),
-                        data.get('exercise_done', False),
-                        json.dumps(data.get('supplement_list', [])),
-                        json.dumps(data.get('meals_logged', [])),
-                        data.get('water_intake_ml'),
-                        compliance_score,
-                        log_id
-                    )
-                )
-            else:
-                # Create new entry
-                log_id = f"bpl_{generate_uuid()}"
-                
-                conn.execute(
-                    """INSERT INTO blueprint_logs
-                       (id, owner, date, supplements_taken, super_veggie_eaten,
-                        nutty_pudding_eaten, exercise_done, supplement_list,
-                        meals_logged, water_intake_ml, compliance_score)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (
-                        log_id,
-                        data['owner'],
-                        data['date'],
-                        data.get('supplements_taken', False),
-                        data.get('super_veggie_eaten', False),
-                        data.get('nutty_pudding_eaten', False),
-                        data.get('exercise_done', False),
-                        json.dumps(data.get('supplement_list', [])),
-                        json.dumps(data.get('meals_logged', [])),
-                        data.get('water_intake_ml'),
-                        compliance_score
-                    )
+            row = conn.execute(self._blueprint_upsert_sql() + " RETURNING id", values).fetchone()
+            created = row['id'] == log_id
+            log_audit(user_id, 'vessel', 'create' if created else 'update', 'blueprint_log', row['id'],
+                     {'owner': data['owner'], 'date': data['date'], 'score': values[-1]}, conn=conn)
+        
+        return {'id': row['id'], 'compliance_score': values[-1], 'status': 'created' if created else 'updated'}
+    
+    def log_blueprints(self, entries: List[Dict], user_id: str) -> Dict:
+        """
+        Backfill many days of Blueprint logs in one transaction
+        
+        Entries are validated first (owner, ISO date); valid ones are
+        upserted with one executemany, so a day already logged is replaced,
+        and the batch gets a single audit entry.
+        """
+        rows, failed = {}, []
+        for number, data in enumerate(entries, start=1):
+            if not isinstance(data, dict):
+                failed.append({'record': number, 'error': 'Not an object'})
+                continue
+            if data.get('owner') not in self.OWNERS:
+                failed.append({'record': number, 'error': f"owner must be one of {', '.join(self.OWNERS)}"})
+                continue
+            try:
+                day = date.fromisoformat(str(data.get('date')))
+            except ValueError:
+                failed.append({'record': number, 'error': f"Invalid date: {data.get('date')!r}"})
+                continue
+            # A day listed twice: the later entry wins
+            rows[(data['owner'], day.isoformat())] = dict(data, date=day.isoformat())
+        
+        stats = {'created': 0, 'updated': 0, 'failed': len(failed)}
+        if rows:
+            with get_db() as conn:
+                existing = {tuple(row) for row in conn.execute(
+                    """SELECT owner, date FROM blueprint_logs
+                       WHERE (owner, date) IN (SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]')
+                                               FROM json_each(?))""",
+                    (json.dumps(sorted(rows)),)
+                )}
+                conn.executemany(
+                    self._blueprint_upsert_sql(),
+                    [self._blueprint_values(f"bpl_{generate_uuid()}", data) for data in rows.values()]
                 )
+                stats['updated'] = len(existing)
+                stats['created'] = len(rows) - len(existing)
+                log_audit(user_id, 'vessel', 'import', 'blueprint_log', None,
+                         {'start': min(d for _, d in rows), 'end': max(d for _, d in rows), **stats}, conn=conn)
+        
+        return {'status': 'completed', **stats, 'errors': failed}
+    
+    def _blueprint_values(self, log_id: str, data: Dict) -> tuple:
+        """INSERT parameters for _blueprint_upsert_sql (compliance score last)"""
+        return (
+            log_id,
+            data['owner'],
+            data['date'],
+            data.get('supplements_taken', False),
+            data.get('super_veggie_eaten', False),
+            data.get('nutty_pudding_eaten', False),
+            data.get('exercise_done', False),
+            json.dumps(data.get('supplement_list', [])),
+            json.dumps(data.get('meals_logged', [])),
+            data.get('water_intake_ml'),
+            self._calculate_blueprint_score(data)
+        )
+    
+    def _blueprint_upsert_sql(self) -> str:
+        """Insert a day's log, or replace the owner's existing log for that date (keeping its id)"""
+        updates = ', '.join(f"{c} = excluded.{c}" for c in self.BLUEPRINT_FIELDS)
+        return f"""INSERT INTO blueprint_logs (id, owner, date, {', '.join(self.BLUEPRINT_FIELDS)})
+                   VALUES ({', '.join('?' * (len(self.BLUEPRINT_FIELDS) + 3))})
+                   ON CONFLICT(owner, date) DO UPDATE SET {updates}"""
+    
+    def get_blueprint_heatmap(self, owner: str, days: int = 365, end_date: str = None) -> Dict:
+        """
+        Daily compliance scores and streaks for a calendar heatmap
         
-        # Log audit outside database context
-        log_audit(user_id, 'vessel', 'create' if not existing else 'update', 'blueprint_log', log_id,
-                 {'owner': data['owner'], 'date': data['date'], 'score': compliance_score})
+        One range scan of the (owner, date) key. A day counts towards a
+        streak when its score is at least COMPLIANT_SCORE; streaks are
+        runs of consecutive calendar days (gaps-and-islands: date minus row
+        number is constant within a run). The current streak still counts
+        if today hasn't been logged yet.
+        """
+        try:
+            end = date.fromisoformat(end_date) if end_date else date.today()
+        except ValueError as e:
+            return {'error': f"Invalid date: {e}"}
+        start = end - timedelta(days=days - 1)
+        
+        with get_db() as conn:
+            rows = conn.execute(
+                """SELECT date, compliance_score, compliant,
+                          CASE WHEN compliant THEN ROW_NUMBER() OVER (PARTITION BY compliant, island
+                                                                   ORDER BY date) ELSE 0 END AS streak
+                   FROM (SELECT date, compliance_score, compliance_score >= ? AS compliant,
+                                julianday(date) - ROW_NUMBER() OVER (PARTITION BY compliance_score >= ?
+                                                                     ORDER BY date) AS island
+                         FROM blueprint_logs
+                         WHERE owner = ? AND date BETWEEN ? AND ?)
+                   ORDER BY date""",
+                (self.COMPLIANT_SCORE, self.COMPLIANT_SCORE, owner, start.isoformat(), end.isoformat())
+            ).fetchall()
+        
+        heatmap = [
+            {'date': row['date'], 'score': row['compliance_score'],
+             'compliant': bool(row['compliant']), 'streak': row['streak']}
+            for row in rows
+        ]
+        scores = [d['score'] for d in heatmap if d['score'] is not None]
+        
+        latest = heatmap[-1] if heatmap else None
+        current_streak = 0
+        if latest and latest['compliant'] and latest['date'] >= (end - timedelta(days=1)).isoformat():
+            current_streak = latest['streak']
         
-        return {'id': log_id, 'compliance_score': compliance_score, 'status': 'updated' if existing else 'created'}
+        return {
+            'owner': owner,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'compliant_score': self.COMPLIANT_SCORE,
+            'logged_days': len(heatmap),
+            'compliant_days': sum(d['compliant'] for d in heatmap),
+            'avg_compliance': round(sum(scores) / len(scores), 1) if scores else 0,
+            'current_streak': current_streak,
+            'longest_streak': max((d['streak'] for d in heatmap), default=0),
+            'days': heatmap
+        }
     
     def get_blueprint_logs(self, user_id: str, owner: str = None,
                           start_date: str = None, end_date: str = None,
@@ -227,67 +307,145 @@ class VesselModule:
         return workouts
     
     def get_workout_stats(self, owner: str, days: int = 30) -> Dict:
-        """Get workout statistics"""
-        workouts = self.get_workouts('system', owner=owner, days=days)
+        """Get workout statistics (from the workouts_daily rollup)"""
+        with get_db() as conn:
+            return self._workout_stats(conn, owner, days)
+    
+    def _workout_stats(self, conn, owner: str, days: int) -> Dict:
+        totals = rollups.workout_totals(conn, owner, days)
         
-        if not workouts:
+        if not totals['workouts']:
             return {
                 'total_workouts': 0,
                 'total_minutes': 0,
+                'total_volume_kg': 0,
                 'avg_rpe': 0,
                 'by_type': {},
                 'prs_count': 0
             }
         
-        total_minutes = sum(w['duration_minutes'] for w in workouts)
-        avg_rpe = sum(w['avg_rpe'] or 0 for w in workouts) / len(workouts)
-        
-        # Count by workout type
-        by_type = Counter(w['workout_type'] for w in workouts)
-        
-        # Count PRs
-        prs_count = sum(len(w.get('prs_achieved', [])) for w in workouts)
+        avg_rpe = totals['rpe_sum'] / totals['rpe_n'] if totals['rpe_n'] else 0
         
         return {
-            'total_workouts': len(workouts),
-            'total_minutes': total_minutes,
+            'total_workouts': totals['workouts'],
+            'total_minutes': totals['minutes'],
+            'total_volume_kg': totals['volume_kg'],
             'avg_rpe': round(avg_rpe, 1),
-            'by_type': dict(by_type),
-            'prs_count': prs_count
+            'by_type': totals['by_type'],
+            'prs_count': totals['prs']
         }
     
     # ========== BIOMETRICS ==========
     
     def log_biometrics(self, data: Dict, user_id: str) -> Dict:
-        """Log biometric data"""
+        """
+        Log biometric data
+        
+        A reading with a device_source upserts on (owner, date,
+        device_source) like bulk imports (blank fields keep their value);
+        manual readings without one are always added.
+        """
         bio_id = f"bio_{generate_uuid()}"
+        values = [bio_id, data['owner'], data['date']] + [data.get(c) for c in ('device_source',) + ingest.COLUMNS]
         
         with get_db() as conn:
-            conn.execute(
-                """INSERT INTO biometrics
-                   (id, owner, date, sleep_score, sleep_hours, deep_sleep_pct,
-                    hrv, resting_hr, recovery_score, weight_kg, body_fat_pct, device_source)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    bio_id,
-                    data['owner'],
-                    data['date'],
-                    data.get('sleep_score'),
-                    data.get('sleep_hours'),
-                    data.get('deep_sleep_pct'),
-                    data.get('hrv'),
-                    data.get('resting_hr'),
-                    data.get('recovery_score'),
-                    data.get('weight_kg'),
-                    data.get('body_fat_pct'),
-                    data.get('device_source')
-                )
-            )
+            row = conn.execute(self._biometrics_upsert_sql() + " RETURNING id", values).fetchone()
+        created = row['id'] == bio_id
         
-        log_audit(user_id, 'vessel', 'create', 'biometrics', bio_id,
+        log_audit(user_id, 'vessel', 'create' if created else 'update', 'biometrics', row['id'],
                  {'owner': data['owner'], 'date': data['date']})
         
-        return {'id': bio_id, 'status': 'logged'}
+        return {'id': row['id'], 'status': 'logged' if created else 'updated'}
+    
+    def _biometrics_upsert_sql(self) -> str:
+        """Insert a reading, or fill in the owner's reading for that date and device (keeping its id)"""
+        columns = ('owner', 'date', 'device_source') + ingest.COLUMNS
+        return f"""INSERT INTO biometrics (id, {', '.join(columns)})
+                   VALUES ({', '.join('?' * (len(columns) + 1))})
+                   ON CONFLICT(owner, date, device_source) WHERE device_source IS NOT NULL
+                   DO UPDATE SET {', '.join(f'{c} = COALESCE(excluded.{c}, {c})' for c in ingest.COLUMNS)}"""
+    
+    def ingest_biometrics(self, lines: Iterable[str], owner: str, user_id: str,
+                          fmt: str = None, filename: str = None,
+                          device_source: str = None) -> Dict:
+        """
+        Bulk-import a wearable export (Oura, Whoop, Garmin, ...)
+        
+        Rows are read as a stream and upserted INGEST_BATCH_SIZE at a time
+        with one executemany per batch, keyed on (owner, date,
+        device_source): a day already imported from the same device is
+        updated (blank fields keep their value), not duplicated. The
+        biometrics_daily triggers are suspended during each batch and the
+        touched days recomputed once. Rows may carry their own owner or
+        device_source; otherwise the arguments apply ('import' if none).
+        """
+        if owner not in self.OWNERS:
+            return {'error': f"owner must be one of {', '.join(self.OWNERS)}"}
+        
+        fmt = fmt or ingest.detect_format(filename)
+        if fmt not in ingest.FORMATS:
+            return {'error': f"Unsupported format: {fmt}"}
+        
+        device_source = device_source or 'import'
+        stats = {'imported': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        failed, days = [], set()
+        batch = []
+        
+        try:
+            for number, raw in ingest.parse_export(lines, fmt):
+                record, error = ingest.to_record(raw) if isinstance(raw, dict) else (None, 'Not an object')
+                if error is None and record.get('owner', owner) not in self.OWNERS:
+                    error = f"Unknown owner: {record['owner']}"
+                if error:
+                    failed.append({'record': number, 'error': error})
+                    continue
+                if not any(record.get(c) is not None for c in ingest.COLUMNS):
+                    stats['skipped'] += 1
+                    continue
+                
+                record.setdefault('owner', owner)
+                record.setdefault('device_source', device_source)
+                batch.append(record)
+                if len(batch) >= self.INGEST_BATCH_SIZE:
+                    self._ingest_batch(batch, stats, days)
+                    batch = []
+            if batch:
+                self._ingest_batch(batch, stats, days)
+        except (ValueError, csv.Error) as e:
+            # Malformed file: batches already written stay committed
+            failed.append({'record': None, 'error': f"Could not parse {fmt}: {e}"})
+        
+        stats['failed'] = len(failed)
+        log_audit(user_id, 'vessel', 'import', 'biometrics', None,
+                 {'owner': owner, 'format': fmt, 'device_source': device_source, **stats})
+        
+        return {'status': 'completed', 'format': fmt, **stats, 'days': len(days), 'errors': failed}
+    
+    def _ingest_batch(self, records: List[Dict], stats: Dict, days: set):
+        """Upsert one batch and refresh its days in biometrics_daily, in one transaction"""
+        columns = ('owner', 'date', 'device_source') + ingest.COLUMNS
+        keys = {(r['owner'], r['date'], r['device_source']) for r in records}
+        
+        with get_db() as conn:
+            existing = {tuple(row) for row in conn.execute(
+                """SELECT owner, date, device_source FROM biometrics
+                   WHERE (owner, date, device_source) IN (
+                       SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'),
+                              json_extract(value, '$[2]')
+                       FROM json_each(?))""",
+                (json.dumps(sorted(keys)),)
+            )}
+            
+            with rollups.suspended(conn, 'biometrics_daily'):
+                conn.executemany(
+                    self._biometrics_upsert_sql(),
+                    [[f"bio_{generate_uuid()}"] + [r.get(c) for c in columns] for r in records]
+                )
+                rollups.refresh_biometric_days(conn, {(owner, day) for owner, day, _ in keys})
+        
+        stats['updated'] += len(keys & existing)
+        stats['imported'] += len(keys - existing)
+        days.update((owner, day) for owner, day, _ in keys)
     
     def get_biometrics(self, user_id: str, owner: str = None,
                       days: int = 30) -> List[Dict]:
@@ -311,10 +469,14 @@ class VesselModule:
         return [dict(row) for row in rows]
     
     def get_biometric_trends(self, owner: str, days: int = 30) -> Dict:
-        """Get biometric trends and averages"""
-        biometrics = self.get_biometrics('system', owner=owner, days=days)
+        """Get biometric trends and averages (from the biometrics_daily rollup)"""
+        with get_db() as conn:
+            return self._biometric_trends(conn, owner, days)
+    
+    def _biometric_trends(self, conn, owner: str, days: int) -> Dict:
+        totals = rollups.biometric_totals(conn, owner, days)
         
-        if not biometrics:
+        if not totals['readings']:
             return {
                 'avg_sleep_score': 0,
                 'avg_sleep_hours': 0,
@@ -326,34 +488,25 @@ class VesselModule:
                 'trend': 'unknown'
             }
         
-        # Calculate averages
-        sleep_scores = [b['sleep_score'] for b in biometrics if b['sleep_score']]
-        sleep_hours = [b['sleep_hours'] for b in biometrics if b['sleep_hours']]
-        hrv_values = [b['hrv'] for b in biometrics if b['hrv']]
-        resting_hr = [b['resting_hr'] for b in biometrics if b['resting_hr']]
-        recovery_scores = [b['recovery_score'] for b in biometrics if b['recovery_score']]
-        weights = [b['weight_kg'] for b in biometrics if b['weight_kg']]
-        
-        avg_sleep_score = sum(sleep_scores) / len(sleep_scores) if sleep_scores else 0
-        avg_sleep_hours = sum(sleep_hours) / len(sleep_hours) if sleep_hours else 0
-        avg_hrv = sum(hrv_values) / len(hrv_values) if hrv_values else 0
-        avg_resting_hr = sum(resting_hr) / len(resting_hr) if resting_hr else 0
-        avg_recovery = sum(recovery_scores) / len(recovery_scores) if recovery_scores else 0
-        avg_weight = sum(weights) / len(weights) if weights else 0
-        
-        # Calculate weight change (first vs last)
+        daily = rollups.biometric_days(conn, owner, days)  # newest first
+        
+        # Calculate weight change (latest vs oldest day with a weigh-in)
+        weights = [d['weight_kg'] for d in daily if d['weight_kg'] is not None]
         weight_change = 0
         if len(weights) >= 2:
             weight_change = weights[0] - weights[-1]  # Recent - oldest
         
-        # Determine trend (recovery score based)
-        if recovery_scores:
-            recent_avg = sum(recovery_scores[:len(recovery_scores)//3]) / (len(recovery_scores)//3 or 1)
-            early_avg = sum(recovery_scores[-len(recovery_scores)//3:]) / (len(recovery_scores)//3 or 1)
+        # Determine trend (least-squares recovery slope across the days with a score,
+        # from the same rollup window as the averages)
+        recovery = [(date.fromisoformat(d['date']), d['recovery_score'])
+                    for d in daily if d['recovery_score'] is not None]
+        if recovery:
+            slope = timeseries.slope_of(recovery) or 0.0
+            change = slope * (recovery[0][0] - recovery[-1][0]).days
             
-            if recent_avg > early_avg + 5:
+            if change > 5:
                 trend = 'improving'
-            elif recent_avg < early_avg - 5:
+            elif change < -5:
                 trend = 'declining'
             else:
                 trend = 'stable'
@@ -361,20 +514,53 @@ class VesselModule:
             trend = 'unknown'
         
         return {
-            'avg_sleep_score': round(avg_sleep_score, 1),
-            'avg_sleep_hours': round(avg_sleep_hours, 1),
-            'avg_hrv': round(avg_hrv, 1),
-            'avg_resting_hr': round(avg_resting_hr, 1),
-            'avg_recovery_score': round(avg_recovery, 1),
-            'avg_weight': round(avg_weight, 1),
+            'avg_sleep_score': round(totals['sleep_score'] or 0, 1),
+            'avg_sleep_hours': round(totals['sleep_hours'] or 0, 1),
+            'avg_hrv': round(totals['hrv'] or 0, 1),
+            'avg_resting_hr': round(totals['resting_hr'] or 0, 1),
+            'avg_recovery_score': round(totals['recovery_score'] or 0, 1),
+            'avg_weight': round(totals['weight_kg'] or 0, 1),
             'weight_change_kg': round(weight_change, 1),
             'trend': trend
         }
     
+    def get_rollups(self, owner: str, days: int = 90, period: str = 'daily') -> Dict:
+        """Biometric means and workout totals per day or week"""
+        if period not in rollups.PERIODS:
+            return {'error': f"period must be one of {', '.join(rollups.PERIODS)}"}
+        
+        with get_db() as conn:
+            points = rollups.series(conn, owner, days, period)
+        
+        return {'owner': owner, 'period': period, 'days': days, 'points': points}
+    
+    def get_biometric_series(self, owner: str, days: int = 90, start_date: str = None,
+                             end_date: str = None, metrics: List[str] = None,
+                             max_points: int = timeseries.MAX_POINTS) -> Dict:
+        """EWMA, baseline, z-score, slope and acute:chronic series for charts"""
+        metrics = list(metrics or timeseries.METRICS)
+        unknown = [m for m in metrics if m not in timeseries.METRICS]
+        if unknown:
+            return {'error': f"Unknown metrics: {', '.join(unknown)} "
+                             f"(expected any of {', '.join(timeseries.METRICS)})"}
+        
+        try:
+            end = date.fromisoformat(end_date) if end_date else date.today()
+            start = date.fromisoformat(start_date) if start_date else end - timedelta(days=days - 1)
+        except ValueError as e:
+            return {'error': f"Invalid date: {e}"}
+        if start > end:
+            return {'error': 'start_date must be on or before end_date'}
+        
+        with get_db() as conn:
+            data = timeseries.load(conn, owner, start, end, metrics)
+        
+        return {'owner': owner, **timeseries.analyze(data, max_points=max_points)}
+    
     # ========== SOBRIETY TRACKER ==========
     
     def start_sobriety_tracker(self, data: Dict, user_id: str) -> Dict:
-        """Start tracking sobriety for a habit"""
+        """Start tracking sobriety for a habit (cost_per_day enables savings)"""
         tracker_id = f"sob_{generate_uuid()}"
         
         start_date = data['start_date']
@@ -391,130 +577,178 @@ class VesselModule:
             
             conn.execute(
                 """INSERT INTO sobriety_tracker
-                   (id, owner, habit_type, start_date, current_streak_days,
-                    longest_streak_days, relapse_log, why_i_started)
-                   VALUES (?, ?, ?, ?, 0, 0, ?, ?)""",
+                   (id, owner, habit_type, start_date, why_i_started, cost_per_day)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
                 (
                     tracker_id,
                     data['owner'],
                     data['habit_type'],
                     start_date,
-                    json.dumps([]),
-                    data.get('why_i_started')
+                    data.get('why_i_started'),
+                    data.get('cost_per_day')
                 )
             )
         
         log_audit(user_id, 'vessel', 'create', 'sobriety_tracker', tracker_id,
                  {'owner': data['owner'], 'habit': data['habit_type']})
         
-        # Update streak
-        self._update_sobriety_streak(tracker_id)
-        
         return {'id': tracker_id, 'status': 'created'}
     
     def get_sobriety_tracker(self, tracker_id: str, user_id: str) -> Optional[Dict]:
-        """Get sobriety tracker status"""
+        """Get sobriety tracker status, with streaks and savings as of today"""
         with get_db() as conn:
-            cursor = conn.execute(
-                "SELECT * FROM sobriety_tracker WHERE id = ?",
-                (tracker_id,)
-            )
-            row = cursor.fetchone()
-            
-            if not row:
+            trackers = self._sobriety_status(conn, "t.id = ?", (tracker_id,))
+            if not trackers:
                 return None
             
-            tracker = dict(row)
-            if tracker.get('relapse_log'):
-                tracker['relapse_log'] = json.loads(tracker['relapse_log'])
+            tracker = trackers[0]
+            tracker['relapse_log'] = [
+                {
+                    'id': row['id'],
+                    'date': row['relapse_date'],
+                    'reason': row['reason'],
+                    'triggers': json.loads(row['triggers']) if row['triggers'] else [],
+                    'cost': row['cost']
+                }
+                for row in conn.execute(
+                    """SELECT id, relapse_date, reason, triggers, cost FROM sobriety_relapses
+                       WHERE tracker_id = ? ORDER BY relapse_date""",
+                    (tracker_id,)
+                )
+            ]
             
             return tracker
     
-    def log_relapse(self, tracker_id: str, relapse_data: Dict, user_id: str) -> Dict:
-        """Log a relapse"""
-        tracker = self.get_sobriety_tracker(tracker_id, user_id)
-        if not tracker:
-            return {'error': 'Tracker not found'}
-        
-        relapse_entry = {
-            'date': relapse_data['relapse_date'],
-            'reason': relapse_data.get('reason'),
-            'triggers': relapse_data.get('triggers', []),
-            'cost': relapse_data.get('cost', 0)
-        }
+    def update_sobriety_tracker(self, tracker_id: str, data: Dict, user_id: str) -> Dict:
+        """Update a tracker's cost_per_day or why_i_started"""
+        fields = {k: data[k] for k in ('cost_per_day', 'why_i_started') if k in data}
+        if not fields:
+            return {'error': 'Nothing to update (expected cost_per_day or why_i_started)'}
         
-        # Update tracker
         with get_db() as conn:
-            # Update last relapse
-            conn.execute(
-                "UPDATE sobriety_tracker SET last_relapse = ? WHERE id = ?",
-                (relapse_data['relapse_date'], tracker_id)
+            cursor = conn.execute(
+                f"UPDATE sobriety_tracker SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                (*fields.values(), tracker_id)
             )
+            if not cursor.rowcount:
+                return {'error': 'Tracker not found'}
+        
+        log_audit(user_id, 'vessel', 'update', 'sobriety_tracker', tracker_id, fields)
+        
+        return {'id': tracker_id, 'status': 'updated'}
+    
+    def log_relapse(self, tracker_id: str, relapse_data: Dict, user_id: str) -> Dict:
+        """Log a relapse (one row in sobriety_relapses)"""
+        relapse_id = f"rel_{generate_uuid()}"
+        relapse_date = relapse_data['relapse_date']
+        
+        with get_db() as conn:
+            # last_relapse only moves forward, so back-dated entries don't reset the streak
+            tracker = conn.execute(
+                """UPDATE sobriety_tracker
+                   SET last_relapse = CASE WHEN last_relapse IS NULL OR last_relapse < ?
+                                           THEN ? ELSE last_relapse END
+                   WHERE id = ?
+                   RETURNING habit_type""",
+                (relapse_date, relapse_date, tracker_id)
+            ).fetchone()
+            if not tracker:
+                return {'error': 'Tracker not found'}
             
-            # Add to relapse log (tracker['relapse_log'] is already a list from get_sobriety_tracker)
-            relapse_log = tracker['relapse_log'] if isinstance(tracker['relapse_log'], list) else []
-            relapse_log.append(relapse_entry)
             conn.execute(
-                "UPDATE sobriety_tracker SET relapse_log = ? WHERE id = ?",
-                (json.dumps(relapse_log), tracker_id)
+                """INSERT INTO sobriety_relapses (id, tracker_id, relapse_date, reason, triggers, cost)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (
+                    relapse_id,
+                    tracker_id,
+                    relapse_date,
+                    relapse_data.get('reason'),
+                    json.dumps(relapse_data.get('triggers', [])),
+                    relapse_data.get('cost', 0)
+                )
             )
         
-        # Recalculate streak
-        self._update_sobriety_streak(tracker_id)
-        
         log_audit(user_id, 'vessel', 'log_relapse', 'sobriety_tracker', tracker_id,
-                 {'habit': tracker['habit_type'], 'date': relapse_data['relapse_date']})
+                 {'habit': tracker['habit_type'], 'date': relapse_date})
         
-        return {'id': tracker_id, 'status': 'relapse_logged'}
+        return {'id': tracker_id, 'relapse_id': relapse_id, 'status': 'relapse_logged'}
     
-    def _update_sobriety_streak(self, tracker_id: str):
-        """Update sobriety streak calculation"""
-        tracker = self.get_sobriety_tracker(tracker_id, 'system')
-        if not tracker:
-            return
+    def _sobriety_status(self, conn, where: str = "1 = 1", params: tuple = ()) -> List[Dict]:
+        """
+        Trackers matching `where` (on alias t) with streaks and savings as of today
         
+        Current streak: days since the last relapse (excluding it), or since
+        start_date. Longest streak: the largest gap between start_date and
+        consecutive relapses (LAG over sobriety_relapses), or the current
+        one. Savings: cost_per_day for every day since start_date, less what
+        the relapses cost.
+        """
         today = date.today()
+        rows = conn.execute(
+            f"""SELECT t.*, IFNULL(r.relapse_count, 0) AS relapse_count,
+                       IFNULL(r.relapse_cost, 0) AS relapse_cost, r.longest_gap, r.latest
+                FROM sobriety_tracker t
+                LEFT JOIN (
+                    SELECT tracker_id, COUNT(*) AS relapse_count, SUM(IFNULL(cost, 0)) AS relapse_cost,
+                           MAX(relapse_date) AS latest,
+                           MAX(CAST(julianday(relapse_date) - julianday(IFNULL(previous, start_date))
+                                    - (previous IS NOT NULL) AS INTEGER)) AS longest_gap
+                    FROM (
+                        SELECT s.tracker_id, s.relapse_date, s.cost, t.start_date,
+                               LAG(s.relapse_date) OVER (PARTITION BY s.tracker_id
+                                                         ORDER BY s.relapse_date) AS previous
+                        FROM sobriety_relapses s JOIN sobriety_tracker t ON t.id = s.tracker_id
+                        WHERE {where}
+                    )
+                    GROUP BY tracker_id
+                ) r ON r.tracker_id = t.id
+                WHERE {where}""",
+            params + params
+        ).fetchall()
         
-        # Calculate current streak
-        if tracker['last_relapse']:
-            last_relapse_date = datetime.strptime(tracker['last_relapse'], '%Y-%m-%d').date()
-            current_streak = (today - last_relapse_date).days - 1
-            if current_streak < 0:
-                current_streak = 0
-        else:
-            start_date = datetime.strptime(tracker['start_date'], '%Y-%m-%d').date()
-            current_streak = (today - start_date).days
-        
-        # Update longest streak if needed
-        longest_streak = max(tracker['longest_streak_days'], current_streak)
-        
-        # Calculate savings (placeholder - would need habit-specific cost per day)
-        # For now, set to 0
-        savings = 0
-        
-        with get_db() as conn:
-            conn.execute(
-                """UPDATE sobriety_tracker
-                   SET current_streak_days = ?, longest_streak_days = ?, savings_calculated = ?
-                   WHERE id = ?""",
-                (current_streak, longest_streak, savings, tracker_id)
+        trackers = []
+        for row in rows:
+            tracker = dict(row)
+            start = date.fromisoformat(tracker['start_date'][:10])
+            last_relapse = max(filter(None, (tracker['last_relapse'], tracker.pop('latest'))), default=None)
+            
+            if last_relapse:
+                current_streak = max((today - date.fromisoformat(last_relapse[:10])).days - 1, 0)
+            else:
+                current_streak = max((today - start).days, 0)
+            
+            cost_per_day = tracker['cost_per_day'] or 0
+            savings = cost_per_day * max((today - start).days, 0) - tracker.pop('relapse_cost')
+            
+            tracker.update(
+                last_relapse=last_relapse,
+                current_streak_days=current_streak,
+                longest_streak_days=max(tracker.pop('longest_gap') or 0, current_streak),
+                savings_calculated=round(savings, 2) if cost_per_day else 0
             )
+            tracker.pop('relapse_log', None)
+            trackers.append(tracker)
+        return trackers
     
     # ========== ANALYTICS ==========
     
     def get_analytics(self, owner: str, days: int = 30) -> Dict:
-        """Get overall health analytics"""
-        # Blueprint compliance
-        blueprint_logs = self.get_blueprint_logs('system', owner=owner, limit=days)
-        avg_compliance = 0
-        if blueprint_logs:
-            avg_compliance = sum(log['compliance_score'] for log in blueprint_logs) / len(blueprint_logs)
-        
-        # Workout stats
-        workout_stats = self.get_workout_stats(owner, days=days)
-        
-        # Biometric trends
-        biometric_trends = self.get_biometric_trends(owner, days=days)
+        """Get overall health analytics (one connection, pre-aggregated rows)"""
+        with get_db() as conn:
+            # Blueprint compliance
+            blueprint = conn.execute(
+                """SELECT COUNT(*) AS logged_days, AVG(compliance_score) AS avg_compliance
+                   FROM blueprint_logs
+                   WHERE owner = ? AND date > date('now', ?)""",
+                (owner, f'-{days} days')
+            ).fetchone()
+            avg_compliance = blueprint['avg_compliance'] or 0
+            
+            # Workout stats
+            workout_stats = self._workout_stats(conn, owner, days)
+            
+            # Biometric trends
+            biometric_trends = self._biometric_trends(conn, owner, days)
         
         # Generate insights
         insights = []
@@ -540,7 +774,7 @@ class VesselModule:
             'period_days': days,
             'blueprint': {
                 'avg_compliance': round(avg_compliance, 1),
-                'logged_days': len(blueprint_logs)
+                'logged_days': blueprint['logged_days']
             },
             'workouts': workout_stats,
             'biometrics': biometric_trends,
@@ -573,15 +807,10 @@ class VesselModule:
                    WHERE date > date('now', '-30 days')"""
             ).fetchone()['count']
             
-            # Sobriety trackers
-            sobriety_trackers = conn.execute(
-                "SELECT COUNT(*) as count FROM sobriety_tracker"
-            ).fetchone()['count']
-            
-            # Longest streak
-            longest_streak = conn.execute(
-                "SELECT MAX(longest_streak_days) as max_streak FROM sobriety_tracker"
-            ).fetchone()['max_streak'] or 0
+            # Sobriety trackers (streaks are computed on read)
+            trackers = self._sobriety_status(conn)
+            sobriety_trackers = len(trackers)
+            longest_streak = max((t['longest_streak_days'] for t in trackers), default=0)
             
             return {
                 'blueprint_logs_30d': blueprint_30d,
@@ -0,0 +1,334 @@
+"""
+Biometric time series for The Vessel
+
+A window of biometrics_daily / workouts_daily is loaded once into a
+(day x metric) NumPy matrix (NaN where a day has no reading), padded with
+LOOKBACK_DAYS of history so the first day in range already has a full
+baseline. Every series is then computed for all metrics in one pass:
+
+- ewma: exponentially weighted mean over calendar days (span EWMA_SPAN);
+  missing days decay the weight rather than counting as zero
+- baseline / z: mean and standard deviation of the previous BASELINE_DAYS
+  days, and today's deviation from them in standard deviations
+- slope: least-squares slope (units per day) over the trailing SLOPE_DAYS
+- acute_chronic: ACUTE_DAYS / CHRONIC_DAYS mean training load, where a
+  day's load is workout minutes x session RPE (DEFAULT_RPE if not logged)
+
+Rolling statistics come from cumulative sums, so each is O(days) however
+wide the window. Long ranges are downsampled into equal buckets of days:
+means per bucket, and the most extreme z-score so spikes stay visible.
+"""
+import math
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Dict, Optional, Sequence, Tuple
+
+# numpy is imported where used, so importing the API doesn't pay for it
+if TYPE_CHECKING:
+    import numpy as np
+
+from modules.vessel.rollups import BIOMETRIC_METRICS
+
+LOAD_METRIC = 'load'
+METRICS = BIOMETRIC_METRICS + (LOAD_METRIC,)
+
+EWMA_SPAN = 7
+BASELINE_DAYS = 28
+SLOPE_DAYS = 28
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+LOOKBACK_DAYS = max(BASELINE_DAYS, SLOPE_DAYS, CHRONIC_DAYS)
+
+# Baseline needs this many readings before a z-score is reported
+MIN_BASELINE_READINGS = 7
+ANOMALY_Z = 2.0
+
+DEFAULT_RPE = 5
+MAX_POINTS = 366
+
+# Acute:chronic workload zones (upper bounds)
+LOAD_ZONES = ((0.8, 'undertraining'), (1.3, 'optimal'), (1.5, 'elevated'))
+
+
+def load(conn, owner: str, start: date, end: date, metrics: Sequence[str] = METRICS) -> Dict:
+    """
+    Daily metric matrix for owner from start - LOOKBACK_DAYS to end
+
+    values is (day x metric) with NaN for days without a reading; training
+    load is 0 on days without a workout.
+    """
+    import numpy as np
+
+    first = start - timedelta(days=LOOKBACK_DAYS)
+    n_days = (end - first).days + 1
+    values = np.full((n_days, len(metrics)), np.nan)
+
+    biometrics = [m for m in metrics if m in BIOMETRIC_METRICS]
+    if biometrics:
+        columns = ', '.join(f"{m}_sum, {m}_n" for m in biometrics)
+        rows = conn.execute(
+            f"""SELECT day, {columns} FROM biometrics_daily
+                WHERE owner = ? AND day BETWEEN ? AND ?""",
+            (owner, first.isoformat(), end.isoformat())
+        ).fetchall()
+        if rows:
+            offsets = np.array([(date.fromisoformat(row['day']) - first).days for row in rows])
+            raw = np.array([[row[f'{m}_{part}'] for m in biometrics for part in ('sum', 'n')]
+                            for row in rows], dtype=np.float64)  # None -> NaN
+            sums, counts = raw[:, 0::2], raw[:, 1::2]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means = np.where(counts > 0, sums / counts, np.nan)
+            for j, m in enumerate(biometrics):
+                values[offsets, metrics.index(m)] = means[:, j]
+
+    if LOAD_METRIC in metrics:
+        j = metrics.index(LOAD_METRIC)
+        values[:, j] = 0.0
+        for row in conn.execute(
+            f"""SELECT day, SUM(minutes * COALESCE(rpe_sum * 1.0 / rpe_n, {DEFAULT_RPE})) AS load
+                FROM workouts_daily
+                WHERE owner = ? AND day BETWEEN ? AND ?
+                GROUP BY day""",
+            (owner, first.isoformat(), end.isoformat())
+        ):
+            values[(date.fromisoformat(row['day']) - first).days, j] = row['load'] or 0.0
+
+    return {'first': first, 'start': start, 'end': end, 'metrics': list(metrics), 'values': values}
+
+
+def ewma(values: 'np.ndarray', span: int = EWMA_SPAN, block: int = 256) -> 'np.ndarray':
+    """
+    Exponentially weighted mean down the rows of values, skipping NaNs
+
+    The recurrence num_t = w * num_{t-1} + x_t (and likewise for the
+    weights) is evaluated a block of days at a time as a lower-triangular
+    decay-matrix product, carrying the previous block's state forward.
+    """
+    import numpy as np
+
+    decay = 1.0 - 2.0 / (span + 1)
+    present = ~np.isnan(values)
+    x = np.where(present, values, 0.0)
+    weight = present.astype(np.float64)
+
+    lag = np.arange(block)[:, None] - np.arange(block)[None, :]
+    kernel = np.where(lag >= 0, decay ** np.maximum(lag, 0), 0.0)
+    carry = decay ** np.arange(1, block + 1)
+
+    num, den = np.empty_like(x), np.empty_like(x)
+    num_prev = np.zeros(x.shape[1:])
+    den_prev = np.zeros(x.shape[1:])
+    for lo in range(0, len(x), block):
+        hi = min(lo + block, len(x))
+        k = kernel[:hi - lo, :hi - lo]
+        num[lo:hi] = k @ x[lo:hi] + np.multiply.outer(carry[:hi - lo], num_prev)
+        den[lo:hi] = k @ weight[lo:hi] + np.multiply.outer(carry[:hi - lo], den_prev)
+        num_prev, den_prev = num[hi - 1], den[hi - 1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den > 1e-12, num / den, np.nan)
+
+
+def _window_sums(a: 'np.ndarray', window: int, lag: int = 0) -> 'np.ndarray':
+    """Sum down the rows of a over the `window` rows ending `lag` rows before each row"""
+    import numpy as np
+
+    cum = np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])
+    idx = np.arange(len(a))
+    hi = np.maximum(idx + 1 - lag, 0)
+    lo = np.maximum(hi - window, 0)
+    return cum[hi] - cum[lo]
+
+
+def baseline(values: 'np.ndarray', window: int = BASELINE_DAYS):
+    """(mean, std, readings) of the previous `window` days for each day, NaN-aware"""
+    import numpy as np
+
+    present = ~np.isnan(values)
+    x = np.where(present, values, 0.0)
+    n = _window_sums(present.astype(np.float64), window, lag=1)
+    s = _window_sums(x, window, lag=1)
+    ss = _window_sums(x * x, window, lag=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(n > 0, s / n, np.nan)
+        var = np.where(n > 1, (ss - n * mean * mean) / (n - 1), np.nan)
+    return mean, np.sqrt(np.clip(var, 0, None)), n
+
+
+def zscores(values: 'np.ndarray', mean: 'np.ndarray', std: 'np.ndarray', n: 'np.ndarray') -> 'np.ndarray':
+    """Deviation from the baseline in standard deviations (NaN without enough history)"""
+    import numpy as np
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((n >= MIN_BASELINE_READINGS) & (std > 1e-9), (values - mean) / std, np.nan)
+
+
+def slopes(values: 'np.ndarray', window: int = SLOPE_DAYS) -> 'np.ndarray':
+    """Least-squares slope (units per day) over the trailing `window` days, NaN-aware"""
+    import numpy as np
+
+    present = ~np.isnan(values)
+    w = present.astype(np.float64)
+    y = np.where(present, values, 0.0)
+    t = np.arange(len(values), dtype=np.float64).reshape((-1,) + (1,) * (values.ndim - 1))
+
+    n = _window_sums(w, window)
+    sx, sy = _window_sums(w * t, window), _window_sums(y, window)
+    sxx, sxy = _window_sums(w * t * t, window), _window_sums(y * t, window)
+    denom = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((n >= 2) & (denom > 1e-9), (n * sxy - sx * sy) / denom, np.nan)
+
+
+def acute_chronic(load_values: 'np.ndarray', acute: int = ACUTE_DAYS, chronic: int = CHRONIC_DAYS) -> 'np.ndarray':
+    """Mean daily load over the last `acute` days over that of the last `chronic` days"""
+    import numpy as np
+
+    x = np.nan_to_num(load_values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        chronic_mean = _window_sums(x, chronic) / chronic
+        return np.where(chronic_mean > 0, (_window_sums(x, acute) / acute) / chronic_mean, np.nan)
+
+
+def load_zone(ratio: Optional[float]) -> str:
+    if ratio is None:
+        return 'unknown'
+    for bound, zone in LOAD_ZONES:
+        if ratio < bound:
+            return zone
+    return 'high_risk'
+
+
+def overall_slopes(data: Dict) -> Dict[str, Optional[float]]:
+    """Least-squares slope (units per day) of each metric over [start, end]"""
+    skip = (data['start'] - data['first']).days
+    values = data['values'][skip:]
+    if not len(values):
+        return dict.fromkeys(data['metrics'])
+    last = slopes(values, window=len(values))[-1]
+    return {m: None if last[j] != last[j] else float(last[j]) for j, m in enumerate(data['metrics'])}
+
+
+def slope_of(readings: Sequence[Tuple[date, float]]) -> Optional[float]:
+    """Least-squares slope (units per day) of dated readings, e.g. rollup days already read"""
+    import numpy as np
+
+    first = min(day for day, _ in readings)
+    values = np.full((max(day for day, _ in readings) - first).days + 1, np.nan)
+    for day, value in readings:
+        values[(day - first).days] = value
+    last = slopes(values, window=len(values))[-1]
+    return None if last != last else float(last)
+
+
+def compute(data: Dict) -> Dict[str, 'np.ndarray']:
+    """Every series for every metric, trimmed to [start, end]"""
+    values = data['values']
+    mean, std, n = baseline(values)
+    series = {
+        'value': values,
+        'ewma': ewma(values),
+        'baseline': mean,
+        'z': zscores(values, mean, std, n),
+        'slope': slopes(values)
+    }
+    if LOAD_METRIC in data['metrics']:
+        series['acute_chronic'] = acute_chronic(values[:, data['metrics'].index(LOAD_METRIC)])
+
+    skip = (data['start'] - data['first']).days
+    return {name: array[skip:] for name, array in series.items()}
+
+
+def downsample(series: Dict[str, 'np.ndarray'], bucket_days: int) -> Dict[str, 'np.ndarray']:
+    """Bucket means per series (NaNs skipped); z keeps each bucket's most extreme value"""
+    import numpy as np
+
+    if bucket_days <= 1:
+        return series
+
+    out = {}
+    for name, array in series.items():
+        edges = np.arange(0, len(array), bucket_days)
+        present = ~np.isnan(array)
+        if name == 'z':
+            high = np.maximum.reduceat(np.where(present, array, -np.inf), edges, axis=0)
+            low = np.minimum.reduceat(np.where(present, array, np.inf), edges, axis=0)
+            extreme = np.where(np.abs(low) > np.abs(high), low, high)
+            out[name] = np.where(np.isfinite(extreme), extreme, np.nan)
+            continue
+        sums = np.add.reduceat(np.where(present, array, 0.0), edges, axis=0)
+        counts = np.add.reduceat(present.astype(np.float64), edges, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[name] = np.where(counts > 0, sums / counts, np.nan)
+    return out
+
+
+def _round(value, digits: int = 2) -> Optional[float]:
+    return None if value != value else round(float(value), digits)
+
+
+def analyze(data: Dict, max_points: int = MAX_POINTS) -> Dict:
+    """Chart points (downsampled to at most max_points), summary and anomalies from load() output"""
+    import numpy as np
+
+    metrics = data['metrics']
+    series = compute(data)
+    values = series['value']
+    n_days = len(values)
+    start = data['start']
+
+    bucket_days = max(1, math.ceil(n_days / max_points))
+    buckets = downsample(series, bucket_days)
+    per_metric = [name for name in buckets if name != 'acute_chronic']
+
+    points = []
+    for i in range(len(buckets['value'])):
+        point = {'date': (start + timedelta(days=i * bucket_days)).isoformat()}
+        for j, m in enumerate(metrics):
+            point[m] = {name: _round(buckets[name][i, j], 3 if name == 'slope' else 2) for name in per_metric}
+        if 'acute_chronic' in buckets:
+            point[LOAD_METRIC]['acute_chronic'] = _round(buckets['acute_chronic'][i])
+        points.append(point)
+
+    # Window summary: mean, latest reading and slope over the whole range
+    present = ~np.isnan(values)
+    counts = present.sum(axis=0)
+    sums = np.where(present, values, 0.0).sum(axis=0)
+    overall_slope = overall_slopes(data)
+    latest_idx = np.where(present.any(axis=0), n_days - 1 - np.argmax(present[::-1], axis=0), -1)
+
+    summary = {}
+    for j, m in enumerate(metrics):
+        latest = latest_idx[j]
+        summary[m] = {
+            'readings': int(counts[j]),
+            'mean': _round(sums[j] / counts[j]) if counts[j] else None,
+            'latest': _round(values[latest, j]) if latest >= 0 else None,
+            'ewma': _round(series['ewma'][latest, j]) if latest >= 0 else None,
+            'slope_per_week': None if overall_slope[m] is None else round(overall_slope[m] * 7, 3)
+        }
+
+    acute_chronic_ratio = None
+    if 'acute_chronic' in series and n_days:
+        acute_chronic_ratio = _round(series['acute_chronic'][-1])
+
+    anomalies = []
+    for i, j in zip(*np.nonzero(np.abs(np.nan_to_num(series['z'])) >= ANOMALY_Z)):
+        anomalies.append({
+            'date': (start + timedelta(days=int(i))).isoformat(),
+            'metric': metrics[j],
+            'value': _round(values[i, j]),
+            'baseline': _round(series['baseline'][i, j]),
+            'z': _round(series['z'][i, j])
+        })
+
+    return {
+        'start': start.isoformat(),
+        'end': data['end'].isoformat(),
+        'bucket_days': bucket_days,
+        'metrics': metrics,
+        'points': points,
+        'summary': summary,
+        'acute_chronic': {'ratio': acute_chronic_ratio, 'zone': load_zone(acute_chronic_ratio)}
+        if LOAD_METRIC in metrics else None,
+        'anomalies': anomalies
+    }
@@ -60,6 +60,27 @@ def test_database():
     shutil.rmtree(temp_dir, ignore_errors=True)
 
 
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """
+    Empty database with the current schema, used by core.database.get_db()
+    """
+    import sqlite3
+    import core.database
+
+    db_path = tmp_path / 'levy.db'
+    schema_path = Path(__file__).parent.parent / "database" / "schema.sql"
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(schema_path.read_text())
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(core.database, 'DB_PATH', db_path)
+
+    yield db_path
+
+
 @pytest.fixture
 def test_user(test_database):
     """
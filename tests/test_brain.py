@@ -1,8 +1,25 @@
 """
 Brain module tests
 """
+import asyncio
+
+import networkx as nx
 import pytest
+from core.database import get_db
 from modules.brain.service import BrainModule
+from modules.brain.search import SearchCache, build_match_query, reciprocal_rank_fusion
+from modules.brain.suggest import PrefixIndex
+from modules.brain.anki import AnkiConnect
+from modules.brain.backup import decode_vector, encode_vector, read_ndjson, to_ndjson
+from modules.brain.clipper import WebClipper, extract_content
+from modules.brain.dedup import band_keys, group_pairs, minhash, shingles, similarity
+from modules.brain.embeddings import (
+    CHUNK_OVERLAP, CHUNK_WORDS, aggregate_chunk_hits, chunk_point_id, chunk_text,
+    load_encoder, recall_at_k
+)
+from modules.brain.graph import (
+    SCIPY_AVAILABLE, InvertedIndex, analyze_graph, can_link, compute_edges, entry_similarity
+)
 
 
 class TestBrainModuleInit:
@@ -25,6 +42,53 @@ class TestBrainModuleInit:
         assert brain.qdrant is not None
         assert brain.collection_name is not None
 
+    def test_construction_is_lazy(self):
+        """No Qdrant connection or model load until first use"""
+        brain = BrainModule()
+
+        assert brain._qdrant is None
+        assert brain._embedding_model is None
+
+    def test_payload_indexes_added_to_existing_collection(self):
+        """A collection created before the payload indexes gets them on startup"""
+        from types import SimpleNamespace
+
+        class RecordingQdrant:
+            def __init__(self, collection, indexed):
+                self.collection, self.indexed, self.created = collection, indexed, []
+
+            def get_collections(self):
+                return SimpleNamespace(collections=[SimpleNamespace(name=self.collection)])
+
+            def get_collection(self, collection_name):
+                return SimpleNamespace(payload_schema={f: 'keyword' for f in self.indexed})
+
+            def create_payload_index(self, collection_name, field_name, field_schema):
+                self.created.append(field_name)
+                self.indexed.append(field_name)
+
+        brain = BrainModule()
+        brain.qdrant = RecordingQdrant(brain.collection_name, ['owner'])
+
+        brain._ensure_collection_exists()
+        brain._ensure_collection_exists()
+
+        assert brain.qdrant.created == ['parent_id']
+
+    def test_startup_does_not_import_heavy_dependencies(self):
+        """bin/bench-startup gate: importing the API loads no model/vector/graph libraries"""
+        import subprocess
+        import sys
+        from pathlib import Path
+
+        script = Path(__file__).parent.parent / 'bin' / 'bench-startup'
+        result = subprocess.run(
+            [sys.executable, str(script), '--repeat', '1', '--max-ms', '30000'],
+            capture_output=True, text=True
+        )
+
+        assert result.returncode == 0, result.stdout + result.stderr
+
 
 class TestKnowledgeEntryCRUD:
     """Test knowledge entry CRUD operations"""
@@ -127,6 +191,30 @@ class TestEmbeddings:
         assert len(embedding) == 384  # all-MiniLM-L6-v2 dimension
         assert all(isinstance(x, float) for x in embedding)
 
+    def test_unknown_encoder_backend_rejected(self):
+        """Backend names are validated before any model is loaded"""
+        with pytest.raises(ValueError):
+            load_encoder('tensorflow')
+
+    def test_warm_up_loads_encoder_once(self, monkeypatch):
+        """warm_up() loads the configured encoder and runs one encode"""
+        calls = []
+
+        class FakeEncoder:
+            def encode(self, texts, **kwargs):
+                calls.append(len(texts))
+                return [[0.0] * 384 for _ in texts]
+
+        monkeypatch.setattr('modules.brain.service.load_encoder', lambda: FakeEncoder())
+        brain = BrainModule()
+
+        timings = brain.warm_up()
+        brain.warm_up()
+
+        assert set(timings) == {'load_ms', 'encode_ms'}
+        assert isinstance(brain.embedding_model, FakeEncoder)
+        assert len(calls) == 2
+
     @pytest.mark.slow
     def test_generate_embedding_for_entry(self, test_user, sample_knowledge_entry):
         """Test generating embedding for a knowledge entry"""
@@ -147,6 +235,374 @@ class TestEmbeddings:
             assert result['entry_id'] == entry_id
 
 
+class TestChunkedEmbeddings:
+    """Test chunking, chunk-hit aggregation and chunk storage"""
+
+    @staticmethod
+    def _hash_encode(texts, batch_size=None):
+        """Bag-of-words hashing encoder (deterministic stand-in for the model)"""
+        vectors = []
+        for text in texts:
+            vector = [0.0] * 384
+            for word in text.lower().split():
+                vector[sum(map(ord, word)) % 384] += 1.0
+            vectors.append(vector)
+        return vectors
+
+    def test_chunk_text_overlaps(self):
+        """Windows overlap and together cover every word"""
+        words = [f"w{i}" for i in range(300)]
+        chunks = chunk_text(' '.join(words), title='Title')
+
+        assert all(chunk.startswith('Title\n\n') for chunk in chunks)
+        bodies = [chunk.split('\n\n', 1)[1].split() for chunk in chunks]
+        assert all(len(body) <= CHUNK_WORDS for body in bodies)
+        assert bodies[1][:CHUNK_OVERLAP] == bodies[0][-CHUNK_OVERLAP:]
+        assert set(w for body in bodies for w in body) == set(words)
+
+    def test_chunk_text_short_and_empty(self):
+        """Short content is one chunk; empty content falls back to the title"""
+        assert chunk_text('a few words', title='T') == ['T\n\na few words']
+        assert chunk_text('', title='T') == ['T']
+        assert chunk_text(None) == []
+
+    def test_chunk_point_ids_are_stable_uuids(self):
+        """Same entry/chunk gives the same id; ids differ across chunks"""
+        assert chunk_point_id('abc12345', 0) == chunk_point_id('abc12345', 0)
+        assert chunk_point_id('abc12345', 0) != chunk_point_id('abc12345', 1)
+        assert len(chunk_point_id('abc12345', 0)) == 36
+
+    def test_aggregate_chunk_hits(self):
+        """Entries score as their best chunk"""
+        class Hit:
+            def __init__(self, id, score, payload):
+                self.id, self.score, self.payload = id, score, payload
+
+        hits = [
+            Hit('p1', 0.9, {'parent_id': 'a', 'chunk_index': 3}),
+            Hit('p2', 0.8, {'parent_id': 'b', 'chunk_index': 0}),
+            Hit('p3', 0.7, {'parent_id': 'a', 'chunk_index': 0}),
+            Hit('legacy', 0.6, None),
+        ]
+        results = aggregate_chunk_hits(hits)
+
+        assert [r['id'] for r in results] == ['a', 'b', 'legacy']
+        assert results[0] == {'id': 'a', 'score': 0.9, 'chunk_index': 3, 'chunk_hits': 2}
+        assert len(aggregate_chunk_hits(hits, limit=1)) == 1
+
+    def test_recall_at_k(self):
+        """Share of queries with the relevant entry in the top k"""
+        rankings = [['a', 'b'], ['c', 'a'], ['d', 'e']]
+        assert recall_at_k(rankings, ['a', 'a', 'a'], k=1) == pytest.approx(1 / 3)
+        assert recall_at_k(rankings, ['a', 'a', 'a'], k=2) == pytest.approx(2 / 3)
+
+    def test_long_entry_found_by_late_passage(self, fresh_db):
+        """A passage far past the model's input limit still retrieves its entry"""
+        from qdrant_client import QdrantClient
+
+        brain = BrainModule()
+        brain.qdrant = QdrantClient(':memory:')
+        brain._ensure_collection_exists()
+        brain._encode_batch = self._hash_encode
+        brain._generate_embedding_vector = lambda text: self._hash_encode([text])[0]
+
+        filler = ' '.join(f"filler{i}" for i in range(400))
+        entry_id = brain.create_entry({
+            'title': 'Long clip',
+            'content': f"{filler} {' '.join(['kubernetes ingress'] * 60)}",
+            'content_type': 'web_clip'
+        }, 'faza')['id']
+
+        with get_db() as conn:
+            chunks = conn.execute(
+                "SELECT embedding_chunks FROM knowledge_entries WHERE id = ?", (entry_id,)
+            ).fetchone()[0]
+        assert chunks > 1
+
+        results = brain._semantic_search('kubernetes ingress', 'faza')
+        assert results[0]['id'] == entry_id
+        assert results[0]['matched_chunk'] == chunks - 1
+
+        # Deleting the entry removes every chunk
+        brain.delete_entry(entry_id, 'faza')
+        assert brain.qdrant.count(brain.collection_name).count == 0
+
+
+class TestBackup:
+    """Test NDJSON export/import"""
+
+    def test_vector_round_trip(self):
+        """Vectors survive base64 float32 encoding"""
+        vector = [0.25, -1.5, 3.0]
+        assert decode_vector(encode_vector(vector)) == vector
+
+    def test_read_ndjson_requires_header(self):
+        """Records before a header, or an unknown format, are rejected"""
+        with pytest.raises(ValueError):
+            list(read_ndjson(['{"type": "entry", "entry": {}}']))
+        with pytest.raises(ValueError):
+            list(read_ndjson(['{"type": "header", "format": "other", "version": 1}']))
+
+    def test_export_import_round_trip(self, fresh_db):
+        """Entries and their vectors are restored without re-encoding"""
+        from qdrant_client import QdrantClient
+
+        brain = BrainModule()
+        brain.qdrant = QdrantClient(':memory:')
+        brain._ensure_collection_exists()
+        brain._encode_batch = TestChunkedEmbeddings._hash_encode
+
+        filler = ' '.join(f"word{i}" for i in range(300))
+        ids = [
+            brain.create_entry({'title': f'Note {i}', 'content': f"{filler} topic{i}",
+                                'tags': ['backup', f't{i}'], 'domain': 'tech'}, 'faza')['id']
+            for i in range(3)
+        ]
+        brain.create_entry({'title': 'Private', 'content': 'gaby only'}, 'gaby')
+        points = brain.qdrant.count(brain.collection_name).count
+
+        lines = list(to_ndjson(brain.export_entries('faza', page_size=2)))
+        assert len(lines) == 1 + len(ids)
+        assert '"doc_id"' not in lines[1]
+
+        # Restore into an empty store
+        with get_db() as conn:
+            conn.execute("DELETE FROM knowledge_entries")
+        brain.qdrant = QdrantClient(':memory:')
+        brain._ensure_collection_exists()
+
+        def no_encoding(texts, batch_size=None):
+            raise AssertionError("import must not re-encode")
+        brain._encode_batch = no_encoding
+
+        result = brain.import_entries(lines, 'faza', batch_size=2)
+
+        assert result['imported'] == 3
+        assert result['needs_embedding'] == 0
+        assert brain.qdrant.count(brain.collection_name).count == points - 1
+        entry = brain.get_entry(ids[0], 'faza')
+        assert entry['tags'] == ['backup', 't0']
+        with get_db() as conn:
+            synced = conn.execute(
+                "SELECT COUNT(*) FROM knowledge_entries WHERE embedding_synced = 1 AND embedding_chunks > 1"
+            ).fetchone()[0]
+        assert synced == 3
+
+        # Re-importing skips what already exists; another user can't claim the entries
+        result = brain.import_entries(lines, 'faza')
+        assert (result['skipped'], result['failed'], result['errors']) == (3, 0, [])
+        assert brain.import_entries(lines, 'gaby', on_conflict='replace')['imported'] == 0
+
+    def test_import_reports_malformed_lines(self, fresh_db):
+        """Bad lines after the first batch are reported per line; every valid entry lands"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+        ids = [brain.create_entry({'title': f'Note {i}', 'content': f'body {i}'}, 'faza')['id']
+               for i in range(3)]
+        lines = list(to_ndjson(brain.export_entries('faza', include_embeddings=False)))
+        with get_db() as conn:
+            conn.execute("DELETE FROM knowledge_entries")
+
+        lines = lines[:3] + ['{"type": "entry", "entry": {"id": \n', '{"type": "entry"}\n'] + lines[3:]
+        result = brain.import_entries(lines, 'faza', batch_size=1)
+
+        assert (result['imported'], result['failed']) == (3, 2)
+        assert [e['record'] for e in result['errors']] == [4, 5]
+        assert sorted(e['id'] for e in brain.get_entries('faza')) == sorted(ids)
+
+        with pytest.raises(ValueError):
+            brain.import_entries(lines[1:], 'faza')
+
+    def test_replace_import_reindexes_entry(self, fresh_db):
+        """A replaced entry's old terms, tags and vectors don't survive the import"""
+        import json
+        from qdrant_client import QdrantClient
+
+        brain = BrainModule()
+        brain.qdrant = QdrantClient(':memory:')
+        brain._ensure_collection_exists()
+        brain._encode_batch = TestChunkedEmbeddings._hash_encode
+
+        entry_id = brain.create_entry({'title': 'Alpha', 'content': 'original walrus text',
+                                       'tags': ['old']}, 'faza')['id']
+        brain.create_entry({'title': 'Other', 'content': 'unrelated', 'tags': ['old']}, 'faza')
+        assert brain.qdrant.count(brain.collection_name).count == 2
+
+        lines = list(to_ndjson(brain.export_entries('faza', include_embeddings=False)))
+        record = next(json.loads(line) for line in lines if entry_id in line)
+        record['entry'].update(content='rewritten narwhal text', tags=['new'])
+        lines = [lines[0], json.dumps(record)]
+
+        result = brain.import_entries(lines, 'faza', on_conflict='replace', include_embeddings=False)
+
+        assert (result['imported'], result['needs_embedding']) == (1, 1)
+        assert [r['id'] for r in brain.search('narwhal', 'faza')['results']] == [entry_id]
+        assert brain.search('walrus', 'faza')['results'] == []
+        with get_db() as conn:
+            assert [row['tag'] for row in conn.execute(
+                "SELECT tag FROM knowledge_tags WHERE entry_id = ?", (entry_id,)
+            )] == ['new']
+            assert conn.execute(
+                "SELECT COUNT(*) FROM knowledge_edges WHERE src_id = ? OR dst_id = ?", (entry_id, entry_id)
+            ).fetchone()[0] == 0
+        assert brain.qdrant.count(brain.collection_name).count == 1
+
+
+@pytest.fixture
+def anki_stub():
+    """Local AnkiConnect stand-in (multi, notes, fields, decks, tags) over HTTP/1.1 keep-alive"""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'notes': {}, 'requests': 0, 'connections': set(), 'next_id': 1000}
+
+    def run(action, params):
+        if action == 'addNotes':
+            ids = []
+            for note in params['notes']:
+                state['next_id'] += 1
+                state['notes'][state['next_id']] = note
+                ids.append(state['next_id'])
+            return ids
+        if action == 'updateNoteFields':
+            state['notes'][params['note']['id']]['fields'] = params['note']['fields']
+            return None
+        if action == 'notesInfo':
+            # One card per note, sharing the note's id
+            return [{'noteId': i, 'tags': state['notes'][i]['tags'], 'cards': [i]} if i in state['notes']
+                    else {} for i in params['notes']]
+        if action == 'changeDeck':
+            for card in params['cards']:
+                state['notes'][card]['deckName'] = params['deck']
+            return None
+        if action in ('addTags', 'removeTags'):
+            tags = params['tags'].split()
+            for i in params['notes']:
+                kept = [t for t in state['notes'][i]['tags'] if t not in tags]
+                state['notes'][i]['tags'] = kept + tags if action == 'addTags' else kept
+            return None
+        raise ValueError(f"unsupported action {action}")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            state['requests'] += 1
+            state['connections'].add(self.client_address[1])
+            if request['action'] == 'multi':
+                result = [{'result': run(a['action'], a.get('params', {})), 'error': None}
+                          for a in request['params']['actions']]
+            else:
+                result = run(request['action'], request.get('params', {}))
+            body = json.dumps({'result': result, 'error': None}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", state
+    server.shutdown()
+
+
+class TestAnkiSync:
+    """Test the batched, incremental AnkiConnect sync"""
+
+    def _brain(self, url):
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+        brain.anki = AnkiConnect(url)
+        return brain
+
+    def test_sync_batches_and_is_incremental(self, fresh_db, anki_stub):
+        """Cards go out in multi batches over one connection; reruns only send edits"""
+        url, state = anki_stub
+        brain = self._brain(url)
+
+        ids = [
+            brain.create_entry({'title': f'Card {i}', 'content': f'Q: q{i}\nA: a{i}',
+                                'domain': 'tech', 'is_srs_eligible': True}, 'faza')['id']
+            for i in range(25)
+        ]
+        brain.create_entry({'title': 'Not a card', 'content': 'x'}, 'faza')
+
+        first = brain.sync_anki_cards('faza', batch_size=10)
+
+        assert first['added'] == 25 and first['failed'] == 0
+        assert first['requests'] == 1  # three addNotes actions in one multi
+        assert len(state['connections']) == 1
+        with get_db() as conn:
+            assert conn.execute(
+                "SELECT COUNT(*) FROM knowledge_entries WHERE srs_card_id IS NOT NULL"
+            ).fetchone()[0] == 25
+
+        # Nothing changed: nothing sent
+        assert brain.sync_anki_cards('faza')['added'] == 0
+        assert state['requests'] == 1
+
+        # An edit is pushed as a field update of the existing note
+        brain.update_entry(ids[3], {'content': 'Q: new question\nA: new answer'}, 'faza')
+        third = brain.sync_anki_cards('faza')
+
+        assert (third['added'], third['updated']) == (0, 1)
+        card_id = int(brain.get_entry(ids[3], 'faza')['srs_card_id'])
+        assert state['notes'][card_id]['fields']['Front'] == 'new question'
+
+    def test_sync_moves_deck_and_tags(self, fresh_db, anki_stub):
+        """Domain and tag edits move the note's cards and add/remove its tags"""
+        url, state = anki_stub
+        brain = self._brain(url)
+
+        entry_id = brain.create_entry({'title': 'Card', 'content': 'Q: q\nA: a', 'domain': 'tech',
+                                       'tags': ['python', 'old'], 'is_srs_eligible': True}, 'faza')['id']
+        brain.sync_anki_cards('faza')
+
+        brain.update_entry(entry_id, {'domain': 'dnd', 'tags': ['python', 'new']}, 'faza')
+        result = brain.sync_anki_cards('faza')
+
+        assert (result['updated'], result['failed']) == (1, 0)
+        note = state['notes'][int(brain.get_entry(entry_id, 'faza')['srs_card_id'])]
+        assert note['deckName'] == 'Nexus::dnd'
+        assert sorted(note['tags']) == ['auto', 'new', 'nexus', 'python']
+
+    def test_sync_readds_notes_deleted_in_anki(self, fresh_db, anki_stub):
+        """An edited entry whose note is gone from Anki is added again, not updated"""
+        url, state = anki_stub
+        brain = self._brain(url)
+
+        entry_id = brain.create_entry({'title': 'Card', 'content': 'Q: q\nA: a',
+                                       'is_srs_eligible': True}, 'faza')['id']
+        brain.sync_anki_cards('faza')
+        old_id = int(brain.get_entry(entry_id, 'faza')['srs_card_id'])
+        del state['notes'][old_id]
+
+        brain.update_entry(entry_id, {'content': 'Q: new\nA: answer'}, 'faza')
+        result = brain.sync_anki_cards('faza')
+
+        assert (result['added'], result['updated'], result['failed']) == (1, 0, 0)
+        new_id = int(brain.get_entry(entry_id, 'faza')['srs_card_id'])
+        assert new_id != old_id
+        assert state['notes'][new_id]['fields']['Front'] == 'new'
+
+        brain.update_entry(entry_id, {'content': 'Q: newer\nA: answer'}, 'faza')
+        assert brain.sync_anki_cards('faza')['updated'] == 1
+        assert state['notes'][new_id]['fields']['Front'] == 'newer'
+
+    def test_sync_reports_unreachable_anki(self, fresh_db):
+        """Connection failures are returned as an error, not raised"""
+        brain = self._brain('http://127.0.0.1:9')
+        brain.create_entry({'title': 'Card', 'content': 'x', 'is_srs_eligible': True}, 'faza')
+
+        assert 'error' in brain.sync_anki_cards('faza')
+
+
 class TestAnkiIntegration:
     """Test Anki integration"""
 
@@ -209,7 +665,7 @@ class TestWebClipping:
         # Note: This test makes actual HTTP requests
         # Skip if network is not available
         try:
-            result = brain._extract_web_content('https://example.com')
+            result = asyncio.run(brain._extract_web_content('https://example.com'))
 
             # Result structure
             assert result is not None or result is None  # May fail due to network
@@ -229,7 +685,7 @@ class TestWebClipping:
 
         # Test with a simple URL
         try:
-            result = brain.create_web_clip('https://example.com', test_user['user_id'])
+            result = asyncio.run(brain.create_web_clip('https://example.com', test_user['user_id']))
 
             if 'error' not in result:
                 assert result['status'] == 'created'
@@ -240,6 +696,195 @@ class TestWebClipping:
             pytest.skip(f"Web clipping failed: {e}")
 
 
+@pytest.fixture
+def stub_site():
+    """Local HTTP server: /page/N articles with ETags, /missing 404s; tracks concurrency"""
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    stats = {'requests': [], 'active': 0, 'max_active': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            with lock:
+                stats['active'] += 1
+                stats['max_active'] = max(stats['max_active'], stats['active'])
+                stats['requests'].append((self.path, self.headers.get('If-None-Match')))
+            try:
+                time.sleep(0.05)
+                etag = f'"{self.path}-v1"'
+                if self.path.startswith('/page/') and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                elif self.path.startswith('/page/'):
+                    body = (f"<html><head><title>Page {self.path}</title></head><body>"
+                            f"<nav>menu</nav><article><h1>Heading</h1><p>Body of {self.path}</p>"
+                            f"</article></body></html>").encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html')
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                else:
+                    self.send_error(404)
+            finally:
+                with lock:
+                    stats['active'] -= 1
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", stats
+    server.shutdown()
+
+
+class TestWebClipPipeline:
+    """Test pooled, cached web clipping against a local stub server"""
+
+    def test_extract_content_prefers_article(self):
+        """Article text is used; unknown parsers fall back to html.parser"""
+        html = "<html><title>T</title><body><nav>menu</nav><article><p>Hello</p></article></body></html>"
+
+        assert extract_content(html, 'u') == {'title': 'T', 'content': 'Hello'}
+        assert extract_content(html, 'u', parser='no-such-parser') == {'title': 'T', 'content': 'Hello'}
+        assert extract_content('<html><body></body></html>', 'u') is None
+
+    def test_reclip_uses_conditional_request(self, fresh_db, stub_site):
+        """Second clip of a URL sends If-None-Match and reuses the cached page on 304"""
+        base, stats = stub_site
+        brain = BrainModule()
+
+        first = asyncio.run(brain.create_web_clip(f"{base}/page/1", 'faza', {'tags': ['stub']}))
+        second = asyncio.run(brain.create_web_clip(f"{base}/page/1", 'faza'))
+
+        assert first['status'] == 'created' and first['cached'] is False
+        assert second['status'] == 'created' and second['cached'] is True
+        assert stats['requests'] == [('/page/1', None), ('/page/1', '"/page/1-v1"')]
+        assert brain.get_entry(second['id'], 'faza')['content'] == 'Heading\nBody of /page/1'
+
+    def test_batch_respects_per_host_limit(self, fresh_db, stub_site):
+        """Batch clips run concurrently, capped per host; failures are reported per URL"""
+        base, stats = stub_site
+        brain = BrainModule()
+        brain.clipper = WebClipper(per_host=2)
+
+        clips = [{'url': f"{base}/page/{i}", 'domain': 'tech'} for i in range(6)]
+        clips.append({'url': f"{base}/missing"})
+        results = asyncio.run(brain.create_web_clips(clips, 'faza'))
+
+        assert [r['url'] for r in results] == [c['url'] for c in clips]
+        assert sum(1 for r in results if r.get('status') == 'created') == 6
+        assert results[-1]['error'] == 'Failed to extract content from URL'
+        assert stats['max_active'] == 2
+
+    def test_client_scoped_to_event_loop(self, fresh_db, stub_site):
+        """Clipping works from a running loop; each loop's client is closed when it shuts down"""
+        base, _ = stub_site
+        brain = BrainModule()
+        clients = []
+
+        async def clip(path):
+            result = await brain.create_web_clip(f"{base}{path}", 'faza')
+            clients.append(await brain.clipper._get_client())
+            return result
+
+        assert asyncio.run(clip('/page/1'))['status'] == 'created'
+        assert asyncio.run(clip('/page/2'))['status'] == 'created'
+
+        assert clients[0] is not clients[1]
+        assert all(client.is_closed for client in clients)
+        assert brain.clipper._scopes == {}
+
+
+class TestDuplicates:
+    """Test MinHash/LSH near-duplicate detection and merging"""
+
+    ARTICLE = ' '.join(f"sentence{i % 97} about topic{i % 13}" for i in range(200))
+
+    def test_minhash_estimates_jaccard(self):
+        """Signature agreement tracks shingle-set Jaccard similarity"""
+        edited = self.ARTICLE.replace('sentence5 ', 'changed ', 2)
+        a, b = shingles(self.ARTICLE), shingles(edited)
+        jaccard = len(a & b) / len(a | b)
+
+        assert similarity(minhash(self.ARTICLE), minhash(edited)) == pytest.approx(jaccard, abs=0.15)
+        assert similarity(minhash(self.ARTICLE), minhash(self.ARTICLE.upper())) == 1.0
+        assert band_keys(minhash(self.ARTICLE)) == band_keys(minhash(self.ARTICLE))
+        assert minhash('  ') is None
+
+    def test_group_pairs(self):
+        """Pairs are grouped transitively"""
+        groups = group_pairs([('a', 'b'), ('b', 'c'), ('x', 'y')])
+        assert sorted(map(sorted, groups)) == [['a', 'b', 'c'], ['x', 'y']]
+
+    def test_create_reports_and_skips_duplicates(self, fresh_db):
+        """Creates return near-duplicates; on_duplicate='skip' returns the existing entry"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        original = brain.create_entry({'title': 'A', 'content': self.ARTICLE}, 'faza')
+        assert 'duplicates' not in original
+
+        copy = brain.create_entry({'title': 'A again', 'content': self.ARTICLE + ' extra'}, 'faza')
+        assert copy['status'] == 'created'
+        assert copy['duplicates'][0]['id'] == original['id']
+
+        skipped = brain.create_entry({'title': 'A', 'content': self.ARTICLE, 'on_duplicate': 'skip'}, 'faza')
+        assert skipped['status'] == 'duplicate'
+        assert skipped['id'] in (original['id'], copy['id'])
+
+        # Other owners' private entries are never matched
+        assert 'duplicates' not in brain.create_entry({'title': 'A', 'content': self.ARTICLE}, 'gaby')
+
+    def test_report_backfills_and_merge(self, fresh_db):
+        """Unsigned entries are backfilled; merging keeps one entry with the union of tags"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        keep = brain.create_entry({'title': 'A', 'content': self.ARTICLE, 'tags': ['x']}, 'faza')['id']
+        brain.create_entry({'title': 'Unrelated', 'content': 'something else entirely'}, 'faza')
+        with get_db() as conn:
+            conn.execute(
+                """INSERT INTO knowledge_entries (id, owner, created_by, title, content, tags, timestamp)
+                   VALUES ('legacy', 'faza', 'faza', 'Old copy', ?, '["y"]', '2099-01-01')""",
+                (self.ARTICLE,)
+            )
+
+        report = brain.get_duplicates('faza')
+        assert report['backfilled'] == 1
+        assert report['count'] == 1
+        group = report['groups'][0]
+        assert group['keep'] == keep
+        assert {e['id'] for e in group['entries']} == {keep, 'legacy'}
+
+        merged = brain.merge_entries(keep, ['legacy'], 'faza')
+        assert merged['tags'] == ['x', 'y']
+        assert brain.get_entry('legacy', 'faza') is None
+        assert brain.get_duplicates('faza')['count'] == 0
+
+        assert 'error' in brain.merge_entries(keep, [keep], 'faza')
+
+    def test_web_clip_skip_duplicate(self, fresh_db, stub_site):
+        """Re-clipping the same page with on_duplicate='skip' returns the first clip"""
+        base, _ = stub_site
+        brain = BrainModule()
+
+        first = asyncio.run(brain.create_web_clip(f"{base}/page/1", 'faza'))
+        second = asyncio.run(brain.create_web_clip(f"{base}/page/1", 'faza', {'on_duplicate': 'skip'}))
+
+        assert second['status'] == 'duplicate'
+        assert second['id'] == first['id']
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM knowledge_entries").fetchone()[0] == 1
+
+
 class TestKnowledgeGraph:
     """Test knowledge graph functionality"""
 
@@ -285,6 +930,158 @@ class TestKnowledgeGraph:
         assert 0 <= score <= 1.0
         # Should have lower similarity than same-domain entries
 
+    GRAPH_ENTRIES = [
+        {'id': 'a', 'owner': 'faza', 'domain': 'tech', 'project': 'nexus', 'tags': ['python', 'api']},
+        {'id': 'b', 'owner': 'faza', 'domain': 'tech', 'project': None, 'tags': ['python']},
+        {'id': 'c', 'owner': 'shared', 'domain': 'life', 'project': 'nexus', 'tags': []},
+        {'id': 'd', 'owner': 'gaby', 'domain': 'tech', 'project': 'nexus', 'tags': ['python']},
+        {'id': 'e', 'owner': 'faza', 'domain': 'tech', 'project': None, 'tags': ['rust']},
+        {'id': 'f', 'owner': 'gaby', 'domain': 'life', 'project': None, 'tags': ['api', 'python']},
+    ]
+
+    def _pairwise_edges(self, entries):
+        """Reference O(n²) edge set"""
+        edges = set()
+        for i, e1 in enumerate(entries):
+            for e2 in entries[i + 1:]:
+                weight = entry_similarity(e1, e2)
+                if can_link(e1['owner'], e2['owner']) and weight > 0.3:
+                    edges.add((e1['id'], e2['id'], round(weight, 9)))
+        return edges
+
+    def test_inverted_index_candidates(self):
+        """Only entries sharing a tag or project are candidates"""
+        index = InvertedIndex(self.GRAPH_ENTRIES)
+
+        assert index.candidates(self.GRAPH_ENTRIES[0]) == {'b', 'c', 'd', 'f'}
+        assert index.candidates(self.GRAPH_ENTRIES[4]) == set()
+
+    def test_compute_edges_indexed_matches_pairwise(self):
+        """Candidate generation finds exactly the pairwise edges"""
+        edges = compute_edges(self.GRAPH_ENTRIES, vectorized=False)
+
+        assert {(s, d, round(w, 9)) for s, d, w in edges} == self._pairwise_edges(self.GRAPH_ENTRIES)
+
+    @pytest.mark.skipif(not SCIPY_AVAILABLE, reason="Requires scipy")
+    def test_compute_edges_sparse_matches_pairwise(self):
+        """Sparse-matrix Jaccard path finds exactly the pairwise edges"""
+        edges = compute_edges(self.GRAPH_ENTRIES, vectorized=True)
+
+        assert {(s, d, round(w, 9)) for s, d, w in edges} == self._pairwise_edges(self.GRAPH_ENTRIES)
+
+    def test_edges_maintained_incrementally(self, fresh_db):
+        """Edges are persisted on create/update and dropped on delete"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        base = {'content': 'x', 'domain': 'tech', 'project': 'nexus'}
+        a = brain.create_entry({**base, 'title': 'A', 'tags': ['python']}, 'faza')['id']
+        b = brain.create_entry({**base, 'title': 'B', 'tags': ['python']}, 'faza')['id']
+        c = brain.create_entry({**base, 'title': 'C', 'tags': ['rust'], 'project': None}, 'faza')['id']
+
+        related = [e['id'] for e in brain._get_related_entries(a, 'faza')]
+        assert related == [b]
+
+        brain.update_entry(c, {'tags': ['python']}, 'faza')
+        related = [e['id'] for e in brain._get_related_entries(a, 'faza')]
+        assert set(related) == {b, c}
+
+        brain.delete_entry(b, 'faza')
+        related = [e['id'] for e in brain._get_related_entries(a, 'faza')]
+        assert related == [c]
+
+    def test_related_ranked_by_edges_and_similarity(self, fresh_db):
+        """Embedding similarity lifts a weaker metadata neighbour; 2-hop entries rank by decayed path"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        a, b, c, d = (brain.create_entry({'title': t, 'content': t}, 'faza')['id'] for t in 'ABCD')
+        with get_db() as conn:
+            conn.executemany(
+                "INSERT INTO knowledge_edges (src_id, dst_id, edge_type, weight) VALUES (?, ?, ?, ?)",
+                [(x, y, kind, w) for src, dst, kind, w in [
+                    (a, b, 'metadata', 0.5), (a, c, 'metadata', 0.4), (a, c, 'embedding', 0.9),
+                    (b, d, 'metadata', 0.8)
+                ] for x, y in ((src, dst), (dst, src))]
+            )
+
+        related = brain.get_related(a, 'faza')
+        assert [e['id'] for e in related] == [c, b, d]
+        assert related[0]['embedding_similarity'] == 0.9
+        assert related[2]['hops'] == 2
+        assert related[2]['graph_weight'] == pytest.approx(0.5 * 0.8 * 0.5)
+
+        assert brain.get_related(a, 'gaby') is None
+
+    def test_related_cache_invalidated_on_write(self, fresh_db):
+        """Neighbourhoods are cached and dropped when an entry changes"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        base = {'content': 'x', 'project': 'nexus', 'tags': ['python']}
+        a = brain.create_entry({**base, 'title': 'A'}, 'faza')['id']
+        b = brain.create_entry({**base, 'title': 'B'}, 'faza')['id']
+
+        assert brain.get_related(a, 'faza')[0]['title'] == 'B'
+        brain.get_related(a, 'faza')
+        assert brain.related_cache.stats()['hits'] == 1
+
+        brain.update_entry(b, {'title': 'B2'}, 'faza')
+        assert brain.get_related(a, 'faza')[0]['title'] == 'B2'
+
+        brain.delete_entry(b, 'faza')
+        assert brain.get_related(a, 'faza') == []
+
+    def test_private_entries_not_linked_across_owners(self, fresh_db):
+        """Entries of different owners never share an edge"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        base = {'content': 'x', 'domain': 'tech', 'project': 'nexus', 'tags': ['python']}
+        a = brain.create_entry({**base, 'title': 'A'}, 'faza')['id']
+        brain.create_entry({**base, 'title': 'B'}, 'gaby')
+
+        assert brain._get_related_entries(a, 'faza') == []
+
+    def test_analyze_graph(self):
+        """PageRank, communities and components of a small graph"""
+        graph = nx.Graph()
+        graph.add_weighted_edges_from([('a', 'b', 1.0), ('b', 'c', 1.0), ('a', 'c', 1.0), ('x', 'y', 1.0)])
+        graph.add_node('z')
+
+        analytics = analyze_graph(graph)
+
+        assert analytics['nodes'] == 6
+        assert analytics['components'][0] == ['a', 'b', 'c']
+        assert len(analytics['components']) == 3
+        assert abs(sum(analytics['pagerank'].values()) - 1.0) < 1e-6
+
+        # Warm start converges to the same ranking
+        warm = analyze_graph(graph, previous_pagerank=analytics['pagerank'])
+        for node, score in analytics['pagerank'].items():
+            assert abs(warm['pagerank'][node] - score) < 1e-4
+
+    def test_graph_analytics_invalidated_on_write(self, fresh_db):
+        """Writes mark cached analytics stale; a refresh picks up the change"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        base = {'content': 'x', 'domain': 'tech', 'project': 'nexus', 'tags': ['python']}
+        brain.create_entry({**base, 'title': 'A'}, 'faza')
+        brain.create_entry({**base, 'title': 'B'}, 'faza')
+
+        stats = brain.get_graph_stats('faza')
+        assert stats == {**stats, 'nodes': 2, 'edges': 1, 'components': 1, 'stale': False}
+
+        # A shared entry is visible to every owner
+        brain.create_entry({**base, 'title': 'C'}, 'shared')
+        assert brain.get_graph_stats('faza')['stale'] is True
+
+        assert brain.refresh_stale_graphs() == ['faza']
+        stats = brain.get_graph_stats('faza')
+        assert stats['nodes'] == 3 and stats['edges'] == 3 and stats['stale'] is False
+        assert brain.get_graph_pagerank('faza', limit=1)[0]['title'] in {'A', 'B', 'C'}
+
 
 class TestSearch:
     """Test search functionality"""
@@ -342,6 +1139,213 @@ class TestSearch:
         assert len(results) >= 0
 
 
+class TestHybridSearch:
+    """Test BM25 + vector fusion helpers"""
+
+    def test_build_match_query_quotes_terms(self):
+        """User input must not be parsed as FTS5 syntax"""
+        assert build_match_query('Python AND asyncio') == '"python" "and" "asyncio"'
+        assert build_match_query('NEAR(') == '"near"'
+        assert build_match_query('  ?!  ') is None
+
+    def test_build_match_query_prefix(self):
+        """Trailing '*' or prefix=True turn terms into FTS5 prefix queries"""
+        assert build_match_query('pyth*') == '"pyth"*'
+        assert build_match_query('docker netw', prefix=True) == '"docker" "netw"*'
+
+    def test_index_survives_vacuum(self, fresh_db):
+        """knowledge_fts is keyed on doc_id, which deletes and VACUUM leave unchanged"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        ids = [brain.create_entry({'title': f'Note {i}', 'content': f'vacuum{i}'}, 'faza')['id']
+               for i in range(5)]
+        for entry_id in ids[:3]:
+            brain.delete_entry(entry_id, 'faza')
+        with get_db() as conn:
+            before = dict(conn.execute("SELECT id, doc_id FROM knowledge_entries").fetchall())
+        with get_db() as conn:
+            conn.execute("VACUUM")
+        with get_db() as conn:
+            assert dict(conn.execute("SELECT id, doc_id FROM knowledge_entries").fetchall()) == before
+
+        assert [r['id'] for r in brain._keyword_search('vacuum4', 'faza', {}, 10)] == [ids[4]]
+        assert brain._keyword_search('vacuum0', 'faza', {}, 10) == []
+
+    def test_common_terms_ranked_over_newest_candidates(self, fresh_db, monkeypatch):
+        """A term with more matches than KEYWORD_CANDIDATES is ranked over its newest ones"""
+        import modules.brain.service as brain_service
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        # The oldest entry is the best BM25 match, the newest three are weaker
+        ids = [brain.create_entry({'title': 'Kubernetes', 'content': 'kubernetes kubernetes'}, 'faza')['id']]
+        ids += [brain.create_entry({'title': f'Note {i}', 'content': f'kubernetes {i}'}, 'faza')['id']
+                for i in range(3)]
+        brain.create_entry({'title': 'Kubernetes', 'content': 'gaby only'}, 'gaby')
+
+        assert brain._keyword_search('kubernetes', 'faza', {}, 10)[0]['id'] == ids[0]
+        monkeypatch.setattr(brain_service, 'KEYWORD_CANDIDATES', 3)
+        found = brain._keyword_search('kube', 'faza', {'prefix': True, 'highlight': True}, 10)
+        assert sorted(r['id'] for r in found) == sorted(ids[1:])
+        assert all('<mark>' in r['snippet'] for r in found)
+
+    def test_reciprocal_rank_fusion(self):
+        """Documents ranked well by both lists come first"""
+        keyword = ['a', 'b', 'c']
+        semantic = ['b', 'd', 'a']
+
+        fused = reciprocal_rank_fusion([keyword, semantic])
+        ids = [doc_id for doc_id, _ in fused]
+
+        assert ids[:2] == ['b', 'a']
+        assert set(ids) == {'a', 'b', 'c', 'd'}
+        assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+class TestSearchCache:
+    """Test the write-aware search result cache"""
+
+    def test_key_normalises_query(self):
+        """Case and whitespace don't split the cache; filters do"""
+        assert SearchCache.key('  Docker   Compose', {'limit': 10}) == SearchCache.key('docker compose', {'limit': 10})
+        assert SearchCache.key('docker', {'limit': 10}) != SearchCache.key('docker', {'limit': 20})
+
+    def test_lru_and_ttl(self):
+        """Least recently used entries are evicted; expired ones are misses"""
+        cache = SearchCache(ttl=60, max_entries=2)
+        cache.put('faza', 'a', 1)
+        cache.put('faza', 'b', 2)
+        assert cache.get('faza', 'a') == 1
+        cache.put('faza', 'c', 3)
+
+        assert cache.get('faza', 'b') is None
+        assert cache.get('faza', 'a') == 1
+        assert cache.stats()['evictions'] == 1
+
+        cache.ttl = -1
+        cache.put('faza', 'd', 4)
+        assert cache.get('faza', 'd') is None
+        assert cache.stats()['expired'] == 1
+
+    def test_generations(self):
+        """Owner writes invalidate that owner; shared writes invalidate everyone"""
+        cache = SearchCache()
+        cache.put('faza', 'q', 1)
+        cache.put('gaby', 'q', 2)
+
+        cache.invalidate('gaby')
+        assert cache.get('faza', 'q') == 1
+        assert cache.get('gaby', 'q') is None
+
+        cache.invalidate('shared')
+        assert cache.get('faza', 'q') is None
+        stats = cache.stats()
+        assert stats['stale'] == 2
+        assert stats['hit_rate'] == pytest.approx(1 / 3, abs=1e-3)
+
+    def test_result_computed_before_write_is_not_served(self):
+        """A write landing mid-search leaves the stored result stale"""
+        cache = SearchCache()
+        generation = cache.generation('faza')
+        cache.invalidate('faza')
+        cache.put('faza', 'q', 1, generation)
+        assert cache.get('faza', 'q') is None
+
+    def test_search_served_from_cache_until_write(self, fresh_db):
+        """Repeat searches hit the cache; create/update/delete are visible next time"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        first = brain.create_entry({'title': 'Docker networking', 'content': 'bridge'}, 'faza')['id']
+        assert brain.search('docker', 'faza')['cached'] is False
+        assert brain.search('Docker ', 'faza')['cached'] is True
+
+        second = brain.create_entry({'title': 'Docker volumes', 'content': 'mounts'}, 'faza')['id']
+        result = brain.search('docker', 'faza')
+        assert result['cached'] is False
+        assert {r['id'] for r in result['results']} == {first, second}
+
+        brain.update_entry(second, {'title': 'Volumes'}, 'faza')
+        assert [r['id'] for r in brain.search('docker', 'faza')['results']] == [first]
+
+        brain.delete_entry(first, 'faza')
+        assert brain.search('docker', 'faza')['results'] == []
+
+        # Another owner's writes don't evict faza's results
+        brain.search('docker', 'faza')
+        brain.create_entry({'title': 'Docker for gaby', 'content': 'x'}, 'gaby')
+        assert brain.search('docker', 'faza')['cached'] is True
+        assert brain.get_search_cache_stats()['hits'] == 3
+
+
+class TestSuggestions:
+    """Test prefix suggestions"""
+
+    def test_prefix_index(self):
+        """Titles match from any word; shared tags are counted once per entry"""
+        index = PrefixIndex()
+        index.add({'id': 'a', 'title': 'Docker networking', 'tags': ['devops'], 'project': 'Nexus'})
+        index.add({'id': 'b', 'title': 'Kubernetes', 'tags': ['devops', 'k8s'], 'project': None})
+
+        assert [(r['type'], r['text']) for r in index.search('netw')] == [('title', 'Docker networking')]
+        assert index.search('DEV') == [{'key': 'devops', 'text': 'devops', 'type': 'tag', 'count': 2}]
+        assert index.search('nex')[0]['type'] == 'project'
+        assert index.search('zzz') == []
+
+    def test_prefix_index_incremental(self):
+        """Re-adding replaces an entry's terms; removing drops unused terms"""
+        index = PrefixIndex()
+        index.add({'id': 'a', 'title': 'Old title', 'tags': ['x'], 'project': None})
+        index.add({'id': 'a', 'title': 'New title', 'tags': ['y'], 'project': None})
+
+        assert index.search('old') == []
+        assert index.search('x') == []
+        assert index.search('new')[0]['id'] == 'a'
+
+        index.remove('a')
+        assert index.search('t') == []
+        assert len(index) == 0
+
+    def test_prefix_index_bulk_matches_incremental(self):
+        """add_many builds the same index as one add per entry, and later adds still work"""
+        entries = [{'id': str(i), 'title': f'Note {i} about topic {i % 7}',
+                    'tags': [f'tag{i % 5}', 'common'], 'project': f'P{i % 3}'} for i in range(200)]
+        one_by_one, bulk = PrefixIndex(), PrefixIndex()
+        for entry in entries:
+            one_by_one.add(entry)
+        bulk.add_many(entries)
+
+        assert bulk._keys == one_by_one._keys and bulk._counts == one_by_one._counts
+        assert len(bulk) == 200
+        assert bulk.search('common')[0]['count'] == 200
+
+        bulk.add({'id': '0', 'title': 'Renamed', 'tags': [], 'project': None})
+        assert bulk.search('renamed')[0]['id'] == '0'
+        assert bulk.search('common')[0]['count'] == 199
+
+    def test_suggest_follows_writes(self, fresh_db):
+        """Suggestions include shared entries and reflect creates, updates and deletes"""
+        brain = BrainModule()
+        brain._queue_embedding_generation = lambda entry_id: None
+
+        mine = brain.create_entry({'title': 'Python asyncio', 'content': 'x', 'tags': ['python']}, 'faza')['id']
+        brain.create_entry({'title': 'Python packaging', 'content': 'x', 'tags': ['python'],
+                            'owner': 'shared'}, 'faza')
+        brain.create_entry({'title': 'Python for gaby', 'content': 'x'}, 'gaby')
+
+        result = brain.suggest('pyt', 'faza')
+        titles = {s['text'] for s in result['suggestions'] if s['type'] == 'title'}
+        assert titles == {'Python asyncio', 'Python packaging'}
+        assert [s['count'] for s in result['suggestions'] if s['type'] == 'tag'] == [2]
+
+        # Index is loaded now; later writes are applied incrementally
+        brain.update_entry(mine, {'title': 'Trio vs asyncio'}, 'faza')
+        assert brain.suggest('trio', 'faza')['suggestions'][0]['id'] == mine
+        brain.delete_entry(mine, 'faza')
+        assert brain.suggest('trio', 'faza')['count'] == 0
+
+
 class TestStatistics:
     """Test statistics functionality"""
 
@@ -1,8 +1,16 @@
 """
 Circle module tests
 """
+import sqlite3
+import time
+
 import pytest
+from datetime import date, datetime, timedelta
+import core.database
+from core.database import get_db
+from modules.circle import reminders
 from modules.circle.service import CircleModule
+from modules.vessel.service import VesselModule
 
 
 class TestCircleModuleInit:
@@ -123,6 +131,81 @@ class TestContactCRUD:
         assert quarterly_date is not None
         assert isinstance(quarterly_date, str)
 
+    def test_record_contacts_batch(self, fresh_db):
+        """Bulk interactions match contacts by any identifier and reschedule pings set-wise"""
+        circle = CircleModule()
+        ana = circle.create_contact({'name': 'Ana', 'relationship': 'friend', 'contact_frequency': 'weekly',
+                                     'telegram_handle': '@ana'}, 'faza')['id']
+        ben = circle.create_contact({'name': 'Ben', 'relationship': 'family', 'contact_frequency': 'monthly',
+                                     'phone': '+62 812-3456'}, 'faza')['id']
+        cal = circle.create_contact({'name': 'Cal', 'relationship': 'friend'}, 'faza')['id']
+        circle.create_contact({'name': 'Dee', 'relationship': 'friend', 'phone': '+628123456'}, 'gaby')
+
+        earlier = (date.today() - timedelta(days=10)).isoformat()
+        later = (date.today() - timedelta(days=3)).isoformat()
+        result = circle.record_contacts([
+            {'telegram_handle': 'ANA', 'date': earlier},
+            {'contact_id': ana, 'date': later},
+            {'phone': '+628123456'},
+            {'name': 'cal', 'date': later},
+            {'name': 'Nobody'},
+            {'contact_id': ana, 'date': '2999-01-01'}
+        ], 'faza')
+
+        assert (result['recorded'], result['interactions']) == (3, 4)
+        assert (result['unmatched'], result['invalid']) == ([4], [5])
+        contacts = {c['id']: c for c in result['contacts']}
+        assert contacts[ana]['last_contact_date'] == later
+        assert contacts[ana]['next_scheduled_ping'] == (date.today() + timedelta(days=4)).isoformat()
+        assert contacts[ben]['next_scheduled_ping'] == (date.today() + timedelta(days=30)).isoformat()
+        assert contacts[cal]['next_scheduled_ping'] is None
+
+        with get_db() as conn:
+            due = conn.execute(
+                "SELECT due_at FROM reminder_queue WHERE kind = 'contact_ping' AND ref_id = ?", (ana,)
+            ).fetchone()['due_at']
+        assert due == contacts[ana]['next_scheduled_ping']
+
+    def test_import_contacts(self, fresh_db):
+        """vCard and CSV imports insert new contacts and skip or fill in known ones"""
+        circle = CircleModule()
+        vcard = (
+            "BEGIN:VCARD\r\nVERSION:3.0\r\nN:Putri;Sari;;;\r\nTEL;TYPE=CELL:+62 811 000\r\n"
+            "BDAY:19920314\r\nCATEGORIES:Family\r\nNOTE:Met at\r\n  the reunion\\, 2019\r\nEND:VCARD\r\n"
+            "BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Tom Lee\r\nitem1.EMAIL;type=INTERNET:tom@example.com\r\n"
+            "X-TELEGRAM:@tomlee\r\nEND:VCARD\r\n"
+            "BEGIN:VCARD\r\nVERSION:3.0\r\nTEL:123\r\nEND:VCARD\r\n"
+        )
+        result = circle.import_contacts(vcard, 'faza', filename='phone.vcf')
+
+        assert (result['format'], result['imported'], result['failed']) == ('vcard', 2, 1)
+        sari = next(c for c in circle.get_contacts('faza') if c['name'] == 'Sari Putri')
+        assert (sari['relationship'], sari['birthday'], sari['phone']) == ('family', '1992-03-14', '+62 811 000')
+        assert sari['notes'] == 'Met at the reunion, 2019'
+
+        csv_text = (
+            "Full Name,Email Address,Frequency,Last Contact\n"
+            "Tom Lee,TOM@example.com,weekly,2026-01-10\n"
+            "Uma,uma@example.com,monthly,\n"
+        )
+        assert circle.import_contacts(csv_text, 'faza', fmt='csv')['skipped'] == 1
+
+        result = circle.import_contacts(csv_text, 'faza', fmt='csv', on_conflict='update')
+        assert (result['imported'], result['updated'], result['skipped']) == (0, 2, 0)
+        contacts = {c['name']: c for c in circle.get_contacts('faza')}
+        assert len(contacts) == 3
+        assert contacts['Tom Lee']['telegram_handle'] == '@tomlee'
+        assert contacts['Tom Lee']['next_scheduled_ping'] == '2026-01-17'
+        assert contacts['Uma']['next_scheduled_ping'] == (date.today() + timedelta(days=30)).isoformat()
+        assert contacts['Uma']['relationship'] == 'other'
+
+        # An update without a relationship keeps the stored one
+        result = circle.import_contacts("Name,Phone,Notes\nSari,+62 811 000,Moved to Bandung\n",
+                                        'faza', fmt='csv', on_conflict='update')
+        assert result['updated'] == 1
+        sari = next(c for c in circle.get_contacts('faza') if c['phone'] == '+62 811 000')
+        assert (sari['relationship'], sari['notes']) == ('family', 'Moved to Bandung')
+
 
 class TestHealthLogs:
     """Test health log functionality"""
@@ -169,6 +252,72 @@ class TestHealthLogs:
         assert 'trends' in analysis
         assert analysis['total_logs'] >= 2
 
+    def test_health_correlations(self, fresh_db):
+        """Trigger lift, lagged biometric correlation and trend across symptom types"""
+        circle = CircleModule()
+        today = date.today()
+        with get_db() as conn:
+            for i in range(10):
+                day = (today - timedelta(days=9 - i)).isoformat()
+                severity = 9 - i // 2
+                conn.execute(
+                    "INSERT INTO health_logs (id, timestamp, owner, symptom_type, severity, triggers) "
+                    "VALUES (?, ?, 'gaby', 'reflux', ?, ?)",
+                    (f"hlg_r{i}", f"{day} 08:00:00", severity,
+                     '["coffee"]' if severity >= 7 else '["late_meal"]')
+                )
+                conn.execute(
+                    "INSERT INTO biometrics (id, owner, date, hrv) VALUES (?, 'gaby', ?, ?)",
+                    (f"bio_{i}", day, 40 + 5 * i)
+                )
+            for i in range(2):
+                conn.execute(
+                    "INSERT INTO health_logs (id, timestamp, owner, symptom_type, severity, triggers) "
+                    "VALUES (?, ?, 'gaby', 'allergy', 4, '[\"pollen\"]')",
+                    (f"hlg_a{i}", f"{today.isoformat()} 09:00:00")
+                )
+
+        result = circle.analyze_health_correlations('gaby', days=30)
+        reflux = result['symptoms']['reflux']
+
+        assert result['episode_count'] == 12
+        assert reflux['episode_count'] == 10
+        assert reflux['severity_trend'] == 'improving'
+        assert reflux['triggers'][0]['trigger'] in ('coffee', 'late_meal')
+        coffee = next(t for t in reflux['triggers'] if t['trigger'] == 'coffee')
+        assert (coffee['count'], coffee['lift']) == (6, 1.2)
+        assert coffee['severity_delta'] > 0
+        hrv = next(c for c in reflux['correlations'] if c['metric'] == 'hrv' and c['lag_days'] == 0)
+        assert hrv['r'] < -0.9 and hrv['days'] == 10
+        assert result['symptoms']['allergy']['triggers'][0]['lift'] == 6.0
+
+        # Cached for the day until the owner logs again
+        assert circle.analyze_health_correlations('gaby', days=30) == result
+        circle.create_health_log({'owner': 'gaby', 'symptom_type': 'reflux', 'severity': 3}, logged_by='faza')
+        assert circle.analyze_health_correlations('gaby', days=30)['episode_count'] == 13
+
+        # ... or new biometrics are logged or imported for them
+        def hrv_r():
+            reflux = circle.analyze_health_correlations('gaby', days=30)['symptoms']['reflux']
+            return next(c['r'] for c in reflux['correlations'] if c['metric'] == 'hrv' and c['lag_days'] == 0)
+
+        vessel = VesselModule()
+        before = hrv_r()
+        vessel.log_biometrics({'owner': 'gaby', 'date': today.isoformat(), 'hrv': 5}, user_id='faza')
+        logged = hrv_r()
+        assert logged != before
+        export = f"date,hrv\n{(today - timedelta(days=9)).isoformat()},5\n"
+        vessel.ingest_biometrics(export.splitlines(keepends=True), 'gaby', 'faza', fmt='csv')
+        imported = hrv_r()
+        assert imported != logged
+
+        # Writes from another process (bin/ingest-biometrics) count too
+        other = sqlite3.connect(core.database.DB_PATH)
+        other.execute("UPDATE biometrics SET hrv = 90 WHERE id = 'bio_5'")
+        other.commit()
+        other.close()
+        assert hrv_r() != imported
+
 
 class TestCheckIns:
     """Test relationship check-in functionality"""
@@ -225,6 +374,44 @@ class TestCheckIns:
         assert 'total_checkins' in trends
         assert trends['total_checkins'] >= 5
 
+    def test_checkin_trends_cover_days_not_rows(self, fresh_db):
+        """Trends span calendar days from the rollup: moving averages, slope, change-point"""
+        circle = CircleModule()
+        end = date(2026, 3, 31)
+        with get_db() as conn:
+            for i in range(20):
+                day = end - timedelta(days=19 - i)
+                vibe = 4 if i < 10 else 8
+                # Two check-ins a day: the old row-count limit would have read 10 days
+                for hour in (9, 21):
+                    conn.execute(
+                        "INSERT INTO relationship_checkins "
+                        "(id, timestamp, faza_mood, gaby_mood, relationship_vibe) VALUES (?, ?, 6, 7, ?)",
+                        (f"rchk_{i}_{hour}", f"{day.isoformat()} {hour:02d}:00:00", vibe)
+                    )
+
+        trends = circle.get_checkin_trends(days=20, window=3, end_date=end.isoformat())
+
+        assert trends['checkin_count'] == 40
+        assert trends['days_with_checkins'] == 20
+        assert trends['relationship_avg_vibe'] == 6.0
+        assert trends['trend'] == 'improving'
+        assert trends['metrics']['faza_mood']['slope_per_day'] == 0
+        assert trends['metrics']['relationship_vibe']['change_point'] == {
+            'date': '2026-03-22', 'before': 4.0, 'after': 8.0, 'delta': 4.0
+        }
+        assert trends['metrics']['faza_mood']['change_point'] is None
+
+        moving = {m['date']: m['relationship_vibe'] for m in trends['moving_averages']}
+        assert len(moving) == 20
+        assert moving['2026-03-22'] == round((4 + 4 + 8) / 3, 2)
+        assert moving['2026-03-24'] == 8.0
+
+        # The rollup follows deletes
+        with get_db() as conn:
+            conn.execute("DELETE FROM relationship_checkins WHERE id LIKE 'rchk_19_%'")
+        assert circle.get_checkin_trends(days=20, end_date=end.isoformat())['checkin_count'] == 38
+
 
 class TestReminders:
     """Test reminder functionality"""
@@ -246,6 +433,158 @@ class TestReminders:
         assert isinstance(reminders, list)
 
 
+    def test_birthday_window_wraps_new_year(self, fresh_db):
+        """Birthdays early in January are found from late December"""
+        circle = CircleModule()
+        circle.create_contact({'name': 'Jan', 'relationship': 'friend', 'birthday': '1990-01-05'}, 'faza')
+        circle.create_contact({'name': 'Mar', 'relationship': 'friend', 'birthday': '1990-03-05'}, 'faza')
+        with get_db() as conn:
+            reminders.rebuild(conn, date(2026, 12, 1))
+
+        birthdays = circle._compute_reminders('faza', date(2026, 12, 20))['upcoming_birthdays']
+
+        assert [(b['name'], b['days_until'], b['age']) for b in birthdays] == [('Jan', 16, 37)]
+
+    def test_leap_day_birthday(self):
+        """29 February is celebrated on 28 February in common years"""
+        assert reminders.next_birthday(date(2000, 2, 29), date(2027, 2, 1)) == date(2027, 2, 28)
+        assert reminders.next_birthday(date(2000, 2, 29), date(2028, 2, 1)) == date(2028, 2, 29)
+
+    def test_reminders_cached_until_write(self, fresh_db):
+        """Cached reminders are served until a Circle write"""
+        circle = CircleModule()
+        soon = (date.today() + timedelta(days=3)).replace(year=1992).isoformat()
+        circle.create_contact({'name': 'Ana', 'relationship': 'friend', 'birthday': soon}, 'faza')
+
+        assert [b['name'] for b in circle.get_reminders('faza')['upcoming_birthdays']] == ['Ana']
+
+        # Writes that bypass the module aren't seen until the next invalidation
+        overdue = (date.today() - timedelta(days=2)).isoformat()
+        with get_db() as conn:
+            conn.execute(
+                "INSERT INTO contacts (id, owner, name, relationship, next_scheduled_ping) "
+                "VALUES ('cnt_raw', 'faza', 'Raw', 'friend', ?)",
+                (overdue,)
+            )
+            conn.execute(
+                "INSERT INTO reminder_queue (owner, kind, ref_id, due_at) "
+                "VALUES ('faza', 'contact_ping', 'cnt_raw', ?)",
+                (overdue,)
+            )
+        assert circle.get_reminders('faza')['contacts_to_ping'] == []
+
+        circle.create_checkin({'faza_mood': 7, 'gaby_mood': 7, 'relationship_vibe': 8}, 'faza')
+        pings = circle.get_reminders('faza')['contacts_to_ping']
+        assert [(p['name'], p['overdue_days']) for p in pings] == [('Raw', 2)]
+
+    def test_contact_writes_update_queue(self, fresh_db):
+        """Creating, updating and contacting a person moves their queued reminders"""
+        circle = CircleModule()
+        contact_id = circle.create_contact(
+            {'name': 'Bo', 'relationship': 'friend', 'contact_frequency': 'weekly'}, 'faza'
+        )['id']
+
+        def queued():
+            with get_db() as conn:
+                return {row['kind']: row['due_at'] for row in conn.execute(
+                    "SELECT kind, due_at FROM reminder_queue WHERE ref_id = ?", (contact_id,)
+                )}
+
+        assert queued() == {'contact_ping': (date.today() + timedelta(days=7)).isoformat()}
+
+        circle.update_contact(contact_id, {'contact_frequency': 'monthly', 'birthday': '1985-06-15'}, 'faza')
+        upcoming = reminders.next_birthday(date(1985, 6, 15), date.today())
+        assert queued() == {
+            'contact_ping': (date.today() + timedelta(days=30)).isoformat(),
+            'birthday': (upcoming - timedelta(days=reminders.BIRTHDAY_WINDOW_DAYS)).isoformat()
+        }
+
+        with get_db() as conn:
+            conn.execute(
+                "UPDATE reminder_queue SET due_at = '2000-01-01' WHERE kind = 'contact_ping' AND ref_id = ?",
+                (contact_id,)
+            )
+        circle.record_contact(contact_id, 'faza')
+        assert queued()['contact_ping'] == (date.today() + timedelta(days=30)).isoformat()
+
+    def test_drain_fires_due_reminders_once(self, fresh_db):
+        """The scheduler tick fires each due reminder once and logs it"""
+        circle = CircleModule()
+        contact_id = circle.create_contact(
+            {'name': 'Cy', 'relationship': 'friend', 'contact_frequency': 'weekly'}, 'faza'
+        )['id']
+
+        assert circle.drain_reminders() == []
+
+        later = datetime.now() + timedelta(days=8)
+        fired = circle.drain_reminders(later)
+        assert [(r['kind'], r['ref_id']) for r in fired] == [('contact_ping', contact_id)]
+        assert circle.drain_reminders(later) == []
+
+        with get_db() as conn:
+            logged = conn.execute(
+                "SELECT COUNT(*) FROM audit_log WHERE module = 'circle' AND action = 'remind'"
+            ).fetchone()[0]
+        assert logged == 1
+
+        # Moving the due date re-arms the reminder
+        circle.update_contact(contact_id, {'contact_frequency': 'monthly'}, 'faza')
+        assert len(circle.drain_reminders(later + timedelta(days=30))) == 1
+
+    def test_birthday_rolls_to_next_year(self, fresh_db):
+        """Birthdays past their expiry are rescheduled for the following year"""
+        with get_db() as conn:
+            conn.execute(
+                "INSERT INTO contacts (id, owner, name, relationship, birthday) "
+                "VALUES ('cnt_bd', 'faza', 'Di', 'friend', '1990-03-10')"
+            )
+            reminders.schedule_contact(conn, {'id': 'cnt_bd', 'owner': 'faza', 'birthday': '1990-03-10'},
+                                       date(2026, 3, 1))
+            reminders.drain(conn, datetime(2026, 3, 12, 9, 0))
+            row = conn.execute(
+                "SELECT due_at, expires_at, fired_at FROM reminder_queue WHERE kind = 'birthday'"
+            ).fetchone()
+
+        assert (row['due_at'], row['expires_at'], row['fired_at']) == ('2027-02-08', '2027-03-11', None)
+
+    def test_health_alert_raised_and_cleared(self, fresh_db):
+        """A week of severe reflux queues an alert; milder logs clear it"""
+        circle = CircleModule()
+        log = {'owner': 'gaby', 'symptom_type': 'reflux', 'severity': 8}
+        circle.create_health_log(log, logged_by='faza')
+        circle.create_health_log(log, logged_by='faza')
+
+        alerts = circle.get_reminders('faza')['health_alerts']
+        assert [(a['owner'], a['episode_count'], a['avg_severity']) for a in alerts] == [('gaby', 2, 8.0)]
+
+        for _ in range(2):
+            circle.create_health_log({**log, 'severity': 2}, logged_by='faza')
+        assert circle.get_reminders('faza')['health_alerts'] == []
+
+    def test_health_alert_due_on_utc_clock(self, fresh_db, monkeypatch):
+        """Health alerts are stamped and drained on the same UTC clock as health_logs"""
+        monkeypatch.setenv('TZ', 'Asia/Jakarta')
+        time.tzset()
+        try:
+            circle = CircleModule()
+            log = {'owner': 'gaby', 'symptom_type': 'reflux', 'severity': 9}
+            circle.create_health_log(log, logged_by='faza')
+
+            with get_db() as conn:
+                due_at, logged_at = conn.execute(
+                    """SELECT q.due_at, MAX(h.timestamp) FROM reminder_queue q, health_logs h
+                       WHERE q.kind = 'health_alert'"""
+                ).fetchone()
+            drift = datetime.fromisoformat(due_at) - datetime.fromisoformat(logged_at)
+            assert abs(drift) < timedelta(minutes=1)
+
+            fired = circle.drain_reminders()
+            assert [r['kind'] for r in fired] == ['health_alert']
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+
 class TestStatistics:
     """Test statistics functionality"""
 
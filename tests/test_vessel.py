@@ -1,7 +1,12 @@
 """
 Vessel module tests
 """
+import json
+from pathlib import Path
+
 import pytest
+from datetime import date, timedelta
+from core.database import get_db
 from modules.vessel.service import VesselModule
 
 
@@ -64,6 +69,55 @@ class TestBlueprintProtocol:
         assert 0 <= poor_score <= 1.0
         assert poor_score < 0.3  # Should be low for poor compliance
 
+    def test_blueprint_upsert_per_owner(self, fresh_db):
+        """Logs are keyed on (owner, date): both owners can log a day, re-logging updates it"""
+        vessel = VesselModule()
+        entry = {'owner': 'faza', 'date': '2026-02-24', 'supplements_taken': True,
+                                'super_veggie_eaten': True, 'nutty_pudding_eaten': True,
+                                'exercise_done': True, 'water_intake_ml': 2500}
+        first = vessel.log_blueprint(entry, 'faza')
+        assert (first['status'], first['compliance_score']) == ('created', 100)
+
+        again = vessel.log_blueprint(dict(entry, water_intake_ml=1000), 'faza')
+        assert (again['id'], again['status'], again['compliance_score']) == (first['id'], 'updated', 80)
+        assert vessel.log_blueprint(dict(entry, owner='gaby'), 'gaby')['status'] == 'created'
+
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM blueprint_logs").fetchone()[0] == 2
+            audits = conn.execute(
+                "SELECT action FROM audit_log WHERE entity_type = 'blueprint_log' ORDER BY id"
+            ).fetchall()
+            assert [a['action'] for a in audits] == ['create', 'update', 'create']
+
+    def test_blueprint_backfill_and_heatmap(self, fresh_db):
+        """Bulk backfill in one transaction; heatmap streaks over consecutive compliant days"""
+        vessel = VesselModule()
+        today = date.today()
+        full = {'supplements_taken': True, 'super_veggie_eaten': True, 'nutty_pudding_eaten': True,
+                'exercise_done': True, 'water_intake_ml': 3000}
+        # Compliant for days 20..11 ago, a 40-point day 10 ago, a gap 9 ago, compliant 8..1 ago
+        logs = [dict(full, owner='faza', date=(today - timedelta(days=i)).isoformat())
+                for i in list(range(20, 10, -1)) + list(range(8, 0, -1))]
+        logs.append({'owner': 'faza', 'date': (today - timedelta(days=10)).isoformat(),
+                     'supplements_taken': True, 'exercise_done': True})
+        logs += [{'owner': 'nobody', 'date': today.isoformat()}, {'owner': 'faza', 'date': 'yesterday'}]
+
+        result = vessel.log_blueprints(logs, 'faza')
+        assert (result['created'], result['updated'], result['failed']) == (19, 0, 2)
+        assert [e['record'] for e in result['errors']] == [20, 21]
+
+        assert vessel.log_blueprints(logs[:3], 'faza')['updated'] == 3
+
+        heatmap = vessel.get_blueprint_heatmap('faza', days=365)
+        assert (heatmap['logged_days'], heatmap['compliant_days']) == (19, 18)
+        assert (heatmap['current_streak'], heatmap['longest_streak']) == (8, 10)
+        assert heatmap['days'][10] == {'date': (today - timedelta(days=10)).isoformat(),
+                                       'score': 40, 'compliant': False, 'streak': 0}
+
+        # A missed yesterday ends the current streak
+        stale = vessel.get_blueprint_heatmap('faza', end_date=(today + timedelta(days=2)).isoformat())
+        assert stale['current_streak'] == 0
+
     def test_get_blueprint_logs(self, test_user, sample_blueprint_log):
         """Test getting Blueprint logs"""
         vessel = VesselModule()
@@ -92,6 +146,24 @@ class TestBlueprintProtocol:
         assert 'compliance_score' in log
 
 
+    def test_owner_date_migration_with_legacy_view(self, fresh_db):
+        """The rebuild survives the old broken health_correlations view and keeps every log"""
+        migration = Path(__file__).parent.parent / "database" / "migrations" / "add_blueprint_owner_date_key.sql"
+        with get_db() as conn:
+            conn.executescript(
+                """DROP VIEW health_correlations;
+                   CREATE VIEW health_correlations AS
+                   SELECT h.*, b.sleep_quality AS prev_night_sleep FROM health_logs h
+                   LEFT JOIN biometrics b ON DATE(h.timestamp) = DATE(b.date);"""
+            )
+            conn.execute("INSERT INTO blueprint_logs (id, owner, date, compliance_score) "
+                         "VALUES ('bpl_1', 'faza', '2026-03-01', 90)")
+        with get_db() as conn:
+            conn.executescript(migration.read_text())
+            assert [tuple(r) for r in conn.execute("SELECT id, compliance_score FROM blueprint_logs")] == [('bpl_1', 90)]
+            conn.execute("SELECT prev_night_sleep, morning_hrv FROM health_correlations").fetchall()
+
+
 class TestWorkouts:
     """Test workout logging"""
 
@@ -153,6 +225,25 @@ class TestWorkouts:
         assert 'total_duration' in stats
         assert stats['total_workouts'] == 5
 
+    def test_workout_stats_from_rollup(self, fresh_db):
+        """Stats come from the daily rollup, which follows inserts and deletes"""
+        vessel = VesselModule()
+        for minutes, rpe, prs in ((60, 8, ['squat', 'bench']), (45, None, []), (30, 6, ['row'])):
+            vessel.log_workout({'owner': 'faza', 'workout_type': 'hyperpump', 'duration_minutes': minutes,
+                                'total_volume_kg': 1000, 'avg_rpe': rpe, 'prs_achieved': prs}, 'faza')
+        workout_id = vessel.log_workout({'owner': 'faza', 'workout_type': 'cardio',
+                                         'duration_minutes': 20}, 'faza')['id']
+        vessel.log_workout({'owner': 'gaby', 'workout_type': 'cardio', 'duration_minutes': 50}, 'gaby')
+
+        stats = vessel.get_workout_stats('faza', days=30)
+        assert (stats['total_workouts'], stats['total_minutes'], stats['total_volume_kg']) == (4, 155, 3000)
+        assert (stats['avg_rpe'], stats['prs_count']) == (7.0, 3)
+        assert stats['by_type'] == {'hyperpump': 3, 'cardio': 1}
+
+        with get_db() as conn:
+            conn.execute("DELETE FROM workouts WHERE id = ?", (workout_id,))
+        assert vessel.get_workout_stats('faza', days=30)['by_type'] == {'hyperpump': 3}
+
 
 class TestBiometrics:
     """Test biometric tracking"""
@@ -210,10 +301,190 @@ class TestBiometrics:
         assert 'trend' in trends
         assert trends['trend'] in ['increasing', 'decreasing', 'stable']
 
+    def test_biometric_trends_from_rollup(self, fresh_db):
+        """Averages, weight change and recovery trend from daily rollups"""
+        vessel = VesselModule()
+        today = date.today()
+        for i in range(6):
+            day = (today - timedelta(days=5 - i)).isoformat()
+            vessel.log_biometrics({'owner': 'faza', 'date': day, 'hrv': 50 + i,
+                                   'recovery_score': 50 + 5 * i, 'weight_kg': 80 - 0.2 * i}, 'faza')
+        # A second reading on the latest day counts towards the means
+        vessel.log_biometrics({'owner': 'faza', 'date': today.isoformat(), 'hrv': 62}, 'faza')
+        # Outside the window: neither the means nor the trend see it
+        vessel.log_biometrics({'owner': 'faza', 'date': (today - timedelta(days=30)).isoformat(),
+                               'recovery_score': 99}, 'faza')
+
+        trends = vessel.get_biometric_trends('faza', days=30)
+        assert trends['avg_hrv'] == round((50 + 51 + 52 + 53 + 54 + 55 + 62) / 7, 1)
+        assert trends['avg_recovery_score'] == 62.5
+        assert trends['weight_change_kg'] == -1.0
+        assert trends['trend'] == 'improving'
+
+        weekly = vessel.get_rollups('faza', days=30, period='weekly')['points']
+        assert sum(w['workouts'] for w in weekly) == 0
+        daily = vessel.get_rollups('faza', days=30)['points']
+        assert [d['period'] for d in daily][-1] == today.isoformat()
+        assert daily[-1]['hrv'] == 58.5
+
+    def test_ingest_biometrics(self, fresh_db):
+        """Bulk import upserts per (owner, date, device) and refreshes daily rollups per batch"""
+        vessel = VesselModule()
+        vessel.INGEST_BATCH_SIZE = 2
+        today = date.today()
+        days = [(today - timedelta(days=i)).isoformat() for i in range(3)]
+        vessel.log_biometrics({'owner': 'faza', 'date': days[0], 'hrv': 40}, 'faza')
+
+        export = (
+            "summary_date,Sleep Score,Total Sleep Duration,Average HRV,Lowest Resting Heart Rate\n"
+            f"{days[0]},80,28800,60,52\n"
+            f"{days[1]},75,25200,55,54\n"
+            f"{days[2]},70,,50,\n"
+            "not-a-date,1,2,3,4\n"
+            f"{days[2]},,,,\n"
+        )
+        result = vessel.ingest_biometrics(export.splitlines(keepends=True), 'faza', 'faza',
+                                          filename='oura.csv', device_source='oura')
+        assert (result['imported'], result['updated'], result['skipped'], result['failed']) == (3, 0, 1, 1)
+        assert result['errors'] == [{'record': 5, 'error': 'Missing or invalid date'}]
+
+        # Re-import: same days update in place, blank fields keep their values
+        again = vessel.ingest_biometrics(
+            [f'{{"date": "{days[2]}", "hrv": 58}}\n', f'{{"date": "{days[1]}T07:00:00", "resting_hr": 50}}\n'],
+            'faza', 'faza', fmt='ndjson', device_source='oura'
+        )
+        assert (again['imported'], again['updated']) == (0, 2)
+
+        with get_db() as conn:
+            rows = conn.execute(
+                "SELECT date, sleep_hours, hrv, resting_hr FROM biometrics WHERE device_source = 'oura' ORDER BY date"
+            ).fetchall()
+            assert [tuple(r) for r in rows] == [(days[2], None, 58, None), (days[1], 7.0, 55, 50),
+                                                (days[0], 8.0, 60, 52)]
+            assert conn.execute("SELECT COUNT(*) FROM rollup_suspended").fetchone()[0] == 0
+
+        # The rollup includes the manual reading and stays trigger-maintained afterwards
+        vessel.log_biometrics({'owner': 'faza', 'date': days[2], 'hrv': 62}, 'faza')
+        daily = {d['period']: d for d in vessel.get_rollups('faza', days=7)['points']}
+        assert (daily[days[0]]['hrv'], daily[days[1]]['resting_hr'], daily[days[2]]['hrv']) == (50.0, 50.0, 60.0)
+
+        assert 'error' in vessel.ingest_biometrics([], 'nobody', 'faza')
+
+    def test_log_biometrics_same_device_day(self, fresh_db):
+        """A second same-day reading from a device fills in the first instead of failing"""
+        vessel = VesselModule()
+        day = date.today().isoformat()
+        first = vessel.log_biometrics({'owner': 'faza', 'date': day, 'hrv': 55, 'device_source': 'whoop'}, 'faza')
+        second = vessel.log_biometrics({'owner': 'faza', 'date': day, 'resting_hr': 50,
+                                        'device_source': 'whoop'}, 'faza')
+        assert (second['id'], second['status']) == (first['id'], 'updated')
+
+        with get_db() as conn:
+            rows = conn.execute("SELECT hrv, resting_hr FROM biometrics").fetchall()
+            assert [tuple(r) for r in rows] == [(55, 50)]
+            assert conn.execute("SELECT readings FROM biometrics_daily").fetchone()[0] == 1
+
+    def test_bulk_ingest_migration_merges_duplicates(self, fresh_db):
+        """Readings sharing owner, day and device are merged into the latest, not dropped"""
+        migration = Path(__file__).parent.parent / "database" / "migrations" / "add_biometrics_bulk_ingest.sql"
+        day = date.today().isoformat()
+        with get_db() as conn:
+            conn.execute("DROP INDEX idx_biometrics_owner_date_source")
+            conn.executemany(
+                "INSERT INTO biometrics (id, owner, date, device_source, hrv, resting_hr, weight_kg) "
+                "VALUES (?, 'faza', ?, ?, ?, ?, ?)",
+                [('bio_1', day, 'oura', 50, 60, 80.0), ('bio_2', day, 'oura', 52, None, None),
+                 ('bio_3', day, 'oura', None, None, None), ('bio_4', day, 'whoop', 70, None, None)]
+            )
+            conn.executescript(migration.read_text())
+
+            rows = conn.execute(
+                "SELECT id, hrv, resting_hr, weight_kg FROM biometrics ORDER BY id"
+            ).fetchall()
+            assert [tuple(r) for r in rows] == [('bio_3', 52, 60, 80.0), ('bio_4', 70, None, None)]
+            daily = conn.execute("SELECT readings, hrv_sum, hrv_n FROM biometrics_daily").fetchone()
+            assert tuple(daily) == (2, 122.0, 2)
+            logged = conn.execute(
+                "SELECT metadata FROM audit_log WHERE entity_id = 'add_biometrics_bulk_ingest'"
+            ).fetchone()[0]
+            assert json.loads(logged)['merged_readings'] == 2
+
+    def test_biometric_series(self, fresh_db):
+        """EWMA, baseline anomalies, slopes, acute:chronic load and downsampling"""
+        vessel = VesselModule()
+        today = date.today()
+        for i in range(60):
+            day = (today - timedelta(days=59 - i)).isoformat()
+            # Steady HRV with a small wobble, one crash today
+            hrv = 30 if i == 59 else 60 + (i % 3)
+            vessel.log_biometrics({'owner': 'faza', 'date': day, 'hrv': hrv,
+                                   'weight_kg': 80 - 0.1 * i}, 'faza')
+            # Light training for seven weeks, then a heavy final week
+            with get_db() as conn:
+                conn.execute(
+                    """INSERT INTO workouts (id, owner, timestamp, workout_type, duration_minutes, avg_rpe)
+                       VALUES (?, 'faza', ?, 'cardio', ?, 6)""",
+                    (f'wrk_{i}', f'{day} 07:00:00', 90 if i >= 53 else 30)
+                )
+
+        series = vessel.get_biometric_series('faza', days=30, metrics=['hrv', 'weight_kg', 'load'])
+        assert series['bucket_days'] == 1
+        assert len(series['points']) == 30
+        assert series['points'][-1]['date'] == today.isoformat()
+
+        anomalies = {(a['date'], a['metric']) for a in series['anomalies']}
+        assert {d for d, m in anomalies if m == 'hrv'} == {today.isoformat()}
+        assert series['points'][-1]['hrv']['z'] < -2
+        assert series['points'][-1]['hrv']['baseline'] == 61.0
+        assert series['summary']['weight_kg']['slope_per_week'] == -0.7
+        assert series['points'][-1]['load']['value'] == 540
+
+        # Acute: 7 days x 540, chronic: (21 x 180 + 7 x 540) / 28
+        ratio = 540 / ((21 * 180 + 7 * 540) / 28)
+        assert series['acute_chronic'] == {'ratio': round(ratio, 2), 'zone': 'high_risk'}
+
+        long = vessel.get_biometric_series('faza', days=60, metrics=['hrv'], max_points=10)
+        assert long['bucket_days'] == 6
+        assert len(long['points']) == 10
+        assert long['points'][-1]['hrv']['z'] == series['points'][-1]['hrv']['z']
+
+        assert 'error' in vessel.get_biometric_series('faza', metrics=['steps'])
+
 
 class TestSobrietyTracker:
     """Test sobriety tracking"""
 
+    def test_sobriety_streaks_on_read(self, fresh_db):
+        """Streaks and savings come from sobriety_relapses as of today"""
+        vessel = VesselModule()
+        today = date.today()
+        ago = lambda days: (today - timedelta(days=days)).isoformat()
+
+        tracker_id = vessel.start_sobriety_tracker(
+            {'owner': 'faza', 'habit_type': 'alcohol', 'start_date': ago(100), 'cost_per_day': 5}, 'faza'
+        )['id']
+        tracker = vessel.get_sobriety_tracker(tracker_id, 'faza')
+        assert (tracker['current_streak_days'], tracker['longest_streak_days']) == (100, 100)
+        assert tracker['savings_calculated'] == 500
+
+        vessel.log_relapse(tracker_id, {'relapse_date': ago(70), 'cost': 40}, 'faza')
+        vessel.log_relapse(tracker_id, {'relapse_date': ago(10), 'cost': 60, 'triggers': ['party']}, 'faza')
+        # Back-dated entry: doesn't move last_relapse, splits the first streak
+        vessel.log_relapse(tracker_id, {'relapse_date': ago(90), 'reason': 'wedding'}, 'faza')
+
+        tracker = vessel.get_sobriety_tracker(tracker_id, 'faza')
+        assert tracker['last_relapse'] == ago(10)
+        assert tracker['relapse_count'] == 3
+        assert [r['date'] for r in tracker['relapse_log']] == [ago(90), ago(70), ago(10)]
+        assert tracker['relapse_log'][2]['triggers'] == ['party']
+        # Streaks: 10 (start -> first relapse), 19, 59, then 9 to today
+        assert (tracker['current_streak_days'], tracker['longest_streak_days']) == (9, 59)
+        assert tracker['savings_calculated'] == 500 - 100
+
+        assert vessel.update_sobriety_tracker(tracker_id, {'cost_per_day': 7.5}, 'faza')['status'] == 'updated'
+        assert vessel.get_sobriety_tracker(tracker_id, 'faza')['savings_calculated'] == 650
+        assert 'error' in vessel.log_relapse('sob_missing', {'relapse_date': ago(1)}, 'faza')
+
     def test_start_sobriety_tracker(self, test_user):
         """Test starting a sobriety tracker"""
         vessel = VesselModule()
@@ -283,6 +554,24 @@ class TestSobrietyTracker:
         assert tracker['relapse_count'] >= 1
 
 
+    def test_relapses_migration_reruns(self, fresh_db):
+        """The relapses migration can be applied twice and keeps cost_per_day and relapses"""
+        migration = Path(__file__).parent.parent / "database" / "migrations" / "add_sobriety_relapses.sql"
+        with get_db() as conn:
+            conn.execute(
+                "INSERT INTO sobriety_tracker (id, owner, habit_type, start_date, cost_per_day, relapse_log) "
+                "VALUES ('sob_1', 'faza', 'alcohol', '2026-01-01', 12.5, '[{\"date\": \"2026-02-01\"}]')"
+            )
+        for _ in range(2):
+            with get_db() as conn:
+                conn.executescript(migration.read_text())
+
+        with get_db() as conn:
+            assert conn.execute("SELECT cost_per_day FROM sobriety_tracker").fetchone()[0] == 12.5
+            relapses = conn.execute("SELECT tracker_id, relapse_date FROM sobriety_relapses").fetchall()
+            assert [tuple(r) for r in relapses] == [('sob_1', '2026-02-01')]
+
+
 class TestAnalytics:
     """Test analytics functionality"""
 